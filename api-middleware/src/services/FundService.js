@@ -22,7 +22,8 @@ class FundService extends BaseOdooService {
     try {
       console.log('🔗 [FundService] Calling /data_fund endpoint...');
       // Endpoint /data_fund là public theo Odoo controller
-      const data = await this.apiCall('/data_fund', { requireAuth: false });
+      // lite=1: app không dùng nav_history_json nên bỏ chuỗi lịch sử NAV khỏi payload
+      const data = await this.apiCall('/data_fund', { requireAuth: false, params: { lite: 1 } });
       console.log('📊 [FundService] Raw funds response:', typeof data, Array.isArray(data));
       
       const funds = Array.isArray(data) ? data : [];
@@ -1,6 +1,6 @@
 {
     'name': "Fund Management",
-    'version': '1.1',
+    'version': '1.3',
     'depends': ['base', 'web', 'mail', 'fund_management_control'],
     'author': "Danh",
     'category': 'Assets',
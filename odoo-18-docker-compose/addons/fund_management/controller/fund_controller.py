@@ -1,44 +1,119 @@
 from odoo import http
 from odoo.http import request, Response
 import json
-from datetime import datetime, timedelta, timezone
 from datetime import datetime, timedelta
 
+from odoo.addons.stock_data.utils import ohlc_series
+
+from ..models.fund_nav_point import RESAMPLE_PERIODS
+from ..utils import http_cache
+
+# Cache body /data_fund trong process (theo database + version dữ liệu)
+_FUND_CACHE = http_cache.ResponseCache(max_entries=256)
+
 
 class FundController(http.Controller):
 
-    @http.route('/data_fund', type='http', auth='public', cors='*')
-    def get_funds(self):
-        """Get all funds data"""
-        funds = request.env['portfolio.fund'].sudo().search([])
-        
-        result = [
-            {
-                "id": fund.id,
-                "ticker": fund.ticker,
-                'name': fund.name,
-                'description': fund.description,
-                'current_nav': fund.current_nav,
-                'low_price': fund.low_price,
-                'high_price': fund.high_price,
-                'open_price': fund.open_price,
-                'investment_type': fund.investment_type,
-                'nav_history_json': fund.nav_history_json,
+    # Trường trả về cho danh sách quỹ; biến thể lite bỏ nav_history_json (chuỗi lịch sử lớn)
+    _FUND_LIST_FIELDS = [
+        'ticker', 'name', 'description', 'current_nav', 'low_price', 'high_price', 'open_price',
+        'investment_type', 'color', 'change', 'change_percent', 'volume',
+    ]
+
+    def _fund_list_version(self):
+        """(count, max write_date, max id) của portfolio.fund: đổi khi có quỹ thêm/xoá/sửa hoặc NAV cập nhật"""
+        request.env['portfolio.fund'].sudo().flush_model()
+        request.env.cr.execute("SELECT count(*), max(write_date), max(id) FROM portfolio_fund")
+        return request.env.cr.fetchone()
+
+    def _serialize_funds(self, lite=False):
+        fields_list = list(self._FUND_LIST_FIELDS)
+        if not lite:
+            fields_list.append('nav_history_json')
+        rows = request.env['portfolio.fund'].sudo().search_read([], fields_list)
+        result = []
+        for row in rows:
+            item = {
+                'id': row['id'],
+                'ticker': row['ticker'],
+                'name': row['name'],
+                'description': row['description'],
+                'current_nav': row['current_nav'],
+                'low_price': row['low_price'],
+                'high_price': row['high_price'],
+                'open_price': row['open_price'],
+                'investment_type': row['investment_type'],
                 # expose color so frontend can use the actual fund color
-                'color': getattr(fund, 'color', None) or getattr(fund, 'fund_color', None),
+                'color': row['color'] or None,
                 # market dynamics
-                'change': getattr(fund, 'change', 0.0) or 0.0,
-                'change_percent': getattr(fund, 'change_percent', 0.0) or 0.0,
-                'volume': getattr(fund, 'volume', 0.0) or 0.0,
+                'change': row['change'] or 0.0,
+                'change_percent': row['change_percent'] or 0.0,
+                'volume': row['volume'] or 0.0,
             }
-            for fund in funds
-        ]
+            if not lite:
+                item['nav_history_json'] = row['nav_history_json']
+            result.append(item)
+        return json.dumps(result)
+
+    def _conditional_response(self, etag, last_modified, build_body):
+        """Trả 304 nếu client đã có bản hiện tại (If-None-Match/If-Modified-Since), ngược lại body JSON"""
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+        last_modified_header = http_cache.http_date(last_modified)
+        if last_modified_header:
+            headers.append(('Last-Modified', last_modified_header))
+        if http_cache.is_not_modified(
+                etag, last_modified,
+                request.httprequest.headers.get('If-None-Match'),
+                request.httprequest.headers.get('If-Modified-Since')):
+            return Response(status=304, headers=headers)
+        return Response(build_body(), content_type='application/json', headers=headers)
 
-        return Response(
-            json.dumps(result),
-            content_type='application/json'
+    @http.route('/data_fund', type='http', auth='public', cors='*')
+    def get_funds(self, lite=None, **kwargs):
+        """
+        Get all funds data.
+        ?lite=1 bỏ nav_history_json (lấy lịch sử qua /data_fund/<id>/history).
+        Body được cache theo version dữ liệu quỹ; client gửi lại ETag sẽ nhận 304.
+        """
+        lite = str(lite or '').lower() in ('1', 'true', 'yes')
+        count, last_modified, max_id = self._fund_list_version()
+        variant = 'lite' if lite else 'full'
+        version = (count, last_modified, max_id)
+        etag = http_cache.make_etag('data_fund', variant, *version)
+        cache_key = (request.env.cr.dbname, 'data_fund', variant)
+        return self._conditional_response(
+            etag, last_modified,
+            lambda: _FUND_CACHE.get_or_build(cache_key, version, lambda: self._serialize_funds(lite)),
         )
 
+    @http.route('/data_fund/<int:fund_id>/history', type='http', auth='public', cors='*')
+    def get_fund_history(self, fund_id, page=1, limit=None, date_from=None, date_to=None, resample=None, **kwargs):
+        """
+        Lịch sử NAV của một quỹ theo trang: trang 1 là các điểm mới nhất.
+        date_from/date_to (YYYY-MM-DD) giới hạn cửa sổ đọc từ portfolio.fund.nav.point;
+        resample=week/month giữ điểm cuối mỗi chu kỳ cho các khoảng dài.
+        """
+        fund = request.env['portfolio.fund'].sudo().browse(fund_id).exists()
+        if not fund:
+            return Response(json.dumps({'error': 'Fund not found'}), content_type='application/json', status=404)
+        if resample and resample not in RESAMPLE_PERIODS:
+            return Response(json.dumps({'error': 'Invalid resample'}), content_type='application/json', status=400)
+        try:
+            date_from = date_from and datetime.strptime(date_from, '%Y-%m-%d').date()
+            date_to = date_to and datetime.strptime(date_to, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(json.dumps({'error': 'Invalid date_from/date_to'}), content_type='application/json', status=400)
+        last_modified = fund.write_date
+        etag = http_cache.make_etag('data_fund_history', fund.id, last_modified, page, limit, date_from, date_to, resample)
+
+        def build_body():
+            points = fund.get_nav_history(date_from=date_from, date_to=date_to, resample=resample)[fund.id]
+            data = http_cache.paginate_history(points, page=page, limit=limit)
+            data.update({'fund_id': fund.id, 'ticker': fund.ticker})
+            return json.dumps(data)
+
+        return self._conditional_response(etag, last_modified, build_body)
+
     @http.route('/fund_widget', type='http', auth='public', website=True)
     def fund_widget_page(self, **kwargs):
         """Fund widget page"""
@@ -108,6 +183,8 @@ class FundController(http.Controller):
           - ticker: symbol/ticker to fetch
           - range: one of 1D,5D,1M,3M,6M,1Y (defaults to 1M)
           - fromDate, toDate: optional (YYYY-MM-DD). If provided, override range window
+          - resolution: optional 1/5/15/60 (minutes) or D (defaults: 1D -> 1, 5D -> 15, others -> D)
+          - format: 'columns' returns parallel arrays {t: [], o: [], h: [], l: [], c: [], v: []}
         """
         try:
             ticker = (kwargs.get('ticker') or '').strip().upper()
@@ -139,84 +216,21 @@ class FundController(http.Controller):
                 from_date = today - timedelta(days=31)
             to_date = locals().get('to_date', today)
 
-            data = []
-            if range_key == '1D':
-                # Prefer intraday OHLC for 1D if available
-                try:
-                    intraday_model = request.env['ssi.intraday.ohlc'].sudo()
-                    # Search by symbol (related field) and date
-                    intraday_records = intraday_model.search([
-                        ('symbol', '=', ticker),
-                        ('date', '>=', from_date),
-                        ('date', '<=', to_date),
-                    ], order='date asc, time asc')
-                    
-                    for r in intraday_records:
-                        # Parse time string to datetime
-                        time_str = getattr(r, 'time', '') or ''
-                        date_obj = getattr(r, 'date', None)
-                        
-                        if not date_obj:
-                            continue
-                        
-                        # Parse time string (format: HH:MM:SS or HH:MM)
-                        dt = None
-                        if time_str:
-                            try:
-                                # Try parsing HH:MM:SS or HH:MM format
-                                time_parts = time_str.split(':')
-                                if len(time_parts) >= 2:
-                                    hour = int(time_parts[0])
-                                    minute = int(time_parts[1])
-                                    second = int(time_parts[2]) if len(time_parts) > 2 else 0
-                                    dt = datetime.combine(date_obj, datetime.min.time().replace(hour=hour, minute=minute, second=second))
-                            except (ValueError, IndexError):
-                                # Fallback to start of day
-                                dt = datetime.combine(date_obj, datetime.min.time())
-                        else:
-                            # Fallback to start of day if no time
-                            dt = datetime.combine(date_obj, datetime.min.time())
-                        
-                        if not dt:
-                            continue
-                        
-                        # Convert to Unix timestamp (seconds) using explicit VN timezone (UTC+7)
-                        vn_tz = timezone(timedelta(hours=7))
-                        dt_vn = dt.replace(tzinfo=vn_tz)
-                        ts = int(dt_vn.timestamp())
-                        
-                        data.append({
-                            't': ts,
-                            'o': float(getattr(r, 'open_price', 0.0) or 0.0),
-                            'h': float(getattr(r, 'high_price', 0.0) or 0.0),
-                            'l': float(getattr(r, 'low_price', 0.0) or 0.0),
-                            'c': float(getattr(r, 'close_price', 0.0) or 0.0),
-                            'v': float(getattr(r, 'volume', 0.0) or 0.0),
-                        })
-                except Exception as e:
-                    import traceback
-                    traceback.print_exc()
-                    data = []
-
-            # Fallback or for other ranges: use daily OHLC
-            if not data:
-                ohlc_model = request.env['ssi.daily.ohlc'].sudo()
-                records = ohlc_model.search([
-                    ('symbol', '=', ticker),
-                    ('date', '>=', from_date),
-                    ('date', '<=', to_date),
-                ], order='date asc')
-                data = [
-                    {
-                        't': r.date.strftime('%Y-%m-%d'),
-                        'o': r.open_price or 0.0,
-                        'h': r.high_price or 0.0,
-                        'l': r.low_price or 0.0,
-                        'c': r.close_price or 0.0,
-                        'v': r.volume or 0.0,
-                    }
-                    for r in records
-                ]
+            # Chuỗi dạng cột từ bảng nến tổng hợp (không đọc qua recordset ORM)
+            Rollup = request.env['ssi.ohlc.rollup'].sudo()
+            resolution = ohlc_series.parse_resolution(kwargs.get('resolution'), range_key)
+            columns = Rollup.get_series(ticker, from_date, to_date, resolution)
+            if resolution != ohlc_series.DAILY and not columns['t']:
+                # Fallback: chưa có intraday -> dùng daily OHLC
+                resolution = ohlc_series.DAILY
+                columns = Rollup.get_series(ticker, from_date, to_date, resolution)
+
+            if (kwargs.get('format') or '').lower() == 'columns':
+                return Response(
+                    json.dumps({'status': 'Success', 'resolution': resolution, 'data': columns}, separators=(',', ':')),
+                    content_type='application/json',
+                )
+            data = ohlc_series.unpack_rows(columns)
 
             return Response(json.dumps({'status': 'Success', 'data': data}), content_type='application/json')
         except Exception as e:
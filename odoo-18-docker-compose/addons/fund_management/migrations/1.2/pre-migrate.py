@@ -0,0 +1,44 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Cột của các trường NAV chuyển sang lưu trữ (store=True)
+NAV_COLUMNS = {
+    'nav_maturity_date': 'date',
+    'nav_sell_date': 'date',
+    'nav_days': 'integer',
+    'nav_days_converted': 'numeric',
+    'nav_purchase_value': 'numeric',
+    'nav_price_with_fee': 'numeric',
+    'nav_converted_rate': 'numeric',
+    'nav_interest_delta': 'numeric',
+    'nav_tax_tncn': 'numeric',
+    'nav_sell_price1': 'numeric',
+    'nav_sell_price2': 'numeric',
+    'nav_sell_value1': 'numeric',
+    'nav_sell_value2': 'numeric',
+    'nav_difference': 'numeric',
+    'nav_sell_fee': 'numeric',
+    'nav_tax': 'numeric',
+    'nav_customer_receive': 'numeric',
+    'nav_sell_date_formatted': 'varchar',
+    'nav_maturity_date_formatted': 'varchar',
+    'transaction_date_formatted': 'varchar',
+}
+
+
+def migrate(cr, version):
+    """
+    Tạo sẵn cột để ORM không tính toàn bộ bảng trong một transaction khi nâng cấp;
+    giá trị được cron_backfill_nav_calculation tính theo lô.
+    """
+    if not version:
+        return
+    for column, column_type in NAV_COLUMNS.items():
+        cr.execute(f'ALTER TABLE portfolio_transaction ADD COLUMN IF NOT EXISTS "{column}" {column_type}')
+    cr.execute("""
+        INSERT INTO ir_config_parameter (key, value, create_date, write_date)
+        VALUES ('fund_management.nav_backfill_last_id', '0', now() at time zone 'UTC', now() at time zone 'UTC')
+        ON CONFLICT (key) DO UPDATE SET value = '0'
+    """)
+    _logger.info("Đã tạo cột NAV lưu trữ cho portfolio_transaction, chờ cron backfill")
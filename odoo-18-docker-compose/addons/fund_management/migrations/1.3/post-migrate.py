@@ -0,0 +1,60 @@
+import logging
+from datetime import date
+
+from psycopg2.extras import execute_values
+
+from odoo.addons.fund_management.utils.http_cache import load_history
+
+_logger = logging.getLogger(__name__)
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def migrate(cr, version):
+    """
+    Chuyển lịch sử NAV dạng JSON (cột nav_history_json, dự phòng nav_history) sang portfolio_fund_nav_point.
+    Cột text cũ được giữ nguyên để có thể đối chiếu/rollback.
+    """
+    if not version:
+        return
+    cr.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'portfolio_fund' AND column_name IN ('nav_history_json', 'nav_history')
+    """)
+    columns = {row[0] for row in cr.fetchall()}
+    if not columns:
+        return
+    source = ', '.join(f'"{c}"' for c in ('nav_history_json', 'nav_history') if c in columns)
+    cr.execute(f"SELECT id, {source} FROM portfolio_fund")
+
+    rows = {}
+    for fund_id, *blobs in cr.fetchall():
+        # nav_history_json ưu tiên, nav_history chỉ dùng khi cột JSON trống
+        points = []
+        for blob in blobs:
+            points = load_history(blob)
+            if points:
+                break
+        for point in points:
+            point_date = _parse_date(point.get('date'))
+            try:
+                nav = float(point.get('value') or 0.0)
+            except (TypeError, ValueError):
+                continue
+            if point_date:
+                rows[(fund_id, point_date)] = nav
+    if not rows:
+        return
+
+    execute_values(cr, """
+        INSERT INTO portfolio_fund_nav_point (fund_id, date, nav, create_uid, create_date, write_uid, write_date)
+        VALUES %s
+        ON CONFLICT (fund_id, date) DO UPDATE SET nav = EXCLUDED.nav
+    """, [(fund_id, point_date, nav) for (fund_id, point_date), nav in rows.items()],
+        template="(%s, %s, %s, 1, now() at time zone 'UTC', 1, now() at time zone 'UTC')", page_size=2000)
+    _logger.info("Đã chuyển %d điểm NAV từ JSON sang portfolio_fund_nav_point", len(rows))
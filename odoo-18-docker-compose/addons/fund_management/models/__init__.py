@@ -2,6 +2,7 @@
 from . import balance_history
 from . import comparision
 from . import fund
+from . import fund_nav_point
 from . import investment
 from . import transaction
 from . import signed_contract
\ No newline at end of file
@@ -1,4 +1,7 @@
 from odoo import api, fields, models
+import json
+
+from ..utils import http_cache
 
 from ..utils import constants
 
@@ -34,7 +37,13 @@ class Fund(models.Model):
     nav_history = fields.Text(string="NAV History (JSON)")
     # Dạng JSON tiện cho ace editor ở module overview
     ytd_history_json = fields.Text(string="YTD History JSON")
-    nav_history_json = fields.Text(string="NAV History JSON")
+    # Lịch sử NAV lưu ở portfolio.fund.nav.point; trường JSON chỉ còn là view tương thích (ace editor, /data_fund)
+    nav_history_json = fields.Text(
+        string="NAV History JSON",
+        compute='_compute_nav_history_json',
+        inverse='_inverse_nav_history_json',
+    )
+    nav_point_ids = fields.One2many('portfolio.fund.nav.point', 'fund_id', string='NAV History Points')
     currency_id = fields.Many2one('res.currency', string='Currency', default=lambda self: self.env.company.currency_id)
     status = fields.Selection(
         constants.FUND_STATUSES,
@@ -60,6 +69,45 @@ class Fund(models.Model):
     # Relations
     investment_ids = fields.One2many('portfolio.investment', 'fund_id', string='Investments')
 
+    # --- NAV history ---
+    def _compute_nav_history_json(self):
+        history = self.env['portfolio.fund.nav.point'].get_range(self.ids)
+        for fund in self:
+            points = history.get(fund.id) or []
+            fund.nav_history_json = json.dumps(points) if points else False
+
+    def _inverse_nav_history_json(self):
+        """Sửa JSON trên form -> thay toàn bộ chuỗi điểm NAV của quỹ"""
+        NavPoint = self.env['portfolio.fund.nav.point'].sudo()
+        for fund in self:
+            if not fund.id:
+                continue
+            points = http_cache.load_history(fund.nav_history_json)
+            dates = [str(p['date'])[:10] for p in points]
+            NavPoint.search([('fund_id', '=', fund.id), ('date', 'not in', dates)]).unlink()
+            NavPoint.bulk_upsert([
+                {'fund_id': fund.id, 'date': date, 'nav': float(p.get('value') or 0.0)}
+                for date, p in zip(dates, points)
+            ])
+
+    def _touch_nav_history(self):
+        """Đánh dấu quỹ đổi lịch sử NAV (write_date dùng làm version cho cache /data_fund)"""
+        if self:
+            self.sudo().write({'last_update': fields.Datetime.now()})
+
+    def append_nav_point(self, nav=None, date=None):
+        """Ghi (hoặc thay) điểm NAV của ngày `date` cho từng quỹ; mặc định NAV hiện tại, hôm nay"""
+        date = date or fields.Date.context_today(self)
+        return self.env['portfolio.fund.nav.point'].sudo().bulk_upsert([
+            {'fund_id': fund.id, 'date': date, 'nav': fund.current_nav if nav is None else nav}
+            for fund in self
+        ])
+
+    def get_nav_history(self, date_from=None, date_to=None, resample=None):
+        """Chuỗi NAV trong khoảng ngày của các quỹ -> {fund_id: [{'date', 'value'}]}"""
+        return self.env['portfolio.fund.nav.point'].get_range(
+            self.ids, date_from=date_from, date_to=date_to, resample=resample)
+
     # --- Sync helpers (simplified) ---
     def _map_fund_type(self, fund_type_value):
         """Map fund type to investment type"""
@@ -0,0 +1,106 @@
+from odoo import api, fields, models
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Chu kỳ gộp điểm NAV (date_trunc của PostgreSQL)
+RESAMPLE_PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+
+class FundNavPoint(models.Model):
+    """Chuỗi NAV theo ngày của quỹ (thay cho JSON nav_history_json trong một cột text)"""
+    _name = 'portfolio.fund.nav.point'
+    _description = 'Fund NAV Point'
+    _inherit = ['ssi.bulk.upsert.mixin']
+    _order = 'fund_id, date'
+    _rec_name = 'date'
+
+    _upsert_conflict_fields = ('fund_id', 'date')
+
+    fund_id = fields.Many2one('portfolio.fund', string='Fund', required=True, ondelete='cascade')
+    date = fields.Date(string='Date', required=True)
+    nav = fields.Float(string='NAV', required=True)
+
+    # Unique (fund_id, date) cũng là index ghép phục vụ truy vấn theo khoảng ngày của từng quỹ
+    _sql_constraints = [
+        ('fund_date_unique', 'unique(fund_id, date)', 'Each fund can only have one NAV point per date!'),
+    ]
+
+    # --- Ghi ---
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.mapped('fund_id')._touch_nav_history()
+        return records
+
+    def write(self, vals):
+        funds = self.mapped('fund_id')
+        res = super().write(vals)
+        (funds | self.mapped('fund_id'))._touch_nav_history()
+        return res
+
+    def unlink(self):
+        funds = self.mapped('fund_id')
+        res = super().unlink()
+        funds.exists()._touch_nav_history()
+        return res
+
+    @api.model
+    def bulk_upsert(self, vals_list, page_size=None):
+        result = super().bulk_upsert(vals_list, page_size=page_size)
+        fund_ids = {vals['fund_id'] for vals in vals_list if vals.get('fund_id')}
+        if result['ids'] and fund_ids:
+            self.env['portfolio.fund'].browse(list(fund_ids))._touch_nav_history()
+        return result
+
+    # --- Đọc ---
+    @api.model
+    def get_range(self, fund_ids, date_from=None, date_to=None, resample=None):
+        """
+        Điểm NAV của nhiều quỹ trong khoảng [date_from, date_to] bằng một câu truy vấn.
+
+        Args:
+            resample: 'week'/'month'/... -> giữ điểm cuối cùng của mỗi chu kỳ
+
+        Returns:
+            dict: {fund_id: [{'date': 'YYYY-MM-DD', 'value': nav}, ...]} sắp tăng dần theo ngày
+        """
+        result = {fund_id: [] for fund_id in fund_ids}
+        if not fund_ids:
+            return result
+        where = ["p.fund_id = ANY(%(fund_ids)s)"]
+        params = {'fund_ids': list(fund_ids)}
+        if date_from:
+            where.append("p.date >= %(date_from)s")
+            params['date_from'] = date_from
+        if date_to:
+            where.append("p.date <= %(date_to)s")
+            params['date_to'] = date_to
+
+        self.flush_model()
+        if resample and resample != 'day':
+            if resample not in RESAMPLE_PERIODS:
+                raise ValueError(f"Unsupported resample period: {resample}")
+            params['period'] = resample
+            query = f"""
+                SELECT fund_id, date, nav FROM (
+                    SELECT DISTINCT ON (p.fund_id, date_trunc(%(period)s, p.date))
+                           p.fund_id, p.date, p.nav
+                    FROM portfolio_fund_nav_point p
+                    WHERE {' AND '.join(where)}
+                    ORDER BY p.fund_id, date_trunc(%(period)s, p.date), p.date DESC
+                ) r
+                ORDER BY fund_id, date
+            """
+        else:
+            query = f"""
+                SELECT p.fund_id, p.date, p.nav
+                FROM portfolio_fund_nav_point p
+                WHERE {' AND '.join(where)}
+                ORDER BY p.fund_id, p.date
+            """
+        self.env.cr.execute(query, params)
+        for fund_id, date, nav in self.env.cr.fetchall():
+            result[fund_id].append({'date': date.isoformat(), 'value': nav})
+        return result
+
@@ -75,120 +75,120 @@ class Transaction(models.Model):
         tracking=True
     )
 
-    # NAV Calculation fields (computed)
+    # NAV Calculation fields (computed, lưu trữ - chỉ tính lại khi đầu vào thay đổi)
     nav_maturity_date = fields.Date(
         string="Ngày đáo hạn (E)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         help="Ngày đáo hạn tính từ ngày mua và kỳ hạn"
     )
     nav_sell_date = fields.Date(
         string="Ngày bán (D)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         help="Ngày bán = WORKDAY(ngày đáo hạn, -2)"
     )
     nav_days = fields.Integer(
         string="Số ngày (G)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         help="Số ngày = Ngày đáo hạn - Ngày mua"
     )
     nav_days_converted = fields.Float(
         string="Số ngày quy đổi (H)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         digits=(16, 2),
         help="Số ngày quy đổi theo lãi suất mới"
     )
     nav_purchase_value = fields.Monetary(
         string="Giá trị mua (L)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Giá trị mua = Units * Price + Units * Price * Fee"
     )
     nav_price_with_fee = fields.Monetary(
         string="Giá 1 CCQ đã bao gồm thuế/phí (M)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Giá 1 CCQ đã bao gồm thuế/phí = Giá trị mua / Units"
     )
     nav_converted_rate = fields.Float(
         string="Lãi suất quy đổi (O)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         digits=(16, 4),
         help="Lãi suất quy đổi theo giá bán 2"
     )
     nav_interest_delta = fields.Float(
         string="Chênh lệch lãi suất (Q)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         digits=(16, 4),
         help="Chênh lệch lãi suất = Lãi suất quy đổi - Lãi suất"
     )
     nav_tax_tncn = fields.Float(
         string="Thuế TNCN (R)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         digits=(16, 2),
         help="Thuế TNCN"
     )
     nav_sell_price1 = fields.Monetary(
         string="Giá bán 1 (S)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Giá bán 1 = ROUND(Giá trị bán 1 / Units, 0)"
     )
     nav_sell_price2 = fields.Monetary(
         string="Giá bán 2 (T)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Giá bán 2 = MROUND(Giá bán 1, 50)"
     )
     nav_sell_value1 = fields.Monetary(
         string="Giá trị bán 1 (U)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Giá trị bán 1 = Giá trị mua * Lãi suất / 365 * Số ngày + Giá trị mua"
     )
     nav_sell_value2 = fields.Monetary(
         string="Giá trị bán 2 (V)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Giá trị bán 2 = Units * Giá bán 2"
     )
     nav_difference = fields.Monetary(
         string="Chênh lệch (W)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Chênh lệch = Giá trị bán 2 - Giá trị bán 1"
     )
     nav_sell_fee = fields.Monetary(
         string="Phí bán (X)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Phí bán"
     )
     nav_tax = fields.Monetary(
         string="Thuế (Y)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Thuế"
     )
     nav_customer_receive = fields.Monetary(
         string="Khách hàng thực nhận (Z)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         currency_field='currency_id',
         help="Khách hàng thực nhận = Giá trị bán 1 - Phí bán - Thuế"
     )
@@ -197,19 +197,19 @@ class Transaction(models.Model):
     nav_sell_date_formatted = fields.Char(
         string="Ngày bán (D)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         help="Ngày bán = WORKDAY(ngày đáo hạn, -2) - Format: dd/MM/yyyy"
     )
     nav_maturity_date_formatted = fields.Char(
         string="Ngày đáo hạn (E)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         help="Ngày đáo hạn tính từ ngày mua và kỳ hạn - Format: dd/MM/yyyy"
     )
     transaction_date_formatted = fields.Char(
         string="Ngày mua/bán (C)",
         compute='_compute_nav_calculation',
-        store=False,
+        store=True,
         help="Ngày mua/bán - Format: dd/MM/yyyy"
     )
     
@@ -255,17 +255,22 @@ class Transaction(models.Model):
     @api.onchange('term_months')
     def _onchange_term_months_set_interest(self):
         """Auto-set interest_rate from nav.term.rate (active). Fallback giữ giá trị cũ nếu không tìm thấy."""
+        try:
+            # Đọc bảng lãi suất một lần cho cả recordset
+            rates = self.env['nav.term.rate'].sudo().search_read(
+                [('active', '=', True), ('term_months', 'in', [int(t) for t in self.mapped('term_months') if t])],
+                ['term_months', 'interest_rate'],
+            )
+            rate_map = {r['term_months']: r['interest_rate'] for r in rates}
+        except Exception:
+            rate_map = {}
         for rec in self:
-            try:
-                if not rec.term_months:
-                    continue
-                TermRate = self.env['nav.term.rate'].sudo()
-                rate = TermRate.search([('active', '=', True), ('term_months', '=', int(rec.term_months))], limit=1)
-                if rate:
-                    rec.interest_rate = rate.interest_rate
-                else:
-                    rec.interest_rate = rec.interest_rate or 0.0
-            except Exception:
+            if not rec.term_months:
+                continue
+            rate = rate_map.get(int(rec.term_months))
+            if rate is not None:
+                rec.interest_rate = rate
+            else:
                 rec.interest_rate = rec.interest_rate or 0.0
 
     @api.depends('amount', 'units')
@@ -273,138 +278,179 @@ class Transaction(models.Model):
         for record in self:
             record.calculated_amount = record.amount or 0.0
 
+    _NAV_FLOAT_METRICS = {
+        'nav_days_converted': 'days_converted',
+        'nav_purchase_value': 'purchase_value',
+        'nav_price_with_fee': 'price_with_fee',
+        'nav_converted_rate': 'converted_rate',
+        'nav_interest_delta': 'interest_delta',
+        'nav_tax_tncn': 'tax_tncn',
+        'nav_sell_price1': 'sell_price1',
+        'nav_sell_price2': 'sell_price2',
+        'nav_sell_value1': 'sell_value1',
+        'nav_sell_value2': 'sell_value2',
+        'nav_difference': 'difference',
+        'nav_sell_fee': 'sell_fee',
+        'nav_tax': 'tax',
+        'nav_customer_receive': 'customer_receive',
+    }
+
+    def _nav_calculation_input(self):
+        """Dữ liệu đầu vào cho nav.transaction.calculator, None nếu thiếu thông tin"""
+        self.ensure_one()
+        # Lấy ngày giao dịch từ created_at
+        purchase_date = self.created_at.date() if self.created_at else None
+        if not purchase_date or not self.term_months or not self.units or not self.price or not self.interest_rate:
+            return None
+        # Tính fee_rate từ fee và amount (fee là số tiền, cần chuyển sang phần trăm)
+        purchase_amount = float(self.units or 0.0) * float(self.price or 0.0)
+        fee_amount = float(self.fee or 0.0)
+        return {
+            'purchase_date': purchase_date,
+            'term_months': self.term_months,
+            'units': self.units,
+            'price_per_unit': self.price,
+            'fee_rate': (fee_amount / purchase_amount * 100.0) if purchase_amount > 0 else 0.0,
+            'interest_rate': self.interest_rate or 0.0,
+            'sell_fee': 0.0,  # Có thể thêm field sau
+            'tax': 0.0,  # Có thể thêm field sau
+        }
+
     @api.depends('created_at', 'term_months', 'units', 'price', 'fee', 'interest_rate')
     def _compute_nav_calculation(self):
-        """Tính toán các trường NAV cho transaction"""
+        """Tính toán các trường NAV cho transaction (cả recordset trong một lượt)"""
         for record in self:
             # Reset all fields
             record.nav_maturity_date = False
             record.nav_sell_date = False
             record.nav_days = 0
-            record.nav_days_converted = 0.0
-            record.nav_purchase_value = 0.0
-            record.nav_price_with_fee = 0.0
-            record.nav_converted_rate = 0.0
-            record.nav_interest_delta = 0.0
-            record.nav_tax_tncn = 0.0
-            record.nav_sell_price1 = 0.0
-            record.nav_sell_price2 = 0.0
-            record.nav_sell_value1 = 0.0
-            record.nav_sell_value2 = 0.0
-            record.nav_difference = 0.0
-            record.nav_sell_fee = 0.0
-            record.nav_tax = 0.0
-            record.nav_customer_receive = 0.0
+            for field_name in self._NAV_FLOAT_METRICS:
+                record[field_name] = 0.0
             record.nav_sell_date_formatted = ''
             record.nav_maturity_date_formatted = ''
             record.transaction_date_formatted = ''
-            
-            # Lấy ngày giao dịch từ created_at
-            purchase_date = record.created_at.date() if record.created_at else None
-            
-            # Chỉ tính toán nếu có đủ thông tin
-            if not purchase_date or not record.term_months or not record.units or not record.price or not record.interest_rate:
+
+        # Calculator nằm ở nav_management (phụ thuộc fund_management): chưa cài thì để trống
+        if 'nav.transaction.calculator' not in self.env:
+            return
+
+        # Chỉ tính toán những giao dịch có đủ thông tin
+        pending = []
+        for record in self:
+            data = record._nav_calculation_input()
+            if data:
+                pending.append((record, data))
+        if not pending:
+            return
+
+        # Sử dụng calculator từ nav_management: list view tính cả trang bằng batch (NumPy)
+        calculator = self.env['nav.transaction.calculator']
+        try:
+            metrics_list = calculator.compute_transaction_metrics_full_batch([data for _rec, data in pending])
+        except Exception as e:
+            self._logger.warning(f"Batch NAV calculation failed, fallback per transaction: {e}")
+            metrics_list = []
+            for record, data in pending:
+                try:
+                    metrics_list.append(calculator.compute_transaction_metrics_full(data))
+                except Exception as err:
+                    self._logger.warning(f"Failed to compute NAV calculation for transaction {record.id}: {err}")
+                    metrics_list.append({})
+
+        for (record, data), metrics in zip(pending, metrics_list):
+            if not metrics:
                 continue
-            
             try:
-                # Sử dụng calculator từ nav_management
-                calculator = self.env['nav.transaction.calculator']
-                
-                # Tính fee_rate từ fee và amount (fee là số tiền, cần chuyển sang phần trăm)
-                purchase_amount = float(record.units or 0.0) * float(record.price or 0.0)
-                fee_amount = float(record.fee or 0.0)
-                fee_rate = (fee_amount / purchase_amount * 100.0) if purchase_amount > 0 else 0.0
-                
-                # Chuẩn bị dữ liệu đầu vào
-                transaction_data = {
-                    'purchase_date': purchase_date,
-                    'term_months': record.term_months,
-                    'units': record.units,
-                    'price_per_unit': record.price,
-                    'fee_rate': fee_rate,  # Fee rate tính từ fee amount
-                    'interest_rate': record.interest_rate or 0.0,
-                    'sell_fee': 0.0,  # Có thể thêm field sau
-                    'tax': 0.0,  # Có thể thêm field sau
-                }
-                
-                # Tính toán
-                metrics = calculator.compute_transaction_metrics_full(transaction_data)
-                
-                # Gán kết quả vào các field
-                if metrics.get('maturity_date'):
-                    maturity_str = metrics['maturity_date']
-                    try:
-                        if isinstance(maturity_str, str):
-                            # Parse ISO format date string using Odoo's fields.Date
-                            if 'T' in maturity_str:
-                                maturity_str = maturity_str.split('T')[0]
-                            maturity_date = fields.Date.from_string(maturity_str)
-                            record.nav_maturity_date = maturity_date
-                            # Format thành dd/MM/yyyy
-                            if maturity_date:
-                                record.nav_maturity_date_formatted = maturity_date.strftime('%d/%m/%Y')
-                        elif hasattr(maturity_str, 'date'):
-                            maturity_date = maturity_str.date() if isinstance(maturity_str, datetime) else maturity_str
-                            record.nav_maturity_date = maturity_date
-                            if maturity_date:
-                                record.nav_maturity_date_formatted = maturity_date.strftime('%d/%m/%Y')
-                        else:
-                            record.nav_maturity_date = maturity_str
-                            if maturity_str:
-                                record.nav_maturity_date_formatted = maturity_str.strftime('%d/%m/%Y') if hasattr(maturity_str, 'strftime') else str(maturity_str)
-                    except Exception:
-                        record.nav_maturity_date = False
-                        record.nav_maturity_date_formatted = ''
-                        
-                if metrics.get('sell_date'):
-                    sell_str = metrics['sell_date']
-                    try:
-                        if isinstance(sell_str, str):
-                            # Parse ISO format date string using Odoo's fields.Date
-                            if 'T' in sell_str:
-                                sell_str = sell_str.split('T')[0]
-                            sell_date = fields.Date.from_string(sell_str)
-                            record.nav_sell_date = sell_date
-                            # Format thành dd/MM/yyyy
-                            if sell_date:
-                                record.nav_sell_date_formatted = sell_date.strftime('%d/%m/%Y')
-                        elif hasattr(sell_str, 'date'):
-                            sell_date = sell_str.date() if isinstance(sell_str, datetime) else sell_str
-                            record.nav_sell_date = sell_date
-                            if sell_date:
-                                record.nav_sell_date_formatted = sell_date.strftime('%d/%m/%Y')
-                        else:
-                            record.nav_sell_date = sell_str
-                            if sell_str:
-                                record.nav_sell_date_formatted = sell_str.strftime('%d/%m/%Y') if hasattr(sell_str, 'strftime') else str(sell_str)
-                    except Exception:
-                        record.nav_sell_date = False
-                        record.nav_sell_date_formatted = ''
-                
+                # Ngày trả về dạng ISO 'YYYY-MM-DD'
+                maturity_date = fields.Date.from_string(str(metrics['maturity_date'])[:10]) if metrics.get('maturity_date') else False
+                sell_date = fields.Date.from_string(str(metrics['sell_date'])[:10]) if metrics.get('sell_date') else False
+                record.nav_maturity_date = maturity_date
+                record.nav_maturity_date_formatted = maturity_date.strftime('%d/%m/%Y') if maturity_date else ''
+                record.nav_sell_date = sell_date
+                record.nav_sell_date_formatted = sell_date.strftime('%d/%m/%Y') if sell_date else ''
                 # Format purchase_date (từ created_at) thành dd/MM/yyyy
-                if purchase_date:
-                    try:
-                        record.transaction_date_formatted = purchase_date.strftime('%d/%m/%Y')
-                    except Exception:
-                        record.transaction_date_formatted = ''
+                record.transaction_date_formatted = data['purchase_date'].strftime('%d/%m/%Y')
                 record.nav_days = int(metrics.get('days', 0))
-                record.nav_days_converted = float(metrics.get('days_converted', 0.0))
-                record.nav_purchase_value = float(metrics.get('purchase_value', 0.0))
-                record.nav_price_with_fee = float(metrics.get('price_with_fee', 0.0))
-                record.nav_converted_rate = float(metrics.get('converted_rate', 0.0))
-                record.nav_interest_delta = float(metrics.get('interest_delta', 0.0))
-                record.nav_tax_tncn = float(metrics.get('tax_tncn', 0.0))
-                record.nav_sell_price1 = float(metrics.get('sell_price1', 0.0))
-                record.nav_sell_price2 = float(metrics.get('sell_price2', 0.0))
-                record.nav_sell_value1 = float(metrics.get('sell_value1', 0.0))
-                record.nav_sell_value2 = float(metrics.get('sell_value2', 0.0))
-                record.nav_difference = float(metrics.get('difference', 0.0))
-                record.nav_sell_fee = float(metrics.get('sell_fee', 0.0))
-                record.nav_tax = float(metrics.get('tax', 0.0))
-                record.nav_customer_receive = float(metrics.get('customer_receive', 0.0))
+                for field_name, key in self._NAV_FLOAT_METRICS.items():
+                    record[field_name] = float(metrics.get(key, 0.0))
             except Exception as e:
                 self._logger.warning(f"Failed to compute NAV calculation for transaction {record.id}: {e}")
 
+    # ===== Lưu trữ / backfill các trường NAV =====
+    _NAV_BACKFILL_PARAM = 'fund_management.nav_backfill_last_id'
+
+    @api.model
+    def _nav_stored_fields(self):
+        return [name for name, field in self._fields.items() if field.compute == '_compute_nav_calculation']
+
+    def _recompute_nav_calculation(self):
+        """Đánh dấu và tính lại các trường NAV đã lưu cho recordset (ví dụ khi lịch ngày lễ thay đổi)"""
+        if not self:
+            return
+        fnames = self._nav_stored_fields()
+        for fname in fnames:
+            self.env.add_to_compute(self._fields[fname], self)
+        self.flush_recordset(fnames)
+
+    @api.model
+    def _start_nav_backfill(self):
+        """Bắt đầu (lại) backfill các trường NAV theo lô bằng cron"""
+        self.env['ir.config_parameter'].sudo().set_param(self._NAV_BACKFILL_PARAM, '0')
+        cron = self.env.ref('fund_management.cron_backfill_nav_calculation', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _cron_backfill_nav_calculation(self, batch_size=2000, max_batches=20):
+        """
+        Tính các trường NAV lưu trữ cho giao dịch cũ theo lô id tăng dần.
+        Mỗi lô commit riêng; còn dữ liệu thì tự kích hoạt lại cron.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        last_id = params.get_param(self._NAV_BACKFILL_PARAM)
+        if last_id in (None, False, ''):
+            return
+        last_id = int(last_id)
+        for _batch in range(max_batches):
+            records = self.with_context(active_test=False).search([('id', '>', last_id)], order='id', limit=batch_size)
+            if not records:
+                params.set_param(self._NAV_BACKFILL_PARAM, '')
+                self._logger.info("Backfill NAV calculation: hoàn tất")
+                return
+            records._recompute_nav_calculation()
+            last_id = records[-1].id
+            params.set_param(self._NAV_BACKFILL_PARAM, str(last_id))
+            self.env.cr.commit()
+            self.env.invalidate_all()
+            self._logger.info(f"Backfill NAV calculation: đã xử lý tới id {last_id}")
+        cron = self.env.ref('fund_management.cron_backfill_nav_calculation', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    def _nav_legacy_metrics(self):
+        """
+        Chỉ số NAV rút gọn (sell_value, days_effective...) cho các báo cáo, tính cả recordset một lượt.
+
+        Returns:
+            dict: {transaction_id: metrics}
+        """
+        has_remaining = 'remaining_units' in self._fields
+        items = [{
+            'amount': float(rec.amount or 0),
+            'trade_price': float(rec.amount or 0),
+            'nav_value': float(rec.current_nav or 0),
+            'interest_rate': float(rec.interest_rate or 0),
+            'units': float(rec.units or 0),
+            'remaining_units': float(rec.remaining_units or 0) if has_remaining else 0.0,
+            'term_months': rec.term_months or 0,
+        } for rec in self]
+        try:
+            metrics_list = self.env['nav.transaction.calculator'].compute_transaction_metrics_batch(items)
+        except Exception as e:
+            self._logger.warning(f"Failed to compute NAV report metrics: {e}")
+            metrics_list = [{} for _item in items]
+        return dict(zip(self.ids, metrics_list))
+
     @api.depends('created_at', 'date_end')
     def _compute_datetime_formatted(self):
         """Format datetime fields thành dd/MM/yyyy HH:mm:ss"""
@@ -341,7 +341,7 @@ function initFundSelect() {
     }
   } catch (_) {}
 
-  fetch('/data_fund')
+  fetch('/data_fund?lite=1')
     .then(res => res.json())
     .then(fundData => {
       fundSelect.innerHTML = '<option disabled selected>-- Chọn quỹ đầu tư --</option>';
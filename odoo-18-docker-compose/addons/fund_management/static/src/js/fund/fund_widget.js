@@ -336,7 +336,7 @@ export class FundWidget extends Component {
             try { await loadJS("https://unpkg.com/lightweight-charts/dist/lightweight-charts.standalone.production.js"); } catch(e) { console.warn('Lightweight Charts load failed', e); }
 
             try {
-                const response = await fetch('/data_fund');
+                const response = await fetch('/data_fund?lite=1');
                 const data = await response.json();
                 console.log("📥 Fund data:", data);
                 this.state.funds = data;
@@ -375,17 +375,6 @@ export class FundWidget extends Component {
         console.log("✅ Selected Fund:", fund);
         this.state.selectedFund = fund;
 
-        const navHistory = fund.nav_history_json
-            ? JSON.parse(fund.nav_history_json)
-            : [];
-
-        const labels = navHistory.map(entry => {
-            const d = new Date(entry.date);
-            return `${String(d.getDate()).padStart(2, '0')}-${String(d.getMonth() + 1).padStart(2, '0')}`;
-        });
-
-        const values = navHistory.map(entry => entry.value);
-
         // NAV/Unit chart removed; skip drawing
         // Load candlestick for current ticker
         if (fund && fund.ticker) {
@@ -471,7 +460,7 @@ export class FundWidget extends Component {
             const prevByTicker = {};
             (this.state.funds || []).forEach(f => { prevByTicker[f.ticker] = f; });
 
-            const res = await fetch('/data_fund');
+            const res = await fetch('/data_fund?lite=1');
             const data = await res.json();
             this.state.funds = data;
 
@@ -561,14 +550,25 @@ export class FundWidget extends Component {
         return `hsl(${hue} ${sat}% ${light}%)`;
     }
 
+    // /fund_ohlc?format=columns trả về mảng cột {t: [], o: [], h: [], l: [], c: [], v: []}
+    _ohlcRows(data) {
+        if (Array.isArray(data)) return data;
+        if (!data || !Array.isArray(data.t)) return [];
+        const rows = new Array(data.t.length);
+        for (let i = 0; i < data.t.length; i++) {
+            rows[i] = { t: data.t[i], o: data.o[i], h: data.h[i], l: data.l[i], c: data.c[i], v: data.v[i] };
+        }
+        return rows;
+    }
+
     async loadCandleData(ticker, range) {
         try {
             const { fromDate, toDate } = this._computeDateRange(range);
-            const qs = new URLSearchParams({ ticker, range, fromDate, toDate }).toString();
+            const qs = new URLSearchParams({ ticker, range, fromDate, toDate, format: 'columns' }).toString();
             const res = await fetch(`/fund_ohlc?${qs}`);
             const payload = await res.json();
             if (payload && payload.status === 'Success') {
-                const items = payload.data || [];
+                const items = this._ohlcRows(payload.data);
                 // Xác định intraday hay daily dựa vào kiểu của trường t
                 this._isIntraday = Array.isArray(items) && items.length > 0 && typeof items[0].t === 'number';
                 this.drawCandleChart(items);
@@ -1092,19 +1092,17 @@ export class FundWidget extends Component {
         }
     }
 
-    updateNavChartRange(range) {        // Cập nhật NAV theo thời gian thật
+    async updateNavChartRange(range) {        // Cập nhật NAV theo thời gian thật
         this.unable_roll();
         console.log("⏳ Changing NAV chart range to:", range);
         this.state.activeRange = range;
 
         const fund = this.state.selectedFund;
-        if (!fund || !fund.nav_history_json) {
-            console.warn("⚠️ Không có dữ liệu nav_history_json!");
+        if (!fund || !fund.id) {
+            console.warn("⚠️ Chưa chọn quỹ để vẽ NAV!");
             return;
         }
 
-        const allData = JSON.parse(fund.nav_history_json);
-
         const now = new Date();
         const getDateMonthsAgo = (months) => {
             const d = new Date(now);
@@ -1126,11 +1124,22 @@ export class FundWidget extends Component {
                 startDate = getDateMonthsAgo(1); break;
         }
 
-        // Lọc dữ liệu trong khoảng thời gian được chọn
-        const filtered = allData.filter(entry => {
-            const entryDate = new Date(entry.date);
-            return entryDate >= startDate && entryDate <= now;
+        // Chỉ tải cửa sổ ngày đang vẽ từ bảng điểm NAV (không tải cả chuỗi lịch sử)
+        const toIso = (d) => `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+        const params = new URLSearchParams({
+            date_from: toIso(startDate),
+            date_to: toIso(now),
+            limit: '1000',
         });
+        let filtered = [];
+        try {
+            const res = await fetch(`/data_fund/${fund.id}/history?${params.toString()}`);
+            const data = await res.json();
+            filtered = (data && data.items) || [];
+        } catch (e) {
+            console.error("❌ Error fetching NAV history:", e);
+            return;
+        }
 
         const labels = filtered.map(entry => {
             const d = new Date(entry.date);
@@ -1403,13 +1412,14 @@ export class FundWidget extends Component {
                     ticker: fund.ticker, 
                     range, 
                     fromDate, 
-                    toDate 
+                    toDate,
+                    format: 'columns'
                 }).toString();
                 const res = await fetch(`/fund_ohlc?${qs}`);
                 const payload = await res.json();
                 
                 if (payload && payload.status === 'Success') {
-                    const items = payload.data || [];
+                    const items = this._ohlcRows(payload.data);
                     if (items.length > 0) {
                         // Lấy màu cho CCQ này
                         let fundColor = this.getFundColor(fund);
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+Dữ liệu mẫu dùng chung cho test và benchmark (odoo-18-docker-compose/benchmarks) -
+không import Odoo để benchmark nạp trực tiếp được.
+"""
+import json
+from datetime import date, timedelta
+
+
+def fund_rows(size, history_days=750):
+    """Danh sách quỹ giống /data_fund với chuỗi nav_history_json ~3 năm"""
+    start = date(2022, 1, 3)
+    funds = []
+    for fund_id in range(1, size + 1):
+        history = [{'date': (start + timedelta(days=d)).isoformat(), 'value': 10000.0 + d * fund_id}
+                   for d in range(history_days)]
+        funds.append({'id': fund_id, 'ticker': f'F{fund_id:03d}', 'current_nav': history[-1]['value'],
+                      'nav_history_json': json.dumps(history)})
+    return funds
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime, timedelta
+
+from odoo.tests.common import BaseCase
+
+from ..utils import http_cache
+from .common import fund_rows
+
+
+class TestHttpCache(BaseCase):
+
+    def test_conditional_get(self):
+        modified = datetime(2024, 5, 2, 8, 30, 15, 123456)
+        etag = http_cache.make_etag('data_fund', 'lite', 12, modified, 40)
+        self.assertEqual(etag, http_cache.make_etag('data_fund', 'lite', 12, modified, 40))
+        self.assertNotEqual(etag, http_cache.make_etag('data_fund', 'full', 12, modified, 40))
+        self.assertTrue(http_cache.is_not_modified(etag, modified, if_none_match=etag))
+        self.assertTrue(http_cache.is_not_modified(etag, modified, if_none_match='"other", W/' + etag))
+        self.assertFalse(http_cache.is_not_modified(etag, modified, if_none_match='"other"'))
+
+        header = http_cache.http_date(modified)
+        self.assertEqual(header, 'Thu, 02 May 2024 08:30:15 GMT')
+        self.assertTrue(http_cache.is_not_modified(etag, modified, if_modified_since=header))
+        self.assertFalse(http_cache.is_not_modified(etag, modified + timedelta(seconds=1), if_modified_since=header))
+        # If-None-Match được ưu tiên, header ngày sai định dạng bị bỏ qua
+        self.assertFalse(http_cache.is_not_modified(etag, modified, if_none_match='"other"', if_modified_since=header))
+        self.assertFalse(http_cache.is_not_modified(etag, modified, if_modified_since='not a date'))
+
+    def test_response_cache_version(self):
+        cache = http_cache.ResponseCache(max_entries=2)
+        calls = []
+
+        def build(body):
+            calls.append(body)
+            return body
+
+        self.assertEqual(cache.get_or_build('a', 1, lambda: build('v1')), 'v1')
+        self.assertEqual(cache.get_or_build('a', 1, lambda: build('x')), 'v1')
+        # Version đổi (quỹ vừa ghi) -> build lại
+        self.assertEqual(cache.get_or_build('a', 2, lambda: build('v2')), 'v2')
+        cache.set('b', 1, 'b')
+        cache.set('c', 1, 'c')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('a', 2))
+        self.assertEqual(calls, ['v1', 'v2'])
+
+    def test_paginate_history(self):
+        points = http_cache.load_history(fund_rows(1, history_days=250)[0]['nav_history_json'])
+        self.assertEqual(len(points), 250)
+        first = http_cache.paginate_history(points, page=1, limit=100)
+        self.assertEqual((first['total'], first['pages']), (250, 3))
+        self.assertEqual(first['items'], points[150:])
+        last = http_cache.paginate_history(points, page=3, limit=100)
+        self.assertEqual(last['items'], points[:50])
+        self.assertEqual(http_cache.paginate_history(points, page=4, limit=100)['items'], [])
+        since = http_cache.paginate_history(points, date_from=points[-5]['date'])
+        self.assertEqual(since['items'], points[-5:])
+        self.assertEqual(http_cache.paginate_history(points, limit='abc')['limit'], http_cache.DEFAULT_HISTORY_LIMIT)
+        self.assertEqual(http_cache.load_history('not json'), [])
+        self.assertEqual(http_cache.load_history('{"date": "2024-01-01"}'), [])
+
+    def test_lite_payload_is_small(self):
+        funds = fund_rows(20)
+        full = json.dumps(funds)
+        lite = json.dumps([{k: v for k, v in f.items() if k != 'nav_history_json'} for f in funds])
+        self.assertLess(len(lite) * 100, len(full))
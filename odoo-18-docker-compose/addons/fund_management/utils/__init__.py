@@ -6,12 +6,13 @@ from . import constants
 from . import fee_utils
 from . import investment_utils
 from . import static_config
+from . import http_cache
 
 # Export mround function directly
 from .mround import mround
 
 __all__ = [
     'mround', 'pdf_utils', 'url_utils', 'contract_utils',
-    'constants', 'fee_utils', 'investment_utils', 'static_config'
+    'constants', 'fee_utils', 'investment_utils', 'static_config', 'http_cache'
 ]
 
@@ -0,0 +1,152 @@
+"""
+Cache phản hồi HTTP cho các endpoint danh sách quỹ (không phụ thuộc Odoo).
+
+- make_etag / http_date / is_not_modified: hỗ trợ conditional GET (ETag, Last-Modified -> 304)
+- ResponseCache: giữ body đã serialize theo key, chỉ dùng lại khi version dữ liệu không đổi
+- paginate_history: cắt trang chuỗi NAV lịch sử cho endpoint history riêng
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+DEFAULT_HISTORY_LIMIT = 100
+MAX_HISTORY_LIMIT = 1000
+
+
+def make_etag(*parts):
+    """ETag mạnh từ các thành phần version (count, write_date, biến thể...)"""
+    raw = '|'.join('' if p is None else str(p) for p in parts)
+    return '"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def http_date(value):
+    """datetime (naive = UTC như Odoo) -> chuỗi HTTP-date cho header Last-Modified"""
+    if not value:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _parse_http_date(value):
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def is_not_modified(etag, last_modified=None, if_none_match=None, if_modified_since=None):
+    """
+    Client đã có bản mới nhất hay chưa (RFC 7232: If-None-Match được ưu tiên hơn If-Modified-Since).
+
+    Args:
+        etag: ETag hiện tại của tài nguyên
+        last_modified: datetime cập nhật cuối (naive = UTC)
+        if_none_match / if_modified_since: giá trị header của request
+    """
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        # Chấp nhận cả weak tag do proxy/gzip thêm tiền tố W/
+        return '*' in tags or etag in tags or ('W/' + etag) in tags
+    if if_modified_since and last_modified:
+        since = _parse_http_date(if_modified_since)
+        if since is None:
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP-date chỉ chính xác tới giây
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+class ResponseCache:
+    """Cache LRU thread-safe: key -> (version, body); version khác thì coi như miss"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max(1, int(max_entries or 1))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def get_or_build(self, key, version, build):
+        """Trả body đã cache hoặc gọi build() (ngoài lock) rồi lưu lại"""
+        body = self.get(key, version)
+        if body is None:
+            body = self.set(key, version, build())
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def load_history(raw):
+    """Text JSON nav_history_json -> list {date, value} sắp tăng dần theo ngày"""
+    if not raw:
+        return []
+    try:
+        history = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(history, list):
+        return []
+    points = [p for p in history if isinstance(p, dict) and p.get('date')]
+    points.sort(key=lambda p: str(p['date']))
+    return points
+
+
+def paginate_history(points, page=1, limit=DEFAULT_HISTORY_LIMIT, date_from=None, date_to=None):
+    """
+    Trang 1 là `limit` điểm mới nhất; mỗi trang vẫn sắp tăng dần theo ngày để vẽ biểu đồ.
+
+    Returns:
+        dict: {items, page, limit, total, pages}
+    """
+    try:
+        page = max(1, int(page or 1))
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        limit = min(MAX_HISTORY_LIMIT, max(1, int(limit or DEFAULT_HISTORY_LIMIT)))
+    except (TypeError, ValueError):
+        limit = DEFAULT_HISTORY_LIMIT
+    if date_from:
+        points = [p for p in points if str(p['date']) >= str(date_from)]
+    if date_to:
+        points = [p for p in points if str(p['date']) <= str(date_to)]
+    total = len(points)
+    end = max(0, total - (page - 1) * limit)
+    start = max(0, end - limit)
+    return {
+        'items': points[start:end],
+        'page': page,
+        'limit': limit,
+        'total': total,
+        'pages': (total + limit - 1) // limit,
+    }
@@ -175,22 +175,8 @@ class Holiday(models.Model):
         if not isinstance(payload, list):
             raise UserError(_("Cấu trúc dữ liệu ngày lễ không hợp lệ."))
 
-        created = updated = 0
-        for entry in payload:
-            vals = self._prepare_holiday_vals(entry, year_int)
-            if not vals:
-                continue
-
-            existing = self.search([("code", "=", vals["code"]), ("date", "=", vals["date"])], limit=1)
-            if existing:
-                update_vals = {k: v for k, v in vals.items() if existing[k] != v}
-                if update_vals:
-                    existing.write(update_vals)
-                    updated += 1
-                continue
-
-            self.create(vals)
-            created += 1
+        vals_list = [self._prepare_holiday_vals(entry, year_int) for entry in payload]
+        created, updated = self._upsert_holidays([vals for vals in vals_list if vals])
 
         _logger.info(
             "Đồng bộ ngày lễ hoàn tất: year=%s country=%s created=%s updated=%s",
@@ -211,7 +197,7 @@ class Holiday(models.Model):
     def sync_local_holidays(self, year=None):
         year_int = self._sanitize_year(year)
 
-        created = updated = 0
+        vals_list = []
         processed_codes = set()
 
         for item in self._FIXED_HOLIDAYS:
@@ -230,7 +216,7 @@ class Holiday(models.Model):
                 "active": True,
             }
             processed_codes.add(code)
-            created, updated = self._upsert_holiday(vals, created, updated)
+            vals_list.append(vals)
 
         lunar_entries = self._LUNAR_CONVERSIONS.get(year_int)
         if not lunar_entries:
@@ -257,7 +243,9 @@ class Holiday(models.Model):
             if code in processed_codes:
                 continue
             processed_codes.add(code)
-            created, updated = self._upsert_holiday(vals, created, updated)
+            vals_list.append(vals)
+
+        created, updated = self._upsert_holidays(vals_list)
 
         _logger.info(
             "Đồng bộ ngày lễ nội bộ hoàn tất: year=%s created=%s updated=%s",
@@ -273,20 +261,44 @@ class Holiday(models.Model):
             "year": year_int,
         }
 
-    def _upsert_holiday(self, vals, created, updated):
-        domain = [("code", "=", vals["code"]), ("date", "=", vals["date"])]
-        existing = self.search(domain, limit=1)
-        if existing:
+    def _upsert_holidays(self, vals_list):
+        """
+        Ghi các ngày lễ theo (code, date): một lần search các bản ghi đã có, cập nhật bản ghi
+        khác giá trị và tạo mới tất cả trong một lần create() (mỗi lần ghi ngày lễ đều xoá
+        cache lịch ngày giao dịch và tính lại giao dịch liên quan).
+
+        Returns:
+            tuple (created, updated)
+        """
+        pending = {}
+        for vals in vals_list:
+            pending.setdefault((vals["code"], vals["date"]), vals)
+        if not pending:
+            return 0, 0
+
+        existing = {
+            (holiday.code, holiday.date): holiday
+            for holiday in self.search([("code", "in", list({code for code, _date in pending}))])
+        }
+        to_create = []
+        to_update = {}
+        for key, vals in pending.items():
+            holiday = existing.get(key)
+            if not holiday:
+                to_create.append(vals)
+                continue
             update_vals = {
-                key: value for key, value in vals.items() if existing[key] != value
+                field: value for field, value in vals.items() if holiday[field] != value
             }
             if update_vals:
-                existing.write(update_vals)
-                updated += 1
-        else:
-            self.create(vals)
-            created += 1
-        return created, updated
+                to_update.setdefault(tuple(sorted(update_vals.items())), []).append(holiday.id)
+
+        # Các bản ghi cùng giá trị mới được ghi trong một lệnh
+        for items, ids in to_update.items():
+            self.browse(ids).write(dict(items))
+        if to_create:
+            self.create(to_create)
+        return len(to_create), sum(len(ids) for ids in to_update.values())
 
 
 class Bank(models.Model):
@@ -20,7 +20,12 @@
         'transaction_list',
         # Cần cho mock data từ fund_management
         'fund_management',
+        # Cần cho ngày lễ (data.holiday) của lịch ngày giao dịch
+        'fund_management_control',
     ],
+    'external_dependencies': {
+        'python': ['numpy'],
+    },
     'data': [
         # Security - Phân quyền truy cập models
         'security/ir.model.access.csv',
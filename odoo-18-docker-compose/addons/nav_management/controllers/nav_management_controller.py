@@ -3,8 +3,12 @@ from odoo.http import request
 import json
 import csv
 import io
+import logging
 from datetime import datetime
 
+_logger = logging.getLogger(__name__)
+
+
 class NavManagementController(http.Controller):
     
     @http.route('/nav_management', type='http', auth='user', website=True)
@@ -332,21 +336,33 @@ class NavManagementController(http.Controller):
                 return {'success': False, 'message': 'Thiếu danh sách items'}
 
             calc = request.env['nav.transaction.calculator']
-            results = []
+            bases = []
             for it in items:
-                try:
-                    base = it or {}
-                    # Đảm bảo các field đầu vào tối thiểu có mặt để UI hiển thị được
-                    if 'trade_price' not in base:
-                        # nếu thiếu, cho phép calculator tự fallback dựa vào units*nav_value
-                        base['trade_price'] = base.get('amount') or 0
-                    metrics = calc.compute_transaction_metrics(base)
-                    enriched = {}
-                    enriched.update(base)
-                    enriched.update(metrics)
-                    results.append(enriched)
-                except Exception as _:
-                    results.append(it or {})
+                base = it if isinstance(it, dict) else {}
+                # Đảm bảo các field đầu vào tối thiểu có mặt để UI hiển thị được
+                if 'trade_price' not in base:
+                    # nếu thiếu, cho phép calculator tự fallback dựa vào units*nav_value
+                    base['trade_price'] = base.get('amount') or 0
+                bases.append(base)
+
+            # Tính cả danh sách một lần (NumPy); lỗi thì quay về tính từng item
+            try:
+                metrics_list = calc.compute_transaction_metrics_batch(bases)
+            except Exception as e:
+                _logger.warning(f"[calc_metrics] Batch calculation failed, fallback per item: {e}")
+                metrics_list = []
+                for base in bases:
+                    try:
+                        metrics_list.append(calc.compute_transaction_metrics(base))
+                    except Exception:
+                        metrics_list.append({})
+
+            results = []
+            for base, metrics in zip(bases, metrics_list):
+                enriched = {}
+                enriched.update(base)
+                enriched.update(metrics)
+                results.append(enriched)
             return { 'success': True, 'items': results }
         except Exception as e:
             return { 'success': False, 'message': str(e) }
@@ -427,16 +443,19 @@ class NavManagementController(http.Controller):
                 status_filter='pending_remaining',  # Chỉ lấy pending có remaining units > 0
             )
 
-            profitable = []
+            # Bỏ qua item thiếu dữ liệu cơ bản
+            candidates = [
+                item for item in raw_list
+                if float(item.get('nav_value') or 0) > 0
+                and float(item.get('remaining_units') or item.get('units') or 0) > 0
+            ]
+
+            # Tính toàn bộ phiên trong một lượt vector hoá thay vì từng giao dịch
             calculator = request.env['nav.transaction.calculator']
-            for item in raw_list:
-                # Bỏ qua item thiếu dữ liệu cơ bản
-                if float(item.get('nav_value') or 0) <= 0:
-                    continue
-                if float(item.get('remaining_units') or item.get('units') or 0) <= 0:
-                    continue
-
-                metrics = calculator.compute_transaction_metrics(item)
+            metrics_list = calculator.compute_transaction_metrics_batch(candidates)
+
+            profitable = []
+            for item, metrics in zip(candidates, metrics_list):
                 # Gộp kết quả vào item để trả về UI
                 item.update(metrics)
                 delta = float(metrics.get('interest_delta') or 0)
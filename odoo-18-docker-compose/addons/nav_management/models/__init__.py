@@ -2,3 +2,5 @@ from . import nav_transaction
 from . import nav_monthly
 from . import nav_daily_inventory
 from . import nav_calculator
+from . import data_holiday
+from . import portfolio_transaction
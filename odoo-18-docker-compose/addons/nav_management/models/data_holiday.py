@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from odoo import api, models, tools
+
+from ..utils import date_utils
+
+
+class DataHoliday(models.Model):
+    _inherit = 'data.holiday'
+
+    @tools.ormcache()
+    def _get_business_calendar(self):
+        """
+        Lịch ngày giao dịch dựng từ ngày lễ đang kích hoạt (sync_public_holidays/sync_local_holidays).
+        Cache theo registry, bị xoá khi ngày lễ thay đổi.
+        """
+        rows = self.sudo().with_context(active_test=True).search_read([], ['date'])
+        return date_utils.BusinessCalendar(row['date'] for row in rows if row['date'])
+
+    @api.model
+    def get_business_calendar(self):
+        return self._get_business_calendar()
+
+    def _invalidate_business_calendar(self, dates=()):
+        self.env.registry.clear_cache()
+        self._recompute_transactions_near(dates)
+
+    @api.model
+    def _recompute_transactions_near(self, dates, window_days=20):
+        """
+        Tính lại trường NAV lưu trữ của giao dịch có ngày đáo hạn gần ngày lễ thay đổi
+        (ngày đáo hạn dời qua ngày lễ, ngày bán = WORKDAY(đáo hạn, -2)).
+        """
+        dates = sorted({d for d in dates if d})
+        Transaction = self.env['portfolio.transaction'].sudo()
+        if not dates or not hasattr(Transaction, '_recompute_nav_calculation'):
+            return
+        domain = []
+        for holiday in dates:
+            domain = (['|'] if domain else []) + domain + [
+                '&', ('nav_maturity_date', '>=', holiday), ('nav_maturity_date', '<=', holiday + timedelta(days=window_days)),
+            ]
+        Transaction.search(domain)._recompute_nav_calculation()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._invalidate_business_calendar(records.mapped('date'))
+        return records
+
+    def write(self, vals):
+        old_dates = self.mapped('date') if {'date', 'active'}.intersection(vals) else []
+        res = super().write(vals)
+        if old_dates:
+            self._invalidate_business_calendar(old_dates + self.mapped('date'))
+        return res
+
+    def unlink(self):
+        old_dates = self.mapped('date')
+        res = super().unlink()
+        self._invalidate_business_calendar(old_dates)
+        return res
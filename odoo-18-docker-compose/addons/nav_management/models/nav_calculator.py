@@ -1,7 +1,7 @@
 from odoo import models, fields, _
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from ..utils import date_utils, mround
+from ..utils import date_utils, mround, nav_vector
 
 
 class NavTransactionCalculator(models.AbstractModel):
@@ -29,11 +29,15 @@ class NavTransactionCalculator(models.AbstractModel):
         # fallback an toàn
         return 1
 
+    def _business_calendar(self):
+        """Lịch ngày giao dịch (cuối tuần + ngày lễ data.holiday), cache theo registry"""
+        return self.env['data.holiday'].get_business_calendar()
+
     def compute_maturity_date(self, purchase_date, term_months):
         """
         Tính ngày đáo hạn từ ngày mua và kỳ hạn.
         E: Ngày đáo hạn = IF(WEEKDAY(AB8,2)>5, AB8-WEEKDAY(AB8,2)+7+1, AB8)
-        Nếu ngày đáo hạn rơi vào cuối tuần, chuyển sang thứ 2 tuần sau.
+        Nếu ngày đáo hạn rơi vào cuối tuần hoặc ngày lễ, chuyển sang ngày giao dịch kế tiếp.
         """
         if not purchase_date or not term_months:
             return None
@@ -48,14 +52,7 @@ class NavTransactionCalculator(models.AbstractModel):
         from dateutil.relativedelta import relativedelta
         maturity_date = purchase_dt + relativedelta(months=term_months)
         
-        # Kiểm tra nếu rơi vào cuối tuần (Saturday=5, Sunday=6)
-        weekday_num = date_utils.weekday(maturity_date, return_type=2)
-        if weekday_num > 5:  # Saturday or Sunday
-            # Chuyển sang thứ 2 tuần sau
-            days_to_add = 8 - weekday_num
-            maturity_date = maturity_date + timedelta(days=days_to_add)
-        
-        return maturity_date
+        return self._business_calendar().next_business_day(maturity_date)
 
     def compute_sell_date(self, maturity_date):
         """
@@ -65,7 +62,7 @@ class NavTransactionCalculator(models.AbstractModel):
         if not maturity_date:
             return None
         
-        return date_utils.workday(maturity_date, -2)
+        return date_utils.workday(maturity_date, -2, holidays=self._business_calendar())
 
     def compute_purchase_value(self, units, price_per_unit, fee_rate):
         """
@@ -333,4 +330,91 @@ class NavTransactionCalculator(models.AbstractModel):
             'days_effective': d,
         }
 
+    # Batch API (NumPy) cho cả phiên giao dịch
+    def compute_transaction_metrics_full_batch(self, rows, holidays=None):
+        """
+        Phiên bản vector hoá của compute_transaction_metrics_full cho nhiều giao dịch.
+
+        Args:
+            rows: list[dict] cùng cấu trúc transaction_data của compute_transaction_metrics_full
+            holidays: iterable ngày nghỉ lễ (mặc định lấy từ lịch ngày giao dịch data.holiday)
+
+        Returns:
+            list[dict]: kết quả theo đúng thứ tự rows
+        """
+        if not rows:
+            return []
+        if holidays is None:
+            holidays = self._business_calendar().holidays
+        purchase_dates = [r.get('purchase_date') or r.get('transaction_date') for r in rows]
+        units = nav_vector.to_float_array([r.get('units') for r in rows])
+        price = nav_vector.to_float_array([r.get('price_per_unit') or r.get('price') for r in rows])
+        fee_rate = nav_vector.to_float_array([r.get('fee_rate') for r in rows])
+        interest_rate = nav_vector.to_float_array([r.get('interest_rate') for r in rows])
+        sell_fee = nav_vector.to_float_array([r.get('sell_fee') or r.get('sell_fee_rate', 0.0) for r in rows])
+        tax = nav_vector.to_float_array([r.get('tax') or r.get('tax_rate', 0.0) for r in rows])
+        term_months = nav_vector.to_int_array([r.get('term_months') for r in rows])
+
+        m = nav_vector.full_metrics(
+            nav_vector.to_date_array(purchase_dates), term_months, units, price, fee_rate,
+            interest_rate, sell_fee=sell_fee, tax=tax, holidays=holidays,
+        )
+        columns = {key: values.tolist() for key, values in m.items() if key not in ('maturity_date', 'sell_date')}
+        columns.update({
+            'purchase_date': [
+                d.isoformat() if d and hasattr(d, 'isoformat') else (d or '') for d in purchase_dates
+            ],
+            'sell_date': nav_vector.dates_to_iso(m['sell_date']),
+            'maturity_date': nav_vector.dates_to_iso(m['maturity_date']),
+            'term_months': term_months.tolist(),
+            'units': units.tolist(),
+            'price_per_unit': price.tolist(),
+            'fee_rate': (fee_rate * 100.0).tolist(),
+            'interest_rate': interest_rate.tolist(),
+            'sell_fee': sell_fee.tolist(),
+            'tax': tax.tolist(),
+        })
+        keys = list(columns)
+        results = [dict(zip(keys, values)) for values in zip(*(columns[k] for k in keys))]
+        return results
+
+    def compute_transaction_metrics_batch(self, items):
+        """
+        Phiên bản vector hoá của compute_transaction_metrics cho danh sách giao dịch.
+
+        Item có đủ purchase_date/price_per_unit đi theo công thức đầy đủ, còn lại theo
+        công thức rút gọn (trade_price -> amount -> units*nav_value). Kết quả giữ thứ tự items.
+        """
+        items = list(items or [])
+        results = [{} for _ in items]
+        full_keys = ('purchase_date', 'term_months', 'units', 'price_per_unit', 'interest_rate')
+        full_idx, legacy_idx = [], []
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            if all(k in item for k in full_keys):
+                full_idx.append(i)
+            else:
+                legacy_idx.append(i)
+
+        if full_idx:
+            for i, metrics in zip(full_idx, self.compute_transaction_metrics_full_batch([items[i] for i in full_idx])):
+                results[i] = metrics
 
+        if legacy_idx:
+            legacy = [items[i] for i in legacy_idx]
+            units = nav_vector.to_float_array([it.get('remaining_units') or it.get('units') for it in legacy])
+            m = nav_vector.legacy_metrics(
+                nav_vector.to_float_array([it.get('trade_price') or it.get('amount') for it in legacy]),
+                nav_vector.to_float_array([it.get('nav_value') for it in legacy]),
+                units,
+                nav_vector.to_float_array([it.get('interest_rate') for it in legacy]),
+                nav_vector.effective_days(
+                    nav_vector.to_int_array([it.get('term_months') for it in legacy]),
+                    nav_vector.to_int_array([it.get('days') for it in legacy]),
+                ),
+            )
+            columns = {key: values.tolist() for key, values in m.items()}
+            for pos, i in enumerate(legacy_idx):
+                results[i] = {key: values[pos] for key, values in columns.items()}
+        return results
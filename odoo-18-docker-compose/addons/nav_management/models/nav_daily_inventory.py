@@ -1,5 +1,6 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from odoo.tools import float_compare
 import logging
 from datetime import timedelta
 
@@ -28,19 +29,19 @@ class NavDailyInventory(models.Model):
     opening_avg_price = fields.Float(string='Opening Average Price', digits=(16, 2), tracking=True)
     opening_value = fields.Float(string='Opening Value', compute='_compute_opening_value', store=True, digits=(16, 2))
     
-    # Closing values - Bỏ store=True để luôn tính toán realtime
-    closing_ccq = fields.Float(string='Closing CCQ', compute='_compute_closing_ccq', store=False, digits=(16, 2))
-    closing_avg_price = fields.Float(string='Closing Average Price', compute='_compute_closing_avg_price', store=False, digits=(16, 2))
-    closing_value = fields.Float(string='Closing Value', compute='_compute_closing_value', store=False, digits=(16, 2))
+    # Closing values - lưu trữ, tính theo lô bằng _recompute_daily_inventory()
+    closing_ccq = fields.Float(string='Closing CCQ', readonly=True, digits=(16, 2))
+    closing_avg_price = fields.Float(string='Closing Average Price', readonly=True, digits=(16, 2))
+    closing_value = fields.Float(string='Closing Value', compute='_compute_closing_value', store=True, digits=(16, 2))
     
-    # Changes - Bỏ store=True để luôn tính toán realtime
-    ccq_change = fields.Float(string='CCQ Change', compute='_compute_changes', store=False, digits=(16, 2))
-    price_change = fields.Float(string='Price Change', compute='_compute_changes', store=False, digits=(16, 2))
-    value_change = fields.Float(string='Value Change', compute='_compute_changes', store=False, digits=(16, 2))
+    # Changes
+    ccq_change = fields.Float(string='CCQ Change', compute='_compute_changes', store=True, digits=(16, 2))
+    price_change = fields.Float(string='Price Change', compute='_compute_changes', store=True, digits=(16, 2))
+    value_change = fields.Float(string='Value Change', compute='_compute_changes', store=True, digits=(16, 2))
     
     # Additional fields
-    transaction_details = fields.Html(string='Transaction Details', compute='_compute_transaction_details')
-    calculation_details = fields.Text(string='Calculation Details', compute='_compute_calculation_details')
+    transaction_details = fields.Html(string='Transaction Details', readonly=True, sanitize=False)
+    calculation_details = fields.Text(string='Calculation Details', readonly=True)
     fund_config_info = fields.Text(string='Fund Config Info', compute='_compute_fund_config_info')
     
     # Display name
@@ -73,42 +74,107 @@ class NavDailyInventory(models.Model):
             record.price_change = (record.closing_avg_price or 0.0) - (record.opening_avg_price or 0.0)
             record.value_change = (record.closing_value or 0.0) - (record.opening_value or 0.0)
     
-    @api.depends('fund_id', 'inventory_date')
-    def _compute_transaction_details(self):
-        for record in self:
-            if not record.fund_id or not record.inventory_date:
-                record.transaction_details = "<p><em>Chưa có thông tin giao dịch</em></p>"
+    @api.model
+    def _get_market_maker_user_ids(self):
+        """User nhà tạo lập (thuộc base.group_user), lấy một lần cho cả lô thay vì has_group từng giao dịch"""
+        group = self.env.ref('base.group_user', raise_if_not_found=False)
+        return set(group.sudo().users.ids) if group else set()
+
+    def _read_daily_transactions(self, mm_user_ids=None):
+        """
+        Đọc giao dịch nhà tạo lập đã khớp cho cả lô tồn kho trong một truy vấn.
+
+        Returns:
+            dict: {(fund_id, date): [dict giao dịch theo thứ tự create_date]}
+        """
+        records = self.filtered(lambda r: r.fund_id and r.inventory_date)
+        if not records:
+            return {}
+        if mm_user_ids is None:
+            mm_user_ids = self._get_market_maker_user_ids()
+        if not mm_user_ids:
+            return {}
+
+        Transaction = self.env['portfolio.transaction']
+        read_fields = ['fund_id', 'transaction_type', 'units', 'amount', 'current_nav', 'created_at']
+        if 'matched_units' in Transaction._fields:
+            read_fields.append('matched_units')
+
+        dates = records.mapped('inventory_date')
+        rows = Transaction.search_read([
+            ('fund_id', 'in', records.mapped('fund_id').ids),
+            ('status', '=', 'completed'),
+            ('user_id', 'in', list(mm_user_ids)),
+            ('created_at', '>=', f"{min(dates)} 00:00:00"),
+            ('created_at', '<=', f"{max(dates)} 23:59:59"),
+        ], read_fields, order='create_date, id')
+
+        wanted = {(r.fund_id.id, r.inventory_date) for r in records}
+        grouped = {}
+        for row in rows:
+            if not row.get('created_at') or not row.get('fund_id'):
                 continue
-            
-            try:
-                # Lấy tất cả giao dịch đã khớp trong ngày - CHỈ LẤY GIAO DỊCH NHÀ TẠO LẬP MUA/BÁN LẠI
-                all_transactions = self.env['portfolio.transaction'].search([
-                    ('fund_id', '=', record.fund_id.id),
-                    ('status', '=', 'completed'),
-                    ('created_at', '>=', f"{record.inventory_date} 00:00:00"),
-                    ('created_at', '<=', f"{record.inventory_date} 23:59:59")
-                ])
-                
-                # Lọc chỉ lấy giao dịch nhà tạo lập (dựa trên user_id có group base.group_user)
-                transactions = []
-                for tx in all_transactions:
-                    try:
-                        if tx.user_id and tx.user_id.has_group('base.group_user'):
-                            transactions.append(tx)
-                    except Exception as e:
-                        _logger.warning(f"Lỗi kiểm tra user group cho giao dịch {tx.id}: {e}")
-                        continue
-                
-                _logger.info(f"Hiển thị giao dịch cho fund {record.fund_id.name} ngày {record.inventory_date}: {len(transactions)} giao dịch")
-            
-                if not transactions:
-                    record.transaction_details = "<p><em>Không có giao dịch trong ngày</em></p>"
-                    continue
-                
-                # Tạo HTML table đẹp
-                html_content = f"""
+            key = (row['fund_id'][0], row['created_at'].date())
+            if key in wanted:
+                grouped.setdefault(key, []).append(row)
+        return grouped
+
+    @staticmethod
+    def _summarize_daily_transactions(opening_ccq, opening_avg_price, rows):
+        """
+        Tính CCQ, giá trung bình có trọng số và các dòng chi tiết của một ngày.
+
+        Returns:
+            dict: closing_ccq, closing_avg_price, closing_total_value, lines
+                  lines: list (created_at, transaction_type, units_value, unit_price, transaction_value)
+        """
+        opening_ccq = opening_ccq or 0.0
+        opening_avg_price = opening_avg_price or 0.0
+        # Khởi tạo với dữ liệu đầu ngày
+        weighted_sum = opening_ccq * opening_avg_price
+        total_ccq = opening_ccq
+        lines = []
+
+        for row in rows:
+            # Lấy số lượng CCQ thực tế
+            if 'matched_units' in row:
+                units_value = row['matched_units'] or 0.0
+            else:
+                units_value = row['units'] or 0.0
+
+            # Tính giá đơn vị
+            if row.get('amount') and row.get('units'):
+                unit_price = row['amount'] / row['units']
+            else:
+                unit_price = row.get('current_nav') or 0.0
+
+            transaction_value = units_value * unit_price
+            if row['transaction_type'] == 'purchase':
+                # Mua: thêm vào tổng giá trị và CCQ
+                weighted_sum += transaction_value
+                total_ccq += units_value
+            elif row['transaction_type'] == 'sell':
+                # Bán: trừ theo giá bán thực tế (CCQ không được âm)
+                weighted_sum -= transaction_value
+                total_ccq = max(0, total_ccq - units_value)
+            lines.append((row['created_at'], row['transaction_type'], units_value, unit_price, transaction_value))
+
+        return {
+            'closing_ccq': total_ccq,
+            'closing_avg_price': weighted_sum / total_ccq if total_ccq > 0 else opening_avg_price,
+            'closing_total_value': weighted_sum,
+            'lines': lines,
+        }
+
+    def _render_transaction_details(self, summary):
+        """HTML bảng giao dịch trong ngày"""
+        self.ensure_one()
+        if not summary['lines']:
+            return "<p><em>Không có giao dịch trong ngày</em></p>"
+
+        html_content = f"""
                 <div class="transaction-details">
-                    <h4>Tồn kho đầu ngày: {record.opening_ccq:,.0f} CCQ × {record.opening_avg_price:,.0f} = {record.opening_value:,.0f} VND</h4>
+                    <h4>Tồn kho đầu ngày: {self.opening_ccq:,.0f} CCQ × {self.opening_avg_price:,.0f} = {self.opening_value:,.0f} VND</h4>
                     
                     <table class="table table-striped table-bordered">
                         <thead class="table-dark">
@@ -122,59 +188,20 @@ class NavDailyInventory(models.Model):
                         </thead>
                         <tbody>
                 """
-            
-                total_value = record.opening_value
-                total_ccq = record.opening_ccq
-                total_buy_ccq = 0
-                total_sell_ccq = 0
-                
-                for tx in transactions:
-                    try:
-                        # Đảm bảo giao dịch thuộc đúng fund
-                        if tx.fund_id.id != record.fund_id.id:
-                            _logger.warning(f"Giao dịch {tx.id} không thuộc fund {record.fund_id.name}")
-                            continue
-                            
-                        # Lấy số lượng CCQ thực tế
-                        matched_units = getattr(tx, 'matched_units', False)
-                        if matched_units is not False:
-                            units_value = matched_units
-                        else:
-                            units_value = tx.units or 0
-                        
-                        # Tính giá đơn vị
-                        if getattr(tx, 'amount', 0) and tx.units:
-                            unit_price = tx.amount / tx.units
-                        else:
-                            unit_price = tx.current_nav or 0
-                        
-                        transaction_value = units_value * unit_price
-                        
-                        # Cập nhật tổng
-                        if tx.transaction_type == 'purchase':
-                            total_value += transaction_value
-                            total_ccq += units_value
-                            total_buy_ccq += units_value
-                        elif tx.transaction_type == 'sell':
-                            total_value -= transaction_value
-                            total_ccq = max(0, total_ccq - units_value)
-                            total_sell_ccq += units_value
-                        
-                        # Thêm row vào table
-                        html_content += f"""
+        for created_at, transaction_type, units_value, unit_price, transaction_value in summary['lines']:
+            html_content += f"""
                         <tr>
-                            <td>{tx.created_at.strftime('%H:%M:%S') if tx.created_at else 'N/A'}</td>
-                            <td><span class="badge {'bg-success' if tx.transaction_type == 'purchase' else 'bg-danger'}">{'Mua' if tx.transaction_type == 'purchase' else 'Bán'}</span></td>
+                            <td>{created_at.strftime('%H:%M:%S') if created_at else 'N/A'}</td>
+                            <td><span class="badge {'bg-success' if transaction_type == 'purchase' else 'bg-danger'}">{'Mua' if transaction_type == 'purchase' else 'Bán'}</span></td>
                             <td>{units_value:,.0f}</td>
                             <td>{unit_price:,.0f}</td>
                             <td>{transaction_value:,.0f}</td>
                         </tr>
                         """
-                    except Exception as e:
-                        _logger.warning(f"Lỗi xử lý giao dịch {tx.id}: {e}")
-                        continue
-                
-                html_content += f"""
+
+        total_ccq = summary['closing_ccq']
+        total_value = summary['closing_total_value']
+        html_content += f"""
                         </tbody>
                     </table>
                     
@@ -183,279 +210,180 @@ class NavDailyInventory(models.Model):
                     </div>
                 </div>
                 """
-                
-                record.transaction_details = html_content
-                
-            except Exception as e:
-                _logger.error(f"Lỗi tính toán transaction details cho fund {record.fund_id.name}: {e}")
-                record.transaction_details = f"<p><em>Lỗi hiển thị giao dịch: {str(e)}</em></p>"
-    
-    @api.depends('opening_ccq', 'fund_id', 'inventory_date')
-    def _compute_closing_ccq(self):
-        for record in self:
+        return html_content
+
+    def _render_calculation_details(self, summary):
+        """Chi tiết tính toán để debug và hiển thị"""
+        self.ensure_one()
+        details = []
+        details.append(f"=== CHI TIẾT TÍNH TOÁN TỒN KHO ===")
+        details.append(f"Ngày: {self.inventory_date}")
+        details.append(f"Quỹ: {self.fund_id.name}")
+        details.append(f"")
+        details.append(f"ĐẦU NGÀY:")
+        details.append(f"  - CCQ: {self.opening_ccq:,.0f}")
+        details.append(f"  - Giá TB: {self.opening_avg_price:,.0f}")
+        details.append(f"  - Giá trị: {self.opening_value:,.0f} (= {self.opening_ccq:,.0f} × {self.opening_avg_price:,.0f})")
+        details.append(f"")
+        details.append(f"GIAO DỊCH TRONG NGÀY:")
+        for i, (_created_at, transaction_type, units_value, unit_price, transaction_value) in enumerate(summary['lines'], 1):
+            details.append(f"  {i}. {(transaction_type or '').upper()}: {units_value:,.0f} CCQ × {unit_price:,.0f} = {transaction_value:,.0f}")
+        details.append(f"")
+        details.append(f"CUỐI NGÀY:")
+        details.append(f"  - CCQ: {summary['closing_ccq']:,.0f}")
+        if summary['closing_ccq'] > 0:
+            details.append(f"  - Giá TB: {summary['closing_avg_price']:,.0f}")
+            details.append(f"  - Giá trị: {summary['closing_total_value']:,.0f}")
+        else:
+            details.append(f"  - Giá TB: {self.opening_avg_price:,.0f} (không có CCQ)")
+            details.append(f"  - Giá trị: 0")
+        return "\n".join(details)
+
+    def _recompute_daily_inventory(self, mm_user_ids=None):
+        """
+        Tính và lưu tồn kho cuối ngày cho cả lô:
+        một lần đọc giao dịch cho mọi (quỹ, ngày), sau đó tính CCQ, giá TB và chi tiết cùng lúc.
+        """
+        records = self.filtered(lambda r: r.fund_id and r.inventory_date)
+        if not records:
+            return
+        if mm_user_ids is None:
+            mm_user_ids = self._get_market_maker_user_ids()
+
+        # Tự động lấy dữ liệu đầu ngày nếu chưa có
+        for record in records:
+            if not record.opening_ccq or not record.opening_avg_price:
+                record.with_context(skip_inventory_recompute=True)._auto_load_opening_data()
+
+        transactions_by_day = records._read_daily_transactions(mm_user_ids)
+        for record in records:
             try:
-                # Tự động lấy dữ liệu đầu ngày nếu chưa có
-                if record.fund_id and record.inventory_date and (not record.opening_ccq or record.opening_ccq == 0.0):
-                    record._auto_load_opening_data()
-                
-                if record.fund_id and record.inventory_date:
-                    # Tính toán CCQ cuối ngày dựa trên giao dịch
-                    record.closing_ccq = record._calculate_daily_ccq()
-                else:
-                    record.closing_ccq = record.opening_ccq or 0.0
+                rows = transactions_by_day.get((record.fund_id.id, record.inventory_date), [])
+                summary = self._summarize_daily_transactions(record.opening_ccq, record.opening_avg_price, rows)
+                record.write({
+                    'closing_ccq': summary['closing_ccq'],
+                    'closing_avg_price': summary['closing_avg_price'],
+                    'transaction_details': record._render_transaction_details(summary),
+                    'calculation_details': record._render_calculation_details(summary),
+                })
             except Exception as e:
-                _logger.error(f"Lỗi tính CCQ cho fund {record.fund_id.name if record.fund_id else 'Unknown'}: {e}")
-                record.closing_ccq = record.opening_ccq or 0.0
-    
-    @api.depends('opening_avg_price', 'closing_ccq', 'fund_id', 'inventory_date')
-    def _compute_closing_avg_price(self):
-        for record in self:
-            try:
-                # Tự động lấy dữ liệu đầu ngày nếu chưa có
-                if record.fund_id and record.inventory_date and (not record.opening_avg_price or record.opening_avg_price == 0.0):
+                _logger.error(f"Lỗi tính tồn kho cho fund {record.fund_id.name} ngày {record.inventory_date}: {e}")
+
+    @api.model
+    def _closing_before(self, fund_id, day):
+        """(CCQ, giá TB) cuối ngày đã lưu của bản ghi liền trước ngày day, None nếu không có"""
+        previous = self.search([
+            ('fund_id', '=', fund_id),
+            ('inventory_date', '<', day)
+        ], order='inventory_date desc', limit=1)
+        return (previous.closing_ccq, previous.closing_avg_price) if previous else None
+
+    @api.model
+    def _roll_inventory_chain(self, fund_id, from_date, dirty_dates=None, chunk_size=31):
+        """
+        Tính lại tồn kho từ ngày from_date và cuộn giá trị cuối ngày sang các ngày sau.
+
+        Đầu ngày của mỗi bản ghi = cuối ngày đã lưu của bản ghi liền trước. Gặp ngày không bị
+        đánh dấu dirty mà giá trị đầu ngày không thay đổi thì bỏ qua tới ngày dirty kế tiếp
+        (dừng khi hết ngày dirty), nên một điều chỉnh lùi ngày chỉ tốn O(số ngày bị ảnh hưởng).
+
+        Returns:
+            int: số bản ghi đã tính lại
+        """
+        dirty_dates = set(dirty_dates or ()) | {from_date}
+        pending = sorted(dirty_dates)
+        opening = self._closing_before(fund_id, from_date)
+        mm_user_ids = self._get_market_maker_user_ids()
+
+        rolled = 0
+        domain = [('fund_id', '=', fund_id), ('inventory_date', '>=', from_date)]
+        while True:
+            chunk = self.search(domain, order='inventory_date asc', limit=chunk_size)
+            if not chunk:
+                return rolled
+            transactions_by_day = chunk._read_daily_transactions(mm_user_ids)
+            skip_to = None
+            for record in chunk:
+                record = record.with_context(skip_inventory_recompute=True)
+                if opening is not None:
+                    unchanged = (
+                        float_compare(record.opening_ccq, opening[0], precision_digits=2) == 0
+                        and float_compare(record.opening_avg_price, opening[1], precision_digits=2) == 0
+                    )
+                    if unchanged and record.inventory_date not in dirty_dates:
+                        # Các ngày tới ngày dirty kế tiếp không bị ảnh hưởng
+                        skip_to = next((day for day in pending if day > record.inventory_date), None)
+                        if skip_to is None:
+                            return rolled
+                        break
+                    if not unchanged:
+                        record.write({'opening_ccq': opening[0], 'opening_avg_price': opening[1]})
+                elif not record.opening_ccq or not record.opening_avg_price:
                     record._auto_load_opening_data()
-                
-                if record.fund_id and record.inventory_date and record.closing_ccq > 0:
-                    # Tính giá trung bình cuối ngày dựa trên CCQ đã tính
-                    record.closing_avg_price = record._calculate_weighted_average_price()
-                else:
-                    record.closing_avg_price = record.opening_avg_price or 0.0
-            except Exception as e:
-                _logger.error(f"Lỗi tính giá TB cho fund {record.fund_id.name if record.fund_id else 'Unknown'}: {e}")
-                record.closing_avg_price = record.opening_avg_price or 0.0
-    
-    def _calculate_daily_ccq(self):
-        """Tính CCQ cuối ngày dựa trên giao dịch trong ngày"""
-        try:
-            if not self.fund_id or not self.inventory_date:
-                return self.opening_ccq or 0.0
-            
-            # Lấy tất cả giao dịch đã khớp trong ngày - CHỈ LẤY GIAO DỊCH NHÀ TẠO LẬP MUA/BÁN LẠI
-            all_transactions = self.env['portfolio.transaction'].search([
-                ('fund_id', '=', self.fund_id.id),
-                ('status', '=', 'completed'),
-                ('created_at', '>=', f"{self.inventory_date} 00:00:00"),
-                ('created_at', '<=', f"{self.inventory_date} 23:59:59")
-            ], order='create_date')
-            
-            # Lọc chỉ lấy giao dịch nhà tạo lập (dựa trên user_id có group base.group_user)
-            transactions = []
-            for tx in all_transactions:
-                try:
-                    if tx.user_id and tx.user_id.has_group('base.group_user'):
-                        transactions.append(tx)
-                except Exception as e:
-                    _logger.warning(f"Lỗi kiểm tra user group cho giao dịch {tx.id}: {e}")
-                    continue
-            
-            _logger.info(f"Tính CCQ cho fund {self.fund_id.name} ngày {self.inventory_date}: {len(transactions)} giao dịch")
-        
-            current_ccq = self.opening_ccq or 0.0
-            
-            # Xử lý từng giao dịch theo thứ tự thời gian
-            for tx in transactions:
-                try:
-                    # Đảm bảo giao dịch thuộc đúng fund
-                    if tx.fund_id.id != self.fund_id.id:
-                        _logger.warning(f"Giao dịch {tx.id} không thuộc fund {self.fund_id.name}")
-                        continue
-                        
-                    # Lấy số lượng CCQ thực tế từ giao dịch
-                    matched_units = getattr(tx, 'matched_units', False)
-                    if matched_units is not False:
-                        units_value = matched_units
-                    else:
-                        units_value = tx.units or 0
-            
-                    if tx.transaction_type == 'purchase':
-                        # Mua: thêm CCQ
-                        current_ccq += units_value
-                    elif tx.transaction_type == 'sell':
-                        # Bán: trừ CCQ (không được âm)
-                        current_ccq = max(0, current_ccq - units_value)
-                except Exception as e:
-                    _logger.warning(f"Lỗi xử lý giao dịch {tx.id}: {e}")
-                    continue
-            
-            return current_ccq
-        
-        except Exception as e:
-            _logger.error(f"Lỗi tính CCQ cho fund {self.fund_id.name if self.fund_id else 'Unknown'}: {e}")
-            return self.opening_ccq or 0.0
-    
-    def _calculate_weighted_average_price(self):
-        """Tính giá trung bình có trọng số chính xác theo công thức"""
-        try:
-            if not self.fund_id or not self.inventory_date:
-                return self.opening_avg_price or 0.0
-            
-            # Lấy tất cả giao dịch đã khớp trong ngày - CHỈ LẤY GIAO DỊCH NHÀ TẠO LẬP MUA/BÁN LẠI
-            all_transactions = self.env['portfolio.transaction'].search([
-                ('fund_id', '=', self.fund_id.id),
-                ('status', '=', 'completed'),
-                ('created_at', '>=', f"{self.inventory_date} 00:00:00"),
-                ('created_at', '<=', f"{self.inventory_date} 23:59:59")
-            ], order='create_date')
-            
-            # Lọc chỉ lấy giao dịch nhà tạo lập (dựa trên user_id có group base.group_user)
-            transactions = []
-            for tx in all_transactions:
-                try:
-                    if tx.user_id and tx.user_id.has_group('base.group_user'):
-                        transactions.append(tx)
-                except Exception as e:
-                    _logger.warning(f"Lỗi kiểm tra user group cho giao dịch {tx.id}: {e}")
-                    continue
-            
-            _logger.info(f"Tính giá TB cho fund {self.fund_id.name} ngày {self.inventory_date}: {len(transactions)} giao dịch")
-            
-            # Khởi tạo với dữ liệu đầu ngày
-            weighted_sum = self.opening_value or 0.0  # = self.opening_ccq * self.opening_avg_price
-            total_ccq = self.opening_ccq or 0.0       # Tổng CCQ
-            
-            # Xử lý từng giao dịch
-            for tx in transactions:
-                try:
-                    # Đảm bảo giao dịch thuộc đúng fund
-                    if tx.fund_id.id != self.fund_id.id:
-                        _logger.warning(f"Giao dịch {tx.id} không thuộc fund {self.fund_id.name}")
-                        continue
-                        
-                    # Lấy số lượng CCQ thực tế
-                    matched_units = getattr(tx, 'matched_units', False)
-                    if matched_units is not False:
-                        units_value = matched_units
-                    else:
-                        units_value = tx.units or 0
-                    
-                    # Tính giá đơn vị
-                    if getattr(tx, 'amount', 0) and tx.units:
-                        unit_price = tx.amount / tx.units
-                    else:
-                        unit_price = tx.current_nav or 0
-            
-                    if tx.transaction_type == 'purchase':
-                        # Mua: thêm vào tổng giá trị và CCQ
-                        weighted_sum += units_value * unit_price
-                        total_ccq += units_value
-                    elif tx.transaction_type == 'sell':
-                        # Bán: trừ theo giá bán thực tế
-                        weighted_sum -= units_value * unit_price
-                        total_ccq = max(0, total_ccq - units_value)
-                except Exception as e:
-                    _logger.warning(f"Lỗi xử lý giao dịch {tx.id}: {e}")
-                    continue
-            
-            # Trả về giá trung bình có trọng số
-            if total_ccq > 0:
-                return weighted_sum / total_ccq
+
+                rows = transactions_by_day.get((fund_id, record.inventory_date), [])
+                summary = self._summarize_daily_transactions(record.opening_ccq, record.opening_avg_price, rows)
+                record.write({
+                    'closing_ccq': summary['closing_ccq'],
+                    'closing_avg_price': summary['closing_avg_price'],
+                    'transaction_details': record._render_transaction_details(summary),
+                    'calculation_details': record._render_calculation_details(summary),
+                })
+                opening = (record.closing_ccq, record.closing_avg_price)
+                rolled += 1
+            if skip_to is not None:
+                opening = self._closing_before(fund_id, skip_to)
+                domain = [('fund_id', '=', fund_id), ('inventory_date', '>=', skip_to)]
             else:
-                return self.opening_avg_price or 0.0
-                
-        except Exception as e:
-            _logger.error(f"Lỗi tính giá TB cho fund {self.fund_id.name if self.fund_id else 'Unknown'}: {e}")
-            return self.opening_avg_price or 0.0
-    
-    @api.depends('fund_id', 'inventory_date', 'opening_ccq', 'opening_avg_price')
-    def _compute_calculation_details(self):
-        for record in self:
+                domain = [('fund_id', '=', fund_id), ('inventory_date', '>', chunk[-1].inventory_date)]
+
+    @api.model
+    def _mark_inventory_dirty(self, keys):
+        """
+        Đánh dấu các (fund_id, date) cần tính lại; job cuộn tồn kho được kích hoạt
+        một lần khi transaction commit (không phải mỗi lần ghi giao dịch).
+
+        Args:
+            keys: iterable (fund_id, date)
+        """
+        keys = {(fund_id, day) for fund_id, day in keys if fund_id and day}
+        if not keys:
+            return
+        self.env['nav.daily.inventory.dirty'].sudo()._mark(keys)
+        precommit = self.env.cr.precommit
+        if not precommit.data.get('nav_inventory_roll_trigger'):
+            precommit.data['nav_inventory_roll_trigger'] = True
+            precommit.add(self._trigger_inventory_roll)
+
+    @api.model
+    def _trigger_inventory_roll(self):
+        cron = self.env.ref('nav_management.nav_daily_inventory_roll_cron', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def cron_process_dirty_inventory(self):
+        """Job: tính lại các ngày dirty và cuộn giá trị cuối ngày sang các ngày sau"""
+        Dirty = self.env['nav.daily.inventory.dirty'].sudo()
+        for fund_id, dirty_dates in Dirty._pop_all().items():
             try:
-                record.calculation_details = record._get_calculation_details()
+                with self.env.cr.savepoint():
+                    rolled = self._roll_inventory_chain(fund_id, min(dirty_dates), dirty_dates)
+                _logger.info(f"Đã cuộn tồn kho quỹ {fund_id} từ ngày {min(dirty_dates)}: {rolled} bản ghi")
             except Exception as e:
-                _logger.error(f"Lỗi tính calculation details cho fund {record.fund_id.name}: {e}")
-                record.calculation_details = f"Lỗi tính toán: {str(e)}"
-    
-    def _get_calculation_details(self):
-        """Lấy chi tiết tính toán để debug và hiển thị"""
-        if not self.fund_id or not self.inventory_date:
-            return "Không có dữ liệu để tính toán"
-        
-        try:
-            # Lấy tất cả giao dịch đã khớp trong ngày - CHỈ LẤY GIAO DỊCH NHÀ TẠO LẬP
-            all_transactions = self.env['portfolio.transaction'].search([
-                ('fund_id', '=', self.fund_id.id),
-                ('status', '=', 'completed'),
-                ('created_at', '>=', f"{self.inventory_date} 00:00:00"),
-                ('created_at', '<=', f"{self.inventory_date} 23:59:59")
-            ], order='create_date')
-            
-            # Lọc chỉ lấy giao dịch nhà tạo lập (dựa trên user_id có group base.group_user)
-            transactions = []
-            for tx in all_transactions:
-                try:
-                    if tx.user_id and tx.user_id.has_group('base.group_user'):
-                        transactions.append(tx)
-                except Exception as e:
-                    _logger.warning(f"Lỗi kiểm tra user group cho giao dịch {tx.id}: {e}")
-                    continue
-            
-            details = []
-            details.append(f"=== CHI TIẾT TÍNH TOÁN TỒN KHO ===")
-            details.append(f"Ngày: {self.inventory_date}")
-            details.append(f"Quỹ: {self.fund_id.name}")
-            details.append(f"")
-            details.append(f"ĐẦU NGÀY:")
-            details.append(f"  - CCQ: {self.opening_ccq:,.0f}")
-            details.append(f"  - Giá TB: {self.opening_avg_price:,.0f}")
-            details.append(f"  - Giá trị: {self.opening_value:,.0f} (= {self.opening_ccq:,.0f} × {self.opening_avg_price:,.0f})")
-            details.append(f"")
-            
-            # Khởi tạo với dữ liệu đầu ngày
-            weighted_sum = self.opening_value
-            total_ccq = self.opening_ccq
-            
-            details.append(f"GIAO DỊCH TRONG NGÀY:")
-            for i, tx in enumerate(transactions, 1):
-                try:
-                    # Đảm bảo giao dịch thuộc đúng fund
-                    if tx.fund_id.id != self.fund_id.id:
-                        _logger.warning(f"Giao dịch {tx.id} không thuộc fund {self.fund_id.name}")
-                        continue
-                        
-                    # Lấy số lượng CCQ thực tế
-                    matched_units = getattr(tx, 'matched_units', False)
-                    if matched_units is not False:
-                        units_value = matched_units
-                    else:
-                        units_value = tx.units or 0
-                    
-                    # Tính giá đơn vị
-                    if getattr(tx, 'amount', 0) and tx.units:
-                        unit_price = tx.amount / tx.units
-                    else:
-                        unit_price = tx.current_nav or 0
-                    
-                    transaction_value = units_value * unit_price
-                    
-                    details.append(f"  {i}. {tx.transaction_type.upper()}: {units_value:,.0f} CCQ × {unit_price:,.0f} = {transaction_value:,.0f}")
-                    
-                    if tx.transaction_type == 'purchase':
-                        weighted_sum += transaction_value
-                        total_ccq += units_value
-                    elif tx.transaction_type == 'sell':
-                        weighted_sum -= transaction_value
-                        total_ccq = max(0, total_ccq - units_value)
-                except Exception as e:
-                    _logger.warning(f"Lỗi xử lý giao dịch {tx.id}: {e}")
-                    continue
-            
-            details.append(f"")
-            details.append(f"CUỐI NGÀY:")
-            details.append(f"  - CCQ: {total_ccq:,.0f}")
-            if total_ccq > 0:
-                avg_price = weighted_sum / total_ccq
-                details.append(f"  - Giá TB: {avg_price:,.0f}")
-                details.append(f"  - Giá trị: {weighted_sum:,.0f}")
-            else:
-                details.append(f"  - Giá TB: {self.opening_avg_price:,.0f} (không có CCQ)")
-                details.append(f"  - Giá trị: 0")
-            
-            return "\n".join(details)
-            
-        except Exception as e:
-            _logger.error(f"Lỗi tính chi tiết cho fund {self.fund_id.name}: {e}")
-            return f"Lỗi tính toán: {str(e)}"
-    
+                _logger.error(f"Lỗi cuộn tồn kho quỹ {fund_id}: {e}")
+                # Giữ lại để lần chạy sau xử lý
+                Dirty._mark({(fund_id, day) for day in dirty_dates})
+
+    @api.model
+    def _backfill_daily_inventory(self, batch_size=500):
+        """Tính giá trị lưu trữ cho các bản ghi cũ chưa được tính (chạy khi cài đặt/nâng cấp module)"""
+        inventories = self.search([('transaction_details', '=', False)], order='fund_id, inventory_date')
+        mm_user_ids = self._get_market_maker_user_ids()
+        for start in range(0, len(inventories), batch_size):
+            inventories[start:start + batch_size]._recompute_daily_inventory(mm_user_ids)
+        _logger.info(f"Đã tính lại {len(inventories)} bản ghi tồn kho")
+
     @api.depends('fund_id')
     def _compute_fund_config_info(self):
         for record in self:
@@ -655,39 +583,22 @@ class NavDailyInventory(models.Model):
                 record.opening_avg_price = 0.0
     
     def _get_previous_closing_values(self):
-        """Lấy giá trị cuối ngày từ ngày trước"""
+        """Lấy giá trị cuối ngày đã lưu của bản ghi liền trước (một truy vấn theo index fund_id, inventory_date)"""
         try:
             if not self.fund_id or not self.inventory_date:
                 return None
             
-            # Tìm bản ghi ngày trước
-            previous_date = self.inventory_date - timedelta(days=1)
             previous_record = self.search([
                 ('fund_id', '=', self.fund_id.id),
-                ('inventory_date', '=', previous_date)
-            ], limit=1)
+                ('inventory_date', '<', self.inventory_date)
+            ], order='inventory_date desc', limit=1)
             
-            if previous_record and previous_record.closing_ccq > 0:
-                _logger.info(f"Tìm thấy dữ liệu ngày trước: {previous_date}")
+            if previous_record:
                 return {
                     'closing_ccq': previous_record.closing_ccq,
                     'closing_avg_price': previous_record.closing_avg_price
                 }
             
-            # Nếu không có ngày trước, tìm bản ghi gần nhất trước ngày hiện tại
-            nearest_record = self.search([
-                ('fund_id', '=', self.fund_id.id),
-                ('inventory_date', '<', self.inventory_date),
-                ('closing_ccq', '>', 0)  # Chỉ lấy bản ghi có dữ liệu
-            ], order='inventory_date desc', limit=1)
-            
-            if nearest_record:
-                _logger.info(f"Tìm thấy dữ liệu gần nhất: {nearest_record.inventory_date}")
-                return {
-                    'closing_ccq': nearest_record.closing_ccq,
-                    'closing_avg_price': nearest_record.closing_avg_price
-                }
-            
             _logger.info(f"Không tìm thấy dữ liệu ngày trước cho fund {self.fund_id.name}")
             return None
         except Exception as e:
@@ -713,23 +624,35 @@ class NavDailyInventory(models.Model):
             # Chỉ gọi các method nếu record đã được tạo thành công
             if record:
                 try:
-                    record._onchange_load_previous_defaults()
+                    record.with_context(skip_inventory_recompute=True)._onchange_load_previous_defaults()
                 except Exception as e:
                     _logger.warning(f"Lỗi khi load previous defaults: {e}")
                 
-                # Chỉ tính toán nếu chưa có dữ liệu để tránh vòng lặp
-                if not record.closing_ccq and not record.closing_avg_price:
-                    try:
-                        record._auto_calculate_inventory()
-                    except Exception as e:
-                        _logger.warning(f"Lỗi khi auto calculate inventory: {e}")
+                try:
+                    record._recompute_daily_inventory()
+                except Exception as e:
+                    _logger.warning(f"Lỗi khi auto calculate inventory: {e}")
             return record
         except Exception as e:
             _logger.error(f"Lỗi khi tạo nav.daily.inventory: {e}")
             raise
 
+    @api.model
+    def fields_view_get(self, view_id=None, view_type='form', toolbar=False, submenu=False):
+        """Override để tự động tạo tồn kho khi mở view"""
+        result = super().fields_view_get(view_id, view_type, toolbar, submenu)
+        
+        # Tự động tạo tồn kho thiếu khi mở list view
+        if view_type == 'list' and self.env.context.get('search_default_today'):
+            try:
+                self._auto_create_missing_inventories()
+            except Exception as e:
+                _logger.error(f"Lỗi tự động tạo tồn kho khi mở view: {e}")
+        
+        return result
+    
     def write(self, vals):
-        """Chặn cập nhật gây trùng (fund_id, inventory_date)"""
+        """Chặn cập nhật gây trùng (fund_id, inventory_date) và tính lại tồn kho khi dữ liệu đầu ngày thay đổi"""
         try:
             # Nếu có thay đổi fund_id hoặc inventory_date, kiểm tra trước khi write
             change_fund = 'fund_id' in vals
@@ -746,39 +669,16 @@ class NavDailyInventory(models.Model):
                         ], limit=1)
                         if dup:
                             raise ValidationError(_('Đã tồn tại tồn kho cho quỹ này trong ngày %s') % target_date)
-            return super().write(vals)
-        except Exception as e:
-            _logger.error(f"Lỗi khi cập nhật nav.daily.inventory: {e}")
-            raise
-    
-    @api.model
-    def fields_view_get(self, view_id=None, view_type='form', toolbar=False, submenu=False):
-        """Override để tự động tạo tồn kho khi mở view"""
-        result = super().fields_view_get(view_id, view_type, toolbar, submenu)
-        
-        # Tự động tạo tồn kho thiếu khi mở list view
-        if view_type == 'list' and self.env.context.get('search_default_today'):
-            try:
-                self._auto_create_missing_inventories()
-            except Exception as e:
-                _logger.error(f"Lỗi tự động tạo tồn kho khi mở view: {e}")
-        
-        return result
-    
-    def write(self, vals):
-        """Tự động tính toán khi cập nhật"""
-        try:
             result = super().write(vals)
             # Chỉ tính toán lại nếu có thay đổi quan trọng
             important_fields = ['fund_id', 'inventory_date', 'opening_ccq', 'opening_avg_price']
-            if any(field in vals for field in important_fields):
-                for record in self:
-                    try:
-                        _logger.info(f"Phát hiện thay đổi quan trọng, tính toán lại tồn kho cho {record.fund_id.name}")
-                        # Force recompute tất cả trường computed
-                        record.force_recompute_all_fields()
-                    except Exception as e:
-                        _logger.warning(f"Lỗi khi auto calculate inventory cho record {record.id}: {e}")
+            if any(field in vals for field in important_fields) and not self.env.context.get('skip_inventory_recompute'):
+                try:
+                    self._recompute_daily_inventory()
+                    # Các ngày sau được job cuộn lại theo giá trị cuối ngày mới
+                    self._mark_inventory_dirty((rec.fund_id.id, rec.inventory_date) for rec in self)
+                except Exception as e:
+                    _logger.warning(f"Lỗi khi auto calculate inventory: {e}")
             return result
         except Exception as e:
             _logger.error(f"Lỗi khi write nav.daily.inventory: {e}")
@@ -786,110 +686,30 @@ class NavDailyInventory(models.Model):
     
     def _auto_calculate_inventory(self):
         """Tự động tính toán tồn kho"""
-        for record in self:
-            try:
-                # Kiểm tra flag để tránh vòng lặp
-                if hasattr(record, '_calculating_inventory') and record._calculating_inventory:
-                    return
-                
-                # Set flag để tránh vòng lặp
-                record._calculating_inventory = True
-                
-                # Force refresh các trường computed để đảm bảo tính toán mới nhất
-                record.invalidate_cache(['closing_ccq', 'closing_avg_price', 'closing_value', 'ccq_change', 'price_change', 'value_change'])
-                
-                # Kiểm tra dữ liệu đầu vào
+        try:
+            # Kiểm tra dữ liệu đầu vào
+            for record in self:
                 if not record.opening_ccq or not record.opening_avg_price:
                     try:
-                        record._onchange_load_previous_defaults()
+                        record.with_context(skip_inventory_recompute=True)._onchange_load_previous_defaults()
                     except Exception as e:
                         _logger.warning(f"Lỗi khi load previous defaults: {e}")
-                
-                # Tính toán các giá trị theo thứ tự đúng với logging chi tiết
-                try:
-                    # 1. Tính CCQ cuối ngày trước
-                    record._compute_closing_ccq()
-                    _logger.info(f"Đã tính CCQ cuối ngày cho {record.fund_id.name}: {record.closing_ccq}")
-                except Exception as e:
-                    _logger.warning(f"Lỗi tính closing CCQ: {e}")
-                
-                try:
-                    # 2. Tính giá trung bình cuối ngày (phụ thuộc vào CCQ)
-                    record._compute_closing_avg_price()
-                    _logger.info(f"Đã tính giá TB cuối ngày cho {record.fund_id.name}: {record.closing_avg_price}")
-                except Exception as e:
-                    _logger.warning(f"Lỗi tính closing avg price: {e}")
-                
-                try:
-                    # 3. Tính giá trị cuối ngày (phụ thuộc vào CCQ và giá TB)
-                    record._compute_closing_value()
-                    _logger.info(f"Đã tính giá trị cuối ngày cho {record.fund_id.name}: {record.closing_value}")
-                except Exception as e:
-                    _logger.warning(f"Lỗi tính closing value: {e}")
-                
-                try:
-                    # 4. Tính các thay đổi (phụ thuộc vào tất cả giá trị trên)
-                    record._compute_changes()
-                    _logger.info(f"Đã tính thay đổi cho {record.fund_id.name}: CCQ={record.ccq_change}, Giá={record.price_change}, Giá trị={record.value_change}")
-                except Exception as e:
-                    _logger.warning(f"Lỗi tính changes: {e}")
-                
-                try:
-                    # 5. Tính chi tiết giao dịch (phụ thuộc vào dữ liệu giao dịch)
-                    record._compute_transaction_details()
-                except Exception as e:
-                    _logger.warning(f"Lỗi tính transaction details: {e}")
-                
-                try:
-                    # 6. Tính chi tiết tính toán (phụ thuộc vào tất cả giá trị)
-                    record._compute_calculation_details()
-                except Exception as e:
-                    _logger.warning(f"Lỗi tính calculation details: {e}")
-                
-                # Clear flag
-                record._calculating_inventory = False
-                
-                # Log kết quả cuối cùng
+            self._recompute_daily_inventory()
+            for record in self:
                 _logger.info(f"Hoàn thành tính toán tồn kho cho {record.fund_id.name}: CCQ={record.closing_ccq}, Giá TB={record.closing_avg_price}, Giá trị={record.closing_value}")
-                
-                # Force refresh UI để hiển thị dữ liệu mới nhất
-                record.refresh()
-                    
-            except Exception as e:
-                _logger.error(f"Lỗi tự động tính toán tồn kho: {e}")
-                # Clear flag trong trường hợp lỗi
-                if hasattr(record, '_calculating_inventory'):
-                    record._calculating_inventory = False
+        except Exception as e:
+            _logger.error(f"Lỗi tự động tính toán tồn kho: {e}")
     
     def force_refresh_calculations(self):
         """Force refresh tất cả các tính toán để đảm bảo dữ liệu mới nhất"""
-        for record in self:
-            try:
-                _logger.info(f"Force refresh calculations cho {record.fund_id.name}")
-                # Invalidate cache tất cả trường computed
-                record.invalidate_cache(['closing_ccq', 'closing_avg_price', 'closing_value', 'ccq_change', 'price_change', 'value_change', 'transaction_details', 'calculation_details'])
-                # Tính toán lại
-                record._auto_calculate_inventory()
-                # Refresh record
-                record.refresh()
-            except Exception as e:
-                _logger.error(f"Lỗi force refresh calculations: {e}")
+        self._auto_calculate_inventory()
     
     def force_recompute_all_fields(self):
-        """Force recompute tất cả các trường computed để đảm bảo dữ liệu mới nhất"""
-        for record in self:
-            try:
-                _logger.info(f"Force recompute all fields cho {record.fund_id.name}")
-                # Force recompute tất cả trường computed
-                record._compute_closing_ccq()
-                record._compute_closing_avg_price()
-                record._compute_closing_value()
-                record._compute_changes()
-                record._compute_transaction_details()
-                record._compute_calculation_details()
-                _logger.info(f"Hoàn thành recompute: CCQ={record.closing_ccq}, Giá TB={record.closing_avg_price}, Giá trị={record.closing_value}")
-            except Exception as e:
-                _logger.error(f"Lỗi force recompute all fields: {e}")
+        """Force recompute tất cả các trường tồn kho để đảm bảo dữ liệu mới nhất"""
+        try:
+            self._recompute_daily_inventory()
+        except Exception as e:
+            _logger.error(f"Lỗi force recompute all fields: {e}")
     
     @api.model
     def create_daily_inventory_for_fund(self, fund_id, inventory_date):
@@ -950,19 +770,13 @@ class NavDailyInventory(models.Model):
     
     @api.model
     def refresh_inventory_after_transaction_change(self, fund_id, inventory_date):
-        """Refresh tồn kho sau khi có thay đổi giao dịch"""
+        """Refresh tồn kho sau khi có thay đổi giao dịch: tính lại ngày đó và cuộn sang các ngày sau"""
         try:
             _logger.info(f"Refresh tồn kho sau thay đổi giao dịch cho quỹ {fund_id} ngày {inventory_date}")
             
-            # Tìm bản ghi tồn kho
-            inventory = self.search([
-                ('fund_id', '=', fund_id),
-                ('inventory_date', '=', inventory_date)
-            ], limit=1)
-            
-            if inventory:
-                # Force recompute tất cả trường computed
-                inventory.force_recompute_all_fields()
+            inventory_date = fields.Date.to_date(inventory_date)
+            rolled = self._roll_inventory_chain(int(fund_id), inventory_date)
+            if rolled:
                 return {'success': True, 'message': 'Đã refresh tồn kho sau thay đổi giao dịch'}
             else:
                 return {'success': False, 'message': 'Không tìm thấy bản ghi tồn kho'}
@@ -982,12 +796,8 @@ class NavDailyInventory(models.Model):
                 ('inventory_date', '=', today)
             ])
             
-            for inventory in inventories:
-                try:
-                    inventory.force_recompute_all_fields()
-                    _logger.info(f"Đã refresh tồn kho cho {inventory.fund_id.name}")
-                except Exception as e:
-                    _logger.warning(f"Lỗi refresh tồn kho cho {inventory.fund_id.name}: {e}")
+            # Tính theo lô: một lần đọc giao dịch cho tất cả quỹ
+            inventories.force_recompute_all_fields()
             
             return {'success': True, 'message': f'Đã refresh {len(inventories)} tồn kho'}
         except Exception as e:
@@ -1270,18 +1080,52 @@ class NavDailyInventory(models.Model):
     
     def recalculate_inventory_after_transaction_change(self, fund_id, inventory_date):
         """Tính lại tồn kho sau khi có thay đổi giao dịch"""
-        try:
-            # Tìm bản ghi tồn kho
-            inventory = self.search([
-                ('fund_id', '=', fund_id),
-                ('inventory_date', '=', inventory_date)
-            ], limit=1)
-            
-            if inventory:
-                inventory._auto_calculate_inventory()
-                return {'success': True, 'message': 'Đã tính lại tồn kho'}
-            else:
-                return {'success': False, 'message': 'Không tìm thấy bản ghi tồn kho'}
-        except Exception as e:
-            _logger.error(f"Lỗi tính lại tồn kho: {e}")
-            return {'success': False, 'message': str(e)}
\ No newline at end of file
+        return self.refresh_inventory_after_transaction_change(fund_id, inventory_date)
+
+
+class NavDailyInventoryDirty(models.Model):
+    """Các (quỹ, ngày) có giao dịch thay đổi, chờ job cuộn tồn kho xử lý"""
+    _name = 'nav.daily.inventory.dirty'
+    _description = 'NAV Daily Inventory Dirty Date'
+    _log_access = False
+    _sql_constraints = [
+        ('uniq_fund_date', 'unique(fund_id, inventory_date)', 'Ngày dirty đã tồn tại.')
+    ]
+
+    fund_id = fields.Many2one('portfolio.fund', string='Fund', required=True, ondelete='cascade')
+    inventory_date = fields.Date(string='Inventory Date', required=True)
+
+    @api.model
+    def _mark(self, keys):
+        """Ghi (fund_id, date) bằng một câu INSERT ... ON CONFLICT DO NOTHING"""
+        keys = list(keys)
+        if not keys:
+            return
+        placeholders = ", ".join(["(%s, %s)"] * len(keys))
+        params = [value for key in keys for value in key]
+        self.env.cr.execute(f"""
+            INSERT INTO nav_daily_inventory_dirty (fund_id, inventory_date)
+            VALUES {placeholders}
+            ON CONFLICT (fund_id, inventory_date) DO NOTHING
+        """, params)
+
+    @api.model
+    def _pop_all(self):
+        """
+        Lấy và xóa toàn bộ ngày dirty (bỏ qua dòng đang bị job khác giữ).
+
+        Returns:
+            dict: {fund_id: set(date)}
+        """
+        self.env.cr.execute("""
+            DELETE FROM nav_daily_inventory_dirty
+             WHERE id IN (
+                SELECT id FROM nav_daily_inventory_dirty
+                 FOR UPDATE SKIP LOCKED
+             )
+            RETURNING fund_id, inventory_date
+        """)
+        result = {}
+        for fund_id, inventory_date in self.env.cr.fetchall():
+            result.setdefault(fund_id, set()).add(inventory_date)
+        return result
@@ -0,0 +1,49 @@
+from odoo import api, models
+
+
+class PortfolioTransaction(models.Model):
+    _inherit = 'portfolio.transaction'
+
+    # Các trường ảnh hưởng tới tồn kho CCQ hàng ngày
+    _INVENTORY_FIELDS = {
+        'fund_id', 'status', 'transaction_type', 'units', 'matched_units',
+        'amount', 'current_nav', 'created_at', 'user_id',
+    }
+
+    def _inventory_dirty_keys(self, mm_user_ids=None):
+        """
+        (fund_id, ngày giao dịch) mà các giao dịch trong self ảnh hưởng: chỉ giao dịch
+        đã khớp (completed) của nhà tạo lập được tính vào tồn kho
+        """
+        records = self.filtered(lambda tx: tx.status == 'completed' and tx.fund_id and tx.created_at)
+        if not records:
+            return set()
+        if mm_user_ids is None:
+            mm_user_ids = self.env['nav.daily.inventory']._get_market_maker_user_ids()
+        return {
+            (tx.fund_id.id, tx.created_at.date())
+            for tx in records
+            if tx.user_id.id in mm_user_ids
+        }
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['nav.daily.inventory']._mark_inventory_dirty(records._inventory_dirty_keys())
+        return records
+
+    def write(self, vals):
+        if not self._INVENTORY_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Đánh dấu cả ngày cũ và ngày mới (trường hợp đổi quỹ/ngày giao dịch hoặc hết completed)
+        keys = self._inventory_dirty_keys()
+        result = super().write(vals)
+        keys |= self._inventory_dirty_keys()
+        self.env['nav.daily.inventory']._mark_inventory_dirty(keys)
+        return result
+
+    def unlink(self):
+        keys = self._inventory_dirty_keys()
+        result = super().unlink()
+        self.env['nav.daily.inventory']._mark_inventory_dirty(keys)
+        return result
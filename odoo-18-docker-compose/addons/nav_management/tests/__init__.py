@@ -0,0 +1,3 @@
+from . import test_business_calendar
+from . import test_daily_inventory
+from . import test_nav_vector
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Dữ liệu mẫu dùng chung cho test và benchmark (odoo-18-docker-compose/benchmarks) -
+không import Odoo để benchmark nạp trực tiếp được.
+"""
+import random
+from calendar import monthrange
+from datetime import date, timedelta
+
+import numpy as np
+
+# Ngày lễ 2024-2026 như data.holiday.sync_local_holidays
+HOLIDAYS = [
+    date(2024, 1, 1), date(2024, 2, 12), date(2024, 2, 13), date(2024, 2, 14), date(2024, 4, 18),
+    date(2024, 4, 30), date(2024, 5, 1), date(2024, 9, 2), date(2025, 1, 1), date(2025, 1, 29),
+    date(2025, 1, 30), date(2025, 1, 31), date(2025, 4, 8), date(2025, 4, 30), date(2025, 5, 1),
+    date(2025, 9, 2), date(2026, 1, 1), date(2026, 2, 17), date(2026, 2, 18), date(2026, 2, 19),
+    date(2026, 2, 20), date(2026, 4, 27), date(2026, 4, 30), date(2026, 5, 1), date(2026, 9, 2),
+]
+
+
+def step_workday(start, days, holidays):
+    """WORKDAY cũ: bước từng ngày"""
+    current = start
+    step = 1 if days >= 0 else -1
+    remaining = abs(days)
+    while remaining > 0:
+        current += timedelta(days=step)
+        if current.weekday() >= 5 or current in holidays:
+            continue
+        remaining -= 1
+    return current
+
+
+def workday_cases(size, seed=20240101):
+    rng = random.Random(seed)
+    return [(date(2024, 1, 1) + timedelta(days=rng.randint(0, 1000)), rng.randint(-300, 300)) for _ in range(size)]
+
+
+def scalar_metrics(purchase_date, term_months, units, price, fee_rate, rate):
+    """Công thức từng giao dịch như nav.transaction.calculator.compute_transaction_metrics_full"""
+    month = purchase_date.month - 1 + term_months
+    year = purchase_date.year + month // 12
+    month = month % 12 + 1
+    maturity = date(year, month, min(purchase_date.day, monthrange(year, month)[1]))
+    if maturity.weekday() >= 5:
+        maturity += timedelta(days=7 - maturity.weekday())
+    days = (maturity - purchase_date).days
+    purchase_value = units * price + units * price * fee_rate / 100.0
+    sell_value1 = purchase_value * (rate / 100.0) / 365.0 * days + purchase_value
+    sell_price1 = float(round(sell_value1 / units))
+    sell_price2 = round(sell_price1 / 50) * 50
+    converted = ((sell_price2 / price) - 1) * 365.0 / days * 100.0
+    return maturity, days, sell_value1, sell_price2, converted - rate
+
+
+def nav_session(size, seed=20240101):
+    """Phiên giao dịch tổng hợp: (ngày mua, kỳ hạn tháng, số CCQ, giá, phí %, lãi suất %)"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(size):
+        rows.append((
+            date(2024, 1, 1) + timedelta(days=rng.randint(0, 700)),
+            rng.choice([1, 3, 6, 12]),
+            float(rng.randint(1, 5000)),
+            rng.uniform(9000, 15000),
+            rng.uniform(0, 1),
+            rng.uniform(1, 10),
+        ))
+    return rows
+
+
+def nav_columns(nav_vector, rows):
+    """Các cột đầu vào của nav_vector.full_metrics"""
+    dates, terms, units, price, fee, rate = zip(*rows)
+    return (nav_vector.to_date_array(list(dates)), np.array(terms), np.array(units),
+            np.array(price), np.array(fee), np.array(rate))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests.common import BaseCase
+
+from ..utils import date_utils
+from .common import HOLIDAYS, step_workday, workday_cases
+
+
+class TestBusinessCalendar(BaseCase):
+
+    def test_workday_matches_step_loop(self):
+        calendar = date_utils.BusinessCalendar(HOLIDAYS)
+        holidays = set(HOLIDAYS)
+        for start, days in workday_cases(5_000):
+            self.assertEqual(calendar.workday(start, days), step_workday(start, days, holidays))
+        # Qua ranh giới năm và ra ngoài phạm vi đã dựng
+        self.assertEqual(calendar.workday(date(2024, 12, 31), 1), date(2025, 1, 2))
+        self.assertEqual(calendar.workday(date(2024, 2, 15), -1), date(2024, 2, 9))
+        self.assertEqual(calendar.workday(date(2024, 1, 2), 5000), step_workday(date(2024, 1, 2), 5000, holidays))
+
+    def test_next_business_day(self):
+        calendar = date_utils.BusinessCalendar(HOLIDAYS)
+        self.assertEqual(calendar.next_business_day(date(2025, 4, 30)), date(2025, 5, 2))
+        self.assertEqual(calendar.next_business_day(date(2025, 5, 3)), date(2025, 5, 5))
+        self.assertEqual(calendar.next_business_day(date(2025, 5, 5)), date(2025, 5, 5))
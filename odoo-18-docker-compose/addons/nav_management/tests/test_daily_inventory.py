@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+
+from odoo.tests.common import TransactionCase
+
+
+class TestDailyInventoryRoll(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fund = cls.env['portfolio.fund'].create({
+            'name': 'Quỹ kiểm thử tồn kho',
+            'ticker': 'TINV',
+            'inception_date': date(2024, 1, 1),
+            'current_nav': 10000.0,
+            'investment_type': 'Growth',
+        })
+        Inventory = cls.env['nav.daily.inventory']
+        cls.start = date(2024, 3, 4)
+        cls.days = Inventory.browse()
+        for offset in range(4):
+            cls.days |= Inventory.create({
+                'fund_id': cls.fund.id,
+                'inventory_date': cls.start + timedelta(days=offset),
+            })
+        # Không có giao dịch: cuối ngày = đầu ngày = 1.000 CCQ giá 10.000
+        cls.days.with_context(skip_inventory_recompute=True).write({
+            'opening_ccq': 1000.0, 'opening_avg_price': 10000.0,
+            'closing_ccq': 1000.0, 'closing_avg_price': 10000.0,
+        })
+
+    def test_roll_skips_unaffected_day_to_next_dirty_date(self):
+        day1, day3 = self.days[1], self.days[3]
+        # Ngày 3 lưu giá trị cuối ngày cũ; ngày 2 ở giữa không đổi và không bị đánh dấu
+        day3.with_context(skip_inventory_recompute=True).write({'closing_ccq': 0.0})
+
+        rolled = self.env['nav.daily.inventory']._roll_inventory_chain(
+            self.fund.id, day1.inventory_date, {day1.inventory_date, day3.inventory_date})
+
+        # Ngày 1 và ngày 3 được tính lại, ngày 2 bị bỏ qua
+        self.assertEqual(rolled, 2)
+        self.assertEqual(day3.closing_ccq, 1000.0)
+        self.assertEqual(day3.closing_avg_price, 10000.0)
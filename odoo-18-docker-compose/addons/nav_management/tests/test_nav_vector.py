@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from odoo.tests.common import BaseCase
+
+from ..utils import nav_vector
+from .common import nav_columns, nav_session, scalar_metrics
+
+
+class TestNavVector(BaseCase):
+
+    def test_full_metrics_matches_scalar(self):
+        rows = nav_session(2_000)
+        m = nav_vector.full_metrics(*nav_columns(nav_vector, rows))
+        for i, row in enumerate(rows):
+            maturity, days, sell_value1, sell_price2, delta = scalar_metrics(*row)
+            self.assertEqual(nav_vector.dates_to_iso(m['maturity_date'][i:i + 1])[0], maturity.isoformat())
+            self.assertEqual(m['days'][i], days)
+            self.assertAlmostEqual(m['sell_value1'][i], sell_value1, delta=abs(sell_value1) * 1e-6)
+            self.assertEqual(m['sell_price2'][i], sell_price2)
+            self.assertAlmostEqual(m['interest_delta'][i], delta, delta=max(abs(delta) * 1e-6, 1e-12))
+
+    def test_workday_and_month_end(self):
+        dates = np.array(['2024-01-31', '2024-03-30', '2024-03-31', 'NaT'], dtype='datetime64[D]')
+        self.assertEqual(nav_vector.dates_to_iso(nav_vector.add_months(dates, 1)),
+                         ['2024-02-29', '2024-04-30', '2024-04-30', ''])
+        # Thứ 7 -> WORKDAY(-2) = thứ 5, thứ 2 -> thứ 6 tuần trước
+        self.assertEqual(nav_vector.dates_to_iso(nav_vector.workday(
+            np.array(['2024-06-01', '2024-06-03'], dtype='datetime64[D]'), -2)), ['2024-05-30', '2024-05-30'])
+        self.assertEqual(nav_vector.dates_to_iso(nav_vector.workday(
+            np.array(['2024-06-03'], dtype='datetime64[D]'), -2, holidays=['2024-05-31'])), ['2024-05-29'])
+        self.assertEqual(nav_vector.mround([125, 175, 1024]).tolist(), [100.0, 200.0, 1000.0])
@@ -1,5 +1,6 @@
 from . import date_utils
 from . import mround
+from . import nav_vector
 
-__all__ = ['date_utils', 'mround']
+__all__ = ['date_utils', 'mround', 'nav_vector']
 
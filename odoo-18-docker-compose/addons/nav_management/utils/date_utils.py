@@ -4,7 +4,121 @@
 """
 Date utility functions for NAV calculations
 """
-from datetime import datetime, timedelta
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class BusinessCalendar:
+    """
+    Lịch ngày giao dịch: mảng ordinal các ngày làm việc (thứ 2 - thứ 6, trừ ngày lễ)
+    đã sắp xếp, dựng sẵn theo từng năm và mở rộng khi cần.
+
+    WORKDAY(start, n) = bisect vị trí của start trong mảng + dịch chỉ số n (O(log n)).
+    """
+
+    def __init__(self, holidays=None):
+        self._holidays = frozenset(_to_date(h).toordinal() for h in (holidays or ()) if h)
+        self._lock = threading.Lock()
+        self._first_year = None
+        self._last_year = None
+        self._days = []
+
+    @property
+    def holidays(self):
+        """Danh sách ngày lễ (date) đã sắp xếp"""
+        return [date.fromordinal(o) for o in sorted(self._holidays)]
+
+    def _year_days(self, year):
+        start = date(year, 1, 1).toordinal()
+        end = date(year, 12, 31).toordinal()
+        # date.fromordinal(1) là thứ 2 -> (ordinal - 1) % 7 >= 5 là thứ 7/chủ nhật
+        return [o for o in range(start, end + 1) if (o - 1) % 7 < 5 and o not in self._holidays]
+
+    def _ensure_years(self, year_from, year_to):
+        year_from = max(date.min.year + 1, year_from)
+        year_to = min(date.max.year - 1, year_to)
+        if self._first_year is not None and self._first_year <= year_from and year_to <= self._last_year:
+            return
+        with self._lock:
+            if self._first_year is None:
+                days = []
+                for year in range(year_from, year_to + 1):
+                    days.extend(self._year_days(year))
+                self._days, self._first_year, self._last_year = days, year_from, year_to
+                return
+            head, tail = [], []
+            for year in range(year_from, self._first_year):
+                head.extend(self._year_days(year))
+            for year in range(self._last_year + 1, year_to + 1):
+                tail.extend(self._year_days(year))
+            if head or tail:
+                # Gán mảng mới một lần để luồng đọc song song không thấy mảng dở dang
+                self._days = head + self._days + tail
+                self._first_year = min(self._first_year, year_from)
+                self._last_year = max(self._last_year, year_to)
+
+    def is_business_day(self, value):
+        value = _to_date(value)
+        ordinal = value.toordinal()
+        return value.weekday() < 5 and ordinal not in self._holidays
+
+    def next_business_day(self, value):
+        """Ngày làm việc đầu tiên >= value (cuối tuần/ngày lễ chuyển sang ngày làm việc kế tiếp)"""
+        if not value:
+            return None
+        value = _to_date(value)
+        if self.is_business_day(value):
+            return value
+        return self.workday(value, 1)
+
+    def workday(self, start_date, days):
+        """Excel WORKDAY: ngày làm việc thứ `days` trước/sau start_date"""
+        if not start_date:
+            return None
+        start = _to_date(start_date)
+        days = int(days or 0)
+        if days == 0:
+            return start
+        ordinal = start.toordinal()
+        # Ước lượng số năm cần dựng: ~250 ngày giao dịch mỗi năm
+        span = abs(days) // 240 + 1
+        while True:
+            self._ensure_years(start.year - (span if days < 0 else 1), start.year + (span if days > 0 else 1))
+            trading_days = self._days
+            if days > 0:
+                index = bisect_right(trading_days, ordinal) + days - 1
+            else:
+                index = bisect_left(trading_days, ordinal) + days
+            if 0 <= index < len(trading_days):
+                return date.fromordinal(trading_days[index])
+            if start.year - span <= date.min.year + 1 or start.year + span >= date.max.year - 1:
+                raise ValueError("WORKDAY vượt quá phạm vi ngày hỗ trợ")
+            span *= 2
+
+
+_WEEKEND_CALENDAR = BusinessCalendar()
+
+
+@lru_cache(maxsize=32)
+def _holiday_calendar(holidays):
+    return BusinessCalendar(holidays)
+
+
+def get_calendar(holidays=None):
+    """BusinessCalendar cho danh sách ngày lễ (dùng lại lịch đã dựng cho cùng tập ngày lễ)"""
+    if isinstance(holidays, BusinessCalendar):
+        return holidays
+    if not holidays:
+        return _WEEKEND_CALENDAR
+    return _holiday_calendar(frozenset(_to_date(h) for h in holidays if h))
 
 
 def workday(start_date, days, holidays=None):
@@ -15,49 +129,14 @@ def workday(start_date, days, holidays=None):
     Args:
         start_date: Start date (date or datetime)
         days: Number of working days (negative for past, positive for future)
-        holidays: Optional list of holiday dates to exclude
+        holidays: Optional list of holiday dates to exclude, or a BusinessCalendar
     
     Returns:
         date: Result date
     """
     if not start_date:
         return None
-    
-    # Convert to date if datetime
-    if isinstance(start_date, datetime):
-        current_date = start_date.date()
-    else:
-        current_date = start_date
-    
-    if holidays is None:
-        holidays = []
-    
-    # Convert holidays to date set for fast lookup
-    holiday_set = set()
-    for h in holidays:
-        if isinstance(h, datetime):
-            holiday_set.add(h.date())
-        else:
-            holiday_set.add(h)
-    
-    step = 1 if days >= 0 else -1
-    remaining_days = abs(days)
-    
-    while remaining_days > 0:
-        current_date += timedelta(days=step)
-        
-        # Skip weekends (Saturday=5, Sunday=6)
-        weekday = current_date.weekday()
-        if weekday >= 5:  # Saturday or Sunday
-            continue
-        
-        # Skip holidays
-        if current_date in holiday_set:
-            continue
-        
-        remaining_days -= 1
-    
-    return current_date
+    return get_calendar(holidays).workday(start_date, days)
 
 
 def weekday(date_value, return_type=2):
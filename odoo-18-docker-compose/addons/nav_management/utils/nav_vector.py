@@ -0,0 +1,248 @@
+# Copyright 2024
+# License AGPL-3.0 or later
+
+"""
+Vectorized NAV calculations (NumPy) cho cả phiên giao dịch.
+
+Các hàm nhận mảng cột (units, price, fee, rate, days, term...) và trả về mảng kết quả,
+giữ đúng công thức của nav.transaction.calculator (Excel):
+- MROUND/ROUND dùng làm tròn half-to-even giống round() của Python
+- Ngày đáo hạn rơi vào cuối tuần/ngày lễ được chuyển sang ngày làm việc kế tiếp
+- Ngày bán = WORKDAY(ngày đáo hạn, -2)
+"""
+from datetime import date, datetime
+
+import numpy as np
+
+# Thứ 2 - thứ 6 là ngày làm việc
+WEEKMASK = '1111100'
+
+
+def to_float_array(values):
+    """Chuyển list giá trị (có thể None/chuỗi) sang mảng float64, giá trị lỗi -> 0.0"""
+    try:
+        return np.array([value or 0.0 for value in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    result = np.zeros(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            result[i] = float(value or 0.0)
+        except (TypeError, ValueError):
+            result[i] = 0.0
+    return result
+
+
+def to_int_array(values):
+    """Chuyển list giá trị sang mảng int64, giá trị lỗi -> 0"""
+    result = np.zeros(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        try:
+            result[i] = int(value or 0)
+        except (TypeError, ValueError):
+            result[i] = 0
+    return result
+
+
+def to_date_array(values):
+    """Chuyển list date/datetime/chuỗi ISO sang mảng datetime64[D] (thiếu -> NaT)"""
+    if all(value is None or (isinstance(value, date) and not isinstance(value, datetime)) for value in values):
+        return np.array(values, dtype='datetime64[D]').reshape(len(values))
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    for i, value in enumerate(values):
+        if not value:
+            continue
+        if isinstance(value, datetime):
+            value = value.date()
+        elif isinstance(value, str):
+            try:
+                value = date.fromisoformat(value.split('T')[0].split(' ')[0])
+            except ValueError:
+                continue
+        if isinstance(value, date):
+            result[i] = np.datetime64(value, 'D')
+    return result
+
+
+def safe_divide(numerator, denominator, mask=None):
+    """numerator / denominator tại các vị trí mask (mặc định denominator != 0), còn lại 0.0"""
+    if mask is None:
+        mask = denominator != 0
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    return np.divide(numerator, denominator, out=out, where=mask)
+
+
+def mround(values, step=50):
+    """Excel MROUND cho mảng: làm tròn tới bội số gần nhất của step"""
+    values = np.asarray(values, dtype=np.float64)
+    step = float(step or 0)
+    if step <= 0:
+        return values
+    return np.rint(values / step) * step
+
+
+def add_months(dates, months):
+    """
+    Cộng tháng theo relativedelta(months=n): ngày vượt quá cuối tháng được kẹp về ngày cuối tháng.
+    NaT giữ nguyên NaT.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    months = np.asarray(months, dtype=np.int64)
+    month_start = dates.astype('datetime64[M]')
+    day_offset = (dates - month_start.astype('datetime64[D]')).astype(np.int64)
+    target = month_start + months.astype('timedelta64[M]')
+    target_start = target.astype('datetime64[D]')
+    month_len = ((target + np.timedelta64(1, 'M')).astype('datetime64[D]') - target_start).astype(np.int64)
+    result = target_start + np.minimum(day_offset, month_len - 1).astype('timedelta64[D]')
+    result[np.isnat(dates)] = np.datetime64('NaT')
+    return result
+
+
+def next_business_day(dates, holidays=None):
+    """Ngày rơi vào cuối tuần/ngày lễ chuyển sang ngày làm việc kế tiếp (NaT giữ nguyên)"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    holidays = np.asarray(sorted(holidays or ()), dtype='datetime64[D]')
+    result = dates.copy()
+    valid = ~np.isnat(dates)
+    result[valid] = np.busday_offset(dates[valid], 0, roll='forward', weekmask=WEEKMASK, holidays=holidays)
+    return result
+
+
+def workday(dates, days, holidays=None):
+    """
+    Excel WORKDAY cho mảng ngày: ngày làm việc thứ `days` trước/sau ngày bắt đầu
+    (bỏ qua cuối tuần và ngày lễ). NaT giữ nguyên.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    days = np.broadcast_to(np.asarray(days, dtype=np.int64), dates.shape)
+    holidays = np.asarray(sorted(holidays or ()), dtype='datetime64[D]')
+    result = dates.copy()
+    valid = ~np.isnat(dates)
+    # Ngày bắt đầu không phải ngày làm việc: lùi về phía ngược chiều để không đếm chính nó
+    forward = valid & (days < 0)
+    backward = valid & (days > 0)
+    if forward.any():
+        result[forward] = np.busday_offset(
+            dates[forward], days[forward], roll='forward', weekmask=WEEKMASK, holidays=holidays)
+    if backward.any():
+        result[backward] = np.busday_offset(
+            dates[backward], days[backward], roll='backward', weekmask=WEEKMASK, holidays=holidays)
+    return result
+
+
+def effective_days(term_months, days=None):
+    """Số ngày hiệu lực: ưu tiên days > 0, sau đó kỳ hạn x30 (tối thiểu 1), mặc định 1"""
+    term_months = np.asarray(term_months, dtype=np.int64)
+    result = np.where(term_months > 0, np.maximum(1, term_months * 30), 1)
+    if days is not None:
+        days = np.asarray(days, dtype=np.int64)
+        result = np.where(days > 0, days, result)
+    return result
+
+
+def full_metrics(purchase_dates, term_months, units, price, fee_rate, interest_rate,
+                 sell_fee=None, tax=None, holidays=None, round_step=50):
+    """
+    Tính toàn bộ chỉ số NAV (cột C..Z) cho nhiều giao dịch cùng lúc.
+
+    Args:
+        purchase_dates: mảng datetime64[D]
+        term_months: mảng int (kỳ hạn tháng)
+        units, price, fee_rate (%), interest_rate (%), sell_fee, tax: mảng float
+
+    Returns:
+        dict: tên chỉ số -> mảng
+    """
+    purchase_dates = np.asarray(purchase_dates, dtype='datetime64[D]')
+    term_months = np.asarray(term_months, dtype=np.int64)
+    units = np.asarray(units, dtype=np.float64)
+    price = np.asarray(price, dtype=np.float64)
+    fee_rate = np.asarray(fee_rate, dtype=np.float64)
+    interest_rate = np.asarray(interest_rate, dtype=np.float64)
+    sell_fee = np.zeros_like(units) if sell_fee is None else np.asarray(sell_fee, dtype=np.float64)
+    tax = np.zeros_like(units) if tax is None else np.asarray(tax, dtype=np.float64)
+
+    # E: Ngày đáo hạn, D: Ngày bán
+    has_maturity = ~np.isnat(purchase_dates) & (term_months != 0)
+    maturity = np.full(purchase_dates.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+    maturity[has_maturity] = next_business_day(
+        add_months(purchase_dates[has_maturity], term_months[has_maturity]), holidays=holidays)
+    sell_date = workday(maturity, -2, holidays=holidays)
+
+    # G: Số ngày
+    days = effective_days(term_months)
+    days = np.where(has_maturity, (maturity - purchase_dates).astype('timedelta64[D]').astype(np.int64), days)
+
+    # L, M: Giá trị mua và giá 1 CCQ đã bao gồm phí
+    gross = units * price
+    purchase_value = gross + gross * (fee_rate / 100.0)
+    price_with_fee = safe_divide(purchase_value, units, units > 0)
+
+    # U, S, T, V, W
+    sell_value1 = np.where(days > 0, purchase_value * (interest_rate / 100.0) / 365.0 * days + purchase_value, purchase_value)
+    sell_price1 = np.rint(safe_divide(sell_value1, units, units > 0))
+    sell_price2 = mround(sell_price1, round_step)
+    sell_value2 = units * sell_price2
+    difference = sell_value2 - sell_value1
+
+    # O, Q, H
+    converted_rate = safe_divide(sell_price2, price, (price > 0) & (days > 0))
+    converted_rate = np.where((price > 0) & (days > 0), (converted_rate - 1.0) * 365.0 / np.where(days > 0, days, 1) * 100.0, 0.0)
+    interest_delta = converted_rate - interest_rate
+    days_converted = np.where(interest_rate > 0, safe_divide(converted_rate * days, interest_rate, interest_rate > 0), days)
+
+    return {
+        'maturity_date': maturity,
+        'sell_date': sell_date,
+        'days': days,
+        'days_converted': days_converted,
+        'purchase_value': purchase_value,
+        'price_with_fee': price_with_fee,
+        'converted_rate': converted_rate,
+        'interest_delta': interest_delta,
+        'tax_tncn': interest_delta,
+        'sell_price1': sell_price1,
+        'sell_price2': sell_price2,
+        'sell_value1': sell_value1,
+        'sell_value2': sell_value2,
+        'difference': difference,
+        'customer_receive': sell_value1 - sell_fee - tax,
+    }
+
+
+def legacy_metrics(order_value, nav_value, units, interest_rate, days, round_step=50):
+    """
+    Chỉ số NAV theo công thức rút gọn (giá trị lệnh, NAV tham chiếu) cho nhiều giao dịch.
+
+    Returns:
+        dict: sell_value, price1, price2, interest_rate_new, interest_delta, days_effective
+    """
+    order_value = np.asarray(order_value, dtype=np.float64)
+    nav_value = np.asarray(nav_value, dtype=np.float64)
+    units = np.asarray(units, dtype=np.float64)
+    interest_rate = np.asarray(interest_rate, dtype=np.float64)
+    days = np.asarray(days, dtype=np.int64)
+
+    # Thiếu giá trị lệnh: ước lượng theo units * NAV
+    order_value = np.where((order_value <= 0) & (nav_value > 0) & (units > 0), units * nav_value, order_value)
+
+    sell_value = order_value * (interest_rate / 100.0) / 365.0 * days + order_value
+    price1 = np.rint(safe_divide(sell_value, units, units > 0))
+    price2 = mround(price1, round_step)
+    valid = (nav_value > 0) & (days > 0)
+    rate_new = np.where(valid, (safe_divide(price2, nav_value, valid) - 1.0) * 365.0 / np.where(days > 0, days, 1) * 100.0, 0.0)
+
+    return {
+        'sell_value': sell_value,
+        'price1': price1,
+        'price2': price2,
+        'interest_rate_new': rate_new,
+        'interest_delta': rate_new - interest_rate,
+        'days_effective': days,
+    }
+
+
+def dates_to_iso(values):
+    """Mảng datetime64[D] -> list 'YYYY-MM-DD' (NaT -> '')"""
+    values = np.asarray(values, dtype='datetime64[D]')
+    return [d.isoformat() if d is not None else '' for d in values.astype(object).tolist()]
@@ -89,25 +89,14 @@ class ReportContractSummaryController(http.Controller):
             
             # Format data for frontend - tính toán bằng nav_management nếu có
             data = []
+            # Chỉ số NAV cho cả trang tính một lượt (batch) thay vì từng dòng
+            nav_metrics = records._nav_legacy_metrics()
             for i, record in enumerate(records, 1):
                 thanh_tien = float(getattr(record, 'amount', 0) or 0)
                 ky_han = getattr(record, 'term_months', 0) or 0
                 lai_suat = float(getattr(record, 'interest_rate', 0) or 0)
 
-                tx_dict = {
-                    'amount': thanh_tien,
-                    'trade_price': thanh_tien,
-                    'nav_value': float(getattr(record, 'current_nav', 0) or 0),
-                    'interest_rate': lai_suat,
-                    'units': float(getattr(record, 'units', 0) or 0),
-                    'remaining_units': float(getattr(record, 'remaining_units', 0) or 0),
-                    'term_months': ky_han,
-                }
-                try:
-                    calculator = request.env['nav.transaction.calculator']
-                    metrics = calculator.compute_transaction_metrics(tx_dict) or {}
-                except Exception:
-                    metrics = {}
+                metrics = nav_metrics.get(record.id) or {}
 
                 sell_value = float(metrics.get('sell_value') or 0.0)
                 days_effective = int(metrics.get('days_effective') or 0)
@@ -416,26 +405,15 @@ class ReportContractSummaryController(http.Controller):
                     return int(val or 0)
 
             # Write data rows
+            # Chỉ số NAV cho cả trang tính một lượt (batch) thay vì từng dòng
+            nav_metrics = records._nav_legacy_metrics()
             for index, record in enumerate(records):
                 # Tính toán lại với nav_management
                 thanh_tien = float(getattr(record, 'amount', 0) or 0)
                 ky_han = getattr(record, 'term_months', 0) or 0
                 lai_suat = float(getattr(record, 'interest_rate', 0) or 0)
 
-                tx_dict = {
-                    'amount': thanh_tien,
-                    'trade_price': thanh_tien,
-                    'nav_value': float(getattr(record, 'current_nav', 0) or 0),
-                    'interest_rate': lai_suat,
-                    'units': float(getattr(record, 'units', 0) or 0),
-                    'remaining_units': float(getattr(record, 'remaining_units', 0) or 0),
-                    'term_months': ky_han,
-                }
-                try:
-                    calculator = request.env['nav.transaction.calculator']
-                    metrics = calculator.compute_transaction_metrics(tx_dict) or {}
-                except Exception:
-                    metrics = {}
+                metrics = nav_metrics.get(record.id) or {}
 
                 sell_value = float(metrics.get('sell_value') or 0.0)
                 days_effective = int(metrics.get('days_effective') or 0)
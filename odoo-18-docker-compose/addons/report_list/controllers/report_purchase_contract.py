@@ -92,26 +92,14 @@ class ReportPurchaseContractController(http.Controller):
             
             # Format data for frontend - tính toán với nav_management nếu có
             data = []
+            # Chỉ số NAV cho cả trang tính một lượt (batch) thay vì từng dòng
+            nav_metrics = records._nav_legacy_metrics()
             for i, record in enumerate(records, 1):
                 so_tien = float(getattr(record, 'amount', 0) or 0)
                 ky_han = getattr(record, 'term_months', 0) or 0
                 lai_suat = float(getattr(record, 'interest_rate', 0) or 0)
 
-                # Chuẩn bị input cho calculator
-                tx_dict = {
-                    'amount': so_tien,
-                    'trade_price': so_tien,
-                    'nav_value': float(getattr(record, 'current_nav', 0) or 0),
-                    'interest_rate': lai_suat,
-                    'units': float(getattr(record, 'units', 0) or 0),
-                    'remaining_units': float(getattr(record, 'remaining_units', 0) or 0),
-                    'term_months': ky_han,
-                }
-                try:
-                    calculator = request.env['nav.transaction.calculator']
-                    metrics = calculator.compute_transaction_metrics(tx_dict) or {}
-                except Exception:
-                    metrics = {}
+                metrics = nav_metrics.get(record.id) or {}
 
                 sell_value = float(metrics.get('sell_value') or 0.0)
                 if sell_value <= 0:
@@ -100,6 +100,8 @@ class ReportSellContractController(http.Controller):
 
             # Format data for frontend - bổ sung tính toán từ nav_management
             data = []
+            # Chỉ số NAV cho cả trang tính một lượt (batch) thay vì từng dòng
+            nav_metrics = records._nav_legacy_metrics()
             for i, record in enumerate(records, 1):
                 # Chuẩn bị input cho calculator của nav_management
                 tx_dict = {
@@ -111,11 +113,7 @@ class ReportSellContractController(http.Controller):
                     'remaining_units': float(getattr(record, 'remaining_units', 0) or 0),
                     'term_months': getattr(record, 'term_months', None),
                 }
-                try:
-                    calculator = request.env['nav.transaction.calculator']
-                    metrics = calculator.compute_transaction_metrics(tx_dict) or {}
-                except Exception:
-                    metrics = {}
+                metrics = nav_metrics.get(record.id) or {}
 
                 sell_value = float(metrics.get('sell_value') or 0.0)  # Gốc + lãi
                 order_value = float(tx_dict.get('trade_price') or tx_dict.get('amount') or 0.0)
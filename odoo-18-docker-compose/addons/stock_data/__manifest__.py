@@ -1,6 +1,6 @@
 {
     'name': 'Stock Data',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.2.0',
     'category': 'Financial',
     'summary': 'Stock Data integration via SSI FastConnect API',
     'description': """
@@ -26,10 +26,11 @@
         'views/daily_ohlc_views.xml',
         'views/index_views.xml',
         'views/daily_index_views.xml',
+        'views/job_run_views.xml',
         'views/menu_views.xml',
     ],
     'external_dependencies': {
-        'python': ['ssi_fc_data'],
+        'python': ['ssi_fc_data', 'numpy'],
     },
     'installable': True,
     'application': True,
@@ -0,0 +1,23 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Chuẩn bị unique(security_id, date, time, resolution) cho ssi_intraday_ohlc (dùng bởi bulk_upsert):
+    resolution rỗng -> 1, xoá nến trùng và giữ bản ghi mới nhất.
+    """
+    if not version:
+        return
+    cr.execute("UPDATE ssi_intraday_ohlc SET resolution = 1 WHERE resolution IS NULL OR resolution = 0")
+    cr.execute("""
+        DELETE FROM ssi_intraday_ohlc o
+        USING ssi_intraday_ohlc newer
+        WHERE o.security_id = newer.security_id
+          AND o.date = newer.date
+          AND o.time = newer.time
+          AND o.resolution = newer.resolution
+          AND o.id < newer.id
+    """)
+    _logger.info("Đã xoá %s nến intraday trùng trước khi thêm unique constraint", cr.rowcount)
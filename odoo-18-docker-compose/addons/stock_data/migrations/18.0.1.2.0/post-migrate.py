@@ -0,0 +1,15 @@
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Dựng nến tổng hợp (ssi.ohlc.rollup) từ toàn bộ Intraday OHLC hiện có"""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['ssi.ohlc.rollup']._refresh_intraday()
+    cr.execute("SELECT count(*) FROM ssi_ohlc_rollup")
+    _logger.info("Đã dựng %s nến tổng hợp cho biểu đồ", cr.fetchone()[0])
@@ -1,9 +1,14 @@
 from . import ssi_api_config
+from . import bulk_upsert
 from . import securities
 from . import daily_ohlc
 from . import intraday_ohlc
+from . import ohlc_rollup
 from . import index_list
 from . import index_components
 from . import daily_index
+from . import market_stream
+from . import job_run
+from . import backtest_engine
 
 
@@ -0,0 +1,146 @@
+from odoo import api, models, _
+from odoo.exceptions import UserError
+import logging
+
+import numpy as np
+
+from ..utils.indicators import (
+    DEFAULT_FEE_RATE, ResultCache, bollinger, ema, macd, params_key, rsi, run_many, sma,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Kết quả backtest dùng chung trong process; khoá gồm phiên bản dữ liệu nên không cần xoá khi OHLC đổi
+_RESULT_CACHE = ResultCache()
+
+
+class BacktestEngine(models.AbstractModel):
+    """Chỉ báo và backtest cục bộ trên ssi.daily.ohlc (không gọi API SSI)"""
+    _name = 'ssi.backtest.engine'
+    _description = 'Local Backtest Engine'
+
+    @api.model
+    def _data_versions(self, security_ids):
+        """security_id -> phiên bản dữ liệu daily OHLC (số nến + thời điểm ghi gần nhất)"""
+        self.env['ssi.daily.ohlc'].flush_model(['security_id', 'close_price'])
+        self.env.cr.execute("""
+            SELECT security_id, count(*), max(write_date)
+            FROM ssi_daily_ohlc
+            WHERE security_id = ANY(%s)
+            GROUP BY security_id
+        """, (list(security_ids),))
+        return {sid: f'{count}:{write_date}' for sid, count, write_date in self.env.cr.fetchall()}
+
+    @api.model
+    def load_close_series(self, security_ids, date_from=None, date_to=None):
+        """
+        Giá đóng cửa theo ngày tăng dần của nhiều mã trong một truy vấn.
+
+        Returns:
+            dict security_id -> (mảng datetime64[D], mảng float64)
+        """
+        self.env['ssi.daily.ohlc'].flush_model(['security_id', 'date', 'close_price'])
+        where = ["security_id = ANY(%(ids)s)", "close_price > 0"]
+        params = {'ids': list(security_ids)}
+        if date_from:
+            where.append("date >= %(date_from)s")
+            params['date_from'] = date_from
+        if date_to:
+            where.append("date <= %(date_to)s")
+            params['date_to'] = date_to
+        self.env.cr.execute(f"""
+            SELECT security_id, date, close_price
+            FROM ssi_daily_ohlc
+            WHERE {' AND '.join(where)}
+            ORDER BY security_id, date
+        """, params)
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return {}
+        ids, dates, closes = zip(*rows)
+        ids = np.array(ids)
+        dates = np.array(dates, dtype='datetime64[D]')
+        closes = np.array(closes, dtype=np.float64)
+        # Dữ liệu đã sắp theo security_id -> cắt thành từng đoạn liên tiếp
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        ends = np.r_[starts[1:], len(ids)]
+        return {int(ids[s]): (dates[s:e], closes[s:e]) for s, e in zip(starts, ends)}
+
+    @api.model
+    def compute_indicators(self, security_id, date_from=None, date_to=None, sma_period=20, ema_period=20,
+                           rsi_period=14, bollinger_period=20, bollinger_k=2.0):
+        """Các chỉ báo của một mã ở dạng mảng cột (cùng thứ tự với 't')"""
+        series = self.load_close_series([security_id], date_from, date_to).get(security_id)
+        if not series:
+            return {'t': [], 'close': []}
+        dates, close = series
+        macd_line, macd_signal, macd_hist = macd(close)
+        middle, upper, lower = bollinger(close, bollinger_period, bollinger_k)
+
+        def _col(values):
+            return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+        return {
+            't': [str(d) for d in dates],
+            'close': close.tolist(),
+            'sma': _col(sma(close, sma_period)),
+            'ema': _col(ema(close, ema_period)),
+            'rsi': _col(rsi(close, rsi_period)),
+            'macd': _col(macd_line),
+            'macd_signal': _col(macd_signal),
+            'macd_hist': _col(macd_hist),
+            'bb_middle': _col(middle),
+            'bb_upper': _col(upper),
+            'bb_lower': _col(lower),
+        }
+
+    def _get_max_workers(self):
+        try:
+            return int(self.env['ir.config_parameter'].sudo().get_param('ssi.backtest.max_workers') or 0) or None
+        except ValueError:
+            return None
+
+    @api.model
+    def run_backtest(self, securities, strategy, params=None, date_from=None, date_to=None,
+                     fee_rate=DEFAULT_FEE_RATE):
+        """
+        Backtest một chiến lược cho nhiều mã; mã đã có kết quả với cùng tham số và dữ liệu
+        chưa đổi được lấy từ cache, phần còn lại chạy song song trên tối đa ssi.backtest.max_workers
+        luồng (mặc định MAX_WORKERS của utils/indicators).
+
+        Returns:
+            list dict {security_id, symbol, total_return, ...} sắp theo total_return giảm dần
+        """
+        try:
+            key = params_key(strategy, params, date_from=date_from, date_to=date_to, fee_rate=fee_rate)
+        except ValueError as e:
+            raise UserError(_('Tham số backtest không hợp lệ: %s') % e)
+
+        dbname = self.env.cr.dbname
+        versions = self._data_versions(securities.ids)
+        results, missing = {}, []
+        for security in securities:
+            version = versions.get(security.id)
+            if version is None:
+                continue
+            cached = _RESULT_CACHE.get((dbname, security.id, key, version))
+            if cached is not None:
+                results[security.id] = cached
+            else:
+                missing.append(security.id)
+
+        cached_count = len(results)
+        if missing:
+            series = self.load_close_series(missing, date_from, date_to)
+            computed = run_many({sid: close for sid, (_dates, close) in series.items()}, strategy, params,
+                                fee_rate=fee_rate, max_workers=self._get_max_workers())
+            for sid, result in computed.items():
+                _RESULT_CACHE.set((dbname, sid, key, versions[sid]), result)
+                results[sid] = result
+        _logger.info("Backtest %s: %d securities (%d cached, %d computed)",
+                     strategy, len(results), cached_count, len(results) - cached_count)
+
+        symbols = {s.id: s.symbol for s in securities}
+        rows = [dict(result, security_id=sid, symbol=symbols[sid]) for sid, result in results.items()]
+        rows.sort(key=lambda r: r['total_return'], reverse=True)
+        return rows
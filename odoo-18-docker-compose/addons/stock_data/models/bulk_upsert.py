@@ -0,0 +1,113 @@
+from odoo import api, models
+from psycopg2.extras import execute_values
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class BulkUpsertMixin(models.AbstractModel):
+    """
+    Ghi hàng loạt chuỗi thời gian bằng INSERT ... ON CONFLICT DO UPDATE theo unique constraint
+    (thay cho search(limit=1) + create/write từng bản ghi).
+    Model kế thừa khai báo _upsert_conflict_fields trùng với unique constraint của bảng.
+    """
+    _name = 'ssi.bulk.upsert.mixin'
+    _description = 'Bulk Upsert Mixin'
+
+    _upsert_conflict_fields = ()
+    _upsert_page_size = 2000
+
+    @api.model
+    def bulk_upsert(self, vals_list, page_size=None):
+        """
+        Args:
+            vals_list: list dict giá trị (phải có đủ các trường khoá _upsert_conflict_fields)
+            page_size: số dòng mỗi câu lệnh INSERT
+
+        Returns:
+            dict: {'created': n, 'updated': n, 'ids': [...]}
+        """
+        keys = tuple(self._upsert_conflict_fields)
+        result = {'created': 0, 'updated': 0, 'ids': []}
+        if not keys or not vals_list:
+            return result
+
+        # Trùng khoá trong cùng một lô -> gộp theo thứ tự, giá trị sau đè giá trị trước
+        # (ON CONFLICT không cho cập nhật một dòng 2 lần trong cùng câu lệnh)
+        rows = {}
+        for vals in vals_list:
+            if any(vals.get(k) in (None, False, '') for k in keys):
+                continue
+            key = tuple(vals[k] for k in keys)
+            rows[key] = {**rows[key], **vals} if key in rows else vals
+        if not rows:
+            return result
+
+        # Mỗi nhóm dòng có cùng tập cột là một câu lệnh: cột mà dòng không truyền thì
+        # dòng mới lấy default, dòng đã có giữ nguyên giá trị
+        groups = {}
+        for vals in rows.values():
+            columns = tuple(sorted(
+                name for name in vals
+                if name in self._fields and self._fields[name].store and name not in models.MAGIC_COLUMNS
+            ))
+            groups.setdefault(columns, []).append(vals)
+
+        self.flush_model()
+        created_ids = []
+        page_size = page_size or self._upsert_page_size
+        for columns, values in groups.items():
+            ids, inserted_ids = self._bulk_upsert_group(keys, list(columns), values, page_size)
+            result['ids'].extend(ids)
+            created_ids.extend(inserted_ids)
+
+        result['created'] = len(created_ids)
+        result['updated'] = len(result['ids']) - len(created_ids)
+        self.invalidate_model()
+
+        # Trường tính toán lưu trữ (related symbol/currency...) cho bản ghi mới
+        if created_ids:
+            created = self.browse(created_ids)
+            for field in self._fields.values():
+                if field.store and field.compute:
+                    self.env.add_to_compute(field, created)
+            created.flush_recordset()
+        return result
+
+    def _bulk_upsert_group(self, keys, columns, values, page_size):
+        """INSERT ... ON CONFLICT cho các dòng cùng tập cột `columns` -> (ids, ids vừa tạo)"""
+        missing = [name for name, field in self._fields.items()
+                   if field.store and name not in columns and not field.compute and name not in models.MAGIC_COLUMNS]
+        defaults = self.default_get(missing) if missing else {}
+        insert_columns = columns + sorted(defaults)
+        update_columns = [c for c in columns if c not in keys]
+
+        uid = self.env.uid
+        quoted = ', '.join(f'"{c}"' for c in insert_columns)
+        updates = ', '.join([f'"{c}" = EXCLUDED."{c}"' for c in update_columns]
+                            + ['write_uid = EXCLUDED.write_uid', 'write_date = EXCLUDED.write_date'])
+        query = f"""
+            INSERT INTO "{self._table}" ({quoted}, create_uid, create_date, write_uid, write_date)
+            VALUES %s
+            ON CONFLICT ({', '.join(f'"{k}"' for k in keys)}) DO UPDATE SET {updates}
+            RETURNING id, (xmax = 0) AS inserted
+        """
+        template = '(' + ', '.join(['%s'] * len(insert_columns)) + ", %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')"
+
+        def _column_value(name, vals):
+            value = vals[name] if name in vals else defaults.get(name)
+            return self._fields[name].convert_to_column(value, self, validate=False)
+
+        ids, created_ids = [], []
+        for start in range(0, len(values), page_size):
+            page = [
+                tuple(_column_value(name, vals) for name in insert_columns) + (uid, uid)
+                for vals in values[start:start + page_size]
+            ]
+            returned = execute_values(self.env.cr, query, page, template=template, page_size=len(page), fetch=True)
+            for record_id, inserted in returned:
+                ids.append(record_id)
+                if inserted:
+                    created_ids.append(record_id)
+            _logger.debug("Bulk upsert %s: %d rows", self._name, len(page))
+        return ids, created_ids
@@ -4,6 +4,7 @@ from odoo import models, fields, api
 class DailyIndex(models.Model):
     """Daily Index Data from SSI API"""
     _name = 'ssi.daily.index'
+    _inherit = ['ssi.bulk.upsert.mixin']
     _description = 'Daily Index Data'
     _order = 'date desc, index_code'
 
@@ -50,6 +51,7 @@ class DailyIndex(models.Model):
         ('unique_index_date', 'unique(index_code, date)', 
          'Index code and date must be unique!'),
     ]
+    _upsert_conflict_fields = ('index_code', 'date')
 
     @api.model
     def get_index_codes(self):
@@ -1,15 +1,23 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import logging
-from ssi_fc_data import model, fc_md_client
+from ssi_fc_data import model
 from datetime import datetime
+from ..utils.fund_sync import sync_fund_on_write
 
 _logger = logging.getLogger(__name__)
 
+# Các cột của ssi.securities được _propagate_to_security ghi trực tiếp bằng SQL
+_PROPAGATED_FIELDS = [
+    'last_trading_date', 'current_price', 'high_price', 'low_price', 'last_price',
+    'volume', 'reference_price', 'last_update', 'write_date',
+]
+
 
 class DailyOHLC(models.Model):
     """Daily OHLC (Open, High, Low, Close) Data"""
     _name = 'ssi.daily.ohlc'
+    _inherit = ['ssi.bulk.upsert.mixin']
     _description = 'Daily OHLC Data'
     _order = 'date desc'
     _rec_name = 'date'
@@ -41,78 +49,251 @@ class DailyOHLC(models.Model):
     change_percent = fields.Float('Change (%)')
     previous_close = fields.Float('Previous Close')
     last_update = fields.Datetime('Last Update', default=fields.Datetime.now)
+    # Đánh dấu chờ cron lấy Intraday OHLC (không gọi API trong transaction ghi Daily OHLC)
+    intraday_fetch_pending = fields.Boolean('Intraday Fetch Pending', default=False, index=True, copy=False)
+    # Thời điểm cron nhận dòng để lấy intraday (dòng đang được xử lý bởi một lượt chạy)
+    intraday_claimed_at = fields.Datetime('Intraday Claimed At', readonly=True, copy=False)
 
     _sql_constraints = [
         ('date_symbol_unique', 'unique(date, security_id)', 'Date and Security combination must be unique!')
     ]
+    _upsert_conflict_fields = ('date', 'security_id')
+    # Lượt nhận intraday quá thời gian này (worker dừng giữa chừng) được nhận lại
+    _INTRADAY_CLAIM_TIMEOUT = 900
+
+    @api.model
+    def bulk_upsert(self, vals_list, page_size=None):
+        """Upsert hàng loạt theo (date, security_id), cập nhật giá của security một lần cho cả lô"""
+        result = super().bulk_upsert(vals_list, page_size=page_size)
+        if result['ids']:
+            self.browse(result['ids'])._after_ingest()
+        return result
+
+    def _after_ingest(self):
+        """Hook chạy một lần sau mỗi lô ghi Daily OHLC: cập nhật giá security và xếp hàng lấy intraday"""
+        if not self:
+            return
+        self._propagate_to_security()
+        self._queue_intraday_fetch()
 
     def _propagate_to_security(self):
         """Update parent security summary fields using the latest daily OHLC record.
         Always propagate from the newest date for each security to ensure consistency.
+        Một câu SQL (DISTINCT ON) cho toàn bộ security của lô thay vì search từng security.
         """
-        # Group by security_id to process each security once
-        security_ids = set(self.mapped('security_id').ids)
-        daily_ohlc_model = self.env['ssi.daily.ohlc']
-        
-        for sec_id in security_ids:
-            if not sec_id:
-                continue
-            # Always get the newest Daily OHLC for this security from entire table
-            newest_ohlc = daily_ohlc_model.search([
-                ('security_id', '=', sec_id)
-            ], order='date desc', limit=1)
-            
-            if not newest_ohlc:
-                continue
-                
-            sec = newest_ohlc.security_id
-            vals = {
-                'last_trading_date': newest_ohlc.date,
-                'current_price': newest_ohlc.close_price if newest_ohlc.close_price else sec.current_price,
-                'high_price': newest_ohlc.high_price if newest_ohlc.high_price else sec.high_price,
-                'low_price': newest_ohlc.low_price if newest_ohlc.low_price else sec.low_price,
-                'last_price': newest_ohlc.close_price if newest_ohlc.close_price else sec.last_price,
-                'volume': newest_ohlc.volume if newest_ohlc.volume else sec.volume,
-                # total_value, change, change_percent are computed fields - don't set directly
-                'last_update': fields.Datetime.now(),
-            }
-            # Nếu có previous_close từ OHLC mới nhất, dùng làm reference_price (tham chiếu)
-            # để tính Change/Change% chuẩn theo thị trường (Close - Previous Close)
-            if newest_ohlc.previous_close and newest_ohlc.previous_close > 0:
-                vals['reference_price'] = newest_ohlc.previous_close
-            try:
-                sec.sudo().write(vals)
-            except Exception:
-                # Ignore write errors to avoid blocking OHLC ingestion
-                pass
-
-    def _auto_fetch_intraday_ohlc(self):
-        """Tự động lấy Intraday OHLC cho record này (chỉ cho ngày hôm nay)"""
+        security_ids = [sec_id for sec_id in set(self.mapped('security_id').ids) if sec_id]
+        if not security_ids:
+            return
+        Securities = self.env['ssi.securities'].sudo()
+        self.flush_model()
+        Securities.flush_model()
         try:
-            # Chỉ tự động fetch cho ngày hôm nay để tránh quá tải
-            if self.date != fields.Date.today():
-                return
-            
-            if not self.security_id:
-                return
-            
-            # Kiểm tra xem đã có Intraday OHLC chưa
-            intraday_count = self.env['ssi.intraday.ohlc'].search_count([
-                ('security_id', '=', self.security_id.id),
-                ('date', '=', self.date)
-            ])
-            
-            # Nếu đã có dữ liệu Intraday, không fetch lại
-            if intraday_count > 0:
+            # Savepoint: lỗi SQL ở đây không làm hỏng transaction đang ghi OHLC
+            with self.env.cr.savepoint():
+                # Nếu có previous_close từ OHLC mới nhất, dùng làm reference_price (tham chiếu)
+                # để tính Change/Change% chuẩn theo thị trường (Close - Previous Close)
+                self.env.cr.execute("""
+                    WITH newest AS (
+                        SELECT DISTINCT ON (security_id)
+                               security_id, date, close_price, high_price, low_price, volume, previous_close
+                        FROM ssi_daily_ohlc
+                        WHERE security_id = ANY(%s)
+                        ORDER BY security_id, date DESC, id DESC
+                    )
+                    UPDATE ssi_securities s SET
+                        last_trading_date = n.date,
+                        current_price = COALESCE(NULLIF(n.close_price, 0), s.current_price),
+                        high_price = COALESCE(NULLIF(n.high_price, 0), s.high_price),
+                        low_price = COALESCE(NULLIF(n.low_price, 0), s.low_price),
+                        last_price = COALESCE(NULLIF(n.close_price, 0), s.last_price),
+                        volume = COALESCE(NULLIF(n.volume, 0), s.volume),
+                        reference_price = CASE WHEN n.previous_close > 0 THEN n.previous_close ELSE s.reference_price END,
+                        last_update = now() at time zone 'UTC',
+                        write_date = now() at time zone 'UTC'
+                    FROM newest n
+                    WHERE s.id = n.security_id
+                    RETURNING s.id
+                """, (security_ids,))
+                updated_ids = [row[0] for row in self.env.cr.fetchall()]
+        except Exception:
+            # Ignore write errors to avoid blocking OHLC ingestion
+            _logger.debug("Skip propagating daily OHLC to securities", exc_info=True)
+            return
+        if not updated_ids:
+            return
+        # total_value, change, change_percent là trường tính toán lưu trữ -> tính lại cho các security đã cập nhật
+        Securities.invalidate_model(_PROPAGATED_FIELDS)
+        securities = Securities.browse(updated_ids)
+        securities.modified(_PROPAGATED_FIELDS)
+        securities.flush_recordset()
+        sync_fund_on_write(securities, set(_PROPAGATED_FIELDS))
+
+    @api.model
+    def _today_intraday_missing(self, security_ids, date):
+        """Tập security chưa có Intraday OHLC cho ngày `date` (một truy vấn cho cả lô)"""
+        self.env['ssi.intraday.ohlc'].flush_model(['security_id', 'date'])
+        self.env.cr.execute("""
+            SELECT DISTINCT security_id FROM ssi_intraday_ohlc
+            WHERE date = %s AND security_id = ANY(%s)
+        """, (date, list(security_ids)))
+        return set(security_ids) - {row[0] for row in self.env.cr.fetchall()}
+
+    def _queue_intraday_fetch(self):
+        """Đánh dấu Daily OHLC hôm nay chưa có intraday và kích hoạt cron lấy dữ liệu ở nền"""
+        today = fields.Date.today()
+        todays = self.filtered(lambda r: r.date == today and r.security_id and not r.intraday_fetch_pending)
+        if not todays:
+            return
+        missing = self._today_intraday_missing(todays.security_id.ids, today)
+        pending = todays.filtered(lambda r: r.security_id.id in missing)
+        if not pending:
+            return
+        # Ghi cờ bằng SQL để không chạy lại hook write
+        self.env.cr.execute(
+            "UPDATE ssi_daily_ohlc SET intraday_fetch_pending = TRUE WHERE id = ANY(%s)", (pending.ids,))
+        pending.invalidate_recordset(['intraday_fetch_pending'])
+        cron = self.env.ref('stock_data.ir_cron_fetch_pending_intraday', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _claim_pending_intraday(self, limit):
+        """
+        Nhận tối đa `limit` Daily OHLC đang chờ intraday và commit ngay: SKIP LOCKED chỉ giữ khoá dòng
+        trong transaction ngắn này, các lượt chạy song song (cron + _trigger, nhiều worker) bỏ qua
+        dòng đã được nhận nhờ intraday_claimed_at. Lượt nhận bị dừng giữa chừng hết hạn sau
+        _INTRADAY_CLAIM_TIMEOUT giây.
+        """
+        self.flush_model(['intraday_fetch_pending', 'intraday_claimed_at'])
+        self.env.cr.execute("""
+            UPDATE ssi_daily_ohlc SET intraday_claimed_at = now() at time zone 'UTC'
+            WHERE id IN (
+                SELECT id FROM ssi_daily_ohlc
+                WHERE intraday_fetch_pending
+                  AND (intraday_claimed_at IS NULL
+                       OR intraday_claimed_at < now() at time zone 'UTC' - make_interval(secs => %s))
+                ORDER BY date DESC, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id
+        """, (self._INTRADAY_CLAIM_TIMEOUT, limit))
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        self.env.cr.commit()
+        return self.browse(ids)
+
+    def _release_intraday_claim(self, done):
+        """Bỏ lượt nhận; done=True: đã có intraday nên bỏ luôn cờ chờ"""
+        if not self:
+            return
+        if done:
+            self.env.cr.execute("""
+                UPDATE ssi_daily_ohlc SET intraday_fetch_pending = FALSE, intraday_claimed_at = NULL
+                WHERE id = ANY(%s)
+            """, (self.ids,))
+        else:
+            self.env.cr.execute(
+                "UPDATE ssi_daily_ohlc SET intraday_claimed_at = NULL WHERE id = ANY(%s)", (self.ids,))
+        self.invalidate_recordset(['intraday_fetch_pending', 'intraday_claimed_at'])
+
+    @api.model
+    def cron_fetch_pending_intraday(self, limit=200):
+        """
+        Lấy Intraday OHLC cho các Daily OHLC đang chờ (song song qua fetch executor, ghi bằng bulk upsert).
+        Các dòng được nhận trong một transaction ngắn rồi mới gọi API, nên fetch_all_ohlc / bulk upsert
+        ghi cùng dòng không phải chờ các request HTTP.
+        """
+        pending = self._claim_pending_intraday(limit)
+        if not pending:
+            return
+        claimed = len(pending)
+        # Intraday đã được ghi bởi luồng khác (fetch_all_ohlc, stream) -> bỏ cờ, không gọi API
+        filled = self.browse()
+        for date in set(pending.mapped('date')):
+            same_date = pending.filtered(lambda r: r.date == date)
+            missing = self._today_intraday_missing(same_date.security_id.ids, date)
+            filled |= same_date.filtered(lambda r: r.security_id.id not in missing)
+        if filled:
+            filled._release_intraday_claim(done=True)
+            pending -= filled
+            if not pending:
+                self.env.cr.commit()
                 return
-            
-            # Gọi method fetch intraday OHLC (chỉ fetch data, không trả về notification)
-            self._fetch_intraday_ohlc_silent()
+        try:
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
         except Exception as e:
-            # Log lỗi nhưng không block việc tạo/cập nhật Daily OHLC
-            _logger.debug("Lỗi khi tự động fetch Intraday OHLC cho %s ngày %s: %s", 
-                         self.symbol, self.date, str(e))
-            pass
+            _logger.warning("cron_fetch_pending_intraday: cannot build SSI client: %s", e)
+            pending._release_intraday_claim(done=False)
+            self.env.cr.commit()
+            return
+        executor = self.env['ssi.sdk.config.builder'].get_fetch_executor()
+        page_size = 500
+
+        def _fetch(item):
+            _id, symbol, target_date = item
+            items = []
+            current_page = 1
+            while True:
+                response = executor.request(client.intraday_ohlc, sdk_config, model.intraday_ohlc(
+                    symbol=symbol,
+                    fromDate=target_date.strftime('%d/%m/%Y'),
+                    toDate=target_date.strftime('%d/%m/%Y'),
+                    pageIndex=current_page,
+                    pageSize=page_size,
+                    ascending=True,
+                    resolution=1
+                ))
+                if response.get('status') != 'Success' or not response.get('data'):
+                    break
+                page = response['data'] if isinstance(response['data'], list) else []
+                items.extend(page)
+                if len(page) < page_size:
+                    break
+                current_page += 1
+            return items
+
+        results = executor.map(_fetch, [(r.id, r.symbol, r.date) for r in pending], key=lambda item: item[0])
+        intraday_model = self.env['ssi.intraday.ohlc']
+        done = self.browse()
+        total_records = 0
+        for result in results:
+            rec = self.browse(result.key)
+            if not result.ok:
+                _logger.debug("Lỗi khi tự động fetch Intraday OHLC cho %s ngày %s: %s", rec.symbol, rec.date, result.error)
+                continue
+            vals_list = []
+            for item in result.value:
+                time_str = item.get('Time', '') or item.get('time', '')
+                if not time_str:
+                    continue
+                vals_list.append({
+                    'security_id': rec.security_id.id,
+                    'date': rec.date,
+                    'time': time_str,
+                    'open_price': item.get('Open', 0.0) or item.get('open', 0.0) or 0.0,
+                    'high_price': item.get('High', 0.0) or item.get('high', 0.0) or 0.0,
+                    'low_price': item.get('Low', 0.0) or item.get('low', 0.0) or 0.0,
+                    'close_price': item.get('Close', 0.0) or item.get('close', 0.0) or 0.0,
+                    'volume': item.get('Volume', 0.0) or item.get('volume', 0.0) or 0.0,
+                    'total_value': item.get('TotalValue', 0.0) or item.get('totalValue', 0.0) or 0.0,
+                    'resolution': item.get('Resolution', 1) or item.get('resolution', 1) or 1,
+                })
+            upserted = intraday_model.bulk_upsert(vals_list)
+            total_records += upserted['created'] + upserted['updated']
+            done |= rec
+        done._release_intraday_claim(done=True)
+        # Lỗi: bỏ lượt nhận, giữ cờ chờ để lượt sau thử lại
+        (pending - done)._release_intraday_claim(done=False)
+        self.env.cr.commit()
+        _logger.info("Hoàn thành tự động fetch Intraday OHLC: %d records cho %d/%d Daily OHLC",
+                     total_records, len(done), len(pending))
+        # Còn việc chờ -> chạy tiếp ở lượt sau
+        if claimed == limit:
+            self.env.ref('stock_data.ir_cron_fetch_pending_intraday')._trigger()
+
+    def _auto_fetch_intraday_ohlc(self):
+        """Tự động lấy Intraday OHLC (chỉ cho ngày hôm nay): xếp hàng cho cron chạy nền"""
+        self._queue_intraday_fetch()
 
     def _fetch_intraday_ohlc_silent(self):
         """Lấy Intraday OHLC từ Securities (không trả về notification, dùng cho auto fetch)"""
@@ -120,8 +301,7 @@ class DailyOHLC(models.Model):
             import ssi_fc_data
             from datetime import timedelta
             
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
             if not self.security_id:
                 return
@@ -159,20 +339,13 @@ class DailyOHLC(models.Model):
                     if not intraday_items:
                         break
                     
-                    # Lưu hoặc cập nhật Intraday OHLC records
+                    # Lưu hoặc cập nhật Intraday OHLC records (upsert cả trang)
+                    vals_list = []
                     for item in intraday_items:
                         time_str = item.get('Time', '') or item.get('time', '')
                         if not time_str:
                             continue
-                        
-                        # Kiểm tra xem đã có record chưa
-                        existing = intraday_model.search([
-                            ('security_id', '=', security.id),
-                            ('date', '=', target_date),
-                            ('time', '=', time_str)
-                        ], limit=1)
-                        
-                        values = {
+                        vals_list.append({
                             'security_id': security.id,
                             'date': target_date,
                             'time': time_str,
@@ -183,14 +356,9 @@ class DailyOHLC(models.Model):
                             'volume': item.get('Volume', 0.0) or item.get('volume', 0.0) or 0.0,
                             'total_value': item.get('TotalValue', 0.0) or item.get('totalValue', 0.0) or 0.0,
                             'resolution': item.get('Resolution', 1) or item.get('resolution', 1) or 1,
-                        }
-                        
-                        if existing:
-                            existing.write(values)
-                        else:
-                            intraday_model.create(values)
-                        
-                        total_records += 1
+                        })
+                    upserted = intraday_model.bulk_upsert(vals_list)
+                    total_records += upserted['created'] + upserted['updated']
                     
                     # Nếu số records trả về ít hơn page_size, có thể đã hết dữ liệu
                     if len(intraday_items) < page_size:
@@ -216,30 +384,16 @@ class DailyOHLC(models.Model):
         except Exception as e:
             _logger.exception("Lỗi khi fetch Intraday OHLC: %s", str(e))
 
-    @api.model
-    def create(self, vals):
-        rec = super().create(vals)
-        rec._propagate_to_security()
-        # Tự động fetch Intraday OHLC cho ngày hôm nay
-        rec._auto_fetch_intraday_ohlc()
-        return rec
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._after_ingest()
+        return records
 
     def write(self, vals):
         res = super().write(vals)
-        self._propagate_to_security()
-        # Tự động fetch Intraday OHLC cho ngày hôm nay nếu date được cập nhật hoặc chưa có intraday data
-        if 'date' in vals:
-            # Nếu date được cập nhật, check lại
-            self._auto_fetch_intraday_ohlc()
-        else:
-            # Nếu date không thay đổi, check xem có intraday data chưa
-            if self.date == fields.Date.today():
-                intraday_count = self.env['ssi.intraday.ohlc'].search_count([
-                    ('security_id', '=', self.security_id.id),
-                    ('date', '=', self.date)
-                ])
-                if intraday_count == 0:
-                    self._auto_fetch_intraday_ohlc()
+        if set(vals) - {'intraday_fetch_pending', 'intraday_claimed_at'}:
+            self._after_ingest()
         return res
 
     @api.depends('security_id', 'date', 'intraday_ohlc_ids')
@@ -260,8 +414,7 @@ class DailyOHLC(models.Model):
             import ssi_fc_data
             from datetime import timedelta
             
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
             if not self.security_id:
                 raise UserError(_("Không tìm thấy Security liên quan."))
@@ -299,20 +452,13 @@ class DailyOHLC(models.Model):
                     if not intraday_items:
                         break
                     
-                    # Lưu hoặc cập nhật Intraday OHLC records
+                    # Lưu hoặc cập nhật Intraday OHLC records (upsert cả trang)
+                    vals_list = []
                     for item in intraday_items:
                         time_str = item.get('Time', '') or item.get('time', '')
                         if not time_str:
                             continue
-                        
-                        # Kiểm tra xem đã có record chưa
-                        existing = intraday_model.search([
-                            ('security_id', '=', security.id),
-                            ('date', '=', target_date),
-                            ('time', '=', time_str)
-                        ], limit=1)
-                        
-                        values = {
+                        vals_list.append({
                             'security_id': security.id,
                             'date': target_date,
                             'time': time_str,
@@ -323,14 +469,9 @@ class DailyOHLC(models.Model):
                             'volume': item.get('Volume', 0.0) or item.get('volume', 0.0) or 0.0,
                             'total_value': item.get('TotalValue', 0.0) or item.get('totalValue', 0.0) or 0.0,
                             'resolution': item.get('Resolution', 1) or item.get('resolution', 1) or 1,
-                        }
-                        
-                        if existing:
-                            existing.write(values)
-                        else:
-                            intraday_model.create(values)
-                        
-                        total_records += 1
+                        })
+                    upserted = intraday_model.bulk_upsert(vals_list)
+                    total_records += upserted['created'] + upserted['updated']
                     
                     # Nếu số records trả về ít hơn page_size, có thể đã hết dữ liệu
                     if len(intraday_items) < page_size:
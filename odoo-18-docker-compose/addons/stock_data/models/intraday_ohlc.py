@@ -1,9 +1,12 @@
-from odoo import models, fields
+from odoo import api, models, fields
+
+from ..utils.ohlc_series import touched_hours
 
 
 class IntradayOHLC(models.Model):
     """Intraday OHLC Data"""
     _name = 'ssi.intraday.ohlc'
+    _inherit = ['ssi.bulk.upsert.mixin']
     _description = 'Intraday OHLC Data'
     _order = 'date desc, time desc'
 
@@ -18,7 +21,24 @@ class IntradayOHLC(models.Model):
     low_price = fields.Float('Low Price')
     close_price = fields.Float('Close Price')
     volume = fields.Float('Volume')
-    resolution = fields.Integer('Resolution (minutes)')
+    resolution = fields.Integer('Resolution (minutes)', default=1)
     total_value = fields.Float('Total Value')
 
+    _sql_constraints = [
+        ('security_date_time_resolution_unique', 'unique(security_id, date, time, resolution)',
+         'Security, date, time and resolution combination must be unique!')
+    ]
+    _upsert_conflict_fields = ('security_id', 'date', 'time', 'resolution')
+
+    @api.model
+    def bulk_upsert(self, vals_list, page_size=None):
+        for vals in vals_list:
+            if not vals.get('resolution'):
+                vals['resolution'] = 1
+        result = super().bulk_upsert(vals_list, page_size=page_size)
+        if result['ids']:
+            # Cập nhật nến tổng hợp cho biểu đồ: chỉ các giờ có nến vừa ghi (không tính lại cả ngày)
+            self.env['ssi.ohlc.rollup']._refresh_intraday(hours=touched_hours(vals_list))
+        return result
+
 
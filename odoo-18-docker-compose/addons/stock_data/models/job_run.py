@@ -0,0 +1,312 @@
+from odoo import fields, models
+from odoo.modules.registry import Registry
+from contextlib import contextmanager
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from ..utils.job_queue import advisory_key, ema
+
+_logger = logging.getLogger(__name__)
+
+
+class JobLease:
+    """
+    Quyền chạy một job: giữ pg advisory lock trên kết nối điều phối riêng tới khi job kết thúc.
+    Heartbeat/thống kê/cursor shard được commit ngay trên kết nối này nên các worker khác
+    thấy được trong khi transaction chính của job vẫn đang chạy; lô chỉ được coi là xong khi
+    commit_shard commit cùng transaction với dữ liệu của lô.
+    """
+
+    def __init__(self, env, name, slot, control_cr):
+        self.env = env
+        self.name = name
+        self.slot = slot
+        self._cr = control_cr
+        self._started = time.monotonic()
+        self._pass = None
+        # Khoảng id (low, high] của lô đang xử lý, chưa commit
+        self._claim = None
+        self.processed = 0
+
+    def _execute(self, query, params):
+        self._cr.execute(query, params)
+        self._cr.commit()
+
+    def _start(self):
+        worker = f'{socket.gethostname()}:{os.getpid()}#{self.slot}'
+        self._execute("""
+            UPDATE ssi_job_run SET state = 'running', worker = %s, processed = 0,
+                   started_at = now() at time zone 'UTC', heartbeat_at = now() at time zone 'UTC'
+            WHERE name = %s
+        """, (worker, self.name))
+
+    def _finish(self, error=None):
+        duration = time.monotonic() - self._started
+        self._cr.execute("SELECT run_count, avg_duration FROM ssi_job_run WHERE name = %s", (self.name,))
+        run_count, avg_duration = self._cr.fetchone()
+        self._execute("""
+            UPDATE ssi_job_run SET
+                state = %s, finished_at = now() at time zone 'UTC', heartbeat_at = now() at time zone 'UTC',
+                last_duration = %s, avg_duration = %s, run_count = run_count + 1,
+                error_count = error_count + %s, last_error = COALESCE(%s, last_error), processed = %s
+            WHERE name = %s
+        """, ('failed' if error else 'idle', duration, ema(avg_duration, duration, run_count),
+              1 if error else 0, str(error) if error else None, self.processed, self.name))
+        _logger.info("Job %s finished in %.1fs (processed=%d%s)",
+                     self.name, duration, self.processed, ', failed' if error else '')
+
+    def heartbeat(self, processed=None, backlog=None):
+        """Cập nhật tiến độ; processed cộng dồn trong lần chạy hiện tại"""
+        if processed:
+            self.processed += processed
+        self._execute("""
+            UPDATE ssi_job_run SET heartbeat_at = now() at time zone 'UTC', processed = %s,
+                   backlog = COALESCE(%s, backlog)
+            WHERE name = %s
+        """, (self.processed, backlog, self.name))
+
+    def _slot_alive(self, slot):
+        """Slot đang được worker khác giữ (advisory lock của slot chưa nhả)"""
+        key = advisory_key(self.name, slot)
+        self._cr.execute("SELECT pg_try_advisory_lock(%s, %s)", key)
+        if not self._cr.fetchone()[0]:
+            return True
+        self._cr.execute("SELECT pg_advisory_unlock(%s, %s)", key)
+        return False
+
+    def claim_shard(self, model_name, domain, size):
+        """
+        Lô `size` bản ghi kế tiếp (theo id) sau cursor dùng chung của job.
+        Nhiều worker cùng job nhận các lô rời nhau; worker nhận lô cuối kết thúc lượt (pass)
+        và đưa cursor về 0, các worker còn lại nhận lô rỗng và dừng.
+
+        Lô đã nhận được ghi vào shard_claims và chỉ được xoá bởi commit_shard, cùng transaction
+        với dữ liệu của lô: lô của worker chết giữa chừng (slot không còn ai giữ) được giao lại
+        ở lần nhận lô kế tiếp thay vì bị bỏ qua tới lượt sau.
+
+        Returns:
+            recordset của model_name (trên env của job)
+        """
+        if self._claim is not None:
+            raise RuntimeError(f'Job {self.name}: commit_shard() must be called before claiming the next shard')
+        Model = self.env[model_name]
+        # Khoá dòng job trên kết nối điều phối -> các worker nhận lô lần lượt
+        self._cr.execute("""
+            SELECT shard_cursor, shard_pass, COALESCE(shard_claims, '{}'::jsonb)
+            FROM ssi_job_run WHERE name = %s FOR UPDATE
+        """, (self.name,))
+        cursor, shard_pass, claims = self._cr.fetchone()
+        first = self._pass is None
+        if first:
+            self._pass = shard_pass
+
+        # Lô còn treo của worker đã dừng (kể cả lần chạy trước của chính slot này)
+        for slot, (low, high) in sorted(claims.items(), key=lambda item: (int(item[0]) != self.slot, int(item[0]))):
+            if int(slot) == self.slot and not first:
+                continue
+            if int(slot) != self.slot and self._slot_alive(int(slot)):
+                continue
+            del claims[slot]
+            claims[str(self.slot)] = [low, high]
+            records = Model.search(list(domain) + [('id', '>', low), ('id', '<=', high)], order='id')
+            self._execute("UPDATE ssi_job_run SET shard_claims = %s WHERE name = %s",
+                          (json.dumps(claims), self.name))
+            _logger.info("Job %s: reclaimed shard (%s, %s] of slot %s", self.name, low, high, slot)
+            self._claim = (low, high)
+            if records:
+                return records
+            return self._release_empty(Model, domain, size)
+
+        if self._pass != shard_pass:
+            self._cr.commit()
+            return Model.browse()
+        records = Model.search(list(domain) + [('id', '>', cursor or 0)], order='id', limit=size)
+        backlog = Model.search_count(list(domain) + [('id', '>', records[-1].id)]) if records else 0
+        if backlog:
+            new_cursor, new_pass = records[-1].id, shard_pass
+        else:
+            new_cursor, new_pass = 0, shard_pass + 1
+        if records:
+            claims[str(self.slot)] = [cursor or 0, records[-1].id]
+            self._claim = (cursor or 0, records[-1].id)
+        self._execute("""
+            UPDATE ssi_job_run SET shard_cursor = %s, shard_pass = %s, backlog = %s, shard_claims = %s,
+                   heartbeat_at = now() at time zone 'UTC'
+            WHERE name = %s
+        """, (new_cursor, new_pass, backlog, json.dumps(claims), self.name))
+        return records
+
+    def _release_empty(self, Model, domain, size):
+        """Lô nhận lại không còn bản ghi nào: xoá claim rồi nhận lô kế tiếp"""
+        self.commit_shard()
+        return self.claim_shard(Model._name, domain, size)
+
+    def commit_shard(self, processed=None):
+        """
+        Commit transaction của job cùng với việc xoá claim của lô vừa xử lý
+        (dùng thay cho env.cr.commit() sau mỗi lô nhận từ claim_shard)
+        """
+        if self._claim is not None:
+            self.env.cr.execute("""
+                UPDATE ssi_job_run SET shard_claims = COALESCE(shard_claims, '{}'::jsonb) - %s
+                WHERE name = %s
+            """, (str(self.slot), self.name))
+        self.env.cr.commit()
+        self._claim = None
+        self.heartbeat(processed=processed)
+
+
+class SessionLease:
+    """
+    Quyền chạy một worker nền dài hạn (stream) trong toàn bộ các process Odoo của một database:
+    pg advisory lock cấp session giữ trên kết nối riêng cho tới khi worker dừng.
+    Process chết -> kết nối đóng -> lock tự nhả, process khác nhận lại ở lượt cron giám sát sau.
+    """
+
+    def __init__(self, name, cr):
+        self.name = name
+        self._cr = cr
+        self._lock = threading.Lock()
+
+    @classmethod
+    def try_acquire(cls, dbname, name):
+        """SessionLease nếu giành được lock (không chờ), None nếu process khác đang giữ"""
+        cr = Registry(dbname).cursor()
+        try:
+            cr.execute("SELECT pg_try_advisory_lock(%s, %s)", advisory_key(name))
+            acquired = cr.fetchone()[0]
+            # Lock cấp session vẫn giữ sau commit; không để kết nối treo trong transaction
+            cr.commit()
+        except Exception:
+            cr.close()
+            raise
+        if not acquired:
+            cr.close()
+            return None
+        return cls(name, cr)
+
+    def alive(self):
+        """Kết nối giữ lock còn sống (mất kết nối = mất lock)"""
+        with self._lock:
+            if self._cr is None:
+                return False
+            try:
+                self._cr.execute("SELECT 1")
+                self._cr.commit()
+                return True
+            except Exception:
+                _logger.warning("Lease %s lost its database connection", self.name)
+                self._close()
+                return False
+
+    def release(self):
+        with self._lock:
+            if self._cr is None:
+                return
+            try:
+                self._cr.execute("SELECT pg_advisory_unlock(%s, %s)", advisory_key(self.name))
+                self._cr.commit()
+            except Exception:
+                _logger.debug("Cannot unlock lease %s", self.name, exc_info=True)
+            self._close()
+
+    def _close(self):
+        try:
+            self._cr.close()
+        except Exception:
+            pass
+        self._cr = None
+
+
+class JobRun(models.Model):
+    """Điều phối và thống kê các job đồng bộ SSI chạy bởi cron/wizard"""
+    _name = 'ssi.job.run'
+    _description = 'SSI Job Run'
+    _order = 'name'
+
+    name = fields.Char('Job', required=True, readonly=True)
+    state = fields.Selection([
+        ('idle', 'Idle'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ], string='State', default='idle', readonly=True)
+    worker = fields.Char('Worker', readonly=True)
+    started_at = fields.Datetime('Started At', readonly=True)
+    heartbeat_at = fields.Datetime('Heartbeat At', readonly=True)
+    finished_at = fields.Datetime('Finished At', readonly=True)
+    last_duration = fields.Float('Last Duration (s)', readonly=True)
+    avg_duration = fields.Float('Average Duration (s)', readonly=True)
+    run_count = fields.Integer('Runs', default=0, readonly=True)
+    skip_count = fields.Integer('Skipped (locked)', default=0, readonly=True)
+    error_count = fields.Integer('Errors', default=0, readonly=True)
+    processed = fields.Integer('Processed', default=0, readonly=True, help='Số mục đã xử lý trong lần chạy gần nhất')
+    backlog = fields.Integer('Backlog', default=0, readonly=True, help='Số mục còn chờ ở lần nhận lô gần nhất')
+    shard_cursor = fields.Integer('Shard Cursor', default=0, readonly=True)
+    shard_pass = fields.Integer('Shard Pass', default=0, readonly=True)
+    shard_claims = fields.Json('Shard Claims', readonly=True,
+                               help='Lô đã giao cho từng slot nhưng chưa commit: {slot: [id từ, id tới]}')
+    last_error = fields.Text('Last Error', readonly=True)
+
+    _sql_constraints = [
+        ('name_unique', 'unique(name)', 'Job name must be unique!'),
+    ]
+
+    def _job_shards(self, name):
+        try:
+            return max(1, int(self.env['ir.config_parameter'].sudo().get_param(f'{name}.shards') or 1))
+        except ValueError:
+            return 1
+
+    @contextmanager
+    def acquire(self, name, shards=None):
+        """
+        Chạy job `name` khi giành được pg advisory lock (không chờ):
+
+            with self.env['ssi.job.run'].acquire('ssi.fetch.all_ohlc') as job:
+                if not job:
+                    return  # worker khác đang chạy
+                ...
+                job.heartbeat(processed=n)
+
+        shards > 1 (hoặc tham số '<name>.shards') cho phép tối đa N worker chạy cùng lúc,
+        chia việc bằng JobLease.claim_shard.
+        """
+        shards = shards or self._job_shards(name)
+        control = self.env.registry.cursor()
+        lease = None
+        try:
+            control.execute("""
+                INSERT INTO ssi_job_run (name, state, run_count, skip_count, error_count, processed, backlog,
+                                         shard_cursor, shard_pass, create_uid, create_date, write_uid, write_date)
+                VALUES (%s, 'idle', 0, 0, 0, 0, 0, 0, 0, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+                ON CONFLICT (name) DO NOTHING
+            """, (name, self.env.uid, self.env.uid))
+            control.commit()
+            # Lock cấp session: vẫn giữ khi job commit giữa chừng, tự nhả nếu process chết
+            for slot in range(shards):
+                control.execute("SELECT pg_try_advisory_lock(%s, %s)", advisory_key(name, slot))
+                if control.fetchone()[0]:
+                    lease = JobLease(self.env, name, slot, control)
+                    break
+            if not lease:
+                control.execute("UPDATE ssi_job_run SET skip_count = skip_count + 1 WHERE name = %s", (name,))
+                control.commit()
+                _logger.info("Job %s skipped: already running on another worker", name)
+                yield None
+                return
+            lease._start()
+            try:
+                yield lease
+            except Exception as e:
+                control.rollback()
+                lease._finish(error=e)
+                raise
+            lease._finish()
+        finally:
+            if lease:
+                control.execute("SELECT pg_advisory_unlock(%s, %s)", advisory_key(name, lease.slot))
+            control.close()
@@ -0,0 +1,281 @@
+from odoo import api, fields, models, SUPERUSER_ID
+from odoo.modules.registry import Registry
+from psycopg2.extras import execute_values
+import logging
+import threading
+import time
+
+from ..utils.fund_sync import sync_fund_on_write
+from .job_run import SessionLease
+from ..utils.market_stream import DEFAULT_CHANNELS, ReplayMarketDataStream, StreamWorker
+
+_logger = logging.getLogger(__name__)
+
+# Worker đang chạy trong process hiện tại, theo tên database
+_WORKERS = {}
+# SessionLease của worker: chỉ một process (prefork) chạy stream cho mỗi database
+_LEASES = {}
+_WORKERS_LOCK = threading.Lock()
+
+
+class MarketDataStreamService(models.AbstractModel):
+    """Ingestion realtime từ SSI FastConnect Data hub (kênh X/B/R) thay cho polling theo cron"""
+    _name = 'ssi.market.stream'
+    _description = 'SSI Market Data Stream Service'
+
+    _PARAM_ENABLED = 'ssi.stream.enabled'
+    _PARAM_CHANNELS = 'ssi.stream.channels'
+    _PARAM_FLUSH_MS = 'ssi.stream.flush_ms'
+    _PARAM_REPLAY_FILE = 'ssi.stream.replay_file'
+    _LEASE_NAME = 'ssi.market.stream'
+    _HEARTBEAT_SEC = 30
+    _HEALTHY_SEC = 180
+
+    # --- Cấu hình ---
+    @api.model
+    def _stream_settings(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        channels = ICP.get_param(self._PARAM_CHANNELS) or ','.join(DEFAULT_CHANNELS)
+        try:
+            flush_ms = int(ICP.get_param(self._PARAM_FLUSH_MS) or 500)
+        except ValueError:
+            flush_ms = 500
+        return {
+            'enabled': (ICP.get_param(self._PARAM_ENABLED) or '').lower() in ('1', 'true', 'yes'),
+            'channels': [c.strip() for c in channels.split(',') if c.strip()],
+            'flush_ms': flush_ms,
+            'replay_file': ICP.get_param(self._PARAM_REPLAY_FILE) or '',
+        }
+
+    @api.model
+    def _build_stream_factory(self, settings):
+        """Factory tạo stream cho từng kênh: feed thật (SDK) hoặc stub phát lại khi có replay_file"""
+        if settings['replay_file']:
+            path = settings['replay_file']
+            return lambda channel: ReplayMarketDataStream(path=path, interval_ms=settings['flush_ms'] // 10, loop=True)
+
+        from ssi_fc_data.fc_md_stream import MarketDataStream
+        # Token của client dùng chung (ssi.sdk.config.builder) cũng dùng để đăng ký kênh stream
+        client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
+        return lambda channel: MarketDataStream(sdk_config, client)
+
+    # --- Vòng đời worker ---
+    @api.model
+    def _get_worker(self):
+        return _WORKERS.get(self.env.cr.dbname)
+
+    @api.model
+    def start_stream_worker(self):
+        """
+        Khởi động worker stream cho database hiện tại nếu chưa chạy ở đâu: process giữ được
+        SessionLease mới mở kết nối stream, các process khác bỏ qua
+        """
+        dbname = self.env.cr.dbname
+        settings = self._stream_settings()
+        with _WORKERS_LOCK:
+            worker = _WORKERS.get(dbname)
+            lease = _LEASES.get(dbname)
+            if lease and not lease.alive():
+                # Mất kết nối giữ lock: process khác có thể đã nhận stream -> dừng worker của process này
+                _LEASES.pop(dbname, None)
+                if worker:
+                    worker.stop()
+                    _WORKERS.pop(dbname, None)
+                lease = worker = None
+            if worker and worker.is_alive():
+                return False
+            if not lease:
+                lease = SessionLease.try_acquire(dbname, self._LEASE_NAME)
+                if not lease:
+                    _logger.debug("SSI stream worker already running in another process: db=%s", dbname)
+                    return False
+                _LEASES[dbname] = lease
+            worker = StreamWorker(
+                self._build_stream_factory(settings),
+                self._make_flush(dbname),
+                channels=settings['channels'],
+                flush_ms=settings['flush_ms'],
+                today=fields.Date.today,
+            )
+            worker.start()
+            _WORKERS[dbname] = worker
+        _logger.info("SSI stream worker started: db=%s channels=%s flush_ms=%s",
+                     dbname, settings['channels'], settings['flush_ms'])
+        return True
+
+    @api.model
+    def stop_stream_worker(self):
+        with _WORKERS_LOCK:
+            worker = _WORKERS.pop(self.env.cr.dbname, None)
+            lease = _LEASES.pop(self.env.cr.dbname, None)
+        if worker:
+            worker.stop()
+            _logger.info("SSI stream worker stopped: db=%s", self.env.cr.dbname)
+        if lease:
+            # Nhả lock sau khi worker đã dừng hẳn
+            lease.release()
+        return bool(worker)
+
+    @api.model
+    def cron_ensure_stream_worker(self):
+        """Cron giám sát: bật/tắt worker theo tham số ssi.stream.enabled"""
+        if not self._stream_settings()['enabled']:
+            self.stop_stream_worker()
+            return
+        try:
+            self.start_stream_worker()
+        except Exception as e:
+            _logger.exception("Cannot start SSI stream worker: %s", e)
+
+    @api.model
+    def _is_stream_healthy(self):
+        """Stream đang đẩy dữ liệu gần đây -> các cron polling có thể bỏ qua"""
+        if not self._stream_settings()['enabled']:
+            return False
+        config = self.env['ssi.api.config'].sudo().get_config()
+        last = config.stream_last_flush if config else False
+        return bool(last and (fields.Datetime.now() - last).total_seconds() < self._HEALTHY_SEC)
+
+    @api.model
+    def _make_flush(self, dbname):
+        """Hàm flush chạy trên luồng worker: mở cursor riêng, ghi lô và commit"""
+        state = {'heartbeat': 0.0}
+
+        def flush(batch):
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                result = env['ssi.market.stream']._apply_stream_batch(batch)
+                now = time.time()
+                if now - state['heartbeat'] >= self._HEARTBEAT_SEC:
+                    config = env['ssi.api.config'].get_config()
+                    if config:
+                        config.write({'stream_last_flush': fields.Datetime.now()})
+                    state['heartbeat'] = now
+            return result
+
+        return flush
+
+    # --- Ghi lô vào DB ---
+    @api.model
+    def _apply_stream_batch(self, batch):
+        """
+        Ghi một lô tick đã gộp: bảng giá/room vào ssi.securities, nến 1 phút vào ssi.intraday.ohlc.
+
+        Returns:
+            dict: số bản ghi cập nhật theo loại
+        """
+        quotes = batch.get('quotes') or []
+        bars = batch.get('bars') or []
+        rooms = batch.get('rooms') or []
+        symbols = {row['symbol'] for row in quotes + bars + rooms}
+        if not symbols:
+            return {'quotes': 0, 'bars': 0, 'rooms': 0}
+
+        Securities = self.env['ssi.securities'].sudo()
+        security_ids = {}
+        for row in Securities.search_read([('symbol', 'in', list(symbols))], ['symbol']):
+            security_ids.setdefault(row['symbol'], row['id'])
+
+        result = {
+            'quotes': self._apply_quotes(quotes, security_ids),
+            'rooms': self._apply_rooms(rooms, security_ids),
+            'bars': self._apply_bars(bars, security_ids),
+        }
+        _logger.debug("SSI stream batch applied: %s", result)
+        return result
+
+    @api.model
+    def _apply_quotes(self, quotes, security_ids):
+        rows = [
+            (security_ids[q['symbol']], q['reference_price'], q['ceiling_price'], q['floor_price'],
+             q['current_price'], q['last_price'], q['high_price'], q['low_price'], q['volume'], q['trading_date'])
+            for q in quotes if q['symbol'] in security_ids
+        ]
+        if not rows:
+            return 0
+        Securities = self.env['ssi.securities'].sudo()
+        Securities.flush_model()
+        # Giá 0 trong message nghĩa là chưa có dữ liệu -> giữ giá trị cũ
+        execute_values(self.env.cr, """
+            UPDATE ssi_securities s SET
+                reference_price = COALESCE(NULLIF(v.reference_price, 0), s.reference_price),
+                ceiling_price = COALESCE(NULLIF(v.ceiling_price, 0), s.ceiling_price),
+                floor_price = COALESCE(NULLIF(v.floor_price, 0), s.floor_price),
+                current_price = COALESCE(NULLIF(v.current_price, 0), s.current_price),
+                last_price = COALESCE(NULLIF(v.last_price, 0), s.last_price),
+                high_price = COALESCE(NULLIF(v.high_price, 0), s.high_price),
+                low_price = COALESCE(NULLIF(v.low_price, 0), s.low_price),
+                volume = COALESCE(NULLIF(v.volume, 0), s.volume),
+                last_trading_date = COALESCE(v.trading_date, s.last_trading_date),
+                last_update = now() at time zone 'UTC',
+                write_date = now() at time zone 'UTC'
+            FROM (VALUES %s) AS v(id, reference_price, ceiling_price, floor_price, current_price,
+                                  last_price, high_price, low_price, volume, trading_date)
+            WHERE s.id = v.id
+        """, rows, template='(%s, %s::float8, %s::float8, %s::float8, %s::float8, %s::float8, '
+                           '%s::float8, %s::float8, %s::float8, %s::date)', page_size=1000)
+        # Trường tính toán lưu trữ (total_value/change/change_percent) tính lại trong SQL
+        self.env.cr.execute("""
+            UPDATE ssi_securities SET
+                total_value = COALESCE(current_price, 0) * COALESCE(volume, 0),
+                change = COALESCE(current_price, 0) - COALESCE(reference_price, 0),
+                change_percent = CASE WHEN COALESCE(reference_price, 0) > 0
+                    THEN (COALESCE(current_price, 0) - reference_price) / reference_price * 100.0 ELSE 0 END
+            WHERE id = ANY(%s)
+        """, ([r[0] for r in rows],))
+        Securities.invalidate_model()
+
+        # Đồng bộ sang fund.certificate chỉ cho các mã có chứng chỉ quỹ
+        if 'fund.certificate' in self.env:
+            certs = self.env['fund.certificate'].sudo().search_read([], ['symbol', 'market'])
+            cert_keys = {(c['symbol'], c['market']) for c in certs}
+            linked = Securities.browse([r[0] for r in rows]).filtered(lambda s: (s.symbol, s.market) in cert_keys)
+            if linked:
+                sync_fund_on_write(linked, {
+                    'reference_price', 'ceiling_price', 'floor_price', 'current_price',
+                    'last_price', 'high_price', 'low_price', 'volume', 'last_trading_date',
+                })
+        return len(rows)
+
+    @api.model
+    def _apply_rooms(self, rooms, security_ids):
+        rows = [
+            (security_ids[r['symbol']], r['foreign_total_room'], r['foreign_current_room'],
+             r['foreign_buy_volume'], r['foreign_sell_volume'])
+            for r in rooms if r['symbol'] in security_ids
+        ]
+        if not rows:
+            return 0
+        Securities = self.env['ssi.securities'].sudo()
+        Securities.flush_model()
+        execute_values(self.env.cr, """
+            UPDATE ssi_securities s SET
+                foreign_total_room = v.total_room,
+                foreign_current_room = v.current_room,
+                foreign_buy_volume = v.buy_volume,
+                foreign_sell_volume = v.sell_volume,
+                write_date = now() at time zone 'UTC'
+            FROM (VALUES %s) AS v(id, total_room, current_room, buy_volume, sell_volume)
+            WHERE s.id = v.id
+        """, rows, template='(%s, %s::float8, %s::float8, %s::float8, %s::float8)', page_size=1000)
+        Securities.invalidate_model()
+        return len(rows)
+
+    @api.model
+    def _apply_bars(self, bars, security_ids):
+        vals_list = [{
+            'security_id': security_ids[b['symbol']],
+            'date': b['date'],
+            'time': b['time'],
+            'resolution': 1,
+            'open_price': b['open_price'],
+            'high_price': b['high_price'],
+            'low_price': b['low_price'],
+            'close_price': b['close_price'],
+            'volume': b['volume'],
+            'total_value': b['total_value'],
+        } for b in bars if b['symbol'] in security_ids and b['date'] and b['time']]
+        if not vals_list:
+            return 0
+        result = self.env['ssi.intraday.ohlc'].sudo().bulk_upsert(vals_list)
+        return result['created'] + result['updated']
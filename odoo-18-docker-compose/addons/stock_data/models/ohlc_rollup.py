@@ -0,0 +1,132 @@
+from odoo import api, fields, models
+import logging
+
+from ..utils.ohlc_series import DAILY, INTRADAY_RESOLUTIONS, pack_columns
+
+_logger = logging.getLogger(__name__)
+
+# Giờ Việt Nam (UTC+7): date/time của intraday là giờ địa phương, ts lưu UTC như Datetime của Odoo
+VN_OFFSET = "interval '7 hours'"
+
+
+class OHLCRollup(models.Model):
+    """Nến intraday tổng hợp sẵn theo (security, resolution, ts) cho biểu đồ"""
+    _name = 'ssi.ohlc.rollup'
+    _description = 'OHLC Rollup'
+    _order = 'security_id, resolution, ts'
+    _log_access = False
+
+    security_id = fields.Many2one('ssi.securities', string='Security', required=True, ondelete='cascade')
+    resolution = fields.Integer('Resolution (minutes)', required=True)
+    ts = fields.Datetime('Bucket Start (UTC)', required=True)
+    open_price = fields.Float('Open Price')
+    high_price = fields.Float('High Price')
+    low_price = fields.Float('Low Price')
+    close_price = fields.Float('Close Price')
+    volume = fields.Float('Volume')
+
+    _sql_constraints = [
+        ('security_resolution_ts_unique', 'unique(security_id, resolution, ts)',
+         'Rollup bucket must be unique per security and resolution!'),
+    ]
+
+    def init(self):
+        # Dữ liệu ghi tăng dần theo thời gian -> BRIN trên ts rất nhỏ, đủ cho quét theo khoảng
+        self.env.cr.execute(
+            "CREATE INDEX IF NOT EXISTS ssi_ohlc_rollup_ts_brin ON ssi_ohlc_rollup USING brin (ts)")
+
+    @api.model
+    def _refresh_intraday(self, security_ids=None, dates=None, hours=None):
+        """
+        Tính lại các bucket 1m/5m/15m/1h từ nến 1 phút (ssi.intraday.ohlc) cho các security/ngày đã đổi.
+        None = toàn bộ bảng (dùng khi khởi tạo).
+
+        hours: tập (security_id, ngày, giờ) từ touched_hours -> chỉ tính lại các giờ có nến mới
+        (dùng sau mỗi lần ghi nến, kể cả các lô nhỏ của stream realtime)
+        """
+        self.env['ssi.intraday.ohlc'].flush_model()
+        where = ["i.resolution = 1", r"i.time ~ '^\d{1,2}:\d{2}(:\d{2})?$'"]
+        params = {}
+        if security_ids is not None:
+            where.append("i.security_id = ANY(%(security_ids)s)")
+            params['security_ids'] = list(security_ids)
+        if dates is not None:
+            where.append("i.date = ANY(%(dates)s)")
+            params['dates'] = list(dates)
+        if hours is not None:
+            if not hours:
+                return
+            hours = sorted(hours)
+            # substring trả NULL với time sai định dạng (không lỗi cast như split_part)
+            where.append(r"""(i.security_id, i.date, substring(i.time from '^(\d{1,2}):')::int) IN (
+                SELECT * FROM unnest(%(hour_security_ids)s::int[], %(hour_dates)s::date[], %(hour_values)s::int[]))""")
+            params['hour_security_ids'] = [h[0] for h in hours]
+            params['hour_dates'] = [h[1] for h in hours]
+            params['hour_values'] = [h[2] for h in hours]
+        for minutes in INTRADAY_RESOLUTIONS:
+            params['resolution'] = minutes
+            params['seconds'] = minutes * 60
+            self.env.cr.execute(f"""
+                INSERT INTO ssi_ohlc_rollup
+                    (security_id, resolution, ts, open_price, high_price, low_price, close_price, volume)
+                SELECT b.security_id, %(resolution)s,
+                       to_timestamp(floor(extract(epoch FROM b.bar_ts) / %(seconds)s) * %(seconds)s) AT TIME ZONE 'UTC' AS bucket,
+                       (array_agg(b.open_price ORDER BY b.bar_ts))[1],
+                       max(b.high_price),
+                       min(b.low_price),
+                       (array_agg(b.close_price ORDER BY b.bar_ts DESC))[1],
+                       sum(b.volume)
+                FROM (
+                    SELECT i.security_id, (i.date + i.time::time) - {VN_OFFSET} AS bar_ts,
+                           i.open_price, i.high_price, i.low_price, i.close_price, COALESCE(i.volume, 0) AS volume
+                    FROM ssi_intraday_ohlc i
+                    WHERE {' AND '.join(where)}
+                ) b
+                GROUP BY b.security_id, bucket
+                ON CONFLICT (security_id, resolution, ts) DO UPDATE SET
+                    open_price = EXCLUDED.open_price,
+                    high_price = EXCLUDED.high_price,
+                    low_price = EXCLUDED.low_price,
+                    close_price = EXCLUDED.close_price,
+                    volume = EXCLUDED.volume
+            """, params)
+        self.invalidate_model()
+
+    @api.model
+    def cron_refresh_rollups(self, days=3):
+        """Bù các bucket của vài ngày gần nhất (phòng khi hook sau ghi bị bỏ qua)"""
+        today = fields.Date.today()
+        dates = [fields.Date.subtract(today, days=n) for n in range(days)]
+        self._refresh_intraday(dates=dates)
+
+    @api.model
+    def get_series(self, symbol, date_from, date_to, resolution=DAILY):
+        """
+        Chuỗi OHLC dạng cột cho khoảng [date_from, date_to] (ngày giờ Việt Nam).
+
+        Returns:
+            dict: {t: [], o: [], h: [], l: [], c: [], v: []}
+                  t là 'YYYY-MM-DD' với 'D', epoch giây với intraday
+        """
+        if resolution == DAILY:
+            self.env['ssi.daily.ohlc'].flush_model()
+            self.env.cr.execute("""
+                SELECT to_char(d.date, 'YYYY-MM-DD'), COALESCE(d.open_price, 0), COALESCE(d.high_price, 0),
+                       COALESCE(d.low_price, 0), COALESCE(d.close_price, 0), COALESCE(d.volume, 0)
+                FROM ssi_daily_ohlc d
+                WHERE d.symbol = %s AND d.date >= %s AND d.date <= %s
+                ORDER BY d.date
+            """, (symbol, date_from, date_to))
+        else:
+            self.flush_model()
+            self.env.cr.execute(f"""
+                SELECT extract(epoch FROM r.ts)::bigint, COALESCE(r.open_price, 0), COALESCE(r.high_price, 0),
+                       COALESCE(r.low_price, 0), COALESCE(r.close_price, 0), COALESCE(r.volume, 0)
+                FROM ssi_ohlc_rollup r
+                JOIN ssi_securities s ON s.id = r.security_id
+                WHERE s.symbol = %s AND r.resolution = %s
+                  AND r.ts >= %s::timestamp - {VN_OFFSET}
+                  AND r.ts < (%s::date + 1)::timestamp - {VN_OFFSET}
+                ORDER BY r.ts
+            """, (symbol, int(resolution), date_from, date_to))
+        return pack_columns(self.env.cr.fetchall())
@@ -1,7 +1,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import logging
-from ssi_fc_data import model, fc_md_client
+from ssi_fc_data import model
+from ..utils.fetch_executor import RateLimitedError
 from ..utils.fund_sync import sync_fund_on_write, sync_fund_on_create
 
 _logger = logging.getLogger(__name__)
@@ -41,6 +42,12 @@ class Securities(models.Model):
     change = fields.Float('Change', digits=(12, 3), compute='_compute_price_fields', store=True, readonly=True)
     change_percent = fields.Float('Change (%)', digits=(12, 3), compute='_compute_price_fields', store=True, readonly=True)
     last_price = fields.Float('Last Price', digits=(12, 3))
+
+    # Room nước ngoài (kênh R của stream)
+    foreign_total_room = fields.Float('Foreign Total Room')
+    foreign_current_room = fields.Float('Foreign Current Room')
+    foreign_buy_volume = fields.Float('Foreign Buy Volume')
+    foreign_sell_volume = fields.Float('Foreign Sell Volume')
     
     # Status
     is_active = fields.Boolean('Is Active', default=True)
@@ -115,8 +122,7 @@ class Securities(models.Model):
         """Fetch latest price and board prices (TC/Trần/Sàn) using daily_stock_price"""
         try:
             import ssi_fc_data
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
 
             to_date = fields.Date.today()
             from_date = to_date
@@ -180,8 +186,7 @@ class Securities(models.Model):
         """Lấy chi tiết chứng khoán từ API securities_details"""
         self.ensure_one()
         try:
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
             req = model.securities_details(
                 market=self.market,
@@ -219,8 +224,7 @@ class Securities(models.Model):
         try:
             selected_date = fields.Date.today()
             
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
             req = model.backtest(
                 symbol=self.symbol,
@@ -252,85 +256,110 @@ class Securities(models.Model):
             raise UserError(_("Error fetching backtest: %s") % str(e))
 
     @api.model
-    def cron_sync_all_prices(self):
-        """Cron job to sync prices for all securities every minute"""
+    def cron_sync_all_prices(self, batch_size=None):
+        """
+        Cron job to sync prices for all securities every minute.
+        Đi qua các mã theo lô bằng cursor của job ssi.securities.sync_prices (ssi.job.run):
+        nhiều worker (tham số ssi.securities.sync_prices.shards) nhận các lô rời nhau,
+        lô đang dở khi job dừng giữa chừng được xử lý lại ở lần nhận lô sau.
+        """
         try:
-            import ssi_fc_data
+            import json
             from datetime import timedelta
-            
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            
-            client = fc_md_client.MarketDataClient(sdk_config)
-            
-            # Get all active securities
-            securities = self.search([('is_active', '=', True)], limit=100)  # Limit 100 để tránh timeout
+
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
+            executor = self.env['ssi.sdk.config.builder'].get_fetch_executor()
+
+            try:
+                batch_size = int(batch_size or self.env['ir.config_parameter'].sudo().get_param(
+                    'ssi.sync_prices.batch_size') or 200)
+            except ValueError:
+                batch_size = 200
             to_date = fields.Date.today()
             from_date = to_date - timedelta(days=1)
-            
+
             updated_count = 0
             error_count = 0
-            
-            _logger.info("Starting sync for %d securities", len(securities))
-            
-            for security in securities:
+
+            def _fetch(item):
+                # Chạy trên luồng của executor: chỉ gọi API, không dùng cursor
+                _id, symbol, market = item
+                response = executor.request(client.daily_stock_price, sdk_config, model.daily_stock_price(
+                    symbol=symbol,
+                    fromDate=from_date.strftime('%d/%m/%Y'),
+                    toDate=to_date.strftime('%d/%m/%Y'),
+                    pageIndex=1,
+                    pageSize=1,
+                    market=market
+                ))
+                # Tự động lấy securities_details (mỗi lần sync)
                 try:
-                    req = model.daily_stock_price(
-                        symbol=security.symbol,
-                        fromDate=from_date.strftime('%d/%m/%Y'),
-                        toDate=to_date.strftime('%d/%m/%Y'),
-                        pageIndex=1,
-                        pageSize=1,
-                        market=security.market
-                    )
-                    
-                    response = client.daily_stock_price(sdk_config, req)
-                    
-                    if response.get('status') == 'Success' and response.get('data'):
-                        items = response['data'] if isinstance(response['data'], list) else []
-                        if items:
-                            latest_price = items[0]
-                            def _val(payload, *keys, default=0.0):
-                                for k in keys:
-                                    if k in payload:
-                                        return payload.get(k)
-                                return default
-                            ref_price = _val(latest_price, 'ReferencePrice', 'TC', default=security.reference_price)
-                            ceil_price = _val(latest_price, 'CeilingPrice', 'Trần', default=security.ceiling_price)
-                            floor_price = _val(latest_price, 'FloorPrice', 'Sàn', default=security.floor_price)
-                            # Only update board prices (reference/ceiling/floor) from daily_stock_price API
-                            # Let Daily OHLC propagate handle current_price, high_price, low_price, etc.
-                            security.write({
-                                'reference_price': ref_price,
-                                'ceiling_price': ceil_price,
-                                'floor_price': floor_price,
-                                'last_update': fields.Datetime.now()
-                            })
-                            updated_count += 1
-                            _logger.debug("Updated price for %s", security.symbol)
-                    
-                    # Tự động lấy securities_details (mỗi lần sync)
-                    try:
-                        details_req = model.securities_details(
-                            market=security.market,
-                            symbol=security.symbol,
-                            pageIndex='1',
-                            pageSize='100'
-                        )
-                        details_response = client.securities_details(sdk_config, details_req)
-                        if details_response.get('status') == 'Success' and details_response.get('data'):
-                            import json
-                            security.write({
-                                'securities_details_raw': json.dumps(details_response, indent=2, ensure_ascii=False),
-                                'securities_details_fetch_date': fields.Datetime.now(),
-                            })
-                    except Exception as e:
-                        _logger.debug("Skip securities_details for %s: %s", security.symbol, str(e))
-                        
+                    details = executor.request(client.securities_details, sdk_config, model.securities_details(
+                        market=market,
+                        symbol=symbol,
+                        pageIndex='1',
+                        pageSize='100'
+                    ))
+                except RateLimitedError:
+                    raise
                 except Exception as e:
-                    error_count += 1
-                    _logger.error("Error syncing price for %s: %s", security.symbol, str(e))
-            
+                    _logger.debug("Skip securities_details for %s: %s", symbol, str(e))
+                    details = None
+                return response, details
+
+            def _val(payload, *keys, default=0.0):
+                for k in keys:
+                    if k in payload:
+                        return payload.get(k)
+                return default
+
+            with self.env['ssi.job.run'].acquire('ssi.securities.sync_prices') as job:
+                if not job:
+                    return
+                while True:
+                    securities = job.claim_shard('ssi.securities', [('is_active', '=', True)], batch_size)
+                    if not securities:
+                        break
+                    results = executor.map(_fetch, [(s.id, s.symbol, s.market) for s in securities], key=lambda item: item[0])
+
+                    # Ghi DB trên luồng giữ cursor
+                    for result in results:
+                        security = self.browse(result.key)
+                        if not result.ok:
+                            error_count += 1
+                            _logger.error("Error syncing price for %s: %s", security.symbol, str(result.error))
+                            continue
+                        response, details_response = result.value
+                        try:
+                            vals = {}
+                            if response.get('status') == 'Success' and response.get('data'):
+                                items = response['data'] if isinstance(response['data'], list) else []
+                                if items:
+                                    latest_price = items[0]
+                                    # Only update board prices (reference/ceiling/floor) from daily_stock_price API
+                                    # Let Daily OHLC propagate handle current_price, high_price, low_price, etc.
+                                    vals.update({
+                                        'reference_price': _val(latest_price, 'ReferencePrice', 'TC', default=security.reference_price),
+                                        'ceiling_price': _val(latest_price, 'CeilingPrice', 'Trần', default=security.ceiling_price),
+                                        'floor_price': _val(latest_price, 'FloorPrice', 'Sàn', default=security.floor_price),
+                                        'last_update': fields.Datetime.now()
+                                    })
+                                    updated_count += 1
+                            if details_response and details_response.get('status') == 'Success' and details_response.get('data'):
+                                vals.update({
+                                    'securities_details_raw': json.dumps(details_response, indent=2, ensure_ascii=False),
+                                    'securities_details_fetch_date': fields.Datetime.now(),
+                                })
+                            if vals:
+                                security.write(vals)
+                                _logger.debug("Updated price for %s", security.symbol)
+                        except Exception as e:
+                            error_count += 1
+                            _logger.error("Error syncing price for %s: %s", security.symbol, str(e))
+
+                    # Lưu từng lô cùng với việc đánh dấu lô đã xong: lô chưa commit được giao lại nếu job dừng giữa chừng
+                    job.commit_shard(processed=len(securities))
+
             # Update config
             try:
                 cfg = self.env['ssi.api.config'].get_config()
@@ -341,14 +370,14 @@ class Securities(models.Model):
                     })
             except Exception:
                 _logger.debug("Skip config write in cron_sync_all_prices", exc_info=True)
-            
+
             _logger.info("Sync completed: %d updated, %d errors", updated_count, error_count)
-            
+
         except ImportError:
             _logger.error("SSI SDK not installed")
         except Exception as e:
             _logger.error("Error in cron_sync_all_prices: %s", str(e))
-    
+
     def action_fetch_daily_ohlc_all_funds(self, days_back=365):
         """
         Lấy Daily OHLC cho tất cả các symbol chứng chỉ quỹ một cách đầy đủ
@@ -384,8 +413,7 @@ class Securities(models.Model):
                 }
             
             # Lấy SDK config và client
-            sdk_config = self.env['ssi.sdk.config.builder'].build()
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
             # Lấy security records tương ứng với các fund certificates
             securities = self.env['ssi.securities']
@@ -450,7 +478,8 @@ class Securities(models.Model):
                         if not daily_items:
                             break
                         
-                        # Lưu hoặc cập nhật Daily OHLC records
+                        # Lưu hoặc cập nhật Daily OHLC records (upsert cả trang)
+                        vals_list = []
                         for item in daily_items:
                             date_str = item.get('Date', '')
                             if date_str:
@@ -464,14 +493,8 @@ class Securities(models.Model):
                                         continue
                             else:
                                 continue
-                            
-                            # Kiểm tra xem đã có record chưa
-                            existing = daily_ohlc_model.search([
-                                ('security_id', '=', security.id),
-                                ('date', '=', date_obj)
-                            ], limit=1)
-                            
-                            values = {
+
+                            vals_list.append({
                                 'security_id': security.id,
                                 'date': date_obj,
                                 'open_price': item.get('Open', 0.0) or 0.0,
@@ -484,16 +507,12 @@ class Securities(models.Model):
                                 'change_percent': item.get('ChangePercent', 0.0) or 0.0,
                                 'previous_close': item.get('PreviousClose', 0.0) or 0.0,
                                 'last_update': fields.Datetime.now(),
-                            }
-                            
-                            if existing:
-                                existing.write(values)
-                            else:
-                                daily_ohlc_model.create(values)
-                            
-                            page_success += 1
-                            total_records += 1
-                        
+                            })
+
+                        upserted = daily_ohlc_model.bulk_upsert(vals_list)
+                        page_success += upserted['created'] + upserted['updated']
+                        total_records += upserted['created'] + upserted['updated']
+
                         # Nếu số records trả về ít hơn page_size, có thể đã hết dữ liệu
                         if len(daily_items) < page_size:
                             break
@@ -4,7 +4,7 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import logging
 import json
-from ssi_fc_data import model, fc_md_client
+from ssi_fc_data import model
 
 _logger = logging.getLogger(__name__)
 
@@ -85,14 +85,11 @@ class SecuritiesDetails(models.Model):
             raise UserError(_('Vui lòng chọn Market'))
         
         try:
-            from ..utils.utils import SdkConfigBuilder
-            
             config = self.env['ssi.api.config'].get_config()
             if not config:
                 raise UserError(_('Chưa cấu hình API. Vui lòng cấu hình API trước.'))
             
-            sdk_config = SdkConfigBuilder.build_config(config)
-            client = fc_md_client.MarketDataClient(sdk_config)
+            client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
             req = model.securities_details(
                 market=self.market,
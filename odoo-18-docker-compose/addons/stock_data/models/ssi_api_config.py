@@ -29,7 +29,31 @@ class SSIApiConfig(models.Model):
         ('not_synced', 'Not Synced')
     ], string='Last Sync Status', default='not_synced', readonly=True)
 
-    # Streaming features removed
+    # Streaming (FastConnect Data hub) - xem ssi.market.stream
+    stream_url = fields.Char('Stream URL', default='https://fc-datahub.ssi.com.vn/')
+    stream_last_flush = fields.Datetime('Stream Last Flush', readonly=True,
+                                        help='Lần gần nhất worker stream ghi dữ liệu vào DB')
+
+    # Trường ảnh hưởng tới client SSI dùng chung (ssi.sdk.config.builder.get_market_client)
+    _CLIENT_FIELDS = {'consumer_id', 'consumer_secret', 'api_url', 'stream_url', 'is_active'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['ssi.sdk.config.builder'].invalidate_clients()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        # last_sync_date/stream_last_flush ghi liên tục bởi cron/stream -> không xoá cache
+        if self._CLIENT_FIELDS.intersection(vals):
+            self.env['ssi.sdk.config.builder'].invalidate_clients()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['ssi.sdk.config.builder'].invalidate_clients()
+        return res
 
     @api.model
     def get_config(self):
@@ -37,7 +61,13 @@ class SSIApiConfig(models.Model):
         config = self.search([('is_active', '=', True)], limit=1)
         return config
 
-    # Realtime/streaming actions removed
+    def action_start_stream(self):
+        self.env['ssi.market.stream'].start_stream_worker()
+        return True
+
+    def action_stop_stream(self):
+        self.env['ssi.market.stream'].stop_stream_worker()
+        return True
 
 
 
@@ -0,0 +1,7 @@
+from . import test_bulk_upsert
+from . import test_client_pool
+from . import test_fetch_executor
+from . import test_indicators
+from . import test_job_queue
+from . import test_market_stream
+from . import test_ohlc_series
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Dữ liệu mẫu dùng chung cho test và benchmark (odoo-18-docker-compose/benchmarks) -
+không import Odoo để benchmark nạp trực tiếp được.
+"""
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+SYMBOLS = ['HDB', 'ACB', 'FPT', 'AAM', 'VNM', 'SSI', 'MWG', 'VCB']
+
+
+def fake_api(latency=0.01, fail_every=0):
+    """Giả lập SDK: trễ mạng cố định, thỉnh thoảng trả về lỗi quota"""
+    calls = {'count': 0}
+    lock = threading.Lock()
+
+    def fetch(symbol):
+        with lock:
+            calls['count'] += 1
+            count = calls['count']
+        time.sleep(latency)
+        if fail_every and count % fail_every == 0:
+            return {'status': 429, 'message': 'Too many requests'}
+        return {'status': 'Success', 'data': [{'Symbol': symbol, 'ReferencePrice': 10000}]}
+
+    return fetch, calls
+
+
+def closes(size, seed=20240101):
+    """Chuỗi giá đóng cửa ngẫu nhiên (bước giá 50 đồng)"""
+    rng = random.Random(seed)
+    price = 25000.0
+    values = []
+    for _ in range(size):
+        price = max(1000.0, price * (1 + rng.gauss(0.0003, 0.02)))
+        values.append(round(price / 50) * 50)
+    return np.array(values, dtype=np.float64)
+
+
+def stream_messages(size, seed=20240101):
+    """Sinh message giống hub FastConnect: {"DataType", "Content": chuỗi JSON}"""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(size):
+        symbol = rng.choice(SYMBOLS)
+        kind = rng.choice('XBR')
+        price = 20000 + rng.randint(-50, 50) * 50
+        if kind == 'X':
+            content = {'Symbol': symbol, 'TradingDate': '02/01/2024', 'RefPrice': 20000, 'Ceiling': 21400,
+                       'Floor': 18600, 'LastPrice': price, 'Highest': price + 100, 'Lowest': price - 100,
+                       'TotalVol': i * 100}
+        elif kind == 'B':
+            content = {'Symbol': symbol, 'TradingDate': '02/01/2024', 'Time': '09:%02d:00' % (i % 60),
+                       'Open': price, 'High': price + 50, 'Low': price - 50, 'Close': price,
+                       'Volume': 1000, 'Value': price * 1000}
+        else:
+            content = {'Symbol': symbol, 'TotalRoom': 1e6, 'CurrentRoom': 1e6 - i, 'BuyVol': i, 'SellVol': 0}
+        messages.append(json.dumps({'DataType': kind, 'Content': json.dumps(content)}))
+    return messages
+
+
+def minute_bars(size, seed=20240101):
+    """Nến 1 phút liên tiếp: (epoch, o, h, l, c, v)"""
+    rng = random.Random(seed)
+    start = 1704160800  # 2024-01-02 09:00 giờ VN
+    price = 25000.0
+    rows = []
+    for i in range(size):
+        close = price + rng.randint(-5, 5) * 50
+        rows.append((start + i * 60, price, max(price, close) + 50, min(price, close) - 50, close, float(rng.randint(1, 50) * 100)))
+        price = close
+    return rows
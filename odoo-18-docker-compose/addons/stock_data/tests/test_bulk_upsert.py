@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBulkUpsert(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Index = cls.env['ssi.daily.index']
+        cls.day = date(2024, 3, 4)
+        cls.existing = cls.Index.create({
+            'index_code': 'VNINDEX',
+            'exchange': 'HOSE',
+            'date': cls.day,
+            'index_value': 1250.0,
+            'advances': 120,
+        })
+
+    def test_rows_with_different_keys_keep_values_and_defaults(self):
+        result = self.Index.bulk_upsert([
+            # Chỉ cập nhật giá trị chỉ số: exchange/advances của dòng đã có phải giữ nguyên
+            {'index_code': 'VNINDEX', 'date': self.day, 'index_value': 1260.5},
+            # Dòng mới không truyền last_update: lấy default thay vì NULL
+            {'index_code': 'VN30', 'date': self.day, 'exchange': 'HOSE', 'advances': 18, 'index_value': 1300.0},
+        ])
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+
+        self.assertEqual(self.existing.index_value, 1260.5)
+        self.assertEqual(self.existing.exchange, 'HOSE')
+        self.assertEqual(self.existing.advances, 120)
+
+        created = self.Index.search([('index_code', '=', 'VN30'), ('date', '=', self.day)])
+        self.assertEqual(created.id, (set(result['ids']) - {self.existing.id}).pop())
+        self.assertEqual((created.exchange, created.advances), ('HOSE', 18))
+        self.assertTrue(created.last_update)
+
+    def test_duplicate_keys_in_batch_are_merged(self):
+        self.Index.bulk_upsert([
+            {'index_code': 'VNINDEX', 'date': self.day, 'index_value': 1255.0, 'declines': 200},
+            {'index_code': 'VNINDEX', 'date': self.day, 'index_value': 1258.0},
+        ])
+        self.assertEqual(self.existing.index_value, 1258.0)
+        self.assertEqual(self.existing.declines, 200)
+        self.assertEqual(self.existing.exchange, 'HOSE')
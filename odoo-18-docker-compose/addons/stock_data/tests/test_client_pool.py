@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo.tests.common import BaseCase
+
+from ..utils import client_pool
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _factory(created):
+    def factory(config):
+        # Mô phỏng MarketDataClient: mỗi instance mới = một lần xin token
+        created.append(config)
+        return object()
+    return factory
+
+
+class TestClientPool(BaseCase):
+
+    def test_reuse_until_ttl(self):
+        created = []
+        clock = _FakeClock()
+        pool = client_pool.ClientPool(_factory(created), ttl=100, clock=clock)
+        fingerprint = (1, 'id', 'secret', 'https://fc-data.ssi.com.vn/')
+
+        first = pool.get(('db', 1), fingerprint, 'cfg')
+        clock.now = 99
+        self.assertIs(pool.get(('db', 1), fingerprint, 'cfg'), first)
+        # Token hết hạn -> client mới
+        clock.now = 100
+        renewed = pool.get(('db', 1), fingerprint, 'cfg')
+        self.assertIsNot(renewed, first)
+        self.assertEqual(len(created), 2)
+        # ttl riêng theo lần gọi (ssi.client.token_ttl)
+        clock.now = 150
+        self.assertIsNot(pool.get(('db', 1), fingerprint, 'cfg', ttl=10), renewed)
+
+    def test_fingerprint_and_invalidate(self):
+        created = []
+        pool = client_pool.ClientPool(_factory(created), ttl=3600, clock=_FakeClock())
+        first = pool.get(('db', 1), (1, 'a'), 'cfg')
+        # Đổi credential -> client mới
+        second = pool.get(('db', 1), (1, 'b'), 'cfg')
+        self.assertIsNot(second, first)
+        other = pool.get(('other', 1), (1, 'b'), 'cfg')
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(pool.invalidate(lambda key: key[0] == 'db'), 1)
+        self.assertIs(pool.get(('other', 1), (1, 'b'), 'cfg'), other)
+        self.assertEqual(pool.stats(), {('other', 1): 1})
+        self.assertEqual(pool.invalidate(), 1)
+        self.assertEqual(len(pool), 0)
+
+    def test_concurrent_jobs_share_one_client(self):
+        created = []
+        barrier = threading.Barrier(8)
+        pool = client_pool.ClientPool(_factory(created), ttl=3600)
+
+        def job(_):
+            barrier.wait()
+            return pool.get(('db', 1), (1, 'a'), 'cfg')
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(job, range(8)))
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(c is clients[0] for c in clients))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import BaseCase
+
+from ..utils import fetch_executor
+from .common import fake_api
+
+
+def _fake_clock():
+    clock = {'now': 0.0}
+
+    def sleep(seconds):
+        clock['now'] += seconds
+
+    return clock, sleep
+
+
+class TestFetchExecutor(BaseCase):
+
+    def test_results_keep_input_order(self):
+        symbols = ['S%04d' % i for i in range(200)]
+        fetch, _calls = fake_api(latency=0.001)
+        executor = fetch_executor.FetchExecutor(max_workers=16, rate_per_sec=0)
+        results = executor.map(fetch, symbols)
+        self.assertEqual([r.key for r in results], symbols)
+        self.assertTrue(all(r.ok and r.value['data'][0]['Symbol'] == r.key for r in results))
+
+    def test_rate_limited_responses_are_retried(self):
+        fetch, calls = fake_api(latency=0, fail_every=3)
+        executor = fetch_executor.FetchExecutor(max_workers=4, rate_per_sec=0, retries=5, backoff=0.001)
+        results = executor.map(fetch, range(60))
+        self.assertTrue(all(r.ok and r.value['status'] == 'Success' for r in results))
+        self.assertGreater(calls['count'], 60)
+
+    def test_errors_are_collected_after_retries(self):
+        def fetch(item):
+            raise ConnectionError('down')
+
+        executor = fetch_executor.FetchExecutor(max_workers=2, rate_per_sec=0, retries=2, backoff=0)
+        results = executor.map(fetch, ['ACB', 'FPT'])
+        self.assertEqual([r.attempts for r in results], [3, 3])
+        self.assertTrue(all(isinstance(r.error, ConnectionError) for r in results))
+
+    def test_paginated_fetch_takes_a_token_per_request(self):
+        clock, sleep = _fake_clock()
+        bucket = fetch_executor.TokenBucket(10, capacity=1, clock=lambda: clock['now'], sleep=sleep)
+        executor = fetch_executor.FetchExecutor(max_workers=1, bucket=bucket, item_tokens=0, backoff=0, sleep=sleep)
+
+        def fetch(symbol):
+            # 5 trang cho mỗi mã
+            return [executor.request(lambda page: {'status': 'Success', 'data': [page]}, page) for page in range(5)]
+
+        results = executor.map(fetch, ['ACB', 'FPT'])
+        self.assertTrue(all(r.ok for r in results))
+        # 10 request: 1 token ban đầu + 9 token nạp lại với 10 token/giây
+        self.assertAlmostEqual(clock['now'], 0.9)
+
+    def test_rate_limited_page_retries_whole_item(self):
+        pages = {'calls': 0}
+
+        def get_page(page):
+            pages['calls'] += 1
+            # Trang 2 của lần thử đầu bị giới hạn quota
+            if pages['calls'] == 2:
+                return {'status': 429, 'message': 'Too many requests'}
+            return {'status': 'Success', 'data': [page]}
+
+        executor = fetch_executor.FetchExecutor(max_workers=1, rate_per_sec=0, item_tokens=0, retries=2, backoff=0)
+
+        def fetch(symbol):
+            return [executor.request(get_page, page)['data'][0] for page in range(3)]
+
+        result, = executor.map(fetch, ['ACB'])
+        # Không trả về dữ liệu dở dang: cả item được lấy lại từ trang đầu
+        self.assertTrue(result.ok)
+        self.assertEqual(result.value, [0, 1, 2])
+        self.assertEqual(result.attempts, 2)
+
+        failing = fetch_executor.FetchExecutor(max_workers=1, rate_per_sec=0, item_tokens=0, retries=1, backoff=0)
+        result, = failing.map(lambda symbol: failing.request(lambda: {'status': 429}), ['ACB'])
+        self.assertIsInstance(result.error, fetch_executor.RateLimitedError)
+
+    def test_token_bucket_caps_request_rate(self):
+        clock, sleep = _fake_clock()
+        bucket = fetch_executor.TokenBucket(10, capacity=5, clock=lambda: clock['now'], sleep=sleep)
+        for _ in range(25):
+            bucket.acquire()
+        # 5 token ban đầu + 20 token nạp lại với 10 token/giây
+        self.assertAlmostEqual(clock['now'], 2.0)
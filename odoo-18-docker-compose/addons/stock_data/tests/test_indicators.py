@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+
+from odoo.tests.common import BaseCase
+
+from ..utils import indicators
+from .common import closes
+
+
+def _naive_ema(values, period):
+    alpha = 2.0 / (period + 1)
+    out = [math.nan] * len(values)
+    avg = sum(values[:period]) / period
+    out[period - 1] = avg
+    for i in range(period, len(values)):
+        avg = avg + alpha * (values[i] - avg)
+        out[i] = avg
+    return out
+
+
+def _naive_rsi(values, period):
+    gains = [max(values[i] - values[i - 1], 0.0) for i in range(1, len(values))]
+    losses = [max(values[i - 1] - values[i], 0.0) for i in range(1, len(values))]
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    out = [math.nan] * len(values)
+    out[period] = 100 - 100 / (1 + avg_gain / avg_loss)
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+        out[i + 1] = 100 - 100 / (1 + avg_gain / avg_loss)
+    return out
+
+
+class TestIndicators(BaseCase):
+
+    def test_indicators_match_naive(self):
+        close = closes(500)
+        values = close.tolist()
+
+        sma = indicators.sma(close, 20)
+        self.assertTrue(np.isnan(sma[:19]).all())
+        for i in range(19, len(values)):
+            self.assertAlmostEqual(sma[i], sum(values[i - 19:i + 1]) / 20, delta=1e-6)
+
+        np.testing.assert_allclose(indicators.ema(close, 12), _naive_ema(values, 12), equal_nan=True)
+        np.testing.assert_allclose(indicators.rsi(close, 14), _naive_rsi(values, 14), equal_nan=True)
+
+        line, signal, hist = indicators.macd(close)
+        np.testing.assert_allclose(line, np.array(_naive_ema(values, 12)) - np.array(_naive_ema(values, 26)),
+                                   equal_nan=True)
+        self.assertTrue(np.isnan(signal[:33]).all())
+        self.assertFalse(np.isnan(signal[33]))
+        np.testing.assert_allclose(hist, line - signal, equal_nan=True)
+
+        middle, upper, lower = indicators.bollinger(close, 20, 2.0)
+        window = close[-20:]
+        self.assertAlmostEqual(middle[-1], window.mean(), delta=1e-6)
+        self.assertAlmostEqual(upper[-1], window.mean() + 2 * window.std(), delta=1e-6)
+        self.assertAlmostEqual(lower[-1], window.mean() - 2 * window.std(), delta=1e-6)
+
+    def test_backtest_metrics(self):
+        # Tăng đều: sma_cross luôn giữ vị thế sau khi đủ dữ liệu, không có drawdown
+        rising = np.linspace(10000, 20000, 300)
+        result = indicators.run_backtest(rising, 'sma_cross', {'fast': 5, 'slow': 20}, fee_rate=0.0)
+        self.assertEqual(result['trades'], 1)
+        self.assertEqual(result['win_rate'], 1.0)
+        self.assertAlmostEqual(result['max_drawdown'], 0.0)
+        held = rising[19:]
+        self.assertAlmostEqual(result['total_return'], held[-1] / held[0] - 1)
+
+        # Giảm đều: không bao giờ vào lệnh
+        flat = indicators.run_backtest(rising[::-1], 'sma_cross', fee_rate=0.0)
+        self.assertEqual(flat['trades'], 0)
+        self.assertEqual(flat['total_return'], 0.0)
+
+        for strategy in indicators.STRATEGIES:
+            result = indicators.run_backtest(closes(800), strategy)
+            self.assertTrue(-1.0 <= result['max_drawdown'] <= 0.0)
+            self.assertTrue(0.0 <= result['exposure'] <= 1.0)
+            self.assertEqual(result['bars'], 800)
+
+        self.assertEqual(indicators.run_backtest([25000.0], 'rsi')['trades'], 0)
+        with self.assertRaises(ValueError):
+            indicators.normalize_params('sma_cross', {'fast': 50, 'slow': 20})
+        with self.assertRaises(ValueError):
+            indicators.normalize_params('unknown')
+
+    def test_params_key_is_stable(self):
+        a = indicators.params_key('sma_cross', {'slow': 30, 'fast': 10}, date_from='2024-01-01')
+        b = indicators.params_key('sma_cross', {}, date_from='2024-01-01')
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, indicators.params_key('sma_cross', {'fast': 5}))
+
+    def test_result_cache_lru(self):
+        cache = indicators.ResultCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_run_many_parallel_matches_sequential(self):
+        series = {i: closes(600, seed=i) for i in range(40)}
+        sequential = indicators.run_many(series, 'macd', max_workers=1)
+        parallel = indicators.run_many(series, 'macd', max_workers=2, min_parallel=1)
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(indicators.run_many({}, 'macd'), {})
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import BaseCase
+
+from ..utils import job_queue
+
+INT4_MIN, INT4_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class TestJobQueue(BaseCase):
+
+    def test_advisory_key_is_stable_int4(self):
+        names = ['ssi.fetch.securities_all', 'ssi.fetch.fetch_all_ohlc', 'ssi.fetch.realtime_ohlc',
+                 'ssi.securities.sync_prices']
+        keys = {}
+        for name in names:
+            for slot in range(4):
+                namespace, key = job_queue.advisory_key(name, slot)
+                self.assertEqual(namespace, job_queue.LOCK_NAMESPACE)
+                self.assertTrue(INT4_MIN <= key <= INT4_MAX)
+                keys[(name, slot)] = key
+        # Cùng tên + slot -> cùng khoá giữa các process; khác slot/tên -> khác khoá
+        self.assertEqual(job_queue.advisory_key(names[0], 0), job_queue.advisory_key(names[0]))
+        self.assertEqual(len(set(keys.values())), len(keys))
+
+    def test_ema(self):
+        self.assertEqual(job_queue.ema(None, 12.0, 0), 12.0)
+        self.assertEqual(job_queue.ema(10.0, 20.0, 0), 20.0)
+        self.assertAlmostEqual(job_queue.ema(10.0, 20.0, 5), 12.0)
+        avg = None
+        for count, duration in enumerate([5.0] * 50):
+            avg = job_queue.ema(avg, duration, count)
+        self.assertAlmostEqual(avg, 5.0)
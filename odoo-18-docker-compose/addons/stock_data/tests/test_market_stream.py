@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import threading
+from datetime import date
+
+from odoo.tests.common import BaseCase
+
+from ..utils import market_stream
+from .common import SYMBOLS, stream_messages
+
+
+class TestMarketStream(BaseCase):
+
+    def test_coalescer_keeps_latest_state(self):
+        coalescer = market_stream.TickCoalescer()
+        messages = stream_messages(2_000)
+        for message in messages:
+            coalescer.add_message(message, today=date(2024, 1, 2))
+        batch = coalescer.drain()
+
+        self.assertEqual(len(coalescer), 0)
+        self.assertLessEqual({q['symbol'] for q in batch['quotes']}, set(SYMBOLS))
+        # Mỗi mã chỉ giữ snapshot cuối cùng
+        last_quote = {}
+        for message in messages:
+            data_type, content = market_stream.parse_stream_message(message)
+            if data_type == market_stream.QUOTE:
+                last_quote[content['Symbol']] = content['LastPrice']
+        self.assertEqual({q['symbol']: q['last_price'] for q in batch['quotes']}, last_quote)
+        self.assertTrue(all(q['trading_date'] == date(2024, 1, 2) for q in batch['quotes']))
+        self.assertEqual(len({(b['symbol'], b['date'], b['time']) for b in batch['bars']}), len(batch['bars']))
+
+    def test_parse_rejects_invalid_messages(self):
+        self.assertEqual(market_stream.parse_stream_message('not json'), (None, None))
+        self.assertEqual(market_stream.parse_stream_message({'DataType': 'X', 'Content': '{}'}), (None, None))
+        self.assertEqual(market_stream.parse_stream_message({'DataType': 'Z', 'Content': '{"Symbol": "ACB"}'}),
+                         (None, None))
+
+    def test_worker_flushes_replayed_stream(self):
+        messages = stream_messages(1_000)
+        batches = []
+        done = threading.Event()
+
+        def flush(batch):
+            batches.append(batch)
+            done.set()
+
+        worker = market_stream.StreamWorker(
+            lambda channel: market_stream.ReplayMarketDataStream(messages=messages),
+            flush, flush_ms=50, today=lambda: date(2024, 1, 2))
+        worker.start()
+        for stream in worker.streams:
+            stream.join(5)
+        self.assertTrue(done.wait(5))
+        worker.stop()
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(worker.errors, 0)
+        self.assertGreaterEqual(sum(len(b['quotes']) for b in batches), 1)
+        # Coalescing: số bản ghi ghi xuống ít hơn nhiều so với số tick nhận được
+        written = sum(len(b['quotes']) + len(b['bars']) + len(b['rooms']) for b in batches)
+        self.assertEqual(worker.coalescer.received, len(messages))
+        self.assertLess(written, len(messages))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import json
+
+from odoo.tests.common import BaseCase
+
+from ..utils import ohlc_series
+from .common import minute_bars
+
+
+class TestOhlcSeries(BaseCase):
+
+    def test_parse_resolution(self):
+        self.assertEqual(ohlc_series.parse_resolution(None, '1D'), 1)
+        self.assertEqual(ohlc_series.parse_resolution('', '5D'), 15)
+        self.assertEqual(ohlc_series.parse_resolution(None, '1Y'), ohlc_series.DAILY)
+        self.assertEqual(ohlc_series.parse_resolution('1h'), 60)
+        self.assertEqual(ohlc_series.parse_resolution('5m'), 5)
+        self.assertEqual(ohlc_series.parse_resolution('D'), ohlc_series.DAILY)
+        # Độ phân giải không được tổng hợp sẵn -> daily
+        self.assertEqual(ohlc_series.parse_resolution('7'), ohlc_series.DAILY)
+
+    def test_columns_round_trip(self):
+        rows = minute_bars(500)
+        columns = ohlc_series.pack_columns(rows)
+        self.assertEqual(list(columns), list(ohlc_series.COLUMNS))
+        self.assertEqual(len(columns['t']), 500)
+        self.assertEqual(ohlc_series.unpack_rows(columns), [dict(zip(ohlc_series.COLUMNS, row)) for row in rows])
+        self.assertEqual(ohlc_series.pack_columns([]), {name: [] for name in ohlc_series.COLUMNS})
+
+    def test_columns_payload_is_smaller(self):
+        rows = minute_bars(250 * 270)  # ~1 năm nến 1 phút
+        columns = ohlc_series.pack_columns(rows)
+        compact = json.dumps(columns, separators=(',', ':'))
+        legacy = json.dumps(ohlc_series.unpack_rows(columns))
+        self.assertLess(len(compact), len(legacy) * 0.75)
+
+    def test_touched_hours(self):
+        vals_list = [
+            {'security_id': 1, 'date': '2024-01-02', 'time': '09:15', 'resolution': 1},
+            {'security_id': 1, 'date': '2024-01-02', 'time': '09:59:00', 'resolution': 1},
+            {'security_id': 1, 'date': '2024-01-02', 'time': '10:00'},
+            {'security_id': 2, 'date': '2024-01-02', 'time': '14:30', 'resolution': 5},
+            {'security_id': 2, 'date': '2024-01-02', 'time': 'ATC', 'resolution': 1},
+            {'security_id': 3, 'date': False, 'time': '09:00', 'resolution': 1},
+        ]
+        # Chỉ các giờ có nến 1 phút hợp lệ; nến khác độ phân giải / time lạ bị bỏ qua
+        self.assertEqual(ohlc_series.touched_hours(vals_list), {(1, '2024-01-02', 9), (1, '2024-01-02', 10)})
@@ -1,3 +1,9 @@
+from . import client_pool
+from . import fetch_executor
+from . import indicators
+from . import job_queue
 from . import utils
+from . import market_stream
+from . import ohlc_series
 
 
@@ -0,0 +1,61 @@
+"""
+Registry client SSI FastConnect Data dùng chung trong process (không phụ thuộc Odoo).
+
+Mỗi MarketDataClient tự xác thực ở request đầu tiên và giữ access token trong instance.
+Dùng lại cùng một client theo (database, config id) giúp các cron/wizard không phải
+xin token mới mỗi lần chạy; client được tạo lại khi token gần hết hạn hoặc khi
+thông tin đăng nhập (fingerprint) thay đổi.
+"""
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# SSI cấp token có hạn dùng; làm mới sớm hơn để không gọi API bằng token vừa hết hạn
+DEFAULT_TOKEN_TTL = 3600
+
+
+class ClientPool:
+    """
+    Args:
+        factory: hàm(config) -> client mới
+        ttl: số giây dùng lại một client (thời gian sống của token)
+    """
+
+    def __init__(self, factory, ttl=DEFAULT_TOKEN_TTL, clock=time.monotonic):
+        self.factory = factory
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fingerprint, config, ttl=None):
+        """Client đang dùng của key, hoặc tạo mới nếu chưa có / hết hạn / đổi fingerprint"""
+        ttl = self.ttl if ttl is None else ttl
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['fingerprint'] == fingerprint and now - entry['created'] < ttl:
+                entry['hits'] += 1
+                return entry['client']
+            # Tạo trong lock: các luồng cùng key chờ nhau thay vì cùng xin token
+            client = self.factory(config)
+            self._entries[key] = {'client': client, 'fingerprint': fingerprint, 'created': now, 'hits': 0}
+        _logger.info("SSI client %s: %s", key, 'renewed' if entry else 'created')
+        return client
+
+    def invalidate(self, predicate=None):
+        """Bỏ các client có key thoả predicate (None = tất cả) -> lần gọi sau xác thực lại"""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {key: entry['hits'] for key, entry in self._entries.items()}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,160 @@
+"""
+Thực thi song song các request REST tới SSI FastConnect Data (không phụ thuộc Odoo).
+
+- TokenBucket: giới hạn số request/giây theo quota của SSI (dùng chung giữa các luồng / executor)
+- FetchExecutor: thread pool có giới hạn, retry với backoff + jitter, gom kết quả theo key;
+  FetchExecutor.request lấy token cho từng request SDK khi một item cần nhiều request (phân trang)
+
+Hàm fetch chỉ được gọi API và trả về dữ liệu thuần (dict/list); việc ghi DB phải thực hiện
+sau đó trên luồng giữ cursor của Odoo.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_PER_SEC = 5.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+
+class TokenBucket:
+    """Token bucket thread-safe: acquire() chờ cho tới khi có token"""
+
+    def __init__(self, rate_per_sec, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate_per_sec or 0)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Sai số float khi nạp lại: coi như đủ token nếu chỉ thiếu rất ít
+                if self._tokens >= tokens - 1e-9:
+                    self._tokens = max(0.0, self._tokens - tokens)
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+def is_rate_limited(response):
+    """Response của SDK báo vượt quota (HTTP 429 / thông báo 'limit')"""
+    if not isinstance(response, dict):
+        return False
+    status = str(response.get('status') or response.get('statusCode') or '')
+    message = str(response.get('message') or '').lower()
+    return status in ('429', 'TooManyRequests') or 'too many' in message or 'rate limit' in message
+
+
+class RateLimitedError(RuntimeError):
+    """Request SDK bị giới hạn quota giữa chừng: cả item được thử lại thay vì trả về dữ liệu dở dang"""
+
+
+class FetchResult:
+    __slots__ = ('key', 'value', 'error', 'attempts')
+
+    def __init__(self, key, value=None, error=None, attempts=0):
+        self.key = key
+        self.value = value
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class FetchExecutor:
+    """
+    Chạy fetch(item) cho nhiều item song song, mỗi item lấy `item_tokens` token từ bucket.
+
+    Item gửi nhiều request SDK (phân trang, nhiều endpoint) dùng item_tokens=0 và gọi từng
+    request qua request(): mỗi request lấy một token, request bị giới hạn quota làm cả item
+    được thử lại. Bucket có thể dùng chung giữa nhiều executor (nhiều job trong cùng process).
+
+    Lỗi (exception) hoặc response bị giới hạn quota được thử lại tối đa `retries` lần
+    với backoff luỹ thừa + jitter. Kết quả trả về đúng thứ tự item đầu vào.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, rate_per_sec=DEFAULT_RATE_PER_SEC, burst=None,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, retry_if=is_rate_limited, sleep=time.sleep,
+                 bucket=None, item_tokens=1):
+        self.max_workers = max(1, int(max_workers or 1))
+        self.bucket = bucket if bucket is not None else TokenBucket(rate_per_sec, capacity=burst, sleep=sleep)
+        self.item_tokens = item_tokens
+        self.retries = max(0, int(retries or 0))
+        self.backoff = float(backoff or 0)
+        self.retry_if = retry_if
+        self._sleep = sleep
+
+    def _delay(self, attempt):
+        # Full jitter: tránh các luồng thử lại cùng lúc
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def request(self, func, *args, **kwargs):
+        """
+        Một request SDK trong fetch: lấy một token rồi gọi func.
+
+        Raises:
+            RateLimitedError: response bị giới hạn quota (item được thử lại từ đầu)
+        """
+        self.bucket.acquire()
+        response = func(*args, **kwargs)
+        if self.retry_if and self.retry_if(response):
+            raise RateLimitedError('rate limited')
+        return response
+
+    def call(self, fetch, item, key=None):
+        attempt = 0
+        while True:
+            if self.item_tokens:
+                self.bucket.acquire(self.item_tokens)
+            try:
+                value = fetch(item)
+                if attempt < self.retries and self.retry_if and self.retry_if(value):
+                    raise RateLimitedError('rate limited')
+                return FetchResult(key, value=value, attempts=attempt + 1)
+            except Exception as e:  # noqa: BLE001 - gom lỗi vào kết quả
+                if attempt >= self.retries:
+                    return FetchResult(key, error=e, attempts=attempt + 1)
+                self._sleep(self._delay(attempt))
+                attempt += 1
+
+    def map(self, fetch, items, key=None):
+        """
+        Args:
+            fetch: hàm nhận một item, chỉ gọi API (không dùng cursor/ORM)
+            items: danh sách dữ liệu thuần (id, symbol, market...)
+            key: hàm lấy key của item (mặc định chính item)
+
+        Returns:
+            list[FetchResult]
+        """
+        items = list(items)
+        key = key or (lambda item: item)
+        if not items:
+            return []
+        if self.max_workers == 1 or len(items) == 1:
+            return [self.call(fetch, item, key(item)) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)), thread_name_prefix='ssi-fetch') as pool:
+            futures = [pool.submit(self.call, fetch, item, key(item)) for item in items]
+            results = [future.result() for future in futures]
+        failed = sum(1 for r in results if not r.ok)
+        if failed:
+            _logger.warning("SSI fetch: %d/%d requests failed after retries", failed, len(results))
+        return results
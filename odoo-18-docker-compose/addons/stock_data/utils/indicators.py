@@ -0,0 +1,288 @@
+"""
+Chỉ báo kỹ thuật và backtest theo quy tắc trên chuỗi giá đóng cửa (NumPy, không phụ thuộc Odoo).
+
+- sma/ema/rsi/macd/bollinger: nhận mảng float, trả về mảng cùng độ dài (NaN khi chưa đủ dữ liệu)
+- run_backtest: chiến lược long-only, tín hiệu tại phiên t áp dụng cho lợi suất phiên t+1
+- run_many: chạy một chiến lược cho nhiều mã, song song bằng thread pool khi đủ lớn (các phép tính,
+  kể cả đệ quy EMA/RSI/MACD tính theo khối bằng nhân ma trận, chạy trong NumPy và nhả GIL)
+- ResultCache: cache kết quả theo (mã, tham số, phiên bản dữ liệu)
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+# Chiến lược hỗ trợ và tham số mặc định
+STRATEGIES = {
+    'sma_cross': {'fast': 10, 'slow': 30},
+    'ema_cross': {'fast': 12, 'slow': 26},
+    'rsi': {'period': 14, 'lower': 30.0, 'upper': 70.0},
+    'macd': {'fast': 12, 'slow': 26, 'signal': 9},
+    'bollinger': {'period': 20, 'k': 2.0},
+}
+DEFAULT_FEE_RATE = 0.0015
+# Ít mã hơn ngưỡng này thì chạy tuần tự (chi phí chia việc lớn hơn phần tính toán)
+MIN_PARALLEL = 16
+# Số phần tử mỗi khối khi tính EMA (_ewm_blocks)
+EWM_BLOCK = 64
+# Số luồng tối đa của run_many: chạy trong request HTTP của Odoo, không chiếm hết CPU của worker
+MAX_WORKERS = 4
+
+
+def _as_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def sma(values, period):
+    values = _as_array(values)
+    result = np.full(values.shape, np.nan)
+    if period <= 0 or len(values) < period:
+        return result
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    result[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return result
+
+
+def _ewm(values, alpha, period):
+    """Trung bình trượt luỹ thừa, khởi tạo bằng SMA của `period` giá trị hợp lệ đầu tiên"""
+    values = _as_array(values)
+    result = np.full(values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if period <= 0 or len(valid) < period:
+        return result
+    start = valid[0] + period - 1
+    avg = values[valid[0]:start + 1].mean()
+    result[start] = avg
+    tail = values[start + 1:]
+    gaps = np.flatnonzero(np.isnan(tail))
+    if gaps.size:
+        # NaN giữa chuỗi: như phép đệ quy, mọi giá trị từ đó trở đi là NaN
+        tail = tail[:gaps[0]]
+    if tail.size:
+        result[start + 1:start + 1 + tail.size] = _ewm_blocks(tail, alpha, avg)
+    return result
+
+
+def _ewm_blocks(values, alpha, initial):
+    """
+    y[i] = y[i-1] + alpha * (x[i] - y[i-1]) với y[-1] = initial, tính theo khối EWM_BLOCK phần tử:
+    phần trong khối là một phép nhân ma trận, chỉ giá trị cuối mỗi khối được nối tiếp bằng vòng lặp Python
+    """
+    decay = 1.0 - alpha
+    size = len(values)
+    block = min(EWM_BLOCK, size)
+    blocks = -(-size // block)
+    padded = np.zeros(blocks * block)
+    padded[:size] = values
+    # weights[i, j] = alpha * decay^(i - j) với j <= i: EMA trong khối khi bắt đầu từ 0
+    lag = np.arange(block)
+    diff = lag[:, None] - lag[None, :]
+    weights = np.where(diff >= 0, alpha * decay ** np.maximum(diff, 0), 0.0)
+    local = padded.reshape(blocks, block) @ weights.T
+    # Phần đóng góp của giá trị cuối khối trước: carry * decay^(i + 1)
+    carry_decay = decay ** (lag + 1.0)
+    carries = np.empty(blocks)
+    carry = initial
+    for b in range(blocks):
+        carries[b] = carry
+        carry = carry * carry_decay[-1] + local[b, -1]
+    return (local + carries[:, None] * carry_decay).ravel()[:size]
+
+
+def ema(values, period):
+    return _ewm(values, 2.0 / (period + 1), period)
+
+
+def rsi(close, period=14):
+    """RSI Wilder"""
+    close = _as_array(close)
+    result = np.full(close.shape, np.nan)
+    if len(close) <= period:
+        return result
+    delta = np.diff(close)
+    avg_gain = _ewm(np.clip(delta, 0, None), 1.0 / period, period)
+    avg_loss = _ewm(np.clip(-delta, 0, None), 1.0 / period, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        value = 100.0 - 100.0 / (1.0 + rs)
+    # Không có phiên giảm -> 100
+    value = np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, value)
+    result[1:] = value
+    return result
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """(đường MACD, đường tín hiệu, histogram)"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, period=20, k=2.0):
+    """(dải giữa, dải trên, dải dưới); độ lệch chuẩn tổng thể như đa số nền tảng biểu đồ"""
+    close = _as_array(close)
+    middle = sma(close, period)
+    std = np.full(close.shape, np.nan)
+    if 0 < period <= len(close):
+        std[period - 1:] = np.lib.stride_tricks.sliding_window_view(close, period).std(axis=1)
+    return middle, middle + k * std, middle - k * std
+
+
+def _hold(enter, exit_):
+    """Vị thế 0/1 có trạng thái: vào khi enter, giữ tới khi exit (vector hoá bằng forward-fill)"""
+    state = np.where(enter, 1.0, np.where(exit_, 0.0, np.nan))
+    idx = np.where(~np.isnan(state), np.arange(len(state)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    position = state[idx]
+    return np.nan_to_num(position, nan=0.0)
+
+
+def normalize_params(strategy, params=None):
+    """Tham số đầy đủ (mặc định + ghi đè) của chiến lược; ValueError nếu chiến lược/tham số sai"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {strategy}')
+    merged = dict(STRATEGIES[strategy])
+    for key, value in (params or {}).items():
+        if key not in merged:
+            raise ValueError(f'Unknown parameter for {strategy}: {key}')
+        merged[key] = type(merged[key])(value)
+    if 'fast' in merged and merged['fast'] >= merged['slow']:
+        raise ValueError('fast period must be shorter than slow period')
+    return merged
+
+
+def params_key(strategy, params, **extra):
+    """Chuỗi ổn định đại diện cho (chiến lược, tham số, tuỳ chọn khác) dùng làm khoá cache"""
+    return json.dumps([strategy, normalize_params(strategy, params), extra], sort_keys=True, default=str)
+
+
+def positions(close, strategy, params=None):
+    """Vị thế 0/1 tại cuối mỗi phiên theo chiến lược"""
+    p = normalize_params(strategy, params)
+    close = _as_array(close)
+    with np.errstate(invalid='ignore'):
+        if strategy == 'sma_cross':
+            return (sma(close, p['fast']) > sma(close, p['slow'])).astype(np.float64)
+        if strategy == 'ema_cross':
+            return (ema(close, p['fast']) > ema(close, p['slow'])).astype(np.float64)
+        if strategy == 'macd':
+            line, signal_line, _hist = macd(close, p['fast'], p['slow'], p['signal'])
+            return (line > signal_line).astype(np.float64)
+        if strategy == 'rsi':
+            value = rsi(close, p['period'])
+            return _hold(value < p['lower'], value > p['upper'])
+        # bollinger: mua khi đóng cửa dưới dải dưới, bán khi về trên dải giữa
+        middle, _upper, lower = bollinger(close, p['period'], p['k'])
+        return _hold(close < lower, close > middle)
+
+
+def run_backtest(close, strategy, params=None, fee_rate=DEFAULT_FEE_RATE):
+    """
+    Backtest long-only trên giá đóng cửa.
+
+    Returns:
+        dict: total_return, annual_return, max_drawdown, sharpe, trades, win_rate, exposure, bars
+    """
+    close = _as_array(close)
+    close = close[~np.isnan(close) & (close > 0)]
+    result = {'bars': int(len(close)), 'total_return': 0.0, 'annual_return': 0.0, 'max_drawdown': 0.0,
+              'sharpe': 0.0, 'trades': 0, 'win_rate': 0.0, 'exposure': 0.0}
+    if len(close) < 2:
+        return result
+
+    held = positions(close, strategy, params)[:-1]
+    returns = close[1:] / close[:-1] - 1.0
+    turnover = np.abs(np.diff(np.insert(held, 0, 0.0)))
+    strat = held * returns - turnover * fee_rate
+    equity = np.cumprod(1.0 + strat)
+    peak = np.maximum.accumulate(np.insert(equity, 0, 1.0))[1:]
+
+    # Lợi suất từng giao dịch: cộng log-return theo mã giao dịch (mỗi lần vào lệnh là một mã mới)
+    entries = np.diff(np.insert(held, 0, 0.0)) > 0
+    trade_ids = np.cumsum(entries)
+    in_trade = held > 0
+    trades = int(entries.sum())
+    win_rate = 0.0
+    if trades:
+        log_ret = np.log1p(strat[in_trade])
+        per_trade = np.bincount(trade_ids[in_trade] - 1, weights=log_ret, minlength=trades)
+        win_rate = float((per_trade > 0).mean())
+
+    total = float(equity[-1] - 1.0)
+    std = strat.std()
+    result.update({
+        'total_return': total,
+        'annual_return': float((1.0 + total) ** (TRADING_DAYS / len(strat)) - 1.0) if total > -1 else -1.0,
+        'max_drawdown': float((equity / peak - 1.0).min()),
+        'sharpe': float(strat.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+        'trades': trades,
+        'win_rate': win_rate,
+        'exposure': float(in_trade.mean()),
+    })
+    return result
+
+
+def _run_one(args):
+    key, close, strategy, params, fee_rate = args
+    return key, run_backtest(close, strategy, params, fee_rate)
+
+
+def run_many(series, strategy, params=None, fee_rate=DEFAULT_FEE_RATE, max_workers=None, min_parallel=MIN_PARALLEL):
+    """
+    Chạy cùng một chiến lược cho nhiều chuỗi giá.
+
+    Args:
+        series: dict key -> mảng giá đóng cửa
+        max_workers: số luồng (None -> min(MAX_WORKERS, số CPU)); <= 1 hoặc ít chuỗi hơn
+            min_parallel -> chạy tuần tự
+
+    Returns:
+        dict key -> kết quả run_backtest
+    """
+    normalize_params(strategy, params)  # báo lỗi tham số trước khi chia việc
+    tasks = [(key, close, strategy, params, fee_rate) for key, close in series.items()]
+    if not tasks:
+        return {}
+    if (max_workers is not None and max_workers <= 1) or len(tasks) < min_parallel:
+        return dict(map(_run_one, tasks))
+    # Thread pool thay vì fork process: fork một process Odoo nhiều luồng có thể sao chép lock
+    # đang bị giữ và kết nối DB đang mở. Mọi chiến lược tính bằng phép toán NumPy trên cả mảng (EMA theo
+    # khối, xem _ewm_blocks) nên phần lớn thời gian nhả GIL và các luồng chạy song song
+    max_workers = min(max_workers or MAX_WORKERS, os.cpu_count() or 1, len(tasks))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ssi-backtest') as pool:
+        return dict(pool.map(_run_one, tasks))
+
+
+class ResultCache:
+    """LRU kết quả backtest theo (key chuỗi, params_key, phiên bản dữ liệu)"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,31 @@
+"""
+Điều phối job đồng bộ SSI giữa các worker Odoo (không phụ thuộc Odoo).
+
+- advisory_key: khoá pg_try_advisory_lock(int4, int4) ổn định theo tên job và slot
+- ema: thời gian chạy trung bình trượt của một job
+"""
+import zlib
+
+# Namespace cho tham số thứ nhất của pg advisory lock (tránh đụng khoá của module khác)
+LOCK_NAMESPACE = 0x55D1  # "SSI"
+EMA_ALPHA = 0.2
+
+
+def _int4(value):
+    """uint32 -> int4 có dấu của PostgreSQL"""
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value >= 0x80000000 else value
+
+
+def advisory_key(name, slot=0):
+    """(namespace, key) cho pg_try_advisory_lock; slot > 0 dùng cho job chạy song song nhiều shard"""
+    raw = name if not slot else f'{name}#{slot}'
+    return LOCK_NAMESPACE, _int4(zlib.crc32(raw.encode('utf-8')))
+
+
+def ema(previous, value, count, alpha=EMA_ALPHA):
+    """Trung bình trượt luỹ thừa; lần chạy đầu tiên lấy chính giá trị"""
+    if not count or previous is None:
+        return float(value)
+    return float(previous) * (1 - alpha) + float(value) * alpha
+
@@ -0,0 +1,301 @@
+"""
+Streaming market data (SSI FastConnect Data hub) - phần lõi không phụ thuộc Odoo.
+
+- parse_stream_message: giải mã message của MarketDataStream (DataType/Content)
+- TickCoalescer: gộp tick theo mã, chỉ giữ trạng thái mới nhất giữa hai lần flush
+- ReplayMarketDataStream: stub phát lại message từ file/list, cùng interface với MarketDataStream
+- StreamWorker: luồng nền nối stream -> coalescer -> hàm flush theo chu kỳ N ms
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+_logger = logging.getLogger(__name__)
+
+QUOTE = 'X'
+BAR = 'B'
+ROOM = 'R'
+DEFAULT_CHANNELS = ('X:ALL', 'B:ALL', 'R:ALL')
+
+
+def _val(payload, *keys, default=None):
+    for key in keys:
+        value = payload.get(key)
+        if value not in (None, ''):
+            return value
+    return default
+
+
+def _num(payload, *keys, default=0.0):
+    value = _val(payload, *keys)
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_date(value):
+    """'dd/mm/yyyy' hoặc 'yyyy-mm-dd' -> date (None nếu không hợp lệ)"""
+    if not value:
+        return None
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(value)[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_stream_message(message):
+    """
+    Giải mã message từ hub: {"DataType": "X", "Content": "{...}"} (Content có thể là chuỗi JSON).
+
+    Returns:
+        tuple: (data_type, content dict) hoặc (None, None) nếu không hợp lệ
+    """
+    if isinstance(message, (str, bytes)):
+        try:
+            message = json.loads(message)
+        except ValueError:
+            return None, None
+    if not isinstance(message, dict):
+        return None, None
+    content = message.get('Content', message)
+    if isinstance(content, (str, bytes)):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            return None, None
+    if not isinstance(content, dict):
+        return None, None
+    data_type = (message.get('DataType') or content.get('RType') or '').upper()[:1]
+    if data_type not in (QUOTE, BAR, ROOM) or not content.get('Symbol'):
+        return None, None
+    return data_type, content
+
+
+class TickCoalescer:
+    """
+    Gộp tick theo mã chứng khoán giữa hai lần flush (thread-safe).
+
+    - X (giá khớp/bảng giá): giữ snapshot mới nhất mỗi mã
+    - B (nến 1 phút): giữ nến mới nhất theo (mã, ngày, giờ)
+    - R (room nước ngoài): giữ snapshot mới nhất mỗi mã
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quotes = {}
+        self._bars = {}
+        self._rooms = {}
+        self.received = 0
+
+    def __len__(self):
+        return len(self._quotes) + len(self._bars) + len(self._rooms)
+
+    def add(self, data_type, content, today=None):
+        symbol = str(content.get('Symbol') or '').strip().upper()
+        if not symbol:
+            return
+        with self._lock:
+            self.received += 1
+            if data_type == QUOTE:
+                self._quotes[symbol] = self._quote(symbol, content)
+            elif data_type == BAR:
+                bar = self._bar(symbol, content, today)
+                if bar['time']:
+                    self._bars[(symbol, bar['date'], bar['time'])] = bar
+            elif data_type == ROOM:
+                self._rooms[symbol] = self._room(symbol, content)
+
+    def add_message(self, message, today=None):
+        data_type, content = parse_stream_message(message)
+        if data_type:
+            self.add(data_type, content, today=today)
+        return data_type
+
+    def drain(self):
+        """Lấy toàn bộ trạng thái đã gộp và làm rỗng bộ đệm"""
+        with self._lock:
+            batch = {
+                'quotes': list(self._quotes.values()),
+                'bars': list(self._bars.values()),
+                'rooms': list(self._rooms.values()),
+            }
+            self._quotes, self._bars, self._rooms = {}, {}, {}
+        return batch
+
+    @staticmethod
+    def _quote(symbol, c):
+        last_price = _num(c, 'LastPrice', 'MatchPrice', 'Close')
+        return {
+            'symbol': symbol,
+            'trading_date': _parse_date(_val(c, 'TradingDate')),
+            'reference_price': _num(c, 'RefPrice', 'ReferencePrice'),
+            'ceiling_price': _num(c, 'Ceiling', 'CeilingPrice'),
+            'floor_price': _num(c, 'Floor', 'FloorPrice'),
+            'current_price': last_price,
+            'last_price': last_price,
+            'high_price': _num(c, 'Highest', 'High', 'HighPrice'),
+            'low_price': _num(c, 'Lowest', 'Low', 'LowPrice'),
+            'volume': _num(c, 'TotalVol', 'TotalVolume', 'Volume'),
+        }
+
+    @staticmethod
+    def _bar(symbol, c, today=None):
+        return {
+            'symbol': symbol,
+            'date': _parse_date(_val(c, 'TradingDate')) or today,
+            'time': str(_val(c, 'TradingTime', 'Time', default='') or ''),
+            'open_price': _num(c, 'Open'),
+            'high_price': _num(c, 'High'),
+            'low_price': _num(c, 'Low'),
+            'close_price': _num(c, 'Close'),
+            'volume': _num(c, 'Volume'),
+            'total_value': _num(c, 'Value', 'TotalValue'),
+        }
+
+    @staticmethod
+    def _room(symbol, c):
+        return {
+            'symbol': symbol,
+            'foreign_total_room': _num(c, 'TotalRoom'),
+            'foreign_current_room': _num(c, 'CurrentRoom'),
+            'foreign_buy_volume': _num(c, 'BuyVol'),
+            'foreign_sell_volume': _num(c, 'SellVol'),
+        }
+
+
+class ReplayMarketDataStream:
+    """
+    Stub phát lại message đã ghi (list hoặc file JSON lines) thay cho feed thật.
+    Cùng interface với ssi_fc_data.fc_md_stream.MarketDataStream: start(on_message, on_error, channel).
+    """
+
+    def __init__(self, messages=None, path=None, interval_ms=0, loop=False):
+        self._messages = list(messages or [])
+        self._path = path
+        self._interval = max(0, interval_ms) / 1000.0
+        self._loop = loop
+        self._stop = threading.Event()
+        self._thread = None
+        self.channel = None
+
+    def _load(self):
+        if self._messages or not self._path:
+            return self._messages
+        with open(self._path, encoding='utf-8') as fh:
+            return [line.strip() for line in fh if line.strip()]
+
+    def start(self, on_message, on_error, channel, *argv):
+        self.channel = channel
+        messages = self._load()
+        # Chỉ phát message thuộc kênh đã chọn (X:ALL -> mọi message X)
+        wanted = (channel or '').split(':')[0].upper()
+
+        def run():
+            try:
+                while not self._stop.is_set():
+                    for message in messages:
+                        if self._stop.is_set():
+                            return
+                        data_type, _content = parse_stream_message(message)
+                        if wanted and data_type != wanted:
+                            continue
+                        on_message(json.loads(message) if isinstance(message, str) else message)
+                        if self._interval:
+                            time.sleep(self._interval)
+                    if not self._loop:
+                        return
+            except Exception as e:  # noqa: BLE001 - chuyển lỗi về handler như SDK
+                on_error(e)
+
+        self._thread = threading.Thread(target=run, name='ssi-replay-stream', daemon=True)
+        self._thread.start()
+
+    def swith_channel(self, channel):
+        self.channel = channel
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class StreamWorker:
+    """
+    Luồng nền: nhận tick từ các stream, gộp bằng TickCoalescer và gọi flush(batch) mỗi flush_ms.
+
+    stream_factory(channel) trả về một đối tượng có start(on_message, on_error, channel).
+    flush(batch) chạy trên luồng của worker (tự mở cursor riêng phía Odoo).
+    """
+
+    def __init__(self, stream_factory, flush, channels=DEFAULT_CHANNELS, flush_ms=500, today=None):
+        self._stream_factory = stream_factory
+        self._flush = flush
+        self._channels = [c for c in channels if c]
+        self._flush_interval = max(50, int(flush_ms or 500)) / 1000.0
+        self._today = today or (lambda: datetime.now().date())
+        self._stop = threading.Event()
+        self._thread = None
+        self.coalescer = TickCoalescer()
+        self.streams = []
+        self.errors = 0
+        self.last_flush = None
+        self.last_error = None
+
+    def is_alive(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _on_message(self, message):
+        self.coalescer.add_message(message, today=self._today())
+
+    def _on_error(self, error):
+        self.errors += 1
+        self.last_error = str(error)
+        _logger.warning("SSI stream error: %s", error)
+
+    def start(self):
+        if self.is_alive():
+            return
+        self._stop.clear()
+        for channel in self._channels:
+            stream = self._stream_factory(channel)
+            stream.start(self._on_message, self._on_error, channel)
+            self.streams.append(stream)
+        self._thread = threading.Thread(target=self._run, name='ssi-stream-flush', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._flush_interval):
+            self.flush_now()
+        self.flush_now()
+
+    def flush_now(self):
+        if not len(self.coalescer):
+            return None
+        batch = self.coalescer.drain()
+        try:
+            result = self._flush(batch)
+            self.last_flush = time.time()
+            return result
+        except Exception as e:  # noqa: BLE001 - worker không được chết vì một lô lỗi
+            self._on_error(e)
+            return None
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for stream in self.streams:
+            stop = getattr(stream, 'stop', None)
+            if callable(stop):
+                try:
+                    stop()
+                except Exception as e:  # noqa: BLE001
+                    _logger.debug("Stop stream failed: %s", e)
+        if self._thread:
+            self._thread.join(timeout)
+        self.streams = []
@@ -0,0 +1,65 @@
+"""
+Chuỗi OHLC dạng cột cho biểu đồ (không phụ thuộc Odoo).
+
+Dữ liệu trả về cho client ở dạng mảng song song {t: [], o: [], h: [], l: [], c: [], v: []}
+thay vì mỗi nến một object.
+"""
+
+# Độ phân giải (phút) được tổng hợp sẵn trong ssi.ohlc.rollup; 'D' đọc trực tiếp ssi.daily.ohlc
+INTRADAY_RESOLUTIONS = (1, 5, 15, 60)
+DAILY = 'D'
+COLUMNS = ('t', 'o', 'h', 'l', 'c', 'v')
+
+# Độ phân giải mặc định theo khoảng thời gian của biểu đồ
+RANGE_RESOLUTION = {
+    '1D': 1,
+    '5D': 15,
+}
+
+
+def parse_resolution(value, range_key=None):
+    """'1'/'5'/'15'/'60'/'1h'/'D' (hoặc theo range) -> số phút hoặc 'D'"""
+    if value in (None, ''):
+        return RANGE_RESOLUTION.get((range_key or '').upper(), DAILY)
+    value = str(value).strip().upper()
+    if value in ('D', '1D', 'DAY'):
+        return DAILY
+    if value.endswith('H'):
+        value = str(int(value[:-1] or 1) * 60)
+    elif value.endswith('M'):
+        value = value[:-1]
+    try:
+        minutes = int(value)
+    except ValueError:
+        return DAILY
+    return minutes if minutes in INTRADAY_RESOLUTIONS else DAILY
+
+
+def pack_columns(rows):
+    """list tuple (t, o, h, l, c, v) -> dict mảng cột"""
+    if not rows:
+        return {name: [] for name in COLUMNS}
+    return {name: list(values) for name, values in zip(COLUMNS, zip(*rows))}
+
+
+def unpack_rows(columns):
+    """dict mảng cột -> list dict {t, o, h, l, c, v} (định dạng cũ của /fund_ohlc)"""
+    return [dict(zip(COLUMNS, values)) for values in zip(*(columns.get(name, []) for name in COLUMNS))]
+
+
+def touched_hours(vals_list):
+    """
+    Các giờ (security_id, 'YYYY-MM-DD', giờ) có nến 1 phút vừa ghi. Mọi bucket 1m/5m/15m/1h nằm
+    gọn trong một giờ, nên chỉ cần tính lại các giờ này thay vì cả ngày.
+    """
+    hours = set()
+    for vals in vals_list:
+        if int(vals.get('resolution') or 1) != 1 or not vals.get('security_id') or not vals.get('date'):
+            continue
+        try:
+            hour = int(str(vals.get('time') or '').split(':', 1)[0])
+        except ValueError:
+            continue
+        if 0 <= hour < 24:
+            hours.add((vals['security_id'], str(vals['date'])[:10], hour))
+    return hours
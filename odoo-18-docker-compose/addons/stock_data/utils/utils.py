@@ -1,13 +1,50 @@
-from odoo import api, models, _
+from odoo import api, models, tools, _
 from odoo.api import Environment, SUPERUSER_ID
 from odoo.exceptions import UserError
 import logging
 import threading
 from odoo import fields
+from .client_pool import ClientPool, DEFAULT_TOKEN_TTL
+from .fetch_executor import FetchExecutor, TokenBucket, DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_SEC, DEFAULT_RETRIES
 
 _logger = logging.getLogger(__name__)
 
 
+def _new_market_client(sdk_config):
+    from ssi_fc_data import fc_md_client
+    return fc_md_client.MarketDataClient(sdk_config), sdk_config
+
+
+# MarketDataClient dùng chung trong process theo (database, config id), xem get_market_client()
+_CLIENT_POOL = ClientPool(_new_market_client)
+
+# Token bucket dùng chung trong process theo database -> (rate, burst, bucket), xem get_fetch_executor().
+# Mỗi process Odoo có bucket riêng: quota của database được chia đều cho các process (_fetch_process_count)
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def _fetch_process_count():
+    """
+    Số process Odoo có thể cùng gọi API: chế độ prefork (workers > 0) gồm các HTTP worker
+    và cron worker (max_cron_threads); chế độ threaded chỉ có một process
+    """
+    workers = tools.config.get('workers') or 0
+    if workers <= 0:
+        return 1
+    return workers + max(tools.config.get('max_cron_threads') or 0, 0)
+
+
+def _shared_bucket(dbname, rate_per_sec, burst):
+    """Bucket chung của database; tạo lại khi đổi quota cấu hình"""
+    with _BUCKETS_LOCK:
+        entry = _BUCKETS.get(dbname)
+        if entry is None or entry[:2] != (rate_per_sec, burst):
+            entry = (rate_per_sec, burst, TokenBucket(rate_per_sec, capacity=burst))
+            _BUCKETS[dbname] = entry
+        return entry[2]
+
+
 MARKET_MAP = {
     'DERIVATIVES': 'DER',
     'DER': 'DER',
@@ -29,30 +66,71 @@ class SdkConfigBuilder(models.AbstractModel):
     _name = 'ssi.sdk.config.builder'
     _description = 'SDK Config Builder'
 
+    @tools.ormcache()
+    def _get_config_values(self):
+        """
+        Thông tin đăng nhập của cấu hình đang kích hoạt (cache theo registry,
+        bị xoá khi ssi.api.config đổi credential/URL, xem SSIApiConfig._CLIENT_FIELDS)
+        """
+        cfg_rec = self.env['ssi.api.config'].sudo().get_config()
+        if not cfg_rec:
+            return None
+        return (
+            cfg_rec.id,
+            (cfg_rec.consumer_id or '').strip(),
+            (cfg_rec.consumer_secret or '').strip(),
+            (cfg_rec.api_url or '').strip(),
+            (cfg_rec.stream_url or 'https://fc-datahub.ssi.com.vn/').strip(),
+        )
+
     @api.model
     def build(self):
-        cfg_rec = self.env['ssi.api.config'].get_config()
-        if not cfg_rec:
+        values = self._get_config_values()
+        if not values:
             raise UserError(_("Không tìm thấy cấu hình SSI API đang kích hoạt. Vui lòng kiểm tra cấu hình SSI API."))
-        
-        if not cfg_rec.consumer_id or not cfg_rec.consumer_id.strip():
+        _config_id, consumer_id, consumer_secret, api_url, stream_url = values
+
+        if not consumer_id:
             raise UserError(_("Consumer ID không được để trống. Vui lòng kiểm tra cấu hình SSI API."))
         
-        if not cfg_rec.consumer_secret or not cfg_rec.consumer_secret.strip():
+        if not consumer_secret:
             raise UserError(_("Consumer Secret không được để trống. Vui lòng kiểm tra cấu hình SSI API."))
         
-        if not cfg_rec.api_url or not cfg_rec.api_url.strip():
+        if not api_url:
             raise UserError(_("API URL không được để trống. Vui lòng kiểm tra cấu hình SSI API."))
         
         class Config:
             pass
         sdk_config = Config()
-        sdk_config.consumerID = cfg_rec.consumer_id.strip()
-        sdk_config.consumerSecret = cfg_rec.consumer_secret.strip()
-        sdk_config.url = cfg_rec.api_url.strip()
+        sdk_config.consumerID = consumer_id
+        sdk_config.consumerSecret = consumer_secret
+        sdk_config.url = api_url
+        sdk_config.stream_url = stream_url
         sdk_config.auth_type = 'Bearer'
         return sdk_config
 
+    @api.model
+    def get_market_client(self):
+        """
+        (client, sdk_config) dùng chung của cấu hình đang kích hoạt: token của client được giữ
+        tới khi hết hạn (ssi.client.token_ttl giây) thay vì xác thực lại ở mỗi cron/wizard.
+        """
+        # build() kiểm tra cấu hình (raise UserError như trước); chỉ đọc giá trị đã cache, không truy vấn DB
+        sdk_config = self.build()
+        values = self._get_config_values()
+        try:
+            ttl = int(self.env['ir.config_parameter'].sudo().get_param('ssi.client.token_ttl') or DEFAULT_TOKEN_TTL)
+        except ValueError:
+            ttl = DEFAULT_TOKEN_TTL
+        return _CLIENT_POOL.get((self.env.cr.dbname, values[0]), values, sdk_config, ttl=ttl)
+
+    @api.model
+    def invalidate_clients(self):
+        """Xoá cache cấu hình và client của database hiện tại (sau khi đổi credential)"""
+        dbname = self.env.cr.dbname
+        self.env.registry.clear_cache()
+        return _CLIENT_POOL.invalidate(lambda key: key[0] == dbname)
+
     @staticmethod
     def build_config(cfg_rec):
         """Build sdk_config from a given config record (static for direct calls)."""
@@ -78,10 +156,39 @@ class SdkConfigBuilder(models.AbstractModel):
         sdk_config.consumerID = consumer_id.strip()
         sdk_config.consumerSecret = consumer_secret.strip()
         sdk_config.url = api_url.strip()
+        sdk_config.stream_url = (getattr(cfg_rec, 'stream_url', None) or 'https://fc-datahub.ssi.com.vn/').strip()
         sdk_config.auth_type = 'Bearer'
         return sdk_config
 
+    @api.model
+    def get_fetch_executor(self):
+        """
+        Executor cho các job đồng bộ theo từng mã (quota cấu hình qua ir.config_parameter):
+        ssi.fetch.max_workers, ssi.fetch.rate_per_sec, ssi.fetch.burst, ssi.fetch.retries
 
-        
+        ssi.fetch.rate_per_sec / ssi.fetch.burst là quota của cả database: bucket chỉ dùng chung
+        giữa các cron/wizard trong một process, nên mỗi process nhận phần quota chia đều theo
+        _fetch_process_count(). Tổng tốc độ không vượt quota kể cả khi mọi worker cùng fetch, đổi lại
+        một process chạy một mình chỉ dùng phần của nó. Fetch gọi từng request SDK qua
+        executor.request() (một token cho mỗi request, kể cả từng trang).
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
 
+        def _param(key, default, cast):
+            try:
+                return cast(ICP.get_param(key) or default)
+            except (TypeError, ValueError):
+                return default
 
+        rate_per_sec = _param('ssi.fetch.rate_per_sec', DEFAULT_RATE_PER_SEC, float)
+        burst = _param('ssi.fetch.burst', 0, float) or None
+        processes = _fetch_process_count()
+        if processes > 1:
+            rate_per_sec /= processes
+            burst = max(1.0, burst / processes) if burst else None
+        return FetchExecutor(
+            max_workers=_param('ssi.fetch.max_workers', DEFAULT_MAX_WORKERS, int),
+            bucket=_shared_bucket(self.env.cr.dbname, rate_per_sec, burst),
+            item_tokens=0,
+            retries=_param('ssi.fetch.retries', DEFAULT_RETRIES, int),
+        )
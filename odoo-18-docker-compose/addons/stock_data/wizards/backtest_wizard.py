@@ -1,4 +1,6 @@
+import json
 import logging
+from markupsafe import escape
 from odoo import _
 from odoo.exceptions import UserError
 from ssi_fc_data import model
@@ -6,6 +8,9 @@ from ssi_fc_data import model
 
 _logger = logging.getLogger(__name__)
 
+# Số dòng tối đa hiển thị trong kết quả wizard
+LOCAL_RESULT_ROWS = 50
+
 
 def fetch_backtest(wizard, client, sdk_config):
     if not wizard.symbol:
@@ -29,4 +34,36 @@ def fetch_backtest(wizard, client, sdk_config):
     else:
         raise UserError(_("Failed to fetch backtest data: %s") % response.get('message', 'Unknown error'))
 
+def run_local_backtest(wizard):
+    """Backtest trên ssi.daily.ohlc đã lưu cho một/nhiều mã (symbol cách nhau dấu phẩy) hoặc cả thị trường"""
+    domain = [('is_active', '=', True)]
+    symbols = [s.strip().upper() for s in (wizard.symbol or '').split(',') if s.strip()]
+    if symbols:
+        domain.append(('symbol', 'in', symbols))
+    if wizard.market and wizard.market != 'ALL':
+        domain.append(('market', '=', wizard.market))
+    securities = wizard.env['ssi.securities'].search(domain)
+    if not securities:
+        raise UserError(_("No securities found for backtest"))
+
+    try:
+        params = json.loads(wizard.strategy_params) if wizard.strategy_params else {}
+    except ValueError:
+        raise UserError(_("Strategy parameters must be a JSON object, e.g. {\"fast\": 10, \"slow\": 30}"))
+
+    rows = wizard.env['ssi.backtest.engine'].run_backtest(
+        securities, wizard.strategy, params, date_from=wizard.from_date, date_to=wizard.to_date)
 
+    lines = ''.join(
+        f"<tr><td>{escape(r['symbol'])}</td><td>{r['total_return']:.2%}</td><td>{r['annual_return']:.2%}</td>"
+        f"<td>{r['max_drawdown']:.2%}</td><td>{r['sharpe']:.2f}</td><td>{r['trades']}</td>"
+        f"<td>{r['win_rate']:.0%}</td><td>{r['bars']}</td></tr>"
+        for r in rows[:LOCAL_RESULT_ROWS]
+    )
+    wizard.result_message = (
+        f"<p>Backtest {escape(wizard.strategy)} on {len(rows)} securities</p>"
+        "<table class='table table-sm'><thead><tr><th>Symbol</th><th>Return</th><th>Annual</th>"
+        "<th>Max DD</th><th>Sharpe</th><th>Trades</th><th>Win</th><th>Bars</th></tr></thead>"
+        f"<tbody>{lines}</tbody></table>"
+    )
+    wizard.last_count = len(rows)
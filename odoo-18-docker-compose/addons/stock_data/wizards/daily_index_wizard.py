@@ -8,6 +8,50 @@ from ssi_fc_data import model
 _logger = logging.getLogger(__name__)
 
 
+def _parse_index_date(item, fallback):
+    # Support both old (Date: YYYY-MM-DD) and new (TradingDate: dd/MM/YYYY)
+    date_str = item.get('TradingDate') or item.get('Date', '')
+    if not date_str:
+        return fallback
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except Exception:
+            continue
+    return fallback
+
+
+def _index_values(item, index_code, fallback_date):
+    return {
+        'index_code': item.get('IndexId', index_code),
+        'index_name': item.get('IndexName', index_code),
+        'exchange': item.get('Exchange', ''),
+        'date': _parse_index_date(item, fallback_date),
+        'index_value': float(item.get('IndexValue', 0.0) or 0.0),
+        'change': float(item.get('Change', 0.0) or 0.0),
+        'ratio_change': float(item.get('RatioChange', 0.0) or 0.0),
+        'total_trade': int(item.get('TotalTrade', 0) or 0),
+        'total_match_vol': float(item.get('TotalMatchVol', 0.0) or 0.0),
+        'total_match_val': float(item.get('TotalMatchVal', 0.0) or 0.0),
+        'total_deal_vol': float(item.get('TotalDealVol', 0.0) or 0.0),
+        'total_deal_val': float(item.get('TotalDealVal', 0.0) or 0.0),
+        'total_vol': float(item.get('TotalVol', 0.0) or 0.0),
+        'total_val': float(item.get('TotalVal', 0.0) or 0.0),
+        'advances': int(item.get('Advances', 0) or 0),
+        'no_changes': int(item.get('NoChanges', 0) or 0),
+        'declines': int(item.get('Declines', 0) or 0),
+        'ceilings': int(item.get('Ceilings', 0) or 0),
+        'floors': int(item.get('Floors', 0) or 0),
+        'trading_session': item.get('TradingSession', ''),
+        'time': item.get('Time', ''),
+        # compatibility fields
+        'close_value': float(item.get('IndexValue', 0.0) or 0.0),
+        'volume': float(item.get('TotalVol', 0.0) or 0.0),
+        'total_value': float(item.get('TotalVal', 0.0) or 0.0),
+        'change_percent': float(item.get('RatioChange', 0.0) or 0.0),
+    }
+
+
 def fetch_daily_index(wizard, client, sdk_config):
     if not wizard.symbol:
         index_model = wizard.env['ssi.index.list']
@@ -60,58 +104,9 @@ def fetch_daily_index(wizard, client, sdk_config):
                         items = response['data'] if isinstance(response['data'], list) else []
                         if not items:
                             break
-                        for item in items:
-                            # Support both old (Date: YYYY-MM-DD) and new (TradingDate: dd/MM/YYYY)
-                            date_str = item.get('TradingDate') or item.get('Date', '')
-                            if date_str:
-                                try:
-                                    try:
-                                        date_obj = datetime.strptime(date_str, '%d/%m/%Y').date()
-                                    except Exception:
-                                        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                                except Exception:
-                                    date_obj = wizard.from_date
-                            else:
-                                date_obj = wizard.from_date
-
-                            existing = daily_index_model.search([
-                                ('index_code', '=', idx.index_code),
-                                ('date', '=', date_obj)
-                            ], limit=1)
-
-                            values = {
-                                'index_code': item.get('IndexId', idx.index_code),
-                                'index_name': item.get('IndexName', idx.index_code),
-                                'exchange': item.get('Exchange', ''),
-                                'date': date_obj,
-                                'index_value': float(item.get('IndexValue', 0.0) or 0.0),
-                                'change': float(item.get('Change', 0.0) or 0.0),
-                                'ratio_change': float(item.get('RatioChange', 0.0) or 0.0),
-                                'total_trade': int(item.get('TotalTrade', 0) or 0),
-                                'total_match_vol': float(item.get('TotalMatchVol', 0.0) or 0.0),
-                                'total_match_val': float(item.get('TotalMatchVal', 0.0) or 0.0),
-                                'total_deal_vol': float(item.get('TotalDealVol', 0.0) or 0.0),
-                                'total_deal_val': float(item.get('TotalDealVal', 0.0) or 0.0),
-                                'total_vol': float(item.get('TotalVol', 0.0) or 0.0),
-                                'total_val': float(item.get('TotalVal', 0.0) or 0.0),
-                                'advances': int(item.get('Advances', 0) or 0),
-                                'no_changes': int(item.get('NoChanges', 0) or 0),
-                                'declines': int(item.get('Declines', 0) or 0),
-                                'ceilings': int(item.get('Ceilings', 0) or 0),
-                                'floors': int(item.get('Floors', 0) or 0),
-                                'trading_session': item.get('TradingSession', ''),
-                                'time': item.get('Time', ''),
-                                # compatibility fields
-                                'close_value': float(item.get('IndexValue', 0.0) or 0.0),
-                                'volume': float(item.get('TotalVol', 0.0) or 0.0),
-                                'total_value': float(item.get('TotalVal', 0.0) or 0.0),
-                                'change_percent': float(item.get('RatioChange', 0.0) or 0.0),
-                            }
-
-                            if existing:
-                                existing.write(values)
-                            else:
-                                daily_index_model.create(values)
+                        daily_index_model.bulk_upsert([
+                            _index_values(item, idx.index_code, wizard.from_date) for item in items
+                        ])
                     else:
                         break
                     current_page += 1
@@ -160,66 +155,14 @@ def fetch_daily_index(wizard, client, sdk_config):
 
     if response.get('status') == 'Success' and response.get('data'):
         daily_index_model = wizard.env['ssi.daily.index']
-        count = 0
-        updated = 0
-        created = 0
-
         items = response['data'] if isinstance(response['data'], list) else []
 
-        for item in items:
-            date_str = item.get('TradingDate') or item.get('Date', '')
-            if date_str:
-                try:
-                    try:
-                        date_obj = datetime.strptime(date_str, '%d/%m/%Y').date()
-                    except Exception:
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                except Exception:
-                    date_obj = wizard.from_date
-            else:
-                date_obj = wizard.from_date
-
-            existing = daily_index_model.search([
-                ('index_code', '=', wizard.symbol),
-                ('date', '=', date_obj)
-            ], limit=1)
-
-            values = {
-                'index_code': item.get('IndexId', wizard.symbol),
-                'index_name': item.get('IndexName', wizard.symbol),
-                'exchange': item.get('Exchange', ''),
-                'date': date_obj,
-                'index_value': float(item.get('IndexValue', 0.0) or 0.0),
-                'change': float(item.get('Change', 0.0) or 0.0),
-                'ratio_change': float(item.get('RatioChange', 0.0) or 0.0),
-                'total_trade': int(item.get('TotalTrade', 0) or 0),
-                'total_match_vol': float(item.get('TotalMatchVol', 0.0) or 0.0),
-                'total_match_val': float(item.get('TotalMatchVal', 0.0) or 0.0),
-                'total_deal_vol': float(item.get('TotalDealVol', 0.0) or 0.0),
-                'total_deal_val': float(item.get('TotalDealVal', 0.0) or 0.0),
-                'total_vol': float(item.get('TotalVol', 0.0) or 0.0),
-                'total_val': float(item.get('TotalVal', 0.0) or 0.0),
-                'advances': int(item.get('Advances', 0) or 0),
-                'no_changes': int(item.get('NoChanges', 0) or 0),
-                'declines': int(item.get('Declines', 0) or 0),
-                'ceilings': int(item.get('Ceilings', 0) or 0),
-                'floors': int(item.get('Floors', 0) or 0),
-                'trading_session': item.get('TradingSession', ''),
-                'time': item.get('Time', ''),
-                # compatibility
-                'close_value': float(item.get('IndexValue', 0.0) or 0.0),
-                'volume': float(item.get('TotalVol', 0.0) or 0.0),
-                'total_value': float(item.get('TotalVal', 0.0) or 0.0),
-                'change_percent': float(item.get('RatioChange', 0.0) or 0.0),
-            }
-
-            if existing:
-                existing.write(values)
-                updated += 1
-            else:
-                daily_index_model.create(values)
-                created += 1
-            count += 1
+        upserted = daily_index_model.bulk_upsert([
+            _index_values(item, wizard.symbol, wizard.from_date) for item in items
+        ])
+        created = upserted['created']
+        updated = upserted['updated']
+        count = created + updated
 
         wizard.result_message = f"<p>Fetched {count} daily index records for {wizard.symbol} (Created: {created}, Updated: {updated})</p>"
         wizard.last_count = count
@@ -2,6 +2,7 @@ from odoo import fields, _
 import logging
 from datetime import datetime
 from ssi_fc_data import model
+from ..utils.fetch_executor import RateLimitedError
 
 
 _logger = logging.getLogger(__name__)
@@ -32,20 +33,72 @@ def fetch_all_ohlc(wizard, client, sdk_config):
 
     to_date = fields.Date.today()
     from_date = to_date
+    page_size = getattr(wizard, 'page_size', None) or 500
+    executor = wizard.env['ssi.sdk.config.builder'].get_fetch_executor()
+
+    def _fetch(item):
+        # Chạy trên luồng của executor: chỉ gọi API (daily, toàn bộ trang intraday, giá bảng)
+        _id, symbol, market = item
+        daily_req = model.daily_ohlc(
+            symbol=symbol,
+            fromDate=from_date.strftime('%d/%m/%Y'),
+            toDate=to_date.strftime('%d/%m/%Y'),
+            pageIndex=1,
+            pageSize=10,
+            ascending=True
+        )
+        daily_response = executor.request(client.daily_ohlc, sdk_config, daily_req)
+
+        # Fetch đầy đủ intraday bars trong ngày theo đúng nghiệp vụ
+        intraday_items = []
+        current_page = 1
+        while True:
+            intraday_req = model.intraday_ohlc(
+                symbol=symbol,
+                fromDate=to_date.strftime('%d/%m/%Y'),
+                toDate=to_date.strftime('%d/%m/%Y'),
+                pageIndex=current_page,
+                pageSize=page_size,
+                ascending=True,
+                resolution=1
+            )
+            intraday_response = executor.request(client.intraday_ohlc, sdk_config, intraday_req)
+            if intraday_response.get('status') != 'Success' or not intraday_response.get('data'):
+                break
+            items = intraday_response['data'] if isinstance(intraday_response['data'], list) else []
+            if not items:
+                break
+            intraday_items.extend(items)
+            if len(items) < page_size:
+                break
+            current_page += 1
 
-    for security in securities:
         try:
-            _logger.info("Fetching OHLC for symbol: %s (ID: %s)", security.symbol, security.id)
-
-            daily_req = model.daily_ohlc(
-                symbol=security.symbol,
+            price_resp = executor.request(client.daily_stock_price, sdk_config, model.daily_stock_price(
+                symbol=symbol,
                 fromDate=from_date.strftime('%d/%m/%Y'),
                 toDate=to_date.strftime('%d/%m/%Y'),
                 pageIndex=1,
-                pageSize=10,
-                ascending=True
-            )
-            daily_response = client.daily_ohlc(sdk_config, daily_req)
+                pageSize=1,
+                market=market
+            ))
+        except RateLimitedError:
+            raise
+        except Exception as e:
+            _logger.debug('Skip stock price enrichment for %s: %s', symbol, e)
+            price_resp = None
+        return daily_response, intraday_items, price_resp
+
+    results = executor.map(_fetch, [(s.id, s.symbol, s.market) for s in securities], key=lambda item: item[0])
+
+    # Ghi DB trên luồng giữ cursor
+    for result in results:
+        security = securities_model.browse(result.key)
+        try:
+            _logger.info("Saving OHLC for symbol: %s (ID: %s)", security.symbol, security.id)
+            if not result.ok:
+                raise result.error
+            daily_response, intraday_items, price_resp = result.value
             if daily_response.get('status') == 'Success' and daily_response.get('data'):
                 daily_items = daily_response['data'] if isinstance(daily_response['data'], list) else []
                 for item in daily_items:
@@ -93,68 +146,31 @@ def fetch_all_ohlc(wizard, client, sdk_config):
                                 daily_ohlc_model.create(values)
                             daily_success += 1
 
-            # Fetch đầy đủ intraday bars trong ngày theo đúng nghiệp vụ
-            _today = fields.Date.today()
-            current_page = 1
-            page_size = getattr(wizard, 'page_size', None) or 500
-            total_saved = 0
-            while True:
-                intraday_req = model.intraday_ohlc(
-                    symbol=security.symbol,
-                    fromDate=_today.strftime('%d/%m/%Y'),
-                    toDate=_today.strftime('%d/%m/%Y'),
-                    pageIndex=current_page,
-                    pageSize=page_size,
-                    ascending=True,
-                    resolution=1
-                )
-                intraday_response = client.intraday_ohlc(sdk_config, intraday_req)
-                if intraday_response.get('status') != 'Success' or not intraday_response.get('data'):
-                    break
-                intraday_items = intraday_response['data'] if isinstance(intraday_response['data'], list) else []
-                if not intraday_items:
-                    break
-                for item in intraday_items:
-                    date_str = item.get('Date', '')
-                    time_str = item.get('Time', '') or '00:00'
-                    if date_str:
-                        try:
-                            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        except Exception:
-                            date_obj = from_date
-                    else:
+            vals_list = []
+            for item in intraday_items:
+                date_str = item.get('Date', '')
+                time_str = item.get('Time', '') or '00:00'
+                if date_str:
+                    try:
+                        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+                    except Exception:
                         date_obj = from_date
-
-                    existing = intraday_ohlc_model.search([
-                        ('security_id', '=', security.id),
-                        ('date', '=', date_obj),
-                        ('time', '=', time_str)
-                    ], limit=1)
-
-                    values = {
-                        'security_id': security.id,
-                        'date': date_obj,
-                        'time': time_str,
-                        'open_price': item.get('Open', 0.0),
-                        'high_price': item.get('High', 0.0),
-                        'low_price': item.get('Low', 0.0),
-                        'close_price': item.get('Close', 0.0),
-                        'volume': item.get('Volume', 0.0),
-                        'total_value': item.get('TotalValue', 0.0),
-                        'resolution': item.get('Resolution', 1),
-                    }
-
-                    if existing:
-                        existing.write(values)
-                    else:
-                        intraday_ohlc_model.create(values)
-                    total_saved += 1
-
-                current_page += 1
-                try:
-                    wizard.env.cr.commit()
-                except Exception:
-                    pass
+                else:
+                    date_obj = from_date
+                vals_list.append({
+                    'security_id': security.id,
+                    'date': date_obj,
+                    'time': time_str,
+                    'open_price': item.get('Open', 0.0),
+                    'high_price': item.get('High', 0.0),
+                    'low_price': item.get('Low', 0.0),
+                    'close_price': item.get('Close', 0.0),
+                    'volume': item.get('Volume', 0.0),
+                    'total_value': item.get('TotalValue', 0.0),
+                    'resolution': item.get('Resolution', 1),
+                })
+            upserted = intraday_ohlc_model.bulk_upsert(vals_list)
+            total_saved = upserted['created'] + upserted['updated']
 
             if total_saved:
                 intraday_success += 1
@@ -163,27 +179,15 @@ def fetch_all_ohlc(wizard, client, sdk_config):
             # Removed: Intraday OHLC update to security - let Daily OHLC propagate handle price updates
             # Daily OHLC automatically propagates to security fields via _propagate_to_security()
 
-            try:
-                price_req = model.daily_stock_price(
-                    symbol=security.symbol,
-                    fromDate=from_date.strftime('%d/%m/%Y'),
-                    toDate=to_date.strftime('%d/%m/%Y'),
-                    pageIndex=1,
-                    pageSize=1,
-                    market=security.market
-                )
-                price_resp = client.daily_stock_price(sdk_config, price_req)
-                if price_resp.get('status') == 'Success' and price_resp.get('data'):
-                    price_items = price_resp['data'] if isinstance(price_resp['data'], list) else []
-                    if price_items:
-                        p = price_items[0]
-                        security.write({
-                            'reference_price': p.get('ReferencePrice', security.reference_price),
-                            'ceiling_price': p.get('CeilingPrice', security.ceiling_price),
-                            'floor_price': p.get('FloorPrice', security.floor_price),
-                        })
-            except Exception as e:
-                _logger.debug('Skip stock price enrichment for %s: %s', security.symbol, e)
+            if price_resp and price_resp.get('status') == 'Success' and price_resp.get('data'):
+                price_items = price_resp['data'] if isinstance(price_resp['data'], list) else []
+                if price_items:
+                    p = price_items[0]
+                    security.write({
+                        'reference_price': p.get('ReferencePrice', security.reference_price),
+                        'ceiling_price': p.get('CeilingPrice', security.ceiling_price),
+                        'floor_price': p.get('FloorPrice', security.floor_price),
+                    })
 
             try:
                 wizard.env.cr.commit()
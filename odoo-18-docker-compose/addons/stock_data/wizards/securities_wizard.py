@@ -107,35 +107,44 @@ def fetch_securities(wizard, client, sdk_config):
 
 def fetch_securities_details_all(wizard, client, sdk_config):
     securities_model = wizard.env['ssi.securities']
-    securities = securities_model.search([('is_active', '=', True)], limit=100)
+    securities = securities_model.search([('is_active', '=', True)])
+    executor = wizard.env['ssi.sdk.config.builder'].get_fetch_executor()
 
     total_updated = 0
     error_count = 0
 
-    for security in securities:
+    to_date = fields.Date.today()
+    from_date = to_date - timedelta(days=7)
+
+    def _fetch(item):
+        _id, symbol, market = item
+        req = model.daily_stock_price(
+            symbol=symbol,
+            fromDate=from_date.strftime('%d/%m/%Y'),
+            toDate=to_date.strftime('%d/%m/%Y'),
+            pageIndex=1,
+            pageSize=1,
+            market=market
+        )
+        return executor.request(client.daily_stock_price, sdk_config, req)
+
+    def _val(payload, *keys, default=None):
+        for k in keys:
+            if k in payload:
+                return payload.get(k)
+        return default
+
+    results = executor.map(_fetch, [(s.id, s.symbol, s.market) for s in securities], key=lambda item: item[0])
+    for result in results:
+        security = securities_model.browse(result.key)
         try:
-            to_date = fields.Date.today()
-            from_date = to_date - timedelta(days=7)
-
-            req = model.daily_stock_price(
-                symbol=security.symbol,
-                fromDate=from_date.strftime('%d/%m/%Y'),
-                toDate=to_date.strftime('%d/%m/%Y'),
-                pageIndex=1,
-                pageSize=1,
-                market=security.market
-            )
-
-            response = client.daily_stock_price(sdk_config, req)
+            if not result.ok:
+                raise result.error
+            response = result.value
             if response.get('status') == 'Success' and response.get('data'):
                 items = response['data'] if isinstance(response['data'], list) else []
                 if items:
                     latest_price = items[0]
-                    def _val(payload, *keys, default=None):
-                        for k in keys:
-                            if k in payload:
-                                return payload.get(k)
-                        return default
                     ref_price = _val(latest_price, 'ReferencePrice', 'TC', default=security.reference_price)
                     ceil_price = _val(latest_price, 'CeilingPrice', 'Trần', default=security.ceiling_price)
                     floor_price = _val(latest_price, 'FloorPrice', 'Sàn', default=security.floor_price)
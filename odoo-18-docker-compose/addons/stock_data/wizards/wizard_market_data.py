@@ -1,9 +1,10 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 from datetime import datetime, timedelta
+import json
 import logging
-from ..utils.utils import SdkConfigBuilder, normalize_market
-from ssi_fc_data import model, fc_md_client
+from ..utils.utils import normalize_market
+from ssi_fc_data import model
 from .securities_wizard import (
     fetch_securities_all as _wiz_fetch_securities_all,
     fetch_securities as _wiz_fetch_securities,
@@ -22,7 +23,9 @@ from .daily_index_wizard import (
 )
 from .backtest_wizard import (
     fetch_backtest as _wiz_fetch_backtest,
+    run_local_backtest as _wiz_run_local_backtest,
 )
+from ..utils.indicators import STRATEGIES
 
 _logger = logging.getLogger(__name__)
 
@@ -36,6 +39,7 @@ class WizardFetchMarketData(models.TransientModel):
         ('fetch_all_ohlc', 'Fetch OHLC for All Securities'),
         ('daily_index', 'Fetch Daily Index'),
         ('backtest', 'BackTest'),
+        ('local_backtest', 'Local Backtest (stored OHLC)'),
     ], string='Action Type', required=True, default='securities_all')
 
     market = fields.Selection([
@@ -53,6 +57,15 @@ class WizardFetchMarketData(models.TransientModel):
     page_index = fields.Integer('Page Index', default=1)
     page_size = fields.Integer('Page Size', default=100)
 
+    strategy = fields.Selection([
+        ('sma_cross', 'SMA Crossover'),
+        ('ema_cross', 'EMA Crossover'),
+        ('rsi', 'RSI Mean Reversion'),
+        ('macd', 'MACD Signal'),
+        ('bollinger', 'Bollinger Bands'),
+    ], string='Strategy', default='sma_cross')
+    strategy_params = fields.Char('Strategy Parameters', help='JSON, bỏ trống dùng mặc định (xem STRATEGIES)')
+
     result_message = fields.Html('Result', readonly=True)
     last_count = fields.Integer('Last Fetched Records', readonly=True)
 
@@ -63,9 +76,8 @@ class WizardFetchMarketData(models.TransientModel):
     _BATCH_DAILY_INDEX_KEY = 'ssi.daily_index.batch_size'
     _DEFAULT_BATCH = 50
 
-    # --- Lock helpers to avoid overlapping runs ---
-    _LOCK_KEY = 'ssi.market.fetch.lock'
-    _LOCK_TTL_SEC = 300  # 5 minutes
+    # cron_realtime_ohlc và auto_fetch_realtime_data lấy cùng tập mã -> dùng chung một lock
+    _REALTIME_JOB = 'ssi.fetch.realtime_ohlc'
 
     def _push_notice(self, title, message, level='info'):
         try:
@@ -80,75 +92,78 @@ class WizardFetchMarketData(models.TransientModel):
         except Exception as e:
             _logger.debug('Push notice failed: %s', e)
 
-    def _acquire_lock(self, lock_key=None, ttl_sec=None):
-        ICP = self.env['ir.config_parameter'].sudo()
-        key = lock_key or self._LOCK_KEY
-        ttl = ttl_sec or self._LOCK_TTL_SEC
-        import time
-        now = int(time.time())
-        raw = ICP.get_param(key)
-        if raw:
-            try:
-                ts = int(raw)
-                if now - ts < ttl:
-                    return False
-            except Exception:
-                pass
-        ICP.set_param(key, str(now))
-        return True
-
-    def _release_lock(self, lock_key=None):
-        ICP = self.env['ir.config_parameter'].sudo()
-        key = lock_key or self._LOCK_KEY
-        try:
-            ICP.set_param(key, '')
-        except Exception:
-            pass
+    @api.onchange('action_type')
+    def _onchange_action_type(self):
+        # Backtest cục bộ cần chuỗi dài: mặc định một năm gần nhất
+        if self.action_type == 'local_backtest' and self.from_date and self.from_date == self.to_date:
+            self.from_date = self.to_date - timedelta(days=365)
+
+    @api.onchange('strategy')
+    def _onchange_strategy(self):
+        if self.strategy:
+            self.strategy_params = json.dumps(STRATEGIES[self.strategy])
 
     def action_fetch_data(self):
         self.ensure_one()
-        
+
+        # Backtest cục bộ chỉ đọc OHLC đã lưu: không cần cấu hình/client SSI
+        if self.action_type == 'local_backtest':
+            return self._run_local_backtest()
+
         config = self.env['ssi.api.config'].get_config()
         if not config:
             raise UserError(_("Please configure SSI API settings first."))
 
-        sdk_config = SdkConfigBuilder.build_config(config)
+        client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
+
+        # Cron và thao tác tay cùng loại dùng chung một lock (pg advisory lock, xem ssi.job.run)
+        with self.env['ssi.job.run'].acquire(f'ssi.fetch.{self.action_type}') as job:
+            if not job:
+                return {
+                    'type': 'ir.actions.client',
+                    'tag': 'display_notification',
+                    'params': {
+                        'title': _('Fetch Skipped'),
+                        'message': _('Another worker is already fetching %s.') % self.action_type,
+                        'type': 'warning',
+                        'sticky': False,
+                    }
+                }
+            try:
+                if self.action_type == 'securities_all':
+                    self._fetch_securities_all(client, sdk_config)
+                elif self.action_type == 'index_all':
+                    self._fetch_index_all(client, sdk_config)
+                elif self.action_type == 'fetch_all_ohlc':
+                    self._fetch_all_ohlc(client, sdk_config)
+                elif self.action_type == 'daily_index':
+                    self._fetch_daily_index(client, sdk_config)
+                elif self.action_type == 'backtest':
+                    self._fetch_backtest(client, sdk_config)
+
+                if config:
+                    try:
+                        config.sudo().write({
+                            'last_sync_date': fields.Datetime.now(),
+                            'last_sync_status': 'success'
+                        })
+                    except Exception:
+                        _logger.debug("Skip config write(success) due to access/txn", exc_info=True)
 
-        try:
-            client = fc_md_client.MarketDataClient(sdk_config)
-
-            if self.action_type == 'securities_all':
-                self._fetch_securities_all(client, sdk_config)
-            elif self.action_type == 'index_all':
-                self._fetch_index_all(client, sdk_config)
-            elif self.action_type == 'fetch_all_ohlc':
-                self._fetch_all_ohlc(client, sdk_config)
-            elif self.action_type == 'daily_index':
-                self._fetch_daily_index(client, sdk_config)
-            elif self.action_type == 'backtest':
-                self._fetch_backtest(client, sdk_config)
-
-            if config:
-                try:
-                    config.sudo().write({
-                        'last_sync_date': fields.Datetime.now(),
-                        'last_sync_status': 'success'
-                    })
-                except Exception:
-                    _logger.debug("Skip config write(success) due to access/txn", exc_info=True)
+            except Exception as e:
+                _logger.exception("Error fetching data: %s", str(e))
+                if config:
+                    try:
+                        config.sudo().write({
+                            'last_sync_date': fields.Datetime.now(),
+                            'last_sync_status': 'failed'
+                        })
+                    except Exception:
+                        _logger.debug("Skip config write(failed) due to access/txn", exc_info=True)
+                raise UserError(_("Error fetching data: %s") % str(e))
+
+            job.heartbeat(processed=self.last_count or 0)
 
-        except Exception as e:
-            _logger.exception("Error fetching data: %s", str(e))
-            if config:
-                try:
-                    config.sudo().write({
-                        'last_sync_date': fields.Datetime.now(),
-                        'last_sync_status': 'failed'
-                    })
-                except Exception:
-                    _logger.debug("Skip config write(failed) due to access/txn", exc_info=True)
-            raise UserError(_("Error fetching data: %s") % str(e))
-        
         count_msg = _('%s records') % (self.last_count or 0)
         return {
             'type': 'ir.actions.client',
@@ -189,6 +204,17 @@ class WizardFetchMarketData(models.TransientModel):
     def _fetch_backtest(self, client, sdk_config):
         _wiz_fetch_backtest(self, client, sdk_config)
 
+    def _run_local_backtest(self):
+        _wiz_run_local_backtest(self)
+        # Mở lại wizard để hiển thị bảng kết quả
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
     # Helper methods
     def _get_batch_size(self, key, default):
         try:
@@ -230,6 +256,10 @@ class WizardFetchMarketData(models.TransientModel):
 
     @api.model
     def cron_fetch_all_ohlc(self):
+        # Stream realtime đang ghi dữ liệu -> polling chỉ là dự phòng
+        if self.env['ssi.market.stream']._is_stream_healthy():
+            _logger.debug("cron_fetch_all_ohlc skipped: market stream is healthy")
+            return
         try:
             # OHLC cần nhanh -> giới hạn tập symbol hợp lý, page_size không ảnh hưởng nhiều
             batch_size = self._get_batch_size(self._BATCH_OHLC_KEY, 50)
@@ -325,36 +355,38 @@ class WizardFetchMarketData(models.TransientModel):
         Returns:
             int: Số lượng securities đã cập nhật
         """
-        try:
-            _logger.info("Starting auto_fetch_realtime_data...")
+        with self.env['ssi.job.run'].acquire(self._REALTIME_JOB) as job:
+            if not job:
+                return 0
+            try:
+                _logger.info("Starting auto_fetch_realtime_data...")
             
-            # Chỉ fetch cho các symbol cụ thể: HDB, ACB, FPT, AAM
-            target_symbols = ['HDB', 'ACB', 'FPT', 'AAM']
-            securities_model = self.env['ssi.securities']
-            active_securities = securities_model.search([
-                ('symbol', 'in', target_symbols),
-                ('is_active', '=', True),
-                ('last_update', '>=', fields.Datetime.now() - timedelta(minutes=5))
-            ], limit=limit)
+                # Chỉ fetch cho các symbol cụ thể: HDB, ACB, FPT, AAM
+                target_symbols = ['HDB', 'ACB', 'FPT', 'AAM']
+                securities_model = self.env['ssi.securities']
+                active_securities = securities_model.search([
+                    ('symbol', 'in', target_symbols),
+                    ('is_active', '=', True),
+                    ('last_update', '>=', fields.Datetime.now() - timedelta(minutes=5))
+                ], limit=limit)
             
-            if not active_securities:
-                _logger.info("No active securities found for realtime fetch")
-                return 0
+                if not active_securities:
+                    _logger.info("No active securities found for realtime fetch")
+                    return 0
             
-            config = self.env['ssi.api.config'].get_config()
-            if not config:
-                _logger.error("No SSI API config found")
-                return 0
+                config = self.env['ssi.api.config'].get_config()
+                if not config:
+                    _logger.error("No SSI API config found")
+                    return 0
                 
-            sdk_config = SdkConfigBuilder.build_config(config)
-            client = fc_md_client.MarketDataClient(sdk_config)
+                client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
-            updated_count = 0
-            for security in active_securities:
-                try:
+                executor = self.env['ssi.sdk.config.builder'].get_fetch_executor()
+
+                def _fetch(item):
                     # Fetch intraday OHLC (last 1 hour)
                     req = model.intraday_ohlc(
-                        symbol=security.symbol,
+                        symbol=item[1],
                         fromDate=(fields.Datetime.now() - timedelta(hours=1)).strftime('%d/%m/%Y'),
                         toDate=fields.Datetime.now().strftime('%d/%m/%Y'),
                         pageIndex=1,
@@ -362,33 +394,43 @@ class WizardFetchMarketData(models.TransientModel):
                         ascending=False,
                         resolution=1
                     )
-                    
-                    response = client.intraday_ohlc(sdk_config, req)
-                    if response.get('status') == 'Success' and response.get('data'):
-                        items = response['data'] if isinstance(response['data'], list) else []
-                        if items:
-                            latest_item = items[0]
-                            security.write({
-                                'current_price': latest_item.get('Close') or latest_item.get('close', 0.0),
-                                'high_price': latest_item.get('High') or latest_item.get('high', 0.0),
-                                'low_price': latest_item.get('Low') or latest_item.get('low', 0.0),
-                                'volume': latest_item.get('Volume') or latest_item.get('volume', 0.0),
-                                'total_value': latest_item.get('TotalValue') or latest_item.get('totalValue', 0.0),
-                                'change': latest_item.get('Change') or latest_item.get('change', 0.0),
-                                'change_percent': latest_item.get('ChangePercent') or latest_item.get('changePercent', 0.0),
-                                'last_price': latest_item.get('Close') or latest_item.get('close', 0.0),
-                                'last_update': fields.Datetime.now()
-                            })
-                            updated_count += 1
-                except Exception as e:
-                    _logger.debug("Skip realtime OHLC for %s: %s", security.symbol, str(e))
+                    return executor.request(client.intraday_ohlc, sdk_config, req)
+
+                results = executor.map(_fetch, [(s.id, s.symbol) for s in active_securities], key=lambda item: item[0])
+
+                updated_count = 0
+                for result in results:
+                    security = securities_model.browse(result.key)
+                    try:
+                        if not result.ok:
+                            raise result.error
+                        response = result.value
+                        if response.get('status') == 'Success' and response.get('data'):
+                            items = response['data'] if isinstance(response['data'], list) else []
+                            if items:
+                                latest_item = items[0]
+                                security.write({
+                                    'current_price': latest_item.get('Close') or latest_item.get('close', 0.0),
+                                    'high_price': latest_item.get('High') or latest_item.get('high', 0.0),
+                                    'low_price': latest_item.get('Low') or latest_item.get('low', 0.0),
+                                    'volume': latest_item.get('Volume') or latest_item.get('volume', 0.0),
+                                    'total_value': latest_item.get('TotalValue') or latest_item.get('totalValue', 0.0),
+                                    'change': latest_item.get('Change') or latest_item.get('change', 0.0),
+                                    'change_percent': latest_item.get('ChangePercent') or latest_item.get('changePercent', 0.0),
+                                    'last_price': latest_item.get('Close') or latest_item.get('close', 0.0),
+                                    'last_update': fields.Datetime.now()
+                                })
+                                updated_count += 1
+                    except Exception as e:
+                        _logger.debug("Skip realtime OHLC for %s: %s", security.symbol, str(e))
+
+                job.heartbeat(processed=updated_count)
+                _logger.info("Completed auto_fetch_realtime_data: updated %d securities", updated_count)
+                return updated_count
             
-            _logger.info("Completed auto_fetch_realtime_data: updated %d securities", updated_count)
-            return updated_count
-            
-        except Exception as e:
-            _logger.exception("auto_fetch_realtime_data failed: %s", e)
-            return 0
+            except Exception as e:
+                _logger.exception("auto_fetch_realtime_data failed: %s", e)
+                return 0
 
     @api.model
     def start_auto_sync(self, batch_size=None, include_realtime=True):
@@ -422,60 +464,65 @@ class WizardFetchMarketData(models.TransientModel):
     @api.model
     def cron_realtime_ohlc(self):
         """Ultra-fast OHLC fetch for realtime data (every 10 seconds)"""
-        try:
-            # Chỉ fetch OHLC cho các symbol cụ thể: HDB, ACB, FPT, AAM
-            target_symbols = ['HDB', 'ACB', 'FPT', 'AAM']
-            securities_model = self.env['ssi.securities']
-            active_securities = securities_model.search([
-                ('symbol', 'in', target_symbols),
-                ('is_active', '=', True),
-                ('last_update', '>=', fields.Datetime.now() - timedelta(minutes=5))
-            ], limit=20)  # Limit to 20 most active securities
-            
-            if not active_securities:
+        if self.env['ssi.market.stream']._is_stream_healthy():
+            _logger.debug("cron_realtime_ohlc skipped: market stream is healthy")
+            return
+        with self.env['ssi.job.run'].acquire(self._REALTIME_JOB) as job:
+            if not job:
                 return
+            try:
+                # Chỉ fetch OHLC cho các symbol cụ thể: HDB, ACB, FPT, AAM
+                target_symbols = ['HDB', 'ACB', 'FPT', 'AAM']
+                securities_model = self.env['ssi.securities']
+                active_securities = securities_model.search([
+                    ('symbol', 'in', target_symbols),
+                    ('is_active', '=', True),
+                    ('last_update', '>=', fields.Datetime.now() - timedelta(minutes=5))
+                ], limit=20)  # Limit to 20 most active securities
             
-            config = self.env['ssi.api.config'].get_config()
-            if not config:
-                return
+                if not active_securities:
+                    return
+            
+                config = self.env['ssi.api.config'].get_config()
+                if not config:
+                    return
                 
-            sdk_config = SdkConfigBuilder.build_config(config)
-            client = fc_md_client.MarketDataClient(sdk_config)
+                client, sdk_config = self.env['ssi.sdk.config.builder'].get_market_client()
             
-            # Fetch latest OHLC for active securities
-            for security in active_securities:
-                try:
-                    # Fetch intraday OHLC (last 1 hour)
-                    req = model.intraday_ohlc(
-                        symbol=security.symbol,
-                        fromDate=(fields.Datetime.now() - timedelta(hours=1)).strftime('%d/%m/%Y'),
-                        toDate=fields.Datetime.now().strftime('%d/%m/%Y'),
-                        pageIndex=1,
-                        pageSize=1,
-                        ascending=False,
-                        resolution=1
-                    )
+                # Fetch latest OHLC for active securities
+                for security in active_securities:
+                    try:
+                        # Fetch intraday OHLC (last 1 hour)
+                        req = model.intraday_ohlc(
+                            symbol=security.symbol,
+                            fromDate=(fields.Datetime.now() - timedelta(hours=1)).strftime('%d/%m/%Y'),
+                            toDate=fields.Datetime.now().strftime('%d/%m/%Y'),
+                            pageIndex=1,
+                            pageSize=1,
+                            ascending=False,
+                            resolution=1
+                        )
                     
-                    response = client.intraday_ohlc(sdk_config, req)
-                    if response.get('status') == 'Success' and response.get('data'):
-                        items = response['data'] if isinstance(response['data'], list) else []
-                        if items:
-                            latest_item = items[0]
-                            _logger.info("Realtime updating security %s with data: %s", security.symbol, latest_item)
-                            # Update security with latest data (intraday OHLC có đầy đủ thông tin)
-                            security.write({
-                                'current_price': latest_item.get('Close') or latest_item.get('close', 0.0),
-                                'high_price': latest_item.get('High') or latest_item.get('high', 0.0),
-                                'low_price': latest_item.get('Low') or latest_item.get('low', 0.0),
-                                'volume': latest_item.get('Volume') or latest_item.get('volume', 0.0),
-                                'total_value': latest_item.get('TotalValue') or latest_item.get('totalValue', 0.0),
-                                'change': latest_item.get('Change') or latest_item.get('change', 0.0),
-                                'change_percent': latest_item.get('ChangePercent') or latest_item.get('changePercent', 0.0),
-                                'last_price': latest_item.get('Close') or latest_item.get('close', 0.0),
-                                'last_update': fields.Datetime.now()
-                            })
-                except Exception as e:
-                    _logger.debug("Skip realtime OHLC for %s: %s", security.symbol, str(e))
+                        response = client.intraday_ohlc(sdk_config, req)
+                        if response.get('status') == 'Success' and response.get('data'):
+                            items = response['data'] if isinstance(response['data'], list) else []
+                            if items:
+                                latest_item = items[0]
+                                _logger.info("Realtime updating security %s with data: %s", security.symbol, latest_item)
+                                # Update security with latest data (intraday OHLC có đầy đủ thông tin)
+                                security.write({
+                                    'current_price': latest_item.get('Close') or latest_item.get('close', 0.0),
+                                    'high_price': latest_item.get('High') or latest_item.get('high', 0.0),
+                                    'low_price': latest_item.get('Low') or latest_item.get('low', 0.0),
+                                    'volume': latest_item.get('Volume') or latest_item.get('volume', 0.0),
+                                    'total_value': latest_item.get('TotalValue') or latest_item.get('totalValue', 0.0),
+                                    'change': latest_item.get('Change') or latest_item.get('change', 0.0),
+                                    'change_percent': latest_item.get('ChangePercent') or latest_item.get('changePercent', 0.0),
+                                    'last_price': latest_item.get('Close') or latest_item.get('close', 0.0),
+                                    'last_update': fields.Datetime.now()
+                                })
+                    except Exception as e:
+                        _logger.debug("Skip realtime OHLC for %s: %s", security.symbol, str(e))
                     
-        except Exception as e:
-            _logger.exception("cron_realtime_ohlc failed: %s", e)
+            except Exception as e:
+                _logger.exception("cron_realtime_ohlc failed: %s", e)
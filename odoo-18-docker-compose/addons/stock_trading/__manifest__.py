@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Stock Trading',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Finance',
     'summary': 'Quản lý giao dịch chứng khoán qua FastConnect Trading API',
     'description': """
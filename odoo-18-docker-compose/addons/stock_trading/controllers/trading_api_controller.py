@@ -123,13 +123,9 @@ class TradingAPIController(http.Controller):
             # Sync balance
             balance.action_sync_balance()
             
-            # Parse response
-            import json
-            response = json.loads(balance.raw_response) if balance.raw_response else {}
-            
             return {
                 'status': 'success',
-                'data': response.get('data', {}),
+                'data': balance._response_data(),
             }
         except Exception as e:
             _logger.error(f'Error getting balance: {e}')
@@ -169,13 +165,9 @@ class TradingAPIController(http.Controller):
             # Sync position
             position.action_sync_position()
             
-            # Parse response
-            import json
-            response = json.loads(position.raw_response) if position.raw_response else {}
-            
             return {
                 'status': 'success',
-                'data': response.get('data', {}),
+                'data': position._response_data(),
             }
         except Exception as e:
             _logger.error(f'Error getting position: {e}')
@@ -215,13 +207,9 @@ class TradingAPIController(http.Controller):
             # Sync order book
             order_book.action_sync_order_book()
             
-            # Parse response
-            import json
-            response = json.loads(order_book.raw_response) if order_book.raw_response else {}
-            
             return {
                 'status': 'success',
-                'data': response.get('data', {}),
+                'data': order_book._response_data(),
             }
         except Exception as e:
             _logger.error(f'Error getting order book: {e}')
@@ -210,15 +210,6 @@ class TradingPortalController(CustomerPortal):
             # Sync balance
             balance.sudo().action_sync_balance()
             
-            # Parse response
-            balance_data = {}
-            if balance.raw_response:
-                try:
-                    response = json.loads(balance.raw_response)
-                    balance_data = response.get('data', {})
-                except:
-                    pass
-            
             return request.make_response(
                 json.dumps({
                     'status': 'success',
@@ -227,7 +218,7 @@ class TradingPortalController(CustomerPortal):
                         'available_cash': balance.available_cash,
                         'purchasing_power': balance.purchasing_power,
                         'last_sync': balance.last_sync.strftime('%Y-%m-%d %H:%M:%S') if balance.last_sync else '',
-                        'raw_data': balance_data,
+                        'raw_data': balance.sudo()._response_data(),
                     }
                 }),
                 headers=[('Content-Type', 'application/json')]
@@ -0,0 +1,35 @@
+import logging
+
+from odoo.addons.stock_trading.models.utils import pack_payload
+
+_logger = logging.getLogger(__name__)
+
+# Bảng có raw_response (JSON dạng text) chuyển sang raw_payload (JSON nén)
+_TABLES = (
+    'trading_account_balance',
+    'trading_position',
+    'trading_max_quantity',
+    'trading_order_book',
+    'trading_order_history',
+)
+_BATCH_SIZE = 1000
+
+
+def migrate(cr, version):
+    """Nén raw_response cũ vào raw_payload rồi bỏ cột text (raw_response giờ là trường compute)"""
+    if not version:
+        return
+    for table in _TABLES:
+        cr.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = %s AND column_name = 'raw_response'
+        """, (table,))
+        if not cr.fetchone():
+            continue
+        cr.execute(f"SELECT id, raw_response FROM {table} WHERE raw_response IS NOT NULL AND raw_response != ''")
+        rows = cr.fetchall()
+        for start in range(0, len(rows), _BATCH_SIZE):
+            batch = [(pack_payload(raw), rid) for rid, raw in rows[start:start + _BATCH_SIZE]]
+            cr.executemany(f"UPDATE {table} SET raw_payload = %s WHERE id = %s", batch)
+        cr.execute(f"ALTER TABLE {table} DROP COLUMN raw_response")
+        _logger.info("Đã nén %s raw_response của %s vào raw_payload", len(rows), table)
@@ -4,10 +4,13 @@ from . import utils
 from . import config
 from . import wizards
 from . import trading_api_client
+from . import trading_response
 from . import trading_order
 from . import trading_account
 from . import trading_cash
 from . import trading_ors
 from . import trading_stock_transfer
 from . import trading_history
-
+from . import trading_order_stream
+from . import trading_account_sync
+from . import trading_risk
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parse response số dư / vị thế / khối lượng tối đa của FastConnect Trading - không phụ thuộc Odoo.
+
+Các hàm nhận response của SDK ({status, message, data}) và trả về giá trị trường có cấu trúc,
+None nếu response lỗi hoặc không đọc được (bản ghi giữ nguyên giá trị cũ).
+"""
+
+
+def _first(payload, *keys, default=None):
+    for key in keys:
+        value = payload.get(key)
+        if value not in (None, ''):
+            return value
+    return default
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _payload(result):
+    """data (dict) của response; list -> phần tử đầu; response không có status/data -> chính nó"""
+    if isinstance(result, list):
+        return result[0] if result and isinstance(result[0], dict) else None
+    if not isinstance(result, dict):
+        return None
+    status = result.get('status')
+    if status is not None and status != 200:
+        return None
+    data = result.get('data')
+    if isinstance(data, dict):
+        return data
+    if isinstance(data, list):
+        return data[0] if data and isinstance(data[0], dict) else None
+    return result if status is None else None
+
+
+def parse_balance(result):
+    """Response số dư (stock/derivative/PP-MMR) -> {cash_balance, available_cash, purchasing_power}"""
+    data = _payload(result)
+    if data is None:
+        return None
+    cash_balance = _float(_first(data, 'cashBalance', 'cash_balance', 'cash', 'cashBal', default=0))
+    available_cash = _float(_first(data, 'availableCash', 'available_cash', 'available', 'withdrawable', default=0))
+    purchasing_power = _float(_first(data, 'purchasingPower', 'purchasing_power', default=None), default=None)
+    if purchasing_power is None:
+        purchasing_power = available_cash if available_cash > 0 else 0.0
+    return {
+        'cash_balance': cash_balance,
+        'available_cash': available_cash,
+        'purchasing_power': purchasing_power,
+    }
+
+
+def position_lines(result):
+    """
+    Response vị thế -> danh sách dòng {instrument_code, quantity, avg_price, market_price, market_value}
+    của các mã đang giữ (khối lượng khác 0), None nếu response lỗi
+    """
+    if not isinstance(result, dict) or result.get('status') not in (None, 200):
+        return None
+    data = result.get('data')
+    rows = data
+    if isinstance(data, dict):
+        rows = _first(data, 'stockPositions', 'openPosition', 'positions', 'positionList', default=None)
+        if rows is None:
+            rows = []
+    if not isinstance(rows, list):
+        return None
+    lines = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        quantity = _float(_first(row, 'onHand', 'quantity', 'totalQty', 'longQty', 'netQty', default=0))
+        if not quantity:
+            continue
+        market_price = _float(_first(row, 'marketPrice', 'lastPrice', default=0))
+        avg_price = _float(_first(row, 'avgPrice', 'averagePrice', 'costPrice', default=0))
+        value = _float(_first(row, 'marketValue', default=None), default=None)
+        lines.append({
+            'instrument_code': str(_first(row, 'instrumentID', 'instrumentId', 'symbol', default='')).upper(),
+            'quantity': quantity,
+            'avg_price': avg_price,
+            'market_price': market_price,
+            'market_value': value if value is not None else quantity * (market_price or avg_price),
+        })
+    return lines
+
+
+def parse_positions(result):
+    """
+    Response vị thế -> {holding_count, total_quantity, market_value, lines}
+    (tổng hợp và từng dòng theo các mã đang giữ)
+    """
+    lines = position_lines(result)
+    if lines is None:
+        return None
+    return {
+        'holding_count': len(lines),
+        'total_quantity': sum(line['quantity'] for line in lines),
+        'market_value': sum(line['market_value'] for line in lines),
+        'lines': lines,
+    }
+
+
+def same_lines(current, new, key='instrument_code'):
+    """Hai danh sách dòng (dict) giống nhau, không phụ thuộc thứ tự"""
+    if len(current) != len(new):
+        return False
+    current = {line[key]: line for line in current}
+    for line in new:
+        old = current.get(line[key])
+        if old is None or diff_values(old, line):
+            return False
+    return True
+
+
+def parse_max_quantity(result):
+    """Response MaxBuyQty/MaxSellQty -> {max_quantity}"""
+    data = _payload(result)
+    if data is None:
+        return None
+    value = _first(data, 'maxQuantity', 'maxQty', 'maxBuyQty', 'maxSellQty', 'qty', default=None)
+    if value is None:
+        return None
+    return {'max_quantity': int(_float(value))}
+
+
+def parse_rate_limit(result):
+    """
+    Response get_ratelimit -> số request/giây cho phép (lấy giới hạn chặt nhất), None nếu không đọc được.
+    Mỗi mục dạng {limit, period|duration|interval (giây)}.
+    """
+    if not isinstance(result, dict) or result.get('status') not in (None, 200):
+        return None
+    data = result.get('data', result)
+    entries = data if isinstance(data, list) else [data]
+    rates = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        limit = _float(_first(entry, 'limit', 'rateLimit', 'maxRequests', 'requestLimit', default=0))
+        period = _float(_first(entry, 'period', 'duration', 'interval', 'timeWindow', default=1))
+        if limit > 0 and period > 0:
+            rates.append(limit / period)
+    return min(rates) if rates else None
+
+
+def diff_values(current, new, precision=1e-6):
+    """Các trường trong new khác với current (so sánh số có dung sai)"""
+    changed = {}
+    for name, value in new.items():
+        old = current.get(name)
+        if isinstance(value, float) or isinstance(old, float):
+            if abs(_float(old) - _float(value)) <= precision:
+                continue
+        elif old == value:
+            continue
+        changed[name] = value
+    return changed
@@ -164,19 +164,33 @@ class TradingConfig(models.Model):
             if record.stream_url and not record.stream_url.startswith(('http://', 'https://')):
                 raise ValidationError(_('Stream URL phải bắt đầu bằng http:// hoặc https://'))
 
-    def get_api_client(self):
-        """Lấy API client instance để sử dụng"""
+    def unlink(self):
+        from ...models.trading_api_client import invalidate_sessions
+        dbname, ids = self.env.cr.dbname, self.ids
+        res = super().unlink()
+        invalidate_sessions(dbname, ids)
+        return res
+
+    def get_api_client(self, fresh=False):
+        """
+        Lấy API client instance để sử dụng (FCTradingClient đã đăng nhập được dùng chung trong process)
+
+        Args:
+            fresh: True -> bỏ client đang dùng và đăng nhập lại
+        """
         self.ensure_one()
-        from ...models.trading_api_client import TradingAPIClient
-        
+        from ...models.trading_api_client import TradingAPIClient, invalidate_sessions
+
+        if fresh:
+            invalidate_sessions(self.env.cr.dbname, self.ids)
         return TradingAPIClient(self)
     
     def action_test_connection(self):
         """Test kết nối API"""
         self.ensure_one()
         try:
-            client = self.get_api_client()
-            client.get_access_token()  # Test lấy access token
+            client = self.get_api_client(fresh=True)
+            client.get_access_token()  # Test lấy access token (đăng nhập lại thật sự)
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
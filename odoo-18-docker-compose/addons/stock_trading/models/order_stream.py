@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+
+"""
+Đồng bộ trạng thái lệnh từ FCTradingStream - phần lõi không phụ thuộc Odoo.
+
+- parse_stream_message / normalize_order: giải mã event lệnh (stream) và dòng OrderBook về cùng một dạng
+- map_order_status / merge_state: mã trạng thái SSI -> state của trading.order, chặn chuyển trạng thái lùi
+- OrderEventBuffer: gộp event theo lệnh giữa hai lần flush
+- OrderStreamWorker: luồng nền nối stream -> buffer -> flush theo lô, đối soát OrderBook khi (re)connect
+- order_lines: dòng có cấu trúc của response OrderBook / OrderHistory để lưu vào bảng con
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+
+_logger = logging.getLogger(__name__)
+
+# Mã trạng thái lệnh của FastConnect Trading và các giá trị dạng chữ đã gặp trong response
+ORDER_STATES = {
+    # SSI
+    'WA': 'pending',       # Waiting approval
+    'RS': 'pending',       # Ready to send
+    'SOR': 'pending',      # Sending order
+    'SD': 'submitted',     # Sent
+    'SO': 'submitted',     # Sent order (lệnh điều kiện)
+    'QU': 'submitted',     # Queued - đã lên sàn
+    'WM': 'submitted',     # Waiting modify
+    'WC': 'submitted',     # Waiting cancel
+    'PF': 'partially_filled',
+    'FF': 'filled',
+    'FFPC': 'filled',      # Fully filled, partially cancelled
+    'CL': 'cancelled',
+    'EX': 'cancelled',     # Expired
+    'RJ': 'rejected',
+    # Dạng chữ / viết tắt
+    'PENDING': 'pending',
+    'P': 'pending',
+    'WAITING': 'pending',
+    'NEW': 'pending',
+    'SUBMITTED': 'submitted',
+    'S': 'submitted',
+    'ACTIVE': 'submitted',
+    'FILLED': 'filled',
+    'F': 'filled',
+    'COMPLETED': 'filled',
+    'DONE': 'filled',
+    'EXECUTED': 'filled',
+    'PARTIALLY_FILLED': 'partially_filled',
+    'PARTIAL': 'partially_filled',
+    'CANCELLED': 'cancelled',
+    'CANCEL': 'cancelled',
+    'C': 'cancelled',
+    'CANCELED': 'cancelled',
+    'REJECTED': 'rejected',
+    'R': 'rejected',
+    'REJECT': 'rejected',
+    'FAILED': 'rejected',
+    'ERROR': 'error',
+    'E': 'error',
+    'FAIL': 'error',
+}
+
+OPEN_STATES = ('pending', 'submitted', 'partially_filled')
+FINAL_STATES = ('filled', 'cancelled', 'rejected')
+
+# Thứ tự tiến triển của lệnh: event đến muộn/không theo thứ tự không được kéo trạng thái lùi
+_STATE_RANK = {
+    'draft': 0,
+    'error': 0,
+    'pending': 1,
+    'submitted': 2,
+    'partially_filled': 3,
+    'filled': 4,
+    'cancelled': 4,
+    'rejected': 4,
+}
+
+
+def _val(payload, *keys, default=None):
+    for key in keys:
+        value = payload.get(key)
+        if value not in (None, ''):
+            return value
+    return default
+
+
+def _num(payload, *keys, default=0.0):
+    value = _val(payload, *keys)
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def map_order_status(status, filled_qty=0.0, quantity=0.0):
+    """
+    Trạng thái trading.order từ mã trạng thái SSI; không có mã thì suy ra từ khối lượng khớp.
+
+    Returns:
+        str hoặc None nếu event không mang thông tin trạng thái
+    """
+    status = str(status or '').upper().strip()
+    if status:
+        return ORDER_STATES.get(status, 'submitted')
+    if quantity and filled_qty >= quantity:
+        return 'filled'
+    if filled_qty:
+        return 'partially_filled'
+    return None
+
+
+def merge_state(current, new):
+    """State mới nếu được phép chuyển từ current, None nếu giữ nguyên"""
+    if not new or new == current or current in FINAL_STATES:
+        return None
+    if _STATE_RANK.get(new, 0) < _STATE_RANK.get(current, 0):
+        return None
+    return new
+
+
+def parse_stream_message(message):
+    """
+    Giải mã message của FCTradingStream: {"type": "orderEvent", "data": {...}, "notifyId": ...}
+    (data có thể là chuỗi JSON).
+
+    Returns:
+        tuple: (event_type, data dict, notify_id) - (None, None, None) nếu không hợp lệ
+    """
+    if isinstance(message, (str, bytes)):
+        try:
+            message = json.loads(message)
+        except ValueError:
+            return None, None, None
+    if not isinstance(message, dict):
+        return None, None, None
+    data = _val(message, 'data', 'Data', default=message)
+    if isinstance(data, (str, bytes)):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return None, None, None
+    if not isinstance(data, dict):
+        return None, None, None
+    event_type = str(_val(message, 'type', 'Type', 'eventType', default='') or _val(data, 'type', default='') or '')
+    notify_id = _val(message, 'notifyId', 'notifyID', 'NotifyId', default=None)
+    if notify_id is None:
+        notify_id = _val(data, 'notifyId', 'notifyID', default=None)
+    return event_type, data, None if notify_id is None else str(notify_id)
+
+
+def normalize_order(data, event_type=''):
+    """
+    Event lệnh (stream) hoặc một dòng OrderBook -> dict chuẩn hoá.
+
+    Returns:
+        dict {order_id, request_id, account, status, state, filled_qty, avg_price, quantity, error}
+        hoặc None nếu không phải dữ liệu lệnh
+    """
+    if not isinstance(data, dict):
+        return None
+    order_id = str(_val(data, 'orderID', 'orderId', 'order_id', 'OrderID', default='') or '')
+    request_id = str(_val(data, 'requestID', 'requestId', 'request_id', default='') or '')
+    if not order_id and not request_id:
+        return None
+    status = str(_val(data, 'orderStatus', 'ordStatus', 'order_status', 'OrderStatus', 'status', default='') or '')
+    filled_qty = _num(data, 'filledQty', 'filled_qty', 'filledQuantity', 'cumQty', 'matchedQty')
+    quantity = _num(data, 'quantity', 'qty', 'orderQty')
+    state = map_order_status(status, filled_qty, quantity)
+    if state is None and 'match' in event_type.lower():
+        # Event khớp lệnh không kèm trạng thái: ít nhất đã khớp một phần
+        state = 'partially_filled'
+    elif 'error' in event_type.lower() and state in (None, 'submitted'):
+        state = 'rejected'
+    return {
+        'order_id': order_id,
+        'request_id': request_id,
+        'account': str(_val(data, 'account', 'Account', default='') or '').strip().upper(),
+        'status': status.upper(),
+        'state': state,
+        'filled_qty': filled_qty,
+        'avg_price': _num(data, 'avgPrice', 'avgMatchedPrice', 'matchPrice'),
+        'quantity': quantity,
+        'error': _val(data, 'errorMessage', 'rejectReason', 'errorDesc', default=None),
+    }
+
+
+def order_book_rows(result):
+    """Danh sách lệnh trong response OrderBook (data là list, dict chứa list, hoặc một lệnh)"""
+    if not isinstance(result, dict):
+        return []
+    data = result.get('data')
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        rows = _val(data, 'orders', 'orderBooks', 'orderBook', 'orderHistories', default=None)
+        if isinstance(rows, list):
+            return rows
+        return [data]
+    return []
+
+
+def parse_order_date(value):
+    """Ngày đặt lệnh từ epoch (giây/mili giây) hoặc chuỗi dd/mm/yyyy, yyyy-mm-dd..., None nếu không đọc được"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.isdigit()):
+        timestamp = float(value)
+        if timestamp > 1e11:
+            timestamp /= 1000.0
+        try:
+            return date.fromtimestamp(timestamp)
+        except (OverflowError, OSError, ValueError):
+            return None
+    text = str(value).strip()
+    for fmt, size in (('%d/%m/%Y', 10), ('%Y-%m-%d', 10), ('%Y%m%d', 8)):
+        try:
+            return datetime.strptime(text[:size], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def order_lines(result):
+    """
+    Các lệnh trong response OrderBook / OrderHistory -> danh sách dòng
+    {order_id, request_id, account, instrument_code, side, price, quantity, filled_quantity,
+     avg_price, status, state, order_date}
+    """
+    lines = []
+    for row in order_book_rows(result):
+        order = normalize_order(row)
+        if order is None:
+            continue
+        lines.append({
+            'order_id': order['order_id'],
+            'request_id': order['request_id'],
+            'account': order['account'],
+            'instrument_code': str(_val(row, 'instrumentID', 'instrumentId', 'symbol', default='') or '').upper(),
+            'side': str(_val(row, 'buySell', 'side', default='') or '').upper()[:1],
+            'price': _num(row, 'price', 'orderPrice'),
+            'quantity': order['quantity'],
+            'filled_quantity': order['filled_qty'],
+            'avg_price': order['avg_price'],
+            'status': order['status'],
+            'state': order['state'] or '',
+            'order_date': parse_order_date(_val(row, 'inputTime', 'orderDate', 'tradeDate', 'createdTime')),
+        })
+    return lines
+
+
+def event_key(event):
+    return event['order_id'] or f"req:{event['request_id']}"
+
+
+class OrderEventBuffer:
+    """Giữ event đã gộp của mỗi lệnh giữa hai lần flush (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self.received = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, event):
+        with self._lock:
+            self.received += 1
+            self._merge(event)
+
+    def _merge(self, event):
+        key = event_key(event)
+        previous = self._events.get(key)
+        if previous is None:
+            self._events[key] = event
+            return
+        merged = dict(previous)
+        merged.update({k: v for k, v in event.items() if v not in (None, '')})
+        merged['state'] = merge_state(previous['state'], event['state']) or previous['state']
+        merged['filled_qty'] = max(previous['filled_qty'], event['filled_qty'])
+        self._events[key] = merged
+
+    def drain(self):
+        with self._lock:
+            events = list(self._events.values())
+            self._events = {}
+        return events
+
+    def requeue(self, events):
+        """Đưa lại lô chưa ghi được vào buffer, trước các event nhận sau lần drain"""
+        with self._lock:
+            newer, self._events = self._events, {}
+            for event in events:
+                self._merge(event)
+            for event in newer.values():
+                self._merge(event)
+
+
+class OrderStreamWorker:
+    """
+    Luồng nền cho một tài khoản API (trading.config).
+
+    stream_factory(on_message, on_error, on_open, notify_id) trả về stream có start()/stop()
+    (FCTradingStream). flush(events, notify_id) ghi lô event; reconcile() đối soát OrderBook,
+    được gọi sau mỗi lần (re)connect để lấp các event bị lỡ khi mất kết nối.
+    """
+
+    def __init__(self, stream_factory, flush, reconcile=None, flush_ms=500, notify_id='-1', reconnect_sec=5):
+        self._stream_factory = stream_factory
+        self._flush = flush
+        self._reconcile = reconcile
+        self._flush_interval = max(50, int(flush_ms or 500)) / 1000.0
+        self._reconnect_sec = reconnect_sec
+        self._stop = threading.Event()
+        self._need_reconnect = threading.Event()
+        self._need_reconcile = threading.Event()
+        self._thread = None
+        self._connected_at = 0.0
+        self.buffer = OrderEventBuffer()
+        self.notify_id = notify_id or '-1'
+        self.stream = None
+        self.errors = 0
+        self.reconnects = 0
+        self.last_flush = None
+        self.last_error = None
+
+    def is_alive(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _on_open(self):
+        self._need_reconcile.set()
+
+    def _on_message(self, message):
+        event_type, data, notify_id = parse_stream_message(message)
+        if notify_id:
+            self.notify_id = notify_id
+        event = normalize_order(data, event_type) if data else None
+        if event:
+            self.buffer.add(event)
+
+    def _on_error(self, error):
+        self.errors += 1
+        self.last_error = str(error)
+        _logger.warning("Trading stream error: %s", error)
+        # SDK báo lỗi kết nối qua on_error -> kết nối lại (tiếp tục từ notify_id cuối)
+        self._need_reconnect.set()
+
+    def _connect(self):
+        self.stream = self._stream_factory(self._on_message, self._on_error, self._on_open, self.notify_id)
+        self.stream.start()
+        self._connected_at = time.monotonic()
+        # Không phụ thuộc on_open của SDK: luôn đối soát sau khi kết nối
+        self._need_reconcile.set()
+
+    def _disconnect(self):
+        stream, self.stream = self.stream, None
+        stop = getattr(stream, 'stop', None)
+        if callable(stop):
+            try:
+                stop()
+            except Exception as e:  # noqa: BLE001
+                _logger.debug("Stop trading stream failed: %s", e)
+
+    def start(self):
+        if self.is_alive():
+            return
+        self._stop.clear()
+        self._connect()
+        self._thread = threading.Thread(target=self._run, name='trading-order-stream', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._flush_interval):
+            if self._need_reconnect.is_set() and time.monotonic() - self._connected_at >= self._reconnect_sec:
+                self._need_reconnect.clear()
+                self.reconnects += 1
+                self._disconnect()
+                try:
+                    self._connect()
+                except Exception as e:  # noqa: BLE001 - thử lại ở chu kỳ sau
+                    self._on_error(e)
+                    continue
+            # Flush event đang giữ trước, rồi đối soát để snapshot OrderBook không bị event cũ ghi đè
+            self.flush_now()
+            if self._need_reconcile.is_set() and self._reconcile:
+                self._need_reconcile.clear()
+                try:
+                    self._reconcile()
+                except Exception as e:  # noqa: BLE001
+                    self.errors += 1
+                    self.last_error = str(e)
+                    _logger.warning("Trading order book reconcile failed: %s", e)
+        self.flush_now()
+
+    def flush_now(self):
+        if not len(self.buffer):
+            return None
+        events = self.buffer.drain()
+        try:
+            result = self._flush(events, self.notify_id)
+            self.last_flush = time.time()
+            return result
+        except Exception as e:  # noqa: BLE001 - worker không được chết vì một lô lỗi
+            self.errors += 1
+            self.last_error = str(e)
+            _logger.warning("Trading stream flush failed: %s", e)
+            # Giữ lại lô để ghi ở chu kỳ sau; đối soát OrderBook phòng khi lỗi kéo dài
+            self.buffer.requeue(events)
+            self._need_reconcile.set()
+            return None
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._disconnect()
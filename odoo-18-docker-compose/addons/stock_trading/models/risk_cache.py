@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Kiểm tra rủi ro trước khi đặt lệnh trên bộ nhớ - không phụ thuộc Odoo.
+
+- RiskSnapshot: sức mua, số dư chứng khoán và phần đang bị giữ bởi lệnh chưa khớp hết của một tài khoản
+- RiskCache: snapshot theo khoá (database, account), cập nhật theo event lệnh; sync số dư/vị thế
+  làm snapshot bị dựng lại (số dư mới của broker đã trừ các lệnh đặt trước thời điểm sync)
+
+Snapshot chỉ dùng để chặn sớm lệnh chắc chắn không đủ tiền/chứng khoán; broker vẫn là nơi
+kiểm tra cuối cùng, snapshot được đối soát lại định kỳ từ dữ liệu đã sync.
+"""
+
+import threading
+import time
+
+DEFAULT_FEE_RATE = 0.0015
+DEFAULT_MAX_AGE = 60
+
+_OPEN_STATES = ('pending', 'submitted', 'partially_filled')
+
+
+class RiskSnapshot:
+    """Trạng thái rủi ro của một tài khoản"""
+
+    __slots__ = ('buying_power', 'holdings', 'orders', 'loaded_at')
+
+    def __init__(self, buying_power=0.0, holdings=None, loaded_at=None):
+        self.buying_power = float(buying_power or 0.0)
+        # mã -> khối lượng đang nắm giữ; None: chưa sync vị thế (không kiểm tra lệnh bán)
+        self.holdings = None if holdings is None else dict(holdings)
+        # khoá lệnh -> (side, mã, giá giữ chỗ, khối lượng còn lại)
+        self.orders = {}
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+
+    def reserved_cash(self, fee_rate=DEFAULT_FEE_RATE, exclude=None):
+        """Tiền đang giữ cho các lệnh mua chưa khớp hết (trừ lệnh `exclude`)"""
+        return sum(price * qty * (1.0 + fee_rate)
+                   for key, (side, _symbol, price, qty) in self.orders.items() if side == 'B' and key != exclude)
+
+    def reserved_qty(self, symbol, exclude=None):
+        """Khối lượng `symbol` đang giữ cho các lệnh bán chưa khớp hết (trừ lệnh `exclude`)"""
+        return sum(qty for key, (side, sym, _price, qty) in self.orders.items()
+                   if side == 'S' and sym == symbol and key != exclude)
+
+    def track(self, key, side, symbol, price, quantity, filled=0.0, state='submitted'):
+        """
+        Ghi nhận trạng thái mới của một lệnh: lệnh còn mở giữ phần chưa khớp, lệnh kết thúc giải phóng.
+        Phần khớp thêm của lệnh bán trừ vào số dư chứng khoán, của lệnh mua trừ vào sức mua.
+        """
+        previous = self.orders.pop(key, None)
+        remaining = max(0.0, float(quantity or 0) - float(filled or 0))
+        if previous is not None:
+            newly_filled = previous[3] - remaining
+            if newly_filled > 0:
+                if side == 'S':
+                    if self.holdings is not None:
+                        self.holdings[symbol] = max(0.0, self.holdings.get(symbol, 0.0) - newly_filled)
+                else:
+                    self.buying_power = max(0.0, self.buying_power - newly_filled * previous[2])
+        if state in _OPEN_STATES and remaining > 0:
+            self.orders[key] = (side, symbol, float(price or 0.0), remaining)
+
+
+def check_order(snapshot, side, symbol, price, quantity, fee_rate=DEFAULT_FEE_RATE, exclude=None):
+    """
+    Kiểm tra một lệnh với snapshot. exclude: khoá của chính lệnh đang kiểm tra (phần giữ chỗ
+    cũ của lệnh, ví dụ từ lần gửi trước bị lỗi, không bị tính hai lần).
+
+    Returns:
+        tuple (ok, khả dụng): khả dụng là số tiền (lệnh mua) hoặc khối lượng (lệnh bán) còn dùng được,
+        None nếu snapshot không có dữ liệu để kiểm tra
+    """
+    if side == 'B':
+        available = snapshot.buying_power - snapshot.reserved_cash(fee_rate, exclude)
+        return price * quantity * (1.0 + fee_rate) <= available + 1e-6, available
+    if snapshot.holdings is None:
+        return True, None
+    available = snapshot.holdings.get(symbol, 0.0) - snapshot.reserved_qty(symbol, exclude)
+    return quantity <= available, available
+
+
+class RiskCache:
+    """Snapshot rủi ro theo khoá (thread-safe); snapshot cũ hơn max_age giây coi như không có"""
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE, clock=time.monotonic):
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._snapshots = {}
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def keys(self):
+        with self._lock:
+            return list(self._snapshots)
+
+    def get(self, key):
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None or self._clock() - snapshot.loaded_at > self.max_age:
+                return None
+            return snapshot
+
+    def put(self, key, buying_power, holdings=None, orders=()):
+        """
+        Thay snapshot bằng dữ liệu đối soát. orders: các lệnh còn mở chưa được phản ánh trong số dư
+        đã sync, dạng (khoá, side, mã, giá, khối lượng, đã khớp, state)
+        """
+        snapshot = RiskSnapshot(buying_power, holdings, loaded_at=self._clock())
+        for order in orders:
+            snapshot.track(*order)
+        with self._lock:
+            self._snapshots[key] = snapshot
+        return snapshot
+
+    def track(self, key, *order):
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                snapshot.track(*order)
+
+    def check(self, key, side, symbol, price, quantity, fee_rate=DEFAULT_FEE_RATE):
+        """(ok, khả dụng) hoặc None nếu chưa có snapshot còn hiệu lực"""
+        snapshot = self.get(key)
+        if snapshot is None:
+            return None
+        with self._lock:
+            return check_order(snapshot, side, symbol, price, quantity, fee_rate)
+
+    def reserve(self, key, order_key, side, symbol, price, quantity, fee_rate=DEFAULT_FEE_RATE):
+        """
+        Kiểm tra và giữ chỗ ngay trong cùng một lần khoá (hai lệnh gửi đồng thời không cùng dùng một phần sức mua).
+
+        Returns:
+            (ok, khả dụng) hoặc None nếu chưa có snapshot còn hiệu lực
+        """
+        snapshot = self.get(key)
+        if snapshot is None:
+            return None
+        with self._lock:
+            ok, available = check_order(snapshot, side, symbol, price, quantity, fee_rate, exclude=order_key)
+            if ok:
+                # Thay phần giữ chỗ cũ (nếu có) của chính lệnh này
+                snapshot.orders.pop(order_key, None)
+                snapshot.track(order_key, side, symbol, price, quantity, 0.0, 'pending')
+            return ok, available
+
+    def release(self, key, order_key):
+        """Bỏ phần giữ chỗ của lệnh không được gửi tới broker (không tính là đã khớp)"""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                return False
+            return snapshot.orders.pop(order_key, None) is not None
+
+    def invalidate(self, predicate=None):
+        with self._lock:
+            keys = [k for k in self._snapshots if predicate is None or predicate(k)]
+            for key in keys:
+                del self._snapshots[key]
+        return len(keys)
@@ -1,19 +1,29 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, Command, _
 from odoo.exceptions import UserError, ValidationError
 import logging
-import json
+
+from .account_sync import parse_balance, parse_max_quantity, parse_positions, same_lines
 
 _logger = logging.getLogger(__name__)
 
+_POSITION_LINE_FIELDS = ('instrument_code', 'quantity', 'avg_price', 'market_price', 'market_value')
+
+# balance_type -> (method của FCTradingClient, request trong fcmodel_requests)
+_BALANCE_REQUESTS = {
+    'stock': ('get_stock_account_balance', 'StockAccountBalance'),
+    'derivative': ('get_derivative_account_balance', 'DerivativeAccountBalance'),
+    'pp_mmr': ('get_pp_mmr_account', 'PPMMRAccount'),
+}
+
 
 class TradingAccountBalance(models.Model):
     """Số dư tài khoản chứng khoán"""
     _name = 'trading.account.balance'
     _description = 'Trading Account Balance'
     _order = 'create_date desc'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'trading.response.mixin']
 
     name = fields.Char(
         string='Reference',
@@ -84,14 +94,7 @@ class TradingAccountBalance(models.Model):
         ('pp_mmr', 'PP & MMR Account'),
     ], string='Balance Type', required=True, default='stock')
     
-    # Response Data (JSON)
-    raw_response = fields.Text(
-        string='Raw Response',
-        readonly=True,
-        help='Raw JSON response từ API'
-    )
-    
-    # Parsed fields (có thể parse từ JSON nếu cần)
+    # Parsed fields (raw_response/raw_payload: trading.response.mixin)
     cash_balance = fields.Float(
         string='Cash Balance',
         digits=(20, 3),
@@ -130,13 +133,13 @@ class TradingAccountBalance(models.Model):
     def create(self, vals_list):
         """Tự động sync balance khi tạo record mới"""
         records = super().create(vals_list)
-        # Auto sync sau khi tạo nếu có đủ thông tin
-        for record in records:
-            if record.auto_sync and record.config_id and record.account:
-                try:
-                    record.action_sync_balance()
-                except Exception as e:
-                    _logger.warning(f'Auto sync balance failed for new record {record.id}: {e}')
+        # Auto sync sau khi tạo nếu có đủ thông tin (một lô cho mọi bản ghi mới)
+        to_sync = records.filtered(lambda r: r.auto_sync and r.config_id and r.account)
+        if to_sync:
+            try:
+                self.env['trading.account.sync'].sync_records(to_sync, parse_balance)
+            except Exception as e:
+                _logger.warning(f'Auto sync balance failed for new records {to_sync.ids}: {e}')
         return records
     
     def write(self, vals):
@@ -148,15 +151,19 @@ class TradingAccountBalance(models.Model):
         
         result = super().write(vals)
         
+        # Số dư mới: dựng lại snapshot rủi ro của tài khoản
+        if 'last_sync' in vals or 'purchasing_power' in vals:
+            self.env['trading.risk'].refresh_accounts(self.mapped('account'))
+        
         # Auto sync nếu update config_id, account, hoặc balance_type và có đủ thông tin
         # Chỉ sync nếu auto_sync = True (có thể bị tắt trong lần update này)
         if vals.get('config_id') or vals.get('account') or vals.get('balance_type'):
-            for record in self:
-                if auto_sync_enabled.get(record.id, True) and record.config_id and record.account:
-                    try:
-                        record.action_sync_balance()
-                    except Exception as e:
-                        _logger.warning(f'Auto sync balance failed for record {record.id}: {e}')
+            to_sync = self.filtered(lambda r: auto_sync_enabled.get(r.id, True) and r.config_id and r.account)
+            if to_sync:
+                try:
+                    self.env['trading.account.sync'].sync_records(to_sync, parse_balance)
+                except Exception as e:
+                    _logger.warning(f'Auto sync balance failed for records {to_sync.ids}: {e}')
         return result
     
     @api.onchange('config_id', 'account')
@@ -171,6 +178,13 @@ class TradingAccountBalance(models.Model):
                 _logger.warning(f'Auto sync balance failed on onchange: {e}')
                 # Không raise error để không block user input
 
+    def _sync_request(self):
+        """(key, method, request) của bản ghi cho trading.account.sync"""
+        from ssi_fctrading.models import fcmodel_requests
+        account = str(self.account or '').strip().upper()
+        method, request_name = _BALANCE_REQUESTS[self.balance_type]
+        return (method, account), method, getattr(fcmodel_requests, request_name)(account=account)
+
     def action_sync_balance(self):
         """Sync balance từ API"""
         self.ensure_one()
@@ -190,81 +204,10 @@ class TradingAccountBalance(models.Model):
             else:  # pp_mmr
                 from ssi_fctrading.models import fcmodel_requests
                 req = fcmodel_requests.PPMMRAccount(account=account_clean)
-                result = client._client.get_pp_mmr_account(req)
+                result = client._call('get_pp_mmr_account', req)
             
-            # Save response
-            self.write({
-                'raw_response': json.dumps(result, indent=2),
-                'last_sync': fields.Datetime.now(),
-            })
-            
-            # Parse và lưu các field quan trọng nếu có (linh hoạt dict/list, tên key)
-            if isinstance(result, dict):
-                status = result.get('status')
-                data = result.get('data')
-                # Một số API trả trực tiếp dict mà không có status/data
-                parsed = None
-                if isinstance(data, dict):
-                    parsed = data
-                elif isinstance(data, list) and data:
-                    # Lấy phần tử đầu nếu list
-                    parsed = data[0] if isinstance(data[0], dict) else None
-                elif status is None:
-                    # Không có status/data: coi result là payload
-                    parsed = result
-                
-                if isinstance(parsed, dict):
-                    # Hỗ trợ nhiều biến thể key từ API
-                    cash_balance = (
-                        parsed.get('cashBalance') or parsed.get('cash_balance') or parsed.get('cash') or parsed.get('cashBal') or 0
-                    )
-                    available_cash = (
-                        parsed.get('availableCash') or parsed.get('available_cash') or parsed.get('available') or parsed.get('withdrawable') or 0
-                    )
-                    purchasing_power = (
-                        parsed.get('purchasingPower') or parsed.get('purchasing_power') or parsed.get('purchasingPower') or available_cash or 0
-                    )
-                    try:
-                        cash_balance = float(cash_balance)
-                    except Exception:
-                        cash_balance = 0.0
-                    try:
-                        available_cash = float(available_cash)
-                    except Exception:
-                        available_cash = 0.0
-                    try:
-                        purchasing_power = float(purchasing_power)
-                    except Exception:
-                        purchasing_power = available_cash if available_cash > 0 else 0.0
-                    self.write({
-                        'cash_balance': cash_balance,
-                        'available_cash': available_cash,
-                        'purchasing_power': purchasing_power,
-                    })
-            elif isinstance(result, list) and result:
-                # Một số API có thể trả list các mục số dư
-                first = result[0]
-                if isinstance(first, dict):
-                    cash_balance = first.get('cashBalance') or first.get('cash') or first.get('cashBal') or 0
-                    available_cash = first.get('availableCash') or first.get('available') or first.get('withdrawable') or 0
-                    purchasing_power = first.get('purchasingPower') or first.get('purchasing_power') or available_cash or 0
-                    try:
-                        cash_balance = float(cash_balance)
-                    except Exception:
-                        cash_balance = 0.0
-                    try:
-                        available_cash = float(available_cash)
-                    except Exception:
-                        available_cash = 0.0
-                    try:
-                        purchasing_power = float(purchasing_power)
-                    except Exception:
-                        purchasing_power = available_cash if available_cash > 0 else 0.0
-                    self.write({
-                        'cash_balance': cash_balance,
-                        'available_cash': available_cash,
-                        'purchasing_power': purchasing_power,
-                    })
+            # Parse các field quan trọng (linh hoạt dict/list, tên key)
+            self._apply_response(result, parse_balance)
             
             return {
                 'type': 'ir.actions.client',
@@ -279,16 +222,23 @@ class TradingAccountBalance(models.Model):
             _logger.error(f'Error syncing balance: {e}')
             raise UserError(_('Không thể sync số dư: %s') % str(e))
 
+    def _response_data(self):
+        """Số dư dạng dict cho controller (đọc từ các cột đã parse)"""
+        self.ensure_one()
+        return {
+            'account': self.account,
+            'balance_type': self.balance_type,
+            'cash_balance': self.cash_balance,
+            'available_cash': self.available_cash,
+            'purchasing_power': self.purchasing_power,
+            'last_sync': fields.Datetime.to_string(self.last_sync) if self.last_sync else False,
+        }
+
     @api.model
     def cron_sync_balances(self):
-        """Cron: Tự động sync số dư cho các bản ghi gần đây"""
-        # Lấy tối đa 50 bản ghi gần nhất để tránh chạy quá lâu
-        records = self.search([], order='write_date desc', limit=50)
-        for rec in records:
-            try:
-                rec.action_sync_balance()
-            except Exception as e:
-                _logger.warning(f'Cron sync balance failed for {rec.id}: {e}')
+        """Cron: Sync số dư cho mọi bản ghi có API Configuration đang hoạt động (theo lô, song song)"""
+        records = self.search([('config_id.active', '=', True)])
+        return self.env['trading.account.sync'].sync_records(records, parse_balance)
 
 
 class TradingPosition(models.Model):
@@ -296,7 +246,7 @@ class TradingPosition(models.Model):
     _name = 'trading.position'
     _description = 'Trading Position'
     _order = 'create_date desc'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'trading.response.mixin']
 
     name = fields.Char(
         string='Reference',
@@ -329,9 +279,29 @@ class TradingPosition(models.Model):
         help='Lấy summary position (chỉ cho derivative)'
     )
     
-    # Response Data
-    raw_response = fields.Text(
-        string='Raw Response',
+    # Parsed fields (tổng hợp từ line_ids)
+    holding_count = fields.Integer(
+        string='Holdings',
+        readonly=True,
+        help='Số mã đang nắm giữ'
+    )
+    
+    total_quantity = fields.Float(
+        string='Total Quantity',
+        digits=(20, 0),
+        readonly=True
+    )
+    
+    market_value = fields.Float(
+        string='Market Value',
+        digits=(20, 3),
+        readonly=True
+    )
+    
+    line_ids = fields.One2many(
+        'trading.position.line',
+        'position_id',
+        string='Holdings',
         readonly=True
     )
     
@@ -344,6 +314,47 @@ class TradingPosition(models.Model):
     # Notes
     notes = fields.Text(string='Notes')
 
+    def _sync_request(self):
+        """(key, method, request) của bản ghi cho trading.account.sync"""
+        from ssi_fctrading.models import fcmodel_requests
+        account = str(self.account or '').strip().upper()
+        if self.position_type == 'stock':
+            return (('get_stock_position', account), 'get_stock_position',
+                    fcmodel_requests.StockPosition(account=account))
+        return (('get_derivative_position', account, self.query_summary), 'get_derivative_position',
+                fcmodel_requests.DerivativePosition(account=account, querySummary=self.query_summary))
+
+    def write(self, vals):
+        result = super().write(vals)
+        if 'last_sync' in vals or 'line_ids' in vals:
+            self.env['trading.risk'].refresh_accounts(self.mapped('account'))
+        return result
+
+    def _sync_diff(self, vals):
+        """Như mixin, thêm lệnh thay toàn bộ line_ids khi danh sách mã đang giữ đổi"""
+        vals = dict(vals)
+        lines = vals.pop('lines', None)
+        diff = super()._sync_diff(vals)
+        if lines is not None:
+            current = self.line_ids.read(list(_POSITION_LINE_FIELDS), load=False)
+            if not same_lines(current, lines):
+                diff['line_ids'] = [Command.delete(line.id) for line in self.line_ids] + \
+                    [Command.create(line) for line in lines]
+        return diff
+
+    def _response_data(self):
+        """Vị thế dạng dict cho controller (đọc từ line_ids)"""
+        self.ensure_one()
+        return {
+            'account': self.account,
+            'position_type': self.position_type,
+            'holding_count': self.holding_count,
+            'total_quantity': self.total_quantity,
+            'market_value': self.market_value,
+            'positions': self.line_ids.read(list(_POSITION_LINE_FIELDS), load=False),
+            'last_sync': fields.Datetime.to_string(self.last_sync) if self.last_sync else False,
+        }
+
     def action_sync_position(self):
         """Sync position từ API"""
         self.ensure_one()
@@ -356,10 +367,7 @@ class TradingPosition(models.Model):
             else:
                 result = client.get_derivative_position(self.account, self.query_summary)
             
-            self.write({
-                'raw_response': json.dumps(result, indent=2),
-                'last_sync': fields.Datetime.now(),
-            })
+            self._apply_response(result, parse_positions)
             
             return {
                 'type': 'ir.actions.client',
@@ -376,13 +384,41 @@ class TradingPosition(models.Model):
 
     @api.model
     def cron_sync_positions(self):
-        """Cron: Tự động sync vị thế cho các bản ghi gần đây"""
-        records = self.search([], order='write_date desc', limit=50)
-        for rec in records:
-            try:
-                rec.action_sync_position()
-            except Exception as e:
-                _logger.warning(f'Cron sync position failed for {rec.id}: {e}')
+        """Cron: Sync vị thế cho mọi bản ghi có API Configuration đang hoạt động (theo lô, song song)"""
+        records = self.search([('config_id.active', '=', True)])
+        return self.env['trading.account.sync'].sync_records(records, parse_positions)
+
+
+class TradingPositionLine(models.Model):
+    """Một mã đang nắm giữ trong lần sync vị thế"""
+    _name = 'trading.position.line'
+    _description = 'Trading Position Line'
+    _order = 'position_id, instrument_code'
+
+    position_id = fields.Many2one(
+        'trading.position',
+        string='Position',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    
+    account = fields.Char(
+        related='position_id.account',
+        store=True,
+        index=True
+    )
+    
+    instrument_code = fields.Char(
+        string='Instrument Code',
+        required=True,
+        index=True
+    )
+    
+    quantity = fields.Float(string='Quantity', digits=(20, 0))
+    avg_price = fields.Float(string='Average Price', digits=(16, 3))
+    market_price = fields.Float(string='Market Price', digits=(16, 3))
+    market_value = fields.Float(string='Market Value', digits=(20, 3))
 
 
 class TradingMaxQuantity(models.Model):
@@ -390,6 +426,7 @@ class TradingMaxQuantity(models.Model):
     _name = 'trading.max.quantity'
     _description = 'Trading Max Quantity'
     _order = 'create_date desc'
+    _inherit = ['trading.response.mixin']
 
     name = fields.Char(
         string='Reference',
@@ -440,16 +477,23 @@ class TradingMaxQuantity(models.Model):
         readonly=True
     )
     
-    raw_response = fields.Text(
-        string='Raw Response',
-        readonly=True
-    )
-    
     last_sync = fields.Datetime(
         string='Last Sync',
         readonly=True
     )
 
+    def _sync_request(self):
+        """(key, method, request) của bản ghi cho trading.account.sync"""
+        from ssi_fctrading.models import fcmodel_requests
+        account = str(self.account or '').strip().upper()
+        if self.quantity_type == 'buy':
+            method, request = 'get_max_buy_qty', fcmodel_requests.MaxBuyQty(
+                account=account, instrumentID=self.instrument_code, price=self.price)
+        else:
+            method, request = 'get_max_sell_qty', fcmodel_requests.MaxSellQty(
+                account=account, instrumentID=self.instrument_code, price=str(self.price))
+        return (method, account, self.instrument_code, self.price), method, request
+
     def action_get_max_quantity(self):
         """Lấy max quantity từ API"""
         self.ensure_one()
@@ -462,17 +506,7 @@ class TradingMaxQuantity(models.Model):
             else:
                 result = client.get_max_sell_qty(self.account, self.instrument_code, str(self.price))
             
-            self.write({
-                'raw_response': json.dumps(result, indent=2),
-                'last_sync': fields.Datetime.now(),
-            })
-            
-            # Parse max quantity
-            if result.get('status') == 200 and result.get('data'):
-                data = result['data']
-                if isinstance(data, dict):
-                    max_qty = data.get('maxQuantity') or data.get('maxQty') or 0
-                    self.write({'max_quantity': int(max_qty)})
+            self._apply_response(result, parse_max_quantity)
             
             return {
                 'type': 'ir.actions.client',
@@ -489,11 +523,7 @@ class TradingMaxQuantity(models.Model):
 
     @api.model
     def cron_get_max_quantities(self):
-        """Cron: Tự động lấy max quantity cho các bản ghi gần đây"""
-        records = self.search([], order='write_date desc', limit=50)
-        for rec in records:
-            try:
-                rec.action_get_max_quantity()
-            except Exception as e:
-                _logger.warning(f'Cron get max quantity failed for {rec.id}: {e}')
+        """Cron: Lấy max quantity cho mọi bản ghi có API Configuration đang hoạt động (theo lô, song song)"""
+        records = self.search([('config_id.active', '=', True)])
+        return self.env['trading.account.sync'].sync_records(records, parse_max_quantity)
 
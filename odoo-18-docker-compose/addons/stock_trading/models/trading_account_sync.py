@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.addons.stock_data.utils.fetch_executor import (
+    DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_SEC, DEFAULT_RETRIES, FetchExecutor,
+)
+
+from .account_sync import parse_rate_limit
+from .utils import is_unauthorized
+
+_logger = logging.getLogger(__name__)
+
+# Quota đọc từ get_ratelimit theo (database, trading.config id) -> (request/giây, hết hạn)
+_RATE_LIMITS = {}
+_RATE_LIMITS_LOCK = threading.Lock()
+_RATE_LIMIT_TTL = 3600
+# Chỉ dùng một phần quota: cùng tài khoản API còn phục vụ đặt lệnh / stream
+_RATE_LIMIT_SHARE = 0.8
+
+
+class TradingAccountSyncService(models.AbstractModel):
+    """
+    Đồng bộ số dư / vị thế / khối lượng tối đa theo lô: gom bản ghi theo trading.config,
+    gọi API song song trong giới hạn quota và chỉ ghi các bản ghi có giá trị thay đổi
+    """
+    _name = 'trading.account.sync'
+    _description = 'Trading Account Sync Service'
+
+    _PARAM_MAX_WORKERS = 'trading.sync.max_workers'
+    _PARAM_RATE = 'trading.sync.rate_per_sec'
+    _PARAM_RETRIES = 'trading.sync.retries'
+
+    # --- Cấu hình ---
+    @api.model
+    def _param(self, key, default, cast):
+        try:
+            return cast(self.env['ir.config_parameter'].sudo().get_param(key) or default)
+        except (TypeError, ValueError):
+            return default
+
+    @api.model
+    def _rate_per_sec(self, config, client):
+        """Số request/giây cho config: trading.sync.rate_per_sec, không vượt quota API trả về (cache 1 giờ)"""
+        configured = self._param(self._PARAM_RATE, DEFAULT_RATE_PER_SEC, float)
+        key = (self.env.cr.dbname, config.id)
+        now = time.monotonic()
+        with _RATE_LIMITS_LOCK:
+            cached = _RATE_LIMITS.get(key)
+        if cached and cached[1] > now:
+            quota = cached[0]
+        else:
+            try:
+                quota = parse_rate_limit(client.get_rate_limit())
+            except Exception as e:
+                _logger.info(f'Cannot read rate limit for {config.name}: {e}')
+                quota = None
+            with _RATE_LIMITS_LOCK:
+                _RATE_LIMITS[key] = (quota, now + _RATE_LIMIT_TTL)
+        if quota:
+            return min(configured, quota * _RATE_LIMIT_SHARE)
+        return configured
+
+    @api.model
+    def _get_executor(self, config, client):
+        return FetchExecutor(
+            max_workers=self._param(self._PARAM_MAX_WORKERS, DEFAULT_MAX_WORKERS, int),
+            rate_per_sec=self._rate_per_sec(config, client),
+            retries=self._param(self._PARAM_RETRIES, DEFAULT_RETRIES, int),
+        )
+
+    # --- Gọi API ---
+    @api.model
+    def fetch_all(self, config, requests):
+        """
+        Gọi song song các request của một config.
+
+        Args:
+            requests: dict key -> (tên method của FCTradingClient, request object)
+
+        Returns:
+            dict key -> response (Exception nếu request lỗi sau khi thử lại)
+        """
+        if not requests:
+            return {}
+        client = config.get_api_client()
+        executor = self._get_executor(config, client)
+
+        def _fetch(item):
+            # Chạy trên luồng của executor: chỉ gọi API, không dùng cursor
+            _key, (method, request) = item
+            return getattr(client._client, method)(request)
+
+        def _run(items):
+            return {r.key: (r.value if r.ok else r.error)
+                    for r in executor.map(_fetch, items, key=lambda item: item[0])}
+
+        results = _run(list(requests.items()))
+        rejected = [key for key, value in results.items() if is_unauthorized(value)]
+        if rejected:
+            # Token hết hạn giữa chừng: đăng nhập lại trên luồng chính rồi gửi lại các request bị 401
+            _logger.info(f'Token rejected (401) for config {config.name}, logging in again')
+            client._relogin()
+            results.update(_run([(key, requests[key]) for key in rejected]))
+        return results
+
+    # --- Đồng bộ bản ghi ---
+    @api.model
+    def sync_records(self, records, parse):
+        """
+        Đồng bộ các bản ghi (trading.account.balance / trading.position / trading.max.quantity).
+
+        Mỗi bản ghi cung cấp _sync_request() -> (key, method, request); các bản ghi cùng key
+        dùng chung một request. parse(response) -> dict giá trị trường hoặc None nếu lỗi;
+        phần thay đổi so với giá trị đang lưu lấy từ _sync_diff (trading.response.mixin).
+
+        Returns:
+            dict {'synced', 'changed', 'failed'}
+        """
+        stats = {'synced': 0, 'changed': 0, 'failed': 0}
+        now = fields.Datetime.now()
+        for config, recs in records.filtered('config_id').grouped('config_id').items():
+            try:
+                plan = {rec.id: rec._sync_request() for rec in recs}
+                results = self.fetch_all(config, {key: (method, request)
+                                                  for key, method, request in plan.values()})
+            except Exception as e:
+                _logger.warning(f'Sync {records._name} failed for config {config.name}: {e}')
+                stats['failed'] += len(recs)
+                continue
+
+            changes = defaultdict(list)
+            unchanged = []
+            failed = stats['failed']
+            for rec in recs:
+                result = results.get(plan[rec.id][0])
+                vals = None if isinstance(result, Exception) else parse(result)
+                if vals is None:
+                    _logger.warning(f'Sync {records._name} {rec.id} failed: {result}')
+                    stats['failed'] += 1
+                    continue
+                diff = rec._sync_diff(vals)
+                if not diff:
+                    unchanged.append(rec.id)
+                elif any(isinstance(value, list) for value in diff.values()):
+                    # Có lệnh ghi bảng con (line_ids): ghi riêng từng bản ghi
+                    rec.write(dict(diff, last_sync=now))
+                    stats['changed'] += 1
+                else:
+                    changes[tuple(sorted(diff.items()))].append(rec.id)
+
+            # Bản ghi cùng giá trị mới được ghi trong một lệnh; bản ghi không đổi chỉ cập nhật last_sync
+            for items, ids in changes.items():
+                recs.browse(ids).write(dict(items, last_sync=now))
+                stats['changed'] += len(ids)
+            if unchanged:
+                recs.browse(unchanged).write({'last_sync': now})
+            stats['synced'] += len(recs) - (stats['failed'] - failed)
+        _logger.info(f'Sync {records._name}: {stats}')
+        return stats
@@ -6,19 +6,63 @@ Giúp quản lý kết nối và các API calls
 """
 
 import logging
+import threading
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.addons.stock_data.utils.client_pool import ClientPool
 
-from .utils import TokenConstants
+from .utils import READ_ONLY_METHODS, TokenConstants, credentials_fingerprint, is_unauthorized
 
 _logger = logging.getLogger(__name__)
 
 
+class _TradingSession:
+    """FCTradingClient đã đăng nhập, dùng chung giữa các request trong process"""
+
+    def __init__(self, client):
+        self.client = client
+        # Write token (chuỗi) đã nạp vào client -> chỉ restore từ config khi config có token khác
+        self.write_token = None
+        self.lock = threading.Lock()
+
+
+def _new_session(config):
+    """Đăng nhập FCTradingClient mới (lấy read token) cho trading.config"""
+    from ssi_fctrading import FCTradingClient
+
+    client = FCTradingClient(
+        url=config.api_url,
+        consumer_id=config.consumer_id,
+        consumer_secret=config.consumer_secret,
+        private_key=config.private_key,
+        twoFAType=int(config.two_fa_type)
+    )
+    session = _TradingSession(client)
+    # Lưu read token vào config (một lần cho mỗi lần đăng nhập, không phải mỗi lần gọi API)
+    token = client.get_access_token()
+    if token != config.read_access_token:
+        config.write({'read_access_token': token})
+    return session
+
+
+# Session theo (database, config id); tạo lại khi đổi thông tin đăng nhập, hết hạn token hoặc gặp 401
+_SESSIONS = ClientPool(_new_session, ttl=TokenConstants.READ_TOKEN_TTL_SECONDS)
+
+
+def invalidate_sessions(dbname, config_ids=None):
+    """Bỏ session của các config (None = tất cả config của database)"""
+    ids = set(config_ids or ())
+    return _SESSIONS.invalidate(lambda key: key[0] == dbname and (not ids or key[1] in ids))
+
+
 class TradingAPIClient:
     """
     Wrapper class cho FCTradingClient và FCTradingStream
     Quản lý connection, token refresh, error handling
+
+    Wrapper tạo theo từng request (giữ record config của env hiện tại), còn FCTradingClient
+    và token của nó được dùng chung qua _SESSIONS.
     """
     
     def __init__(self, config):
@@ -29,59 +73,94 @@ class TradingAPIClient:
             config: trading.config record
         """
         self.config = config
+        self._session = None
         self._client = None
         self._stream = None
         self._initialize_client()
+
+    def _session_key(self):
+        return (self.config.env.cr.dbname, self.config.id)
+
+    def _fingerprint(self):
+        config = self.config
+        return credentials_fingerprint(config.api_url, config.consumer_id, config.consumer_secret,
+                                       config.private_key, config.two_fa_type)
     
     def _initialize_client(self):
-        """Khởi tạo FCTradingClient"""
+        """Lấy FCTradingClient dùng chung (đăng nhập nếu chưa có) và restore write token"""
         try:
-            from ssi_fctrading import FCTradingClient
-            from ssi_fctrading.models import AccessTokenModel, fcmodel_responses
-            
-            self._client = FCTradingClient(
-                url=self.config.api_url,
-                consumer_id=self.config.consumer_id,
-                consumer_secret=self.config.consumer_secret,
-                private_key=self.config.private_key,
-                twoFAType=int(self.config.two_fa_type)
-            )
-            
-            # Lưu read token vào config
-            self.config.write({
-                'read_access_token': self._client.get_access_token(),
-            })
-            
-            # Restore write_access_token nếu có trong config và còn hiệu lực
-            if self.config.write_access_token:
-                try:
-                    from ssi_fctrading.models import AccessTokenModel, fcmodel_responses
-                    # Tạo AccessToken object từ token string
-                    access_token_obj = fcmodel_responses.AccessToken(accessToken=self.config.write_access_token)
-                    # Tạo AccessTokenModel từ AccessToken object
-                    token_model = AccessTokenModel(access_token_obj)
-                    # Chỉ restore nếu token còn hiệu lực (chưa hết hạn)
-                    if not token_model.is_expired():
-                        self._client._write_access_token = token_model
-                        _logger.info(f'Restored write_access_token from config for: {self.config.name} (token còn hiệu lực)')
-                    else:
-                        _logger.info(f'Write token trong config đã hết hạn cho: {self.config.name}, cần verify lại OTP')
-                        # Clear write token trong config vì đã hết hạn
-                        self.config.write({'write_access_token': False})
-                except Exception as e:
-                    _logger.warning(f'Could not restore write_access_token from config: {e}')
-                    # Nếu không restore được, user sẽ phải verify code lại
-            
-            _logger.info(f'Trading API client initialized for config: {self.config.name}')
+            self._session = _SESSIONS.get(self._session_key(), self._fingerprint(), self.config)
+            self._client = self._session.client
+            self._restore_write_token()
         except Exception as e:
             _logger.error(f'Error initializing trading client: {e}')
             raise UserError(_('Không thể khởi tạo API client: %s') % str(e))
+
+    def _restore_write_token(self):
+        """
+        Nạp write_access_token của config vào client nếu client chưa có đúng token đó
+        (token được verify ở process/worker khác hoặc client vừa được tạo lại)
+        """
+        token = self.config.write_access_token
+        session = self._session
+        if not token or token == session.write_token:
+            return
+        with session.lock:
+            if token == session.write_token:
+                return
+            try:
+                from ssi_fctrading.models import AccessTokenModel, fcmodel_responses
+                # Tạo AccessToken object từ token string
+                access_token_obj = fcmodel_responses.AccessToken(accessToken=token)
+                # Tạo AccessTokenModel từ AccessToken object
+                token_model = AccessTokenModel(access_token_obj)
+                # Chỉ restore nếu token còn hiệu lực (chưa hết hạn)
+                if not token_model.is_expired():
+                    self._client._write_access_token = token_model
+                    session.write_token = token
+                    _logger.info(f'Restored write_access_token from config for: {self.config.name} (token còn hiệu lực)')
+                else:
+                    _logger.info(f'Write token trong config đã hết hạn cho: {self.config.name}, cần verify lại OTP')
+                    # Clear write token trong config vì đã hết hạn
+                    self.config.write({'write_access_token': False})
+            except Exception as e:
+                _logger.warning(f'Could not restore write_access_token from config: {e}')
+                # Nếu không restore được, user sẽ phải verify code lại
+
+    def _relogin(self):
+        """Bỏ session hiện tại và đăng nhập lại (token bị từ chối)"""
+        _SESSIONS.invalidate(lambda key: key == self._session_key())
+        self._initialize_client()
+
+    def _call(self, method, *args):
+        """
+        Gọi method của FCTradingClient. Token bị từ chối (HTTP 401):
+        - method chỉ đọc (READ_ONLY_METHODS): đăng nhập lại và thử lại một lần
+        - method ghi (đặt/sửa/huỷ lệnh, chuyển tiền...): bỏ session và báo lỗi, không tự gửi lại
+          để tránh lệnh trùng; người dùng kiểm tra sổ lệnh rồi thao tác lại
+        """
+        try:
+            result = getattr(self._client, method)(*args)
+        except Exception as e:
+            if not is_unauthorized(e):
+                raise
+            result = e
+        if not is_unauthorized(result):
+            return result
+        _logger.info(f'Token rejected (401) for config {self.config.name} on {method}, logging in again')
+        self._relogin()
+        if method not in READ_ONLY_METHODS:
+            raise UserError(_('Phiên đăng nhập API đã hết hạn nên yêu cầu chưa được gửi lại tự động. '
+                              'Vui lòng kiểm tra sổ lệnh trước khi thực hiện lại.'))
+        return getattr(self._client, method)(*args)
     
     def get_access_token(self):
         """Lấy read access token (tự động refresh nếu hết hạn)"""
         try:
-            token = self._client.get_access_token()
-            self.config.write({'read_access_token': token})
+            token = self._call('get_access_token')
+            # Chỉ ghi DB khi client đã làm mới token
+            if token != self.config.read_access_token:
+                self.config.write({'read_access_token': token})
             return token
         except Exception as e:
             _logger.error(f'Error getting access token: {e}')
@@ -114,6 +193,7 @@ class TradingAPIClient:
             self.config.write({
                 'write_access_token': token,
             })
+            self._session.write_token = token
             
             _logger.info(f'Successfully verified code and obtained write token for config: {self.config.name}')
             return token
@@ -169,6 +249,7 @@ class TradingAPIClient:
             _logger.info(f'Write token đã hết hạn cho config {self.config.name}, cần verify OTP lại')
             # Clear token đã hết hạn
             self._client._write_access_token = None
+            self._session.write_token = None
             self.config.write({'write_access_token': False})
             
             if not code:
@@ -214,7 +295,7 @@ class TradingAPIClient:
             )
             
             # Gọi API GetOTP (public endpoint, không cần access token)
-            result = self._client.get_otp(req)
+            result = self._call('get_otp', req)
             
             # Log response để debug
             _logger.info(f'GetOTP response for config {self.config.name}: {result}')
@@ -326,7 +407,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.NewOrder(**order_data)
-            result = self._client.new_order(req)
+            result = self._call('new_order', req)
             return result
         except Exception as e:
             _logger.error(f'Error placing new order: {e}')
@@ -338,7 +419,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.ModifyOrder(**order_data)
-            result = self._client.modify_order(req)
+            result = self._call('modify_order', req)
             return result
         except Exception as e:
             _logger.error(f'Error modifying order: {e}')
@@ -350,7 +431,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.CancelOrder(**order_data)
-            result = self._client.cancle_order(req)
+            result = self._call('cancle_order', req)
             return result
         except Exception as e:
             _logger.error(f'Error canceling order: {e}')
@@ -362,7 +443,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.NewOrder(**order_data)
-            result = self._client.der_new_order(req)
+            result = self._call('der_new_order', req)
             return result
         except Exception as e:
             _logger.error(f'Error placing derivative order: {e}')
@@ -374,7 +455,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.ModifyOrder(**order_data)
-            result = self._client.der_modify_order(req)
+            result = self._call('der_modify_order', req)
             return result
         except Exception as e:
             _logger.error(f'Error modifying derivative order: {e}')
@@ -386,7 +467,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.CancelOrder(**order_data)
-            result = self._client.der_cancle_order(req)
+            result = self._call('der_cancle_order', req)
             return result
         except Exception as e:
             _logger.error(f'Error canceling derivative order: {e}')
@@ -414,7 +495,7 @@ class TradingAPIClient:
             _logger.info(f'Getting stock account balance for account: {account_clean}')
             
             req = fcmodel_requests.StockAccountBalance(account=account_clean)
-            result = self._client.get_stock_account_balance(req)
+            result = self._call('get_stock_account_balance', req)
             
             # Kiểm tra response
             if isinstance(result, dict):
@@ -451,7 +532,7 @@ class TradingAPIClient:
             account_clean = str(account).strip().upper()
             
             req = fcmodel_requests.DerivativeAccountBalance(account=account_clean)
-            result = self._client.get_derivative_account_balance(req)
+            result = self._call('get_derivative_account_balance', req)
             
             # Kiểm tra response tương tự stock
             if isinstance(result, dict):
@@ -472,7 +553,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.StockPosition(account=account)
-            result = self._client.get_stock_position(req)
+            result = self._call('get_stock_position', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting stock position: {e}')
@@ -484,7 +565,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.DerivativePosition(account=account, querySummary=query_summary)
-            result = self._client.get_derivative_position(req)
+            result = self._call('get_derivative_position', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting derivative position: {e}')
@@ -496,7 +577,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.MaxBuyQty(account=account, instrumentID=instrument_id, price=price)
-            result = self._client.get_max_buy_qty(req)
+            result = self._call('get_max_buy_qty', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting max buy qty: {e}')
@@ -508,7 +589,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.MaxSellQty(account=account, instrumentID=instrument_id, price=price)
-            result = self._client.get_max_sell_qty(req)
+            result = self._call('get_max_sell_qty', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting max sell qty: {e}')
@@ -522,7 +603,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.OrderHistory(account=account, startDate=start_date, endDate=end_date)
-            result = self._client.get_order_history(req)
+            result = self._call('get_order_history', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting order history: {e}')
@@ -534,7 +615,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.OrderBook(account=account)
-            result = self._client.get_order_book(req)
+            result = self._call('get_order_book', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting order book: {e}')
@@ -546,7 +627,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.AuditOrderBook(account=account)
-            result = self._client.get_audit_order_book(req)
+            result = self._call('get_audit_order_book', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting audit order book: {e}')
@@ -555,7 +636,7 @@ class TradingAPIClient:
     def get_rate_limit(self):
         """Lấy rate limit"""
         try:
-            result = self._client.get_ratelimit()
+            result = self._call('get_ratelimit')
             return result
         except Exception as e:
             _logger.error(f'Error getting rate limit: {e}')
@@ -569,7 +650,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.CashInAdvanceAmount(account=account)
-            result = self._client.get_cash_cia_amount(req)
+            result = self._call('get_cash_cia_amount', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting cash CIA amount: {e}')
@@ -581,7 +662,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.CashTransferHistory(account=account, fromDate=from_date, toDate=to_date)
-            result = self._client.get_cash_transfer_history(req)
+            result = self._call('get_cash_transfer_history', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting cash transfer history: {e}')
@@ -593,7 +674,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.CashTransfer(**transfer_data)
-            result = self._client.create_cash_transfer(req)
+            result = self._call('create_cash_transfer', req)
             return result
         except Exception as e:
             _logger.error(f'Error creating cash transfer: {e}')
@@ -607,7 +688,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.OrsDividend(account=account)
-            result = self._client.get_ors_dividend(req)
+            result = self._call('get_ors_dividend', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting ORS dividend: {e}')
@@ -619,7 +700,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.Ors(**ors_data)
-            result = self._client.create_ors(req)
+            result = self._call('create_ors', req)
             return result
         except Exception as e:
             _logger.error(f'Error creating ORS: {e}')
@@ -633,7 +714,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.StockTransferable(account=account)
-            result = self._client.get_stock_transferable(req)
+            result = self._call('get_stock_transferable', req)
             return result
         except Exception as e:
             _logger.error(f'Error getting stock transferable: {e}')
@@ -645,7 +726,7 @@ class TradingAPIClient:
             from ssi_fctrading.models import fcmodel_requests
             
             req = fcmodel_requests.StockTransfer(**transfer_data)
-            result = self._client.create_stock_transfer(req)
+            result = self._call('create_stock_transfer', req)
             return result
         except Exception as e:
             _logger.error(f'Error creating stock transfer: {e}')
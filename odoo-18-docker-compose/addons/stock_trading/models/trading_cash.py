@@ -196,7 +196,7 @@ class TradingCashTransfer(models.Model):
                     'code': self.code,
                 }
                 req = fcmodel_requests.CashTransferVSD(**transfer_data)
-                result = client._client.create_cash_transfer_vsd(req)
+                result = client._call('create_cash_transfer_vsd', req)
             
             self.write({
                 'state': 'success',
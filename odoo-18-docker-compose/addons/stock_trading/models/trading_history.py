@@ -1,18 +1,24 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, Command, _
 from odoo.exceptions import UserError
 import logging
 import json
 
+from .order_stream import order_lines
+
 _logger = logging.getLogger(__name__)
 
+ORDER_LINE_FIELDS = ('order_id', 'request_id', 'account', 'instrument_code', 'side', 'price', 'quantity',
+                     'filled_quantity', 'avg_price', 'status', 'state', 'order_date')
+
 
 class TradingOrderHistory(models.Model):
     """Lịch sử lệnh"""
     _name = 'trading.order.history'
     _description = 'Order History'
     _order = 'create_date desc'
+    _inherit = ['trading.response.mixin']
 
     name = fields.Char(
         string='Reference',
@@ -43,8 +49,10 @@ class TradingOrderHistory(models.Model):
         required=True
     )
     
-    raw_response = fields.Text(
-        string='Raw Response',
+    line_ids = fields.One2many(
+        'trading.order.book.line',
+        'history_id',
+        string='Orders',
         readonly=True
     )
     
@@ -53,6 +61,23 @@ class TradingOrderHistory(models.Model):
         readonly=True
     )
 
+    def _apply_order_lines(self, result):
+        """Thay các dòng lệnh bằng dữ liệu của response mới"""
+        self.ensure_one()
+        self.line_ids.unlink()
+        vals = dict(self._raw_vals(result), last_sync=fields.Datetime.now())
+        vals['line_ids'] = [Command.create(line) for line in order_lines(result)]
+        self.write(vals)
+
+    def _response_data(self):
+        """Danh sách lệnh dạng dict cho controller (đọc từ line_ids)"""
+        self.ensure_one()
+        return {
+            'account': self.account,
+            'orders': self.line_ids.read(list(ORDER_LINE_FIELDS), load=False),
+            'last_sync': fields.Datetime.to_string(self.last_sync) if self.last_sync else False,
+        }
+
     def action_sync_history(self):
         """Sync lịch sử lệnh"""
         self.ensure_one()
@@ -65,11 +90,7 @@ class TradingOrderHistory(models.Model):
             end_date_str = self.end_date.strftime('%d/%m/%Y')
             
             result = client.get_order_history(self.account, start_date_str, end_date_str)
-            
-            self.write({
-                'raw_response': json.dumps(result, indent=2),
-                'last_sync': fields.Datetime.now(),
-            })
+            self._apply_order_lines(result)
             
             return {
                 'type': 'ir.actions.client',
@@ -90,6 +111,7 @@ class TradingOrderBook(models.Model):
     _name = 'trading.order.book'
     _description = 'Order Book'
     _order = 'create_date desc'
+    _inherit = ['trading.response.mixin']
 
     name = fields.Char(
         string='Reference',
@@ -116,8 +138,10 @@ class TradingOrderBook(models.Model):
     ], string='Book Type', required=True, default='normal',
        help='Loại sổ lệnh: normal hoặc audit (có lỗi)')
     
-    raw_response = fields.Text(
-        string='Raw Response',
+    line_ids = fields.One2many(
+        'trading.order.book.line',
+        'book_id',
+        string='Orders',
         readonly=True
     )
     
@@ -126,6 +150,23 @@ class TradingOrderBook(models.Model):
         readonly=True
     )
 
+    def _apply_order_lines(self, result):
+        """Thay các dòng lệnh bằng dữ liệu của response mới"""
+        self.ensure_one()
+        self.line_ids.unlink()
+        vals = dict(self._raw_vals(result), last_sync=fields.Datetime.now())
+        vals['line_ids'] = [Command.create(line) for line in order_lines(result)]
+        self.write(vals)
+
+    def _response_data(self):
+        """Danh sách lệnh dạng dict cho controller (đọc từ line_ids)"""
+        self.ensure_one()
+        return {
+            'account': self.account,
+            'orders': self.line_ids.read(list(ORDER_LINE_FIELDS), load=False),
+            'last_sync': fields.Datetime.to_string(self.last_sync) if self.last_sync else False,
+        }
+
     def action_sync_order_book(self):
         """Sync sổ lệnh"""
         self.ensure_one()
@@ -137,11 +178,7 @@ class TradingOrderBook(models.Model):
                 result = client.get_order_book(self.account)
             else:
                 result = client.get_audit_order_book(self.account)
-            
-            self.write({
-                'raw_response': json.dumps(result, indent=2),
-                'last_sync': fields.Datetime.now(),
-            })
+            self._apply_order_lines(result)
             
             return {
                 'type': 'ir.actions.client',
@@ -157,6 +194,40 @@ class TradingOrderBook(models.Model):
             raise UserError(_('Không thể sync sổ lệnh: %s') % str(e))
 
 
+class TradingOrderBookLine(models.Model):
+    """Một lệnh trong sổ lệnh / lịch sử lệnh đã sync"""
+    _name = 'trading.order.book.line'
+    _description = 'Order Book Line'
+    _order = 'order_date desc, id desc'
+
+    book_id = fields.Many2one(
+        'trading.order.book',
+        string='Order Book',
+        index=True,
+        ondelete='cascade'
+    )
+    
+    history_id = fields.Many2one(
+        'trading.order.history',
+        string='Order History',
+        index=True,
+        ondelete='cascade'
+    )
+    
+    account = fields.Char(string='Account', index=True)
+    order_id = fields.Char(string='Order ID', index=True)
+    request_id = fields.Char(string='Request ID')
+    instrument_code = fields.Char(string='Instrument Code', index=True)
+    side = fields.Char(string='Side', help='B: mua, S: bán')
+    price = fields.Float(string='Price', digits=(16, 3))
+    quantity = fields.Float(string='Quantity', digits=(20, 0))
+    filled_quantity = fields.Float(string='Filled Quantity', digits=(20, 0))
+    avg_price = fields.Float(string='Average Price', digits=(16, 3))
+    status = fields.Char(string='Status', help='Mã trạng thái lệnh của SSI')
+    state = fields.Char(string='State', help='Trạng thái tương ứng của trading.order')
+    order_date = fields.Date(string='Order Date', index=True)
+
+
 class TradingRateLimit(models.Model):
     """Rate Limit"""
     _name = 'trading.rate.limit'
@@ -3,6 +3,7 @@
 import json
 import logging
 import random
+from collections import defaultdict
 from datetime import datetime
 
 from odoo import models, fields, api, _
@@ -14,6 +15,7 @@ from .utils import (
     is_token_expired,
     get_token_expires_in,
 )
+from .order_stream import OPEN_STATES, map_order_status, merge_state, normalize_order, order_book_rows
 
 _logger = logging.getLogger(__name__)
 
@@ -212,6 +214,7 @@ class TradingOrder(models.Model):
         string='Request ID',
         required=True,
         readonly=True,
+        index=True,
         default=lambda self: str(random.randint(0, 99999999)),
         help='ID yêu cầu duy nhất'
     )
@@ -281,6 +284,7 @@ class TradingOrder(models.Model):
     api_order_id = fields.Char(
         string='API Order ID',
         readonly=True,
+        index=True,
         help='Order ID từ API response'
     )
     
@@ -306,6 +310,12 @@ class TradingOrder(models.Model):
         readonly=True
     )
     
+    filled_quantity = fields.Integer(
+        string='Filled Quantity',
+        readonly=True,
+        help='Khối lượng đã khớp (cập nhật từ trading stream / Order Book)'
+    )
+    
     # Authentication
     code = fields.Char(
         string='OTP Code',
@@ -337,6 +347,16 @@ class TradingOrder(models.Model):
         records = super().create(vals_list)
         return records
     
+    def write(self, vals):
+        """Cập nhật phần giữ chỗ của trading.risk khi trạng thái / khối lượng khớp của lệnh đổi"""
+        result = super().write(vals)
+        if 'state' in vals or 'filled_quantity' in vals:
+            try:
+                self.env['trading.risk'].track_orders(self)
+            except Exception as e:
+                _logger.warning(f'Risk tracking failed for orders {self.ids}: {e}')
+        return result
+    
     @api.constrains('stop_order', 'order_type')
     def _check_stop_order(self):
         """Stop order chỉ áp dụng cho derivative"""
@@ -346,41 +366,32 @@ class TradingOrder(models.Model):
     
     @api.depends('account', 'config_id')
     def _compute_account_balance(self):
-        """Tính account_balance_id từ account và config_id"""
-        for record in self:
-            if record.account and record.config_id:
-                account_clean = str(record.account).strip().upper()
-                # Tìm Account Balance record gần nhất với account và config_id này
-                balance = self.env['trading.account.balance'].search([
-                    ('account', '=', account_clean),
-                    ('config_id', '=', record.config_id.id),
-                    ('balance_type', '=', 'stock' if record.order_type == 'stock' else 'derivative')
-                ], order='last_sync desc', limit=1)
-                record.account_balance_id = balance.id if balance else False
-            else:
-                record.account_balance_id = False
+        """Tính account_balance_id từ account và config_id (một truy vấn cho cả recordset)"""
+        def _key(record):
+            return (str(record.account or '').strip().upper(), record.config_id.id,
+                    'stock' if record.order_type == 'stock' else 'derivative')
+
+        keyed = [(record, _key(record)) for record in self if record.account and record.config_id]
+        latest = {}
+        if keyed:
+            keys = {key for _record, key in keyed}
+            balances = self.env['trading.account.balance'].search([
+                ('account', 'in', list({key[0] for key in keys})),
+                ('config_id', 'in', list({key[1] for key in keys})),
+                ('balance_type', 'in', list({key[2] for key in keys})),
+            ], order='last_sync desc')
+            # Kết quả đã sắp theo last_sync giảm dần: giữ bản ghi đầu tiên của mỗi khoá
+            for balance in balances:
+                latest.setdefault((balance.account, balance.config_id.id, balance.balance_type), balance.id)
+        self.account_balance_id = False
+        for record, key in keyed:
+            record.account_balance_id = latest.get(key, False)
     
     @api.depends('account_balance_id', 'account_balance_id.purchasing_power')
     def _compute_purchasing_power(self):
         """Tính purchasing_power từ Account Balance"""
         for record in self:
-            if record.account_balance_id and record.account_balance_id.purchasing_power:
-                record.purchasing_power = record.account_balance_id.purchasing_power
-            else:
-                # Fallback: tìm Account Balance và lấy purchasing_power
-                if record.account and record.config_id:
-                    account_clean = str(record.account).strip().upper()
-                    balance = self.env['trading.account.balance'].search([
-                        ('account', '=', account_clean),
-                        ('config_id', '=', record.config_id.id),
-                        ('balance_type', '=', 'stock' if record.order_type == 'stock' else 'derivative')
-                    ], order='last_sync desc', limit=1)
-                    if balance and balance.purchasing_power:
-                        record.purchasing_power = balance.purchasing_power
-                    else:
-                        record.purchasing_power = 0.0
-                else:
-                    record.purchasing_power = 0.0
+            record.purchasing_power = record.account_balance_id.purchasing_power or 0.0
     
     @staticmethod
     def _get_stock_order_types():
@@ -747,6 +758,17 @@ class TradingOrder(models.Model):
         if self.state != 'draft':
             raise UserError(_('Chỉ có thể submit lệnh ở trạng thái Draft'))
         
+        # Kiểm tra sức mua / số dư chứng khoán trên snapshot cục bộ trước mọi request tới API
+        self.env['trading.risk'].check_order(self)
+        try:
+            return self._send_new_order()
+        except Exception:
+            # DB được rollback nhưng snapshot trong bộ nhớ thì không: bỏ phần giữ chỗ của lệnh
+            self.env['trading.risk'].release_order(self)
+            raise
+    
+    def _send_new_order(self):
+        """Gửi lệnh mới tới API (sau khi trading.risk đã kiểm tra và giữ chỗ)"""
         try:
             # Invalidate cache để đảm bảo có write_access_token mới nhất
             self.config_id.invalidate_recordset(['write_access_token'])
@@ -1127,51 +1149,15 @@ class TradingOrder(models.Model):
         Returns:
             str: Odoo state
         """
-        api_status = str(api_status).upper().strip()
-        
-        # Map các status phổ biến
-        status_mapping = {
-            'PENDING': 'pending',
-            'P': 'pending',
-            'WAITING': 'pending',
-            'NEW': 'pending',
-            
-            'SUBMITTED': 'submitted',
-            'S': 'submitted',
-            'ACTIVE': 'submitted',
-            
-            'FILLED': 'filled',
-            'F': 'filled',
-            'COMPLETED': 'filled',
-            'DONE': 'filled',
-            'EXECUTED': 'filled',
-            
-            'PARTIALLY_FILLED': 'partially_filled',
-            'PARTIAL': 'partially_filled',
-            'PF': 'partially_filled',
-            
-            'CANCELLED': 'cancelled',
-            'CANCEL': 'cancelled',
-            'C': 'cancelled',
-            'CANCELED': 'cancelled',
-            
-            'REJECTED': 'rejected',
-            'R': 'rejected',
-            'REJECT': 'rejected',
-            'FAILED': 'rejected',
-            
-            'ERROR': 'error',
-            'E': 'error',
-            'FAIL': 'error',
-        }
-        
-        return status_mapping.get(api_status, 'submitted')  # Default là submitted
+        return map_order_status(api_status) or 'submitted'  # Default là submitted
     
     def action_sync_status(self):
         """
         Sync order status từ Order Book API
         
-        Lấy thông tin mới nhất từ API về trạng thái lệnh (đã khớp, chờ khớp, đã hủy, v.v.)
+        Lấy thông tin mới nhất từ API về trạng thái lệnh (đã khớp, chờ khớp, đã hủy, v.v.).
+        Khi trading stream đang chạy (trading.order.stream) trạng thái đã được cập nhật tự động;
+        nút này chỉ còn dùng để đối soát thủ công.
         """
         self.ensure_one()
         
@@ -1183,153 +1169,144 @@ class TradingOrder(models.Model):
         
         try:
             client = self.config_id.get_api_client()
+            result = client.get_order_book(self.account)
             
-            # Validate và format account
-            account_clean = str(self.account).strip().upper()
+            if not isinstance(result, dict):
+                raise UserError(_('Response không đúng format'))
+            if result.get('status', 0) != 200:
+                raise UserError(_('Không thể lấy Order Book: %s') % result.get('message', 'Unknown error'))
             
-            # Lấy order book để tìm lệnh hiện tại
-            from ssi_fctrading.models import fcmodel_requests
-            req = fcmodel_requests.OrderBook(account=account_clean)
-            result = client.get_order_book(req)
+            events = [e for e in (normalize_order(row) for row in order_book_rows(result)) if e]
+            _logger.debug('Order Book for %s: %d orders', self.account, len(events))
             
-            _logger.info(f'Order Book response for sync status: {json.dumps(result, indent=2)}')
+            old_state = self.state
+            found = any(e['order_id'] == str(self.api_order_id) for e in events)
+            # Cập nhật luôn các lệnh khác của cùng tài khoản có trong Order Book
+            self._apply_order_events(events, self.config_id)
             
-            # Parse order status từ order book
-            if isinstance(result, dict):
-                status_code = result.get('status', 0)
-                if status_code == 200:
-                    data = result.get('data')
-                    
-                    # Tìm order trong order book
-                    if isinstance(data, list):
-                        # Nếu data là list các orders
-                        for order in data:
-                            order_id = (
-                                str(order.get('orderID', '')) or 
-                                str(order.get('order_id', '')) or 
-                                str(order.get('id', '')) or
-                                ''
-                            )
-                            if order_id == str(self.api_order_id):
-                                # Tìm thấy order, parse status
-                                order_status = self._parse_order_status_from_order_book(order)
-                                old_state = self.state
-                                
-                                self.write({
-                                    'state': order_status,
-                                    'api_response': json.dumps(result, indent=2),
-                                })
-                                
-                                # Update filled_at nếu đã filled
-                                if order_status == 'filled' and old_state != 'filled':
-                                    self.write({'filled_at': fields.Datetime.now()})
-                                
-                                return {
-                                    'type': 'ir.actions.client',
-                                    'tag': 'display_notification',
-                                    'params': {
-                                        'title': _('Status Updated'),
-                                        'message': _('Trạng thái lệnh đã được cập nhật: %s → %s') % (old_state, order_status),
-                                        'type': 'success',
-                                    }
-                                }
-                    elif isinstance(data, dict):
-                        # Nếu data là dict, có thể là single order
-                        order_id = (
-                            str(data.get('orderID', '')) or 
-                            str(data.get('order_id', '')) or 
-                            str(data.get('id', '')) or
-                            ''
-                        )
-                        if order_id == str(self.api_order_id):
-                            order_status = self._parse_order_status_from_order_book(data)
-                            old_state = self.state
-                            
-                            self.write({
-                                'state': order_status,
-                                'api_response': json.dumps(result, indent=2),
-                            })
-                            
-                            if order_status == 'filled' and old_state != 'filled':
-                                self.write({'filled_at': fields.Datetime.now()})
-                            
-                            return {
-                                'type': 'ir.actions.client',
-                                'tag': 'display_notification',
-                                'params': {
-                                    'title': _('Status Updated'),
-                                    'message': _('Trạng thái lệnh đã được cập nhật: %s → %s') % (old_state, order_status),
-                                    'type': 'success',
-                                }
-                            }
-                    
-                    # Không tìm thấy order trong order book
-                    # Có thể order đã filled hoặc cancelled
-                    # Kiểm tra order history
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'title': _('Order Not Found'),
-                            'message': _('Không tìm thấy lệnh trong Order Book. Có thể lệnh đã khớp hoặc đã hủy. Vui lòng kiểm tra Order History.'),
-                            'type': 'warning',
-                        }
+            if not found:
+                # Không tìm thấy order trong order book
+                # Có thể order đã filled hoặc cancelled
+                return {
+                    'type': 'ir.actions.client',
+                    'tag': 'display_notification',
+                    'params': {
+                        'title': _('Order Not Found'),
+                        'message': _('Không tìm thấy lệnh trong Order Book. Có thể lệnh đã khớp hoặc đã hủy. Vui lòng kiểm tra Order History.'),
+                        'type': 'warning',
                     }
-                else:
-                    raise UserError(_('Không thể lấy Order Book: %s') % result.get('message', 'Unknown error'))
-            else:
-                raise UserError(_('Response không đúng format'))
-                
+                }
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Status Updated'),
+                    'message': _('Trạng thái lệnh đã được cập nhật: %s → %s') % (old_state, self.state),
+                    'type': 'success',
+                }
+            }
+        except UserError:
+            raise
         except Exception as e:
             _logger.error(f'Error syncing order status: {e}')
             raise UserError(_('Không thể sync status: %s') % str(e))
     
-    def _parse_order_status_from_order_book(self, order_data):
+    @api.model
+    def _apply_order_events(self, events, config):
         """
-        Parse order status từ order book data
+        Áp dụng lô event lệnh đã chuẩn hoá (normalize_order) từ stream hoặc Order Book của một trading.config.
+        
+        Lệnh được tìm trong config đó theo api_order_id/request_id (có index) trong một truy vấn; event có
+        account chỉ khớp lệnh cùng account. request_id (sinh ngẫu nhiên, có thể trùng) chỉ dùng khi event
+        không có order_id. Các lệnh có cùng giá trị cập nhật được ghi chung một lần write.
+        Trạng thái không bao giờ bị chuyển lùi.
         
-        Args:
-            order_data: Order data từ order book API
-            
         Returns:
-            str: Odoo state
+            int: số lệnh được cập nhật
         """
-        if not isinstance(order_data, dict):
-            return 'pending'
+        events = [e for e in events if e]
+        if not events or not config:
+            return 0
+        order_ids = list({e['order_id'] for e in events if e['order_id']})
+        request_ids = list({e['request_id'] for e in events if e['request_id'] and not e['order_id']})
+        domain = []
+        if order_ids:
+            domain = [('api_order_id', 'in', order_ids)]
+        if request_ids:
+            domain = (['|'] + domain if domain else []) + [('request_id', 'in', request_ids)]
+        orders = self.sudo().search([('config_id', '=', config.id)] + domain)
+        by_order_id = defaultdict(list)
+        by_request_id = defaultdict(list)
+        for o in orders:
+            if o.api_order_id:
+                by_order_id[o.api_order_id].append(o)
+            if o.request_id:
+                by_request_id[o.request_id].append(o)
         
-        # Tìm orderStatus trong order data
-        order_status = (
-            order_data.get('orderStatus') or 
-            order_data.get('status') or 
-            order_data.get('order_status') or
-            order_data.get('OrderStatus') or
-            order_data.get('Status') or
-            None
-        )
-        
-        if order_status:
-            return self._map_api_status_to_odoo_state(str(order_status))
-        
-        # Nếu không có orderStatus, check các field khác
-        # Ví dụ: filledQty, pendingQty, cancelledQty
-        filled_qty = order_data.get('filledQty') or order_data.get('filled_qty') or order_data.get('filledQuantity') or 0
-        quantity = order_data.get('quantity') or order_data.get('qty') or self.quantity or 0
+        def _match(event):
+            if event['order_id']:
+                candidates = by_order_id.get(event['order_id'], [])
+            else:
+                candidates = by_request_id.get(event['request_id'], [])
+            if event['account']:
+                candidates = [o for o in candidates if (o.account or '').strip().upper() == event['account']]
+            # Nhiều lệnh cùng khoá (không xác định được lệnh nào): bỏ qua
+            return candidates[0] if len(candidates) == 1 else None
         
-        try:
-            filled_qty = float(filled_qty) if filled_qty else 0
-            quantity = float(quantity) if quantity else 0
-        except (ValueError, TypeError):
-            filled_qty = 0
-            quantity = 0
+        now = fields.Datetime.now()
+        groups = defaultdict(list)
+        for event in events:
+            order = _match(event)
+            if not order:
+                continue
+            vals = {}
+            state = merge_state(order.state, event['state'])
+            if state:
+                vals['state'] = state
+                if state == 'filled':
+                    vals['filled_at'] = now
+                if state == 'rejected' and event['error']:
+                    vals['error_message'] = str(event['error'])
+            filled = int(event['filled_qty'] or 0)
+            if filled > (order.filled_quantity or 0):
+                vals['filled_quantity'] = filled
+            if vals:
+                groups[tuple(sorted(vals.items()))].append(order.id)
         
-        if quantity > 0:
-            if filled_qty >= quantity:
-                return 'filled'
-            elif filled_qty > 0:
-                return 'partially_filled'
-            else:
-                return 'pending'
+        for vals, ids in groups.items():
+            self.sudo().browse(ids).write(dict(vals))
+        updated = sum(len(ids) for ids in groups.values())
+        if updated:
+            _logger.info('Applied %d order events: %d orders updated', len(events), updated)
+        return updated
+    
+    @api.model
+    def _reconcile_order_book(self, config):
+        """
+        Đối soát lệnh còn mở của một trading.config với Order Book (một request cho mỗi tài khoản),
+        dùng sau khi stream kết nối lại để lấp các event bị lỡ.
         
-        # Default
-        return 'pending'
-
+        Returns:
+            int: số lệnh được cập nhật
+        """
+        open_orders = self.sudo().search([
+            ('config_id', '=', config.id),
+            ('state', 'in', OPEN_STATES),
+            ('api_order_id', '!=', False),
+        ])
+        accounts = {str(a).strip().upper() for a in open_orders.mapped('account') if a}
+        if not accounts:
+            return 0
+        client = config.get_api_client()
+        updated = 0
+        for account in accounts:
+            try:
+                result = client.get_order_book(account)
+            except Exception as e:
+                _logger.warning('Order Book reconcile failed for %s: %s', account, e)
+                continue
+            if not isinstance(result, dict) or result.get('status') != 200:
+                continue
+            updated += self._apply_order_events([normalize_order(row) for row in order_book_rows(result)], config)
+        _logger.info('Order Book reconcile for %s: %d accounts, %d orders updated', config.name, len(accounts), updated)
+        return updated
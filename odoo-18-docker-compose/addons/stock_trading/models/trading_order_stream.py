@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+
+from odoo import models, api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+from odoo.addons.stock_data.models.job_run import SessionLease
+
+from .order_stream import OrderStreamWorker
+
+_logger = logging.getLogger(__name__)
+
+# Worker đang chạy trong process hiện tại, theo (database, trading.config id)
+_WORKERS = {}
+# SessionLease của worker: chỉ một process (prefork) chạy stream cho mỗi config
+_LEASES = {}
+_WORKERS_LOCK = threading.Lock()
+
+
+class TradingOrderStreamService(models.AbstractModel):
+    """Cập nhật trạng thái lệnh theo event của FCTradingStream thay cho polling OrderBook"""
+    _name = 'trading.order.stream'
+    _description = 'Trading Order Stream Service'
+
+    _PARAM_ENABLED = 'trading.stream.enabled'
+    _PARAM_FLUSH_MS = 'trading.stream.flush_ms'
+
+    # --- Cấu hình ---
+    @api.model
+    def _stream_settings(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            flush_ms = int(ICP.get_param(self._PARAM_FLUSH_MS) or 500)
+        except ValueError:
+            flush_ms = 500
+        return {
+            'enabled': (ICP.get_param(self._PARAM_ENABLED) or '').lower() in ('1', 'true', 'yes'),
+            'flush_ms': flush_ms,
+        }
+
+    @api.model
+    def _build_stream_factory(self, dbname, config_id):
+        """
+        Factory tạo FCTradingStream; mỗi lần (re)connect lấy FCTradingClient dùng chung mới nhất
+        của config (token đã được làm mới nếu hết hạn)
+        """
+        def factory(on_message, on_error, on_open, notify_id):
+            from ssi_fctrading import FCTradingStream
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                config = env['trading.config'].browse(config_id)
+                client = config.get_api_client()
+                stream_url = config.stream_url
+            return FCTradingStream(client._client, stream_url, on_message, on_error, notify_id, on_open=on_open)
+
+        return factory
+
+    # --- Vòng đời worker ---
+    @api.model
+    def _active_configs(self):
+        return self.env['trading.config'].sudo().search([('active', '=', True)])
+
+    @api.model
+    def start_stream_worker(self, config):
+        """
+        Khởi động worker stream cho một trading.config nếu chưa chạy ở đâu: process giữ được
+        SessionLease của config mới mở FCTradingStream, các process khác bỏ qua
+        """
+        dbname = self.env.cr.dbname
+        key = (dbname, config.id)
+        settings = self._stream_settings()
+        with _WORKERS_LOCK:
+            worker = _WORKERS.get(key)
+            lease = _LEASES.get(key)
+            if lease and not lease.alive():
+                # Mất kết nối giữ lock: process khác có thể đã nhận stream -> dừng worker của process này
+                _LEASES.pop(key, None)
+                if worker:
+                    worker.stop()
+                    _WORKERS.pop(key, None)
+                lease = worker = None
+            if worker and worker.is_alive():
+                return False
+            if not lease:
+                lease = SessionLease.try_acquire(dbname, f'trading.order.stream.{config.id}')
+                if not lease:
+                    _logger.debug("Trading order stream already running in another process: db=%s config=%s",
+                                  dbname, config.name)
+                    return False
+                _LEASES[key] = lease
+            worker = OrderStreamWorker(
+                self._build_stream_factory(dbname, config.id),
+                self._make_flush(dbname, config.id),
+                reconcile=self._make_reconcile(dbname, config.id),
+                flush_ms=settings['flush_ms'],
+                notify_id=config.last_notify_id or '-1',
+            )
+            worker.start()
+            _WORKERS[key] = worker
+        _logger.info("Trading order stream started: db=%s config=%s notify_id=%s",
+                     dbname, config.name, worker.notify_id)
+        return True
+
+    @api.model
+    def stop_stream_worker(self, config_ids=None):
+        """Dừng worker của các config (None = mọi config của database hiện tại)"""
+        dbname = self.env.cr.dbname
+        with _WORKERS_LOCK:
+            keys = [k for k in _WORKERS if k[0] == dbname and (config_ids is None or k[1] in config_ids)]
+            workers = [_WORKERS.pop(k) for k in keys]
+            leases = [_LEASES.pop(k) for k in list(_LEASES)
+                      if k[0] == dbname and (config_ids is None or k[1] in config_ids)]
+        for worker in workers:
+            worker.stop()
+        # Nhả lock sau khi worker đã dừng hẳn
+        for lease in leases:
+            lease.release()
+        if workers:
+            _logger.info("Trading order stream stopped: db=%s configs=%s", dbname, [k[1] for k in keys])
+        return len(workers)
+
+    @api.model
+    def cron_ensure_order_stream(self):
+        """Cron giám sát: bật/tắt worker theo tham số trading.stream.enabled và config đang active"""
+        if not self._stream_settings()['enabled']:
+            self.stop_stream_worker()
+            return
+        configs = self._active_configs()
+        self.stop_stream_worker([k[1] for k in set(_WORKERS) | set(_LEASES)
+                                 if k[0] == self.env.cr.dbname and k[1] not in configs.ids])
+        for config in configs:
+            try:
+                self.start_stream_worker(config)
+            except Exception as e:
+                _logger.exception("Cannot start trading order stream for %s: %s", config.name, e)
+
+    @api.model
+    def _is_stream_running(self, config):
+        worker = _WORKERS.get((self.env.cr.dbname, config.id))
+        return bool(worker and worker.is_alive())
+
+    # --- Hàm chạy trên luồng worker ---
+    @api.model
+    def _make_flush(self, dbname, config_id):
+        """Ghi lô event trên cursor riêng và lưu notify_id để kết nối lại không bị lỡ event"""
+        state = {'notify_id': None}
+
+        def flush(events, notify_id):
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                config = env['trading.config'].browse(config_id)
+                updated = env['trading.order']._apply_order_events(events, config)
+                if notify_id and notify_id != state['notify_id']:
+                    config.write({'last_notify_id': notify_id})
+                    state['notify_id'] = notify_id
+            return updated
+
+        return flush
+
+    @api.model
+    def _make_reconcile(self, dbname, config_id):
+        def reconcile():
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                return env['trading.order']._reconcile_order_book(env['trading.config'].browse(config_id))
+
+        return reconcile
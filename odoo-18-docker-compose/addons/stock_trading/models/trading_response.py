@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+import logging
+import json
+
+from .account_sync import diff_values
+from .utils import pack_payload, unpack_payload
+
+_logger = logging.getLogger(__name__)
+
+
+class TradingResponseMixin(models.AbstractModel):
+    """
+    Lưu response API: giá trị đã parse nằm ở các cột/bảng con của model,
+    response gốc chỉ giữ (tuỳ chọn) ở dạng JSON nén
+    """
+    _name = 'trading.response.mixin'
+    _description = 'Trading API Response Storage'
+
+    _PARAM_KEEP_RAW = 'trading.raw_response.keep'
+
+    raw_payload = fields.Binary(
+        string='Raw Payload',
+        attachment=False,
+        readonly=True,
+        copy=False,
+        help='Response gốc từ API (JSON nén), chỉ lưu khi tham số trading.raw_response.keep bật'
+    )
+
+    raw_response = fields.Text(
+        string='Raw Response',
+        compute='_compute_raw_response',
+        help='Raw JSON response từ API'
+    )
+
+    @api.depends('raw_payload')
+    def _compute_raw_response(self):
+        for record in self:
+            # bin_size=False: đọc nội dung thay vì kích thước của trường Binary
+            payload = unpack_payload(record.with_context(bin_size=False).raw_payload)
+            record.raw_response = json.dumps(payload, indent=2, ensure_ascii=False) if payload is not None else False
+
+    @api.model
+    def _keep_raw_response(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(self._PARAM_KEEP_RAW) or '1'
+        return value.lower() in ('1', 'true', 'yes')
+
+    @api.model
+    def _raw_vals(self, result):
+        """Giá trị raw_payload cần ghi cho response (rỗng nếu không giữ response gốc)"""
+        return {'raw_payload': pack_payload(result)} if self._keep_raw_response() else {}
+
+    def _sync_diff(self, vals):
+        """Các trường trong vals (kết quả parse) khác với giá trị đang lưu"""
+        self.ensure_one()
+        return diff_values({name: self[name] for name in vals}, vals)
+
+    def _apply_response(self, result, parse):
+        """Ghi response của một lần sync thủ công: giá trị parse được (nếu có) + response gốc"""
+        self.ensure_one()
+        vals = dict(self._raw_vals(result), last_sync=fields.Datetime.now())
+        parsed = parse(result)
+        if parsed is not None:
+            vals.update(self._sync_diff(parsed))
+        self.write(vals)
+        return parsed
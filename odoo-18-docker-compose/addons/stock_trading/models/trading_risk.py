@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api, _
+from odoo.exceptions import UserError
+import logging
+
+from .order_stream import OPEN_STATES
+from .risk_cache import DEFAULT_FEE_RATE, DEFAULT_MAX_AGE, RiskCache
+
+_logger = logging.getLogger(__name__)
+
+# Snapshot rủi ro trong process hiện tại, theo (database, account)
+_RISK = RiskCache()
+
+
+class TradingRiskService(models.AbstractModel):
+    """
+    Kiểm tra sức mua / số dư chứng khoán trước khi gửi lệnh, trên snapshot trong bộ nhớ
+    (dựng từ số dư, vị thế đã sync và các lệnh còn mở đặt sau lần sync đó)
+    """
+    _name = 'trading.risk'
+    _description = 'Pre-trade Risk Check'
+
+    _PARAM_ENABLED = 'trading.risk.enabled'
+    _PARAM_MAX_AGE = 'trading.risk.max_age'
+    _PARAM_FEE_RATE = 'trading.risk.fee_rate'
+
+    # --- Cấu hình ---
+    @api.model
+    def _settings(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+
+        def _param(key, default, cast):
+            try:
+                return cast(ICP.get_param(key) or default)
+            except (TypeError, ValueError):
+                return default
+
+        return {
+            'enabled': (ICP.get_param(self._PARAM_ENABLED) or '1').lower() in ('1', 'true', 'yes'),
+            'max_age': _param(self._PARAM_MAX_AGE, DEFAULT_MAX_AGE, int),
+            'fee_rate': _param(self._PARAM_FEE_RATE, DEFAULT_FEE_RATE, float),
+        }
+
+    @api.model
+    def _key(self, account):
+        return (self.env.cr.dbname, str(account or '').strip().upper())
+
+    @api.model
+    def _reserve_price(self, security):
+        """Giá dùng để giữ sức mua cho lệnh mua: lệnh thị trường (giá 0) tính theo giá trần"""
+        return security.ceiling_price or security.current_price or security.last_price or security.reference_price or 0.0
+
+    def _order_entry(self, order):
+        return (order.id, order.buy_sell, (order.instrument_code or '').strip().upper(),
+                self._reserve_price(order.instrument_id), order.quantity, order.filled_quantity or 0, order.state)
+
+    # --- Snapshot ---
+    @api.model
+    def _load_snapshot(self, account):
+        """
+        Dựng lại snapshot từ dữ liệu đã sync (không gọi API). Số dư/vị thế của broker đã trừ các lệnh
+        đặt trước thời điểm sync, nên chỉ giữ chỗ cho lệnh còn mở đặt sau đó.
+
+        Returns:
+            RiskSnapshot hoặc None nếu tài khoản chưa có số dư đã sync
+        """
+        key = self._key(account)
+        balance = self.env['trading.account.balance'].sudo().search([
+            ('account', '=ilike', key[1]),
+            ('balance_type', '=', 'stock'),
+            ('last_sync', '!=', False),
+        ], order='last_sync desc', limit=1)
+        if not balance:
+            _RISK.invalidate(lambda k: k == key)
+            return None
+        position = self.env['trading.position'].sudo().search([
+            ('account', '=ilike', key[1]),
+            ('position_type', '=', 'stock'),
+            ('last_sync', '!=', False),
+        ], order='last_sync desc', limit=1)
+        holdings = None
+        if position:
+            holdings = {}
+            for line in position.line_ids:
+                holdings[line.instrument_code] = holdings.get(line.instrument_code, 0.0) + line.quantity
+
+        synced_at = {'B': balance.last_sync, 'S': position.last_sync or balance.last_sync}
+        orders = self.env['trading.order'].sudo().search([
+            ('account', '=ilike', key[1]),
+            ('order_type', '=', 'stock'),
+            ('state', 'in', OPEN_STATES),
+            ('submitted_at', '>', min(synced_at.values())),
+        ])
+        entries = [self._order_entry(order) for order in orders
+                   if order.submitted_at > synced_at[order.buy_sell]]
+        return _RISK.put(key, balance.purchasing_power, holdings, entries)
+
+    @api.model
+    def refresh_accounts(self, accounts):
+        """Số dư/vị thế vừa sync: dựng lại snapshot của các tài khoản đang có trong cache"""
+        dbname = self.env.cr.dbname
+        accounts = {str(a).strip().upper() for a in accounts if a}
+        cached = [key[1] for key in _RISK.keys() if key[0] == dbname and key[1] in accounts]
+        for account in cached:
+            self._load_snapshot(account)
+        return len(cached)
+
+    @api.model
+    def track_orders(self, orders):
+        """Cập nhật phần giữ chỗ theo trạng thái/khối lượng khớp mới của các lệnh cổ phiếu"""
+        for order in orders.filtered(lambda o: o.order_type == 'stock' and o.account):
+            _RISK.track(self._key(order.account), *self._order_entry(order))
+
+    @api.model
+    def release_order(self, order):
+        """Lệnh không gửi được (lỗi token, account, API...): bỏ phần giữ chỗ đã đặt bởi check_order"""
+        if order.order_type == 'stock' and order.account:
+            _RISK.release(self._key(order.account), order.id)
+
+    # --- Kiểm tra trước khi gửi lệnh ---
+    @api.model
+    def check_order(self, order):
+        """
+        Kiểm tra lệnh trên snapshot và giữ chỗ phần tiền/chứng khoán của lệnh.
+        Không có dữ liệu đã sync thì bỏ qua (broker kiểm tra).
+
+        Returns:
+            float khả dụng trước khi đặt lệnh, hoặc None nếu không kiểm tra
+        Raises:
+            UserError: chắc chắn không đủ sức mua / chứng khoán
+        """
+        settings = self._settings()
+        if not settings['enabled'] or order.order_type != 'stock' or not order.account:
+            return None
+        _RISK.max_age = settings['max_age']
+        key = self._key(order.account)
+        order_key, side, symbol, price, quantity, _filled, _state = self._order_entry(order)
+        if side == 'B' and not price:
+            return None
+        result = _RISK.reserve(key, order_key, side, symbol, price, quantity, settings['fee_rate'])
+        if result is None and self._load_snapshot(order.account) is not None:
+            result = _RISK.reserve(key, order_key, side, symbol, price, quantity, settings['fee_rate'])
+        if result is None:
+            return None
+        ok, available = result
+        if not ok:
+            if side == 'B':
+                raise UserError(_('Không đủ sức mua: lệnh cần khoảng %(need)s, sức mua khả dụng %(available)s '
+                                  '(đã trừ các lệnh mua đang chờ khớp).') % {
+                    'need': f'{price * quantity * (1 + settings["fee_rate"]):,.0f}',
+                    'available': f'{max(available, 0):,.0f}',
+                })
+            raise UserError(_('Không đủ chứng khoán %(symbol)s để bán: khả dụng %(available)s '
+                              '(đã trừ các lệnh bán đang chờ khớp).') % {
+                'symbol': symbol, 'available': f'{max(available, 0):,.0f}',
+            })
+        return available
+
+    @api.model
+    def cron_reconcile_risk(self):
+        """
+        Cron: dựng lại snapshot của các tài khoản đang có trong cache từ dữ liệu đã sync với broker.
+        Cache nằm trong từng process: với nhiều worker, snapshot ở worker khác được dựng lại khi quá
+        trading.risk.max_age giây.
+        """
+        dbname = self.env.cr.dbname
+        accounts = [key[1] for key in _RISK.keys() if key[0] == dbname]
+        for account in accounts:
+            try:
+                self._load_snapshot(account)
+            except Exception as e:
+                _logger.warning(f'Risk snapshot reconcile failed for {account}: {e}')
+        if accounts:
+            _logger.info(f'Risk snapshots reconciled: {len(accounts)} accounts')
+        return len(accounts)
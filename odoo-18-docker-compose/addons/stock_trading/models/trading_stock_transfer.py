@@ -263,7 +263,7 @@ class TradingStockTransferHistory(models.Model):
                 startDate=start_date_str,
                 endDate=end_date_str
             )
-            result = client._client.get_stock_transfer_history(req)
+            result = client._call('get_stock_transfer_history', req)
             
             self.write({
                 'raw_response': json.dumps(result, indent=2),
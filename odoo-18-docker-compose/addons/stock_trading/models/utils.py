@@ -7,6 +7,9 @@ Chứa các helper functions được dùng chung
 
 import json
 import base64
+import binascii
+import hashlib
+import zlib
 from datetime import datetime
 
 
@@ -19,6 +22,9 @@ class TokenConstants:
     # Write token lifetime (8 giờ) - thông tin cho user
     WRITE_TOKEN_LIFETIME_HOURS = 8
     
+    # Thời gian dùng lại một FCTradingClient đã đăng nhập; token bị từ chối sớm hơn (401) thì đăng nhập lại ngay
+    READ_TOKEN_TTL_SECONDS = 4 * 3600
+    
     # JWT payload field names
     JWT_EXP_FIELD = 'exp'
     
@@ -174,3 +180,71 @@ def get_token_expires_in(token):
     
     return format_time_remaining(total_seconds)
 
+
+
+def credentials_fingerprint(*parts):
+    """
+    Hash thông tin đăng nhập (url, consumer id/secret, private key...) để nhận biết cấu hình đã đổi
+    mà không giữ secret dạng rõ trong khoá cache
+    """
+    raw = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# Method FCTradingClient chỉ đọc dữ liệu: gửi lại sau khi đăng nhập lại là an toàn.
+# Các method còn lại (đặt/sửa/huỷ lệnh, chuyển tiền, OTP...) không tự gửi lại khi gặp 401.
+READ_ONLY_METHODS = frozenset({
+    'get_access_token',
+    'get_stock_account_balance', 'get_derivative_account_balance', 'get_pp_mmr_account',
+    'get_stock_position', 'get_derivative_position',
+    'get_max_buy_qty', 'get_max_sell_qty',
+    'get_order_history', 'get_order_book', 'get_audit_order_book', 'get_ratelimit',
+    'get_cash_cia_amount', 'get_cash_transfer_history', 'get_ors_dividend', 'get_stock_transferable',
+})
+
+
+def _status_code(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_unauthorized(result):
+    """
+    Response (dict) hoặc exception của FCTradingClient báo token không hợp lệ (HTTP 401).
+    Chỉ dựa vào status / mã HTTP thật, không dò nội dung message.
+    """
+    if isinstance(result, dict):
+        return _status_code(result.get('status')) == 401
+    if isinstance(result, Exception):
+        response = getattr(result, 'response', None)
+        status = getattr(response, 'status_code', None) if response is not None else None
+        if status is None:
+            status = getattr(result, 'status_code', None)
+        return _status_code(status) == 401
+    return False
+
+
+def pack_payload(payload):
+    """
+    Response của API -> base64(zlib(JSON không thụt lề)) để lưu vào trường Binary.
+    Nhận cả chuỗi JSON có sẵn (dữ liệu raw_response cũ).
+    """
+    if payload is None:
+        return False
+    if isinstance(payload, str):
+        text = payload
+    else:
+        text = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=str)
+    return base64.b64encode(zlib.compress(text.encode('utf-8'), 6))
+
+
+def unpack_payload(value):
+    """Ngược lại của pack_payload; None nếu trống hoặc không giải nén được"""
+    if not value:
+        return None
+    try:
+        return json.loads(zlib.decompress(base64.b64decode(value)).decode('utf-8'))
+    except (ValueError, binascii.Error, zlib.error):
+        return None
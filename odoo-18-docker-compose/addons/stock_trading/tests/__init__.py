@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+from . import test_account_sync
+from . import test_order_stream
+from . import test_risk_cache
+from . import test_trading_utils
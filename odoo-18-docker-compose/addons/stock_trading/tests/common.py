@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Dữ liệu mẫu dùng chung cho test và benchmark (odoo-18-docker-compose/benchmarks) -
+không import Odoo để benchmark nạp trực tiếp được.
+"""
+import json
+import random
+
+STATUS_FLOW = ['RS', 'SD', 'QU', 'PF', 'PF', 'FF']
+
+RISK_KEY = ('db', '1234561')
+FEE = 0.0015
+
+
+def balance_response(cash, available, purchasing_power=None):
+    data = {'account': '1234561', 'cashBalance': cash, 'availableCash': available}
+    if purchasing_power is not None:
+        data['purchasingPower'] = purchasing_power
+    return {'status': 200, 'message': 'Success', 'data': data}
+
+
+def positions_response(count, seed=20240103):
+    rng = random.Random(seed)
+    rows = [{'instrumentID': f'S{i:03d}', 'onHand': rng.randint(0, 50) * 100,
+             'marketPrice': rng.randint(100, 1000) * 100} for i in range(count)]
+    return {'status': 200, 'data': {'account': '1234561', 'stockPositions': rows}}
+
+
+def order_event(order_id, status, filled=0, quantity=1000, notify_id=None, event_type='orderEvent'):
+    """Message orderEvent của FCTradingStream"""
+    message = {
+        'type': event_type,
+        'data': {'orderID': str(order_id), 'requestID': f'r{order_id}', 'account': '1234561',
+                 'orderStatus': status, 'filledQty': filled, 'quantity': quantity},
+    }
+    if notify_id is not None:
+        message['notifyId'] = notify_id
+    return json.dumps(message)
+
+
+def order_session_messages(orders, seed=20240102):
+    """Mỗi lệnh đi qua RS -> SD -> QU -> PF -> PF -> FF, các lệnh xen kẽ nhau"""
+    rng = random.Random(seed)
+    progress = {order_id: 0 for order_id in range(1, orders + 1)}
+    messages = []
+    notify_id = 0
+    while progress:
+        order_id = rng.choice(list(progress))
+        step = progress[order_id]
+        notify_id += 1
+        filled = {3: 300, 4: 700, 5: 1000}.get(step, 0)
+        messages.append(order_event(order_id, STATUS_FLOW[step], filled, notify_id=notify_id))
+        if step + 1 == len(STATUS_FLOW):
+            del progress[order_id]
+        else:
+            progress[order_id] = step + 1
+    return messages
+
+
+def risk_cache_with(risk_cache, buying_power=100_000_000, holdings=None, orders=(), clock=None):
+    """RiskCache (module risk_cache) có sẵn snapshot của tài khoản RISK_KEY"""
+    cache = risk_cache.RiskCache(max_age=60, clock=clock or (lambda: 0.0))
+    cache.put(RISK_KEY, buying_power, {'SSI': 1000} if holdings is None else holdings, orders)
+    return cache
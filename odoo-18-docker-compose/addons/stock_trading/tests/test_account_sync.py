@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import BaseCase
+
+from ..models import account_sync
+from .common import balance_response, positions_response
+
+
+class TestAccountSync(BaseCase):
+
+    def test_parse_balance_variants(self):
+        self.assertEqual(account_sync.parse_balance(balance_response(1000, 800, 1500)), {
+            'cash_balance': 1000.0, 'available_cash': 800.0, 'purchasing_power': 1500.0})
+        # Không có sức mua -> dùng tiền khả dụng; response dạng list / không có status
+        self.assertEqual(account_sync.parse_balance([{'cash': '50', 'available': '20'}])['purchasing_power'], 20.0)
+        self.assertEqual(account_sync.parse_balance({'cashBalance': 5})['cash_balance'], 5.0)
+        # Sức mua 0 là giá trị hợp lệ, không bị thay bằng tiền khả dụng
+        self.assertEqual(account_sync.parse_balance(balance_response(1000, 800, 0))['purchasing_power'], 0.0)
+
+    def test_parse_errors_keep_previous_values(self):
+        error = {'status': 400, 'message': 'Account not exist', 'data': None}
+        self.assertIsNone(account_sync.parse_balance(error))
+        self.assertIsNone(account_sync.parse_positions(error))
+        self.assertIsNone(account_sync.parse_max_quantity(error))
+        self.assertIsNone(account_sync.parse_max_quantity({'status': 200, 'data': {}}))
+
+    def test_parse_positions_and_max_quantity(self):
+        result = {'status': 200, 'data': {'stockPositions': [
+            {'instrumentID': 'SSI', 'onHand': 100, 'marketPrice': 30000},
+            {'instrumentID': 'VNM', 'onHand': 0, 'marketPrice': 70000},
+            {'instrumentID': 'FPT', 'onHand': 200, 'marketValue': 2400000},
+        ]}}
+        parsed = account_sync.parse_positions(result)
+        self.assertEqual({k: parsed[k] for k in ('holding_count', 'total_quantity', 'market_value')}, {
+            'holding_count': 2, 'total_quantity': 300.0, 'market_value': 5400000.0})
+        self.assertEqual([line['instrument_code'] for line in parsed['lines']], ['SSI', 'FPT'])
+        self.assertEqual(parsed['lines'][1]['market_value'], 2400000.0)
+        self.assertEqual(account_sync.parse_positions({'status': 200, 'data': []})['holding_count'], 0)
+        self.assertEqual(account_sync.parse_max_quantity({'status': 200, 'data': {'maxBuyQty': '1500'}}),
+                         {'max_quantity': 1500})
+
+    def test_same_lines_ignores_order(self):
+        lines = account_sync.parse_positions(positions_response(20))['lines']
+        self.assertTrue(account_sync.same_lines(lines, list(reversed(lines))))
+        # Dòng đọc từ DB có thêm id: chỉ so các trường của dòng mới
+        self.assertTrue(account_sync.same_lines([dict(line, id=i) for i, line in enumerate(lines)], lines))
+        changed = [dict(line) for line in lines]
+        changed[0]['quantity'] += 100
+        self.assertFalse(account_sync.same_lines(lines, changed))
+        self.assertFalse(account_sync.same_lines(lines, lines[1:]))
+
+    def test_parse_rate_limit(self):
+        result = {'status': 200, 'data': [{'limit': 60, 'period': 60}, {'limit': 10, 'period': 1}]}
+        self.assertEqual(account_sync.parse_rate_limit(result), 1.0)
+        self.assertIsNone(account_sync.parse_rate_limit({'status': 200, 'data': {}}))
+        self.assertIsNone(account_sync.parse_rate_limit({'status': 500}))
+
+    def test_diff_values_only_changed(self):
+        current = {'cash_balance': 1000.0, 'available_cash': 800.0, 'max_quantity': 5}
+        self.assertEqual(account_sync.diff_values(current, {'cash_balance': 1000.0000001, 'available_cash': 800.0}), {})
+        self.assertEqual(account_sync.diff_values(current, {'cash_balance': 999.0, 'max_quantity': 5}),
+                         {'cash_balance': 999.0})
+        self.assertEqual(account_sync.diff_values(current, {'max_quantity': 6}), {'max_quantity': 6})
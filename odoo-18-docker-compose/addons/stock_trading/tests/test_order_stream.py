@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+from odoo.tests.common import BaseCase
+
+from ..models import order_stream
+from .common import order_event, order_session_messages
+
+
+class FakeStream:
+    """Stream giả: phát message trên luồng riêng, báo lỗi kết nối ở lần kết nối đầu nếu được yêu cầu"""
+
+    def __init__(self, messages, on_message, on_error, on_open, fail=False):
+        self._messages = messages
+        self._callbacks = (on_message, on_error, on_open)
+        self._fail = fail
+        self.stopped = False
+
+    def start(self):
+        on_message, on_error, on_open = self._callbacks
+
+        def run():
+            on_open()
+            for message in self._messages:
+                on_message(message)
+            if self._fail:
+                on_error(ConnectionError('connection lost'))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestOrderStream(BaseCase):
+
+    def test_status_mapping_and_transitions(self):
+        self.assertEqual(order_stream.map_order_status('QU'), 'submitted')
+        self.assertEqual(order_stream.map_order_status('ffpc'), 'filled')
+        self.assertEqual(order_stream.map_order_status('', filled_qty=100, quantity=100), 'filled')
+        self.assertEqual(order_stream.map_order_status('', filled_qty=10, quantity=100), 'partially_filled')
+        self.assertIsNone(order_stream.map_order_status(''))
+        # Không chuyển lùi, không rời trạng thái cuối
+        self.assertEqual(order_stream.merge_state('pending', 'submitted'), 'submitted')
+        self.assertIsNone(order_stream.merge_state('partially_filled', 'submitted'))
+        self.assertIsNone(order_stream.merge_state('filled', 'cancelled'))
+        self.assertIsNone(order_stream.merge_state('submitted', 'submitted'))
+        self.assertEqual(order_stream.merge_state('error', 'rejected'), 'rejected')
+
+    def test_parse_messages(self):
+        event_type, data, notify_id = order_stream.parse_stream_message(order_event(7, 'PF', 300, notify_id=42))
+        self.assertEqual((event_type, notify_id), ('orderEvent', '42'))
+        event = order_stream.normalize_order(data, event_type)
+        self.assertEqual((event['order_id'], event['state'], event['filled_qty']), ('7', 'partially_filled', 300))
+        # data dạng chuỗi JSON, event khớp lệnh không có trạng thái
+        raw = json.dumps({'type': 'orderMatchEvent', 'data': json.dumps({'orderID': 8, 'matchedQty': 100})})
+        event_type, data, _notify = order_stream.parse_stream_message(raw)
+        self.assertEqual(order_stream.normalize_order(data, event_type)['state'], 'partially_filled')
+        self.assertEqual(order_stream.parse_stream_message('not json'), (None, None, None))
+        self.assertIsNone(order_stream.normalize_order({'account': '1'}))
+        # Order Book: list, dict chứa list, hoặc một lệnh
+        self.assertEqual(len(order_stream.order_book_rows({'status': 200, 'data': [{'orderID': 1}, {'orderID': 2}]})), 2)
+        self.assertEqual(len(order_stream.order_book_rows({'status': 200, 'data': {'orders': [{'orderID': 1}]}})), 1)
+        self.assertEqual(order_stream.order_book_rows({'status': 200, 'data': {'orderID': 1}}), [{'orderID': 1}])
+        self.assertEqual(order_stream.order_book_rows(None), [])
+
+    def test_order_lines(self):
+        result = {'status': 200, 'data': {'orderHistories': [
+            {'orderID': '11', 'account': '1234561', 'instrumentID': 'ssi', 'buySell': 'B', 'price': 30000,
+             'quantity': 1000, 'filledQty': 1000, 'avgPrice': 29950, 'orderStatus': 'FF', 'inputTime': 1704080000000},
+            {'orderID': '12', 'instrumentID': 'FPT', 'buySell': 'S', 'price': 95000, 'quantity': 200,
+             'orderStatus': 'CL', 'orderDate': '02/01/2024'},
+            {'account': 'no-id'},
+        ]}}
+        lines = order_stream.order_lines(result)
+        self.assertEqual([line['order_id'] for line in lines], ['11', '12'])
+        self.assertEqual((lines[0]['instrument_code'], lines[0]['side'], lines[0]['state']), ('SSI', 'B', 'filled'))
+        self.assertIsNotNone(lines[0]['order_date'])
+        self.assertEqual(str(lines[1]['order_date']), '2024-01-02')
+        self.assertEqual(lines[1]['state'], 'cancelled')
+        self.assertEqual(str(order_stream.parse_order_date('2024-03-05T09:15:00')), '2024-03-05')
+        self.assertIsNone(order_stream.parse_order_date(''))
+        self.assertIsNone(order_stream.parse_order_date('n/a'))
+
+    def test_buffer_keeps_most_advanced_state(self):
+        buffer = order_stream.OrderEventBuffer()
+        for message in [order_event(1, 'QU'), order_event(1, 'FF', 1000), order_event(1, 'PF', 300), order_event(2, 'RS')]:
+            _type, data, _notify = order_stream.parse_stream_message(message)
+            buffer.add(order_stream.normalize_order(data, _type))
+        events = {e['order_id']: e for e in buffer.drain()}
+        self.assertEqual((events['1']['state'], events['1']['filled_qty']), ('filled', 1000))
+        self.assertEqual(events['2']['state'], 'pending')
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.received, 4)
+
+    def test_failed_flush_keeps_events_and_reconciles(self):
+        batches = []
+
+        def flush(events, notify_id):
+            if not batches:
+                batches.append(None)
+                raise ConnectionError('database is locked')
+            batches.append({e['order_id']: e['state'] for e in events})
+
+        worker = order_stream.OrderStreamWorker(lambda *args: None, flush)
+        worker._on_message(order_event(1, 'QU', notify_id=1))
+        worker._on_message(order_event(2, 'PF', 300, notify_id=2))
+        self.assertIsNone(worker.flush_now())
+        self.assertEqual(worker.errors, 1)
+        # Lô lỗi quay lại buffer và được gộp với event nhận sau đó
+        self.assertEqual(len(worker.buffer), 2)
+        self.assertTrue(worker._need_reconcile.is_set())
+        worker._on_message(order_event(1, 'FF', 1000, notify_id=3))
+        worker.flush_now()
+        self.assertEqual(batches[1], {'1': 'filled', '2': 'partially_filled'})
+        self.assertEqual(len(worker.buffer), 0)
+
+    def test_worker_reconnects_and_reconciles(self):
+        messages = order_session_messages(50)
+        half = len(messages) // 2
+        connects = []
+        applied = {}
+        done = threading.Event()
+        reconciled = threading.Event()
+
+        def reconcile():
+            # Phải có một lần đối soát sau khi kết nối lại
+            if len(connects) == 2:
+                reconciled.set()
+
+        def factory(on_message, on_error, on_open, notify_id):
+            connects.append(notify_id)
+            # Lần đầu đứt kết nối giữa phiên; lần sau tiếp tục từ notify_id đã nhận
+            chunk = messages[:half] if len(connects) == 1 else messages[half:]
+            return FakeStream(chunk, on_message, on_error, on_open, fail=len(connects) == 1)
+
+        def flush(events, notify_id):
+            for event in events:
+                applied[event['order_id']] = order_stream.merge_state(applied.get(event['order_id']), event['state']) \
+                    or applied.get(event['order_id'])
+            if notify_id == str(len(messages)):
+                done.set()
+
+        worker = order_stream.OrderStreamWorker(factory, flush, reconcile=reconcile,
+                                                flush_ms=50, reconnect_sec=0)
+        worker.start()
+        self.assertTrue(done.wait(5))
+        self.assertTrue(reconciled.wait(5))
+        worker.stop()
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(worker.reconnects, 1)
+        self.assertEqual(connects, ['-1', str(half)])
+        self.assertEqual(len(applied), 50)
+        self.assertEqual(set(applied.values()), {'filled'})
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from odoo.tests.common import BaseCase
+
+from ..models import risk_cache
+from .common import FEE, RISK_KEY as KEY, risk_cache_with
+
+
+class TestRiskCache(BaseCase):
+
+    def test_buy_reserves_buying_power(self):
+        cache = risk_cache_with(risk_cache)
+        # 3.000 cp x 30.000 = 90tr (+ phí) vừa đủ; lệnh thứ hai bị chặn vì phần đã giữ chỗ
+        ok, available = cache.reserve(KEY, 1, 'B', 'FPT', 30000, 3000, FEE)
+        self.assertTrue(ok)
+        self.assertEqual(available, 100_000_000)
+        ok, available = cache.reserve(KEY, 2, 'B', 'FPT', 30000, 1000, FEE)
+        self.assertFalse(ok)
+        self.assertLess(available, 30000 * 1000)
+        # Lệnh 1 bị huỷ -> giải phóng
+        cache.track(KEY, 1, 'B', 'FPT', 30000, 3000, 0, 'cancelled')
+        self.assertTrue(cache.check(KEY, 'B', 'FPT', 30000, 1000, FEE)[0])
+
+    def test_sell_reserves_holdings_and_fills(self):
+        cache = risk_cache_with(risk_cache)
+        self.assertEqual(cache.reserve(KEY, 1, 'S', 'SSI', 0, 600, FEE), (True, 1000))
+        self.assertEqual(cache.check(KEY, 'S', 'SSI', 0, 500, FEE), (False, 400))
+        # Khớp 200: trừ vào số dư, phần còn lại vẫn giữ chỗ
+        cache.track(KEY, 1, 'S', 'SSI', 0, 600, 200, 'partially_filled')
+        snapshot = cache.get(KEY)
+        self.assertEqual(snapshot.holdings['SSI'], 800)
+        self.assertEqual(snapshot.reserved_qty('SSI'), 400)
+        cache.track(KEY, 1, 'S', 'SSI', 0, 600, 600, 'filled')
+        self.assertEqual(snapshot.holdings['SSI'], 400)
+        self.assertEqual(snapshot.reserved_qty('SSI'), 0)
+        self.assertEqual(cache.check(KEY, 'S', 'VNM', 0, 100, FEE), (False, 0.0))
+
+    def test_failed_submit_does_not_double_count(self):
+        cache = risk_cache_with(risk_cache)
+        # Lần gửi đầu giữ 60tr rồi lỗi (token hết hạn...) nhưng phần giữ chỗ còn trong bộ nhớ
+        self.assertTrue(cache.reserve(KEY, 1, 'B', 'FPT', 30000, 2000, FEE)[0])
+        # Gửi lại cùng lệnh: phần giữ chỗ cũ của chính lệnh không bị tính thêm lần nữa
+        ok, available = cache.reserve(KEY, 1, 'B', 'FPT', 30000, 2000, FEE)
+        self.assertTrue(ok)
+        self.assertEqual(available, 100_000_000)
+        self.assertEqual(cache.get(KEY).reserved_cash(FEE), 30000 * 2000 * (1 + FEE))
+        # Bỏ giữ chỗ khi lệnh không gửi được: sức mua không bị trừ
+        self.assertTrue(cache.release(KEY, 1))
+        snapshot = cache.get(KEY)
+        self.assertEqual(snapshot.reserved_cash(FEE), 0)
+        self.assertEqual(snapshot.buying_power, 100_000_000)
+        self.assertFalse(cache.release(KEY, 1))
+
+    def test_buy_fill_consumes_buying_power(self):
+        cache = risk_cache_with(risk_cache, buying_power=10_000_000)
+        cache.reserve(KEY, 1, 'B', 'FPT', 10000, 500, FEE)
+        cache.track(KEY, 1, 'B', 'FPT', 10000, 500, 500, 'filled')
+        snapshot = cache.get(KEY)
+        self.assertEqual(snapshot.buying_power, 5_000_000)
+        self.assertFalse(snapshot.orders)
+
+    def test_unknown_holdings_and_stale_snapshot(self):
+        now = [0.0]
+        cache = risk_cache.RiskCache(max_age=60, clock=lambda: now[0])
+        cache.put(KEY, 1_000_000, None, [(9, 'B', 'FPT', 1000, 100, 0, 'submitted')])
+        # Chưa sync vị thế: không chặn lệnh bán; lệnh mở khi dựng snapshot đã được giữ chỗ
+        self.assertEqual(cache.check(KEY, 'S', 'SSI', 0, 10 ** 6, FEE), (True, None))
+        self.assertEqual(cache.get(KEY).reserved_cash(0), 100_000)
+        now[0] = 61.0
+        self.assertIsNone(cache.get(KEY))
+        self.assertIsNone(cache.check(KEY, 'B', 'FPT', 1, 1, FEE))
+        self.assertEqual(cache.invalidate(lambda key: key == KEY), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_concurrent_reservations_never_overspend(self):
+        cache = risk_cache_with(risk_cache, buying_power=10_000_000)
+        accepted = []
+
+        def submit(order_id):
+            result = cache.reserve(KEY, order_id, 'B', 'FPT', 10000, 100, 0.0)
+            if result[0]:
+                accepted.append(order_id)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(accepted), 10)
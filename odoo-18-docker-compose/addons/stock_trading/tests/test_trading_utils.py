@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import json
+
+from odoo.tests.common import BaseCase
+
+from ..models import utils as trading_utils
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _HTTPError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.response = _Response(status_code)
+
+
+class TestTradingUtils(BaseCase):
+
+    def test_credentials_fingerprint(self):
+        base = ('https://fc-tradeapi.ssi.com.vn/', 'consumer', 'secret', 'key', '1')
+        fingerprint = trading_utils.credentials_fingerprint(*base)
+        self.assertEqual(fingerprint, trading_utils.credentials_fingerprint(*base))
+        self.assertNotIn('secret', fingerprint)
+        self.assertNotEqual(fingerprint, trading_utils.credentials_fingerprint(*base[:2], 'other', *base[3:]))
+        # Ranh giới giữa các phần không bị trộn lẫn
+        self.assertNotEqual(trading_utils.credentials_fingerprint('ab', 'c'),
+                            trading_utils.credentials_fingerprint('a', 'bc'))
+        self.assertEqual(trading_utils.credentials_fingerprint(None), trading_utils.credentials_fingerprint(''))
+
+    def test_is_unauthorized(self):
+        is_unauthorized = trading_utils.is_unauthorized
+        self.assertTrue(is_unauthorized({'status': 401, 'message': 'Unauthorized'}))
+        self.assertFalse(is_unauthorized({'status': 200, 'data': {}}))
+        self.assertFalse(is_unauthorized({'status': 400, 'message': 'Account not exist'}))
+        self.assertTrue(is_unauthorized({'status': '401'}))
+        self.assertFalse(is_unauthorized({'status': 400, 'message': 'Order 401 rejected: unauthorized price'}))
+        self.assertTrue(is_unauthorized(_HTTPError('401 Client Error: Unauthorized for url', 401)))
+        # Chỉ dựa vào mã HTTP thật, không dò message
+        self.assertFalse(is_unauthorized(_HTTPError('Read timed out (order 401)', 504)))
+        self.assertFalse(is_unauthorized(Exception('401 Client Error: Unauthorized for url')))
+        self.assertFalse(is_unauthorized(Exception('Connection reset')))
+        self.assertFalse(is_unauthorized('token'))
+
+    def test_read_only_methods(self):
+        for method in ('get_stock_position', 'get_order_book', 'get_ratelimit', 'get_access_token'):
+            self.assertIn(method, trading_utils.READ_ONLY_METHODS)
+        for method in ('new_order', 'modify_order', 'cancle_order', 'der_new_order', 'der_modify_order',
+                       'der_cancle_order', 'create_cash_transfer', 'create_stock_transfer', 'create_ors', 'get_otp'):
+            self.assertNotIn(method, trading_utils.READ_ONLY_METHODS)
+
+    def test_pack_payload_roundtrip(self):
+        result = {'status': 200, 'message': 'Thành công', 'data': {'stockPositions': [
+            {'instrumentID': f'S{i:03d}', 'onHand': i * 100, 'marketPrice': 25000} for i in range(200)]}}
+        packed = trading_utils.pack_payload(result)
+        self.assertEqual(trading_utils.unpack_payload(packed), result)
+        # JSON dạng text cũ (raw_response) cũng được nén, và nhỏ hơn nhiều so với bản thụt lề
+        pretty = json.dumps(result, indent=2)
+        self.assertEqual(trading_utils.unpack_payload(trading_utils.pack_payload(pretty)), result)
+        self.assertLess(len(packed) * 5, len(pretty))
+        self.assertIs(trading_utils.pack_payload(None), False)
+        self.assertIsNone(trading_utils.unpack_payload(False))
+        self.assertIsNone(trading_utils.unpack_payload(b'not-a-payload'))
@@ -25,6 +25,7 @@
         # Data - Sequences
         'data/sequence_data.xml',
         'data/maturity_notification_data.xml',
+        'data/ir_cron_data.xml',
         
         # Views - Giao diện người dùng (đảm bảo views được nạp trước menu)
         'views/transaction_list_views.xml',        # Views chính
@@ -2,6 +2,7 @@
 from odoo import http, fields
 from odoo.http import request
 from ..utils import mround
+from ..utils.order_book import BookOrder, cross_books, fill_state
 import json
 from datetime import datetime
 from pytz import timezone, UTC
@@ -23,6 +24,11 @@ class OrderMatchingEngine:
         3. Khớp khi: buy_price >= sell_price
         4. Giá khớp: Luôn lấy giá của sell order
         
+        Việc khớp do utils.order_book.cross_books thực hiện trên bộ nhớ; engine chỉ
+        chuyển record thành tuple lệnh và gom các lần khớp thành tuple
+        (buy_item, sell_item, matched_quantity, matched_price). Việc ghi DB được
+        thực hiện một lần trong apply_fills().
+        
         Args:
             buy_orders: List các lệnh mua (portfolio.transaction records)
             sell_orders: List các lệnh bán (portfolio.transaction records)
@@ -30,6 +36,7 @@ class OrderMatchingEngine:
         
         Returns:
             dict: {
+                'fills': list[tuple],
                 'matched_pairs': list,
                 'remaining_buys': list,
                 'remaining_sells': list,
@@ -37,64 +44,29 @@ class OrderMatchingEngine:
             }
         """
         try:
-            # Sắp xếp orders theo Price-Time Priority
-            buy_book = self._build_priority_queue(buy_orders, 'buy')
-            sell_book = self._build_priority_queue(sell_orders, 'sell')
+            buy_items = self._build_book_items(buy_orders, 'buy')
+            sell_items = self._build_book_items(sell_orders, 'sell')
+            items = {item['rec'].id: item for item in buy_items + sell_items}
             
-            matched_pairs = []
+            # Khớp bằng lõi thuần Python (utils.order_book.cross_books)
+            book_fills, book_buys, book_sells = cross_books(
+                [item['order'] for item in buy_items],
+                [item['order'] for item in sell_items],
+            )
             
-            # Khớp lệnh theo thuật toán chuẩn
-            while buy_book and sell_book:
-                # Lấy lệnh tốt nhất từ mỗi bên
-                best_buy = buy_book[0] if buy_book else None
-                best_sell = sell_book[0] if sell_book else None
-                
-                if not best_buy or not best_sell:
-                    break
-                
-                # Kiểm tra điều kiện khớp: buy_price >= sell_price
-                if best_buy['price'] < best_sell['price']:
-                    break
-                
-                # Không khớp lệnh cùng 1 nhà đầu tư hoặc khác quỹ
-                if not self._can_match(best_buy, best_sell):
-                    # Tiến tới lệnh tiếp theo: bỏ lệnh có thời gian muộn hơn để giữ đúng FIFO
-                    try:
-                        if best_buy['time_int'] <= best_sell['time_int']:
-                            # Bỏ sell để thử sell tiếp theo
-                            sell_book.pop(0)
-                        else:
-                            # Bỏ buy để thử buy tiếp theo
-                            buy_book.pop(0)
-                    except Exception:
-                        # Fallback an toàn
-                        sell_book.pop(0)
-                    continue
-                
-                # Khớp lệnh
-                matched_quantity = min(best_buy['remaining'], best_sell['remaining'])
-                if matched_quantity <= 0:
-                    break
-                
-                # Tạo cặp khớp
-                pair = self._create_matched_pair(best_buy, best_sell, matched_quantity)
-                matched_pairs.append(pair)
-                
-                # Cập nhật database
-                self._update_transaction_status(best_buy, best_sell, matched_quantity)
-                
-                # Cập nhật remaining quantities
-                best_buy['remaining'] -= matched_quantity
-                best_sell['remaining'] -= matched_quantity
-                
-                # Loại bỏ orders đã hết
-                if best_buy['remaining'] <= 0:
-                    buy_book.pop(0)
-                if best_sell['remaining'] <= 0:
-                    sell_book.pop(0)
+            # Đồng bộ remaining từ sổ lệnh về item của từng record
+            for item in items.values():
+                item['remaining'] = item['order'].quantity
+            fills = [
+                (items[buy.order_id], items[sell.order_id], matched_quantity, matched_price)
+                for buy, sell, matched_quantity, matched_price in book_fills
+            ]
+            buy_book = [items[o.order_id] for o in book_buys]
+            sell_book = [items[o.order_id] for o in book_sells]
             
             return {
-                "matched_pairs": matched_pairs,
+                "fills": fills,
+                "matched_pairs": [self._create_matched_pair(*fill) for fill in fills],
                 "remaining_buys": [item['rec'] for item in buy_book],
                 "remaining_sells": [item['rec'] for item in sell_book],
                 "algorithm_used": "Price-Time Priority (FIFO)"
@@ -103,22 +75,23 @@ class OrderMatchingEngine:
         except Exception as e:
             pass
             return {
+                "fills": [],
                 "matched_pairs": [],
                 "remaining_buys": buy_orders,
                 "remaining_sells": sell_orders,
                 "algorithm_used": "Price-Time Priority (FIFO)"
             }
     
-    def _build_priority_queue(self, orders, order_type):
+    def _build_book_items(self, orders, order_type):
         """
-        Xây dựng priority queue theo Price-Time Priority
+        Chuyển record thành item của sổ lệnh (kèm tuple lệnh cho lõi khớp)
         
         Args:
             orders: List các orders
             order_type: 'buy' hoặc 'sell'
         
         Returns:
-            List đã sắp xếp theo priority
+            list item có khối lượng còn lại > 0
         """
         book = []
         for order in orders:
@@ -137,22 +110,18 @@ class OrderMatchingEngine:
                 except Exception:
                     remaining = float(getattr(order, 'units', 0) or 0)
             if remaining > 0:
+                price = self._get_order_price(order)
+                order_time = self._get_order_time(order)
                 book.append({
                     'rec': order,
                     'remaining': remaining,
-                    'price': self._get_order_price(order),
-                    'time': self._get_order_time(order),
-                    'time_int': self._time_to_int(self._get_order_time(order))
+                    'price': price,
+                    'time': order_time,
+                    'order': BookOrder.from_tuple(
+                        (order.id, order_type, price, remaining, order.user_id.id, order_time)
+                    ),
                 })
         
-        # Sắp xếp theo Price-Time Priority
-        if order_type == 'buy':
-            # Buy: Giá cao nhất trước, cùng giá thì thời gian sớm nhất trước
-            book.sort(key=lambda x: (-x['price'], x['time_int']))
-        else:  # sell
-            # Sell: Giá thấp nhất trước, cùng giá thì thời gian sớm nhất trước
-            book.sort(key=lambda x: (x['price'], x['time_int']))
-        
         return book
     
     def _get_order_price(self, order):
@@ -182,69 +151,16 @@ class OrderMatchingEngine:
         
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    def _time_to_int(self, time_str):
-        """Chuyển thời gian sang epoch seconds để FIFO theo thời điểm tạo lệnh.
-        Hỗ trợ: 'YYYY-MM-DD HH:MM:SS', 'YYYY-MM-DDTHH:MM:SS', và fallback HH:MM:SS.
-        """
-        try:
-            s = (time_str or '').strip()
-            # Thử parse full datetime
-            try:
-                if 'T' in s:
-                    # ISO-like
-                    dt = datetime.strptime(s[:19], '%Y-%m-%dT%H:%M:%S')
-                elif ' ' in s:
-                    dt = datetime.strptime(s[:19], '%Y-%m-%d %H:%M:%S')
-                else:
-                    dt = None
-                if dt is not None:
-                    return int(dt.timestamp())
-            except Exception:
-                pass
-
-            # Fallback: HH:MM:SS trong ngày
-            if ':' in s:
-                parts = s.split(':')
-                hour = int(parts[0]) if len(parts) > 0 else 0
-                minute = int(parts[1]) if len(parts) > 1 else 0
-                second = int(parts[2]) if len(parts) > 2 else 0
-                return hour * 3600 + minute * 60 + second
-            return 0
-        except Exception:
-            return 0
-    
-    def _can_match(self, buy_item, sell_item):
-        """Kiểm tra có thể khớp lệnh không"""
-        buy = buy_item['rec']
-        sell = sell_item['rec']
-        
-        # Kiểm tra cùng fund
-        if (getattr(buy, 'fund_id', False) and getattr(sell, 'fund_id', False) and 
-            buy.fund_id.id != sell.fund_id.id):
-            return False
-        
-        # Kiểm tra không cùng user
-        if (buy.user_id and sell.user_id and 
-            buy.user_id.id == sell.user_id.id):
-            return False
-        
-        # Kiểm tra điều kiện giá: buy_price >= sell_price
-        buy_price = buy_item['price'] or 0
-        sell_price = sell_item['price'] or 0
-        
-        return buy_price >= sell_price
-    
-    def _create_matched_pair(self, buy_item, sell_item, matched_quantity):
+    def _create_matched_pair(self, buy_item, sell_item, matched_quantity, matched_price):
         """Tạo cặp lệnh khớp theo chuẩn Stock Exchange"""
         buy = buy_item['rec']
         sell = sell_item['rec']
         
-        # Xác định loại user
-        buy_user_type = self._get_user_type(buy)
-        sell_user_type = self._get_user_type(sell)
+        # Xác định loại user (cache trên item để không gọi has_group lặp lại mỗi lần khớp)
+        buy_user_type = self._get_item_user_type(buy_item)
+        sell_user_type = self._get_item_user_type(sell_item)
         
         # Giá khớp luôn là giá của sell order (theo chuẩn Stock Exchange)
-        matched_price = sell_item['price']
         
         return {
                     "buy_id": buy.id,
@@ -274,6 +190,11 @@ class OrderMatchingEngine:
             "term_months": getattr(buy, 'term_months', 0) or 0,
         }
     
+    def _get_item_user_type(self, item):
+        if 'user_type' not in item:
+            item['user_type'] = self._get_user_type(item['rec'])
+        return item['user_type']
+    
     def _get_user_type(self, transaction):
         """Xác định loại user"""
         if not transaction.user_id:
@@ -287,66 +208,91 @@ class OrderMatchingEngine:
         
         return 'investor'
     
-    def _update_transaction_status(self, buy_item, sell_item, matched_quantity):
-        """Cập nhật trạng thái giao dịch trong database"""
-        try:
-            buy_order = self.env['portfolio.transaction'].browse(buy_item['rec'].id)
-            sell_order = self.env['portfolio.transaction'].browse(sell_item['rec'].id)
-
-            # Tính toán remaining và matched units
-            buy_remaining = max(0, buy_item['remaining'] - matched_quantity)
-            sell_remaining = max(0, sell_item['remaining'] - matched_quantity)
-
-            buy_matched = (buy_order.matched_units or 0) + matched_quantity
-            sell_matched = (sell_order.matched_units or 0) + matched_quantity
-
-            # BUY update
-            if buy_remaining > 0:
-                buy_order.with_context(bypass_investment_update=True).sudo().write({
-                    'matched_units': buy_matched,
-                    'remaining_units': buy_remaining,
-                    'ccq_remaining_to_match': buy_remaining,
-                    'is_matched': False,
-                    'status': 'pending',
-                })
+    def apply_fills(self, fills):
+        """
+        Ghi kết quả khớp xuống database theo lô:
+        - portfolio.transaction: gộp khối lượng khớp theo lệnh, các lệnh có cùng giá trị
+          cập nhật được ghi chung một lần write
+        - transaction.matched.orders: một lần create(vals_list)
+        
+        Args:
+            fills: list[tuple] (buy_item, sell_item, matched_quantity, matched_price) từ match_orders
+        
+        Returns:
+            recordset transaction.matched.orders đã tạo
+        """
+        MatchedOrders = self.env['transaction.matched.orders'].sudo()
+        if not fills:
+            return MatchedOrders
+        
+        Transaction = self.env['portfolio.transaction'].sudo()
+        
+        # Gộp khối lượng khớp và remaining cuối cùng theo từng lệnh
+        items = {}
+        matched_by_tx = {}
+        for buy_item, sell_item, matched_quantity, _price in fills:
+            for item in (buy_item, sell_item):
+                tx_id = item['rec'].id
+                items[tx_id] = item
+                matched_by_tx[tx_id] = matched_by_tx.get(tx_id, 0.0) + matched_quantity
+        
+        transactions = Transaction.browse(list(matched_by_tx))
+        now = fields.Datetime.now()
+        
+        # Nhóm các lệnh có cùng giá trị cập nhật để ghi chung
+        groups = {}
+        for tx in transactions:
+            matched_units, remaining, status = fill_state(tx.units, tx.matched_units, matched_by_tx[tx.id])
+            if status == 'pending':
+                vals = (
+                    ('matched_units', matched_units),
+                    ('remaining_units', remaining),
+                    ('ccq_remaining_to_match', remaining),
+                    ('is_matched', False),
+                    ('status', 'pending'),
+                )
             else:
-                vals = {
-                    'matched_units': buy_matched,
-                    'remaining_units': 0,
-                    'ccq_remaining_to_match': 0,
-                    'is_matched': True,
-                    'status': 'completed',
-                }
-                if 'approved_by' in buy_order._fields:
-                    vals['approved_by'] = request.env.user.id
-                if 'approved_at' in buy_order._fields:
-                    vals['approved_at'] = fields.Datetime.now()
-                buy_order.sudo().write(vals)
-
-            # SELL update
-            if sell_remaining > 0:
-                sell_order.with_context(bypass_investment_update=True).sudo().write({
-                    'matched_units': sell_matched,
-                    'remaining_units': sell_remaining,
-                    'ccq_remaining_to_match': sell_remaining,
-                    'is_matched': False,
-                    'status': 'pending',
-                })
+                vals = (
+                    ('matched_units', matched_units),
+                    ('remaining_units', 0),
+                    ('ccq_remaining_to_match', 0),
+                    ('is_matched', True),
+                    ('status', 'completed'),
+                )
+            groups.setdefault(vals, []).append(tx.id)
+        
+        for vals, tx_ids in groups.items():
+            vals = dict(vals)
+            records = Transaction.browse(tx_ids)
+            if vals['status'] == 'pending':
+                records.with_context(bypass_investment_update=True).write(vals)
             else:
-                vals = {
-                    'matched_units': sell_matched,
-                    'remaining_units': 0,
-                    'ccq_remaining_to_match': 0,
-                    'is_matched': True,
-                    'status': 'completed',
-                }
-                if 'approved_by' in sell_order._fields:
-                    vals['approved_by'] = request.env.user.id
-                if 'approved_at' in sell_order._fields:
-                    vals['approved_at'] = fields.Datetime.now()
-                sell_order.sudo().write(vals)
-        except Exception as e:
-            pass
+                if 'approved_by' in Transaction._fields:
+                    vals['approved_by'] = self.env.uid
+                if 'approved_at' in Transaction._fields:
+                    vals['approved_at'] = now
+                records.write(vals)
+        
+        # Tạo matched orders trong một lần create
+        stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        vals_list = []
+        for index, (buy_item, sell_item, matched_quantity, matched_price) in enumerate(fills):
+            buy_tx = buy_item['rec']
+            sell_tx = sell_item['rec']
+            # Trạng thái matched order: done nếu cả 2 đã completed, ngược lại confirmed
+            mo_status = 'done' if (buy_item['remaining'] <= 0 and sell_item['remaining'] <= 0) else 'confirmed'
+            fund = buy_tx.fund_id or sell_tx.fund_id
+            vals_list.append({
+                # Tạo mã duy nhất cho cặp (để dễ theo dõi)
+                'name': f"MO-{fund.id if fund else 'X'}-{stamp}-{index}-{buy_tx.id}-{sell_tx.id}",
+                'buy_order_id': buy_tx.id,
+                'sell_order_id': sell_tx.id,
+                'matched_quantity': matched_quantity,
+                'matched_price': matched_price,
+                'fund_id': fund.id if fund else False,
+                'status': mo_status,
+            })
+        return MatchedOrders.create(vals_list)
 
 
 class FundCalcIntegrationController(http.Controller):
@@ -470,6 +416,7 @@ class FundCalcIntegrationController(http.Controller):
             buy_groups = _group_by_fund(pending_purchases)
             sell_groups = _group_by_fund(pending_sells)
 
+            fills = []
             matched_pairs = []
             remaining_buys = []
             remaining_sells = []
@@ -483,57 +430,16 @@ class FundCalcIntegrationController(http.Controller):
                     remaining_sells.extend(sells or [])
                     continue
                 result = matching_engine.match_orders(buys, sells, use_time_priority)
+                fills.extend(result.get('fills', []))
                 matched_pairs.extend(result.get('matched_pairs', []))
                 remaining_buys.extend(result.get('remaining_buys', []))
                 remaining_sells.extend(result.get('remaining_sells', []))
                 # Lưu algorithm từ result cuối cùng
                 algorithm_used = result.get('algorithm_used', algorithm_used)
 
-            # Lưu cặp lệnh an toàn với savepoint (engine đã cập nhật matched/remaining/status)
-            for pair in matched_pairs:
-                try:
-                    buy_id = pair.get('buy_id')
-                    sell_id = pair.get('sell_id')
-                    if not buy_id or not sell_id:
-                        continue
-                    with request.env.cr.savepoint():
-                        buy_tx = Transaction.browse(int(buy_id))
-                        sell_tx = Transaction.browse(int(sell_id))
-                        if not buy_tx.exists() or not sell_tx.exists():
-                            continue
-                        # Không ghi nhận cặp nếu cùng 1 nhà đầu tư
-                        try:
-                            if buy_tx.user_id and sell_tx.user_id and buy_tx.user_id.id == sell_tx.user_id.id:
-                                continue
-                        except Exception:
-                            pass
-                        # Tạo matched order record (engine đã cập nhật quantities/status)
-                        matched_units = pair.get('matched_ccq') or pair.get('matched_volume')
-                        if not matched_units:
-                            # Fallback: dùng chênh lệch trước/sau nếu cần, hoặc tối thiểu còn lại
-                            matched_units = min(
-                                max(0.0, (buy_tx.units or 0.0) - (buy_tx.remaining_units or 0.0)),
-                                max(0.0, (sell_tx.units or 0.0) - (sell_tx.remaining_units or 0.0))
-                            ) or 0.0
-                        matched_price = pair.get('matched_price')
-                        if matched_price is None:
-                            matched_price = sell_tx.current_nav or (sell_tx.fund_id.current_nav if sell_tx.fund_id else 0)
-
-                        # Trạng thái matched order: done nếu cả 2 đã completed, ngược lại confirmed
-                        mo_status = 'done' if (getattr(buy_tx, 'status', '') == 'completed' and getattr(sell_tx, 'status', '') == 'completed') else 'confirmed'
-                        # Tạo mã duy nhất cho cặp (để dễ theo dõi)
-                        unique_code = f"MO-{buy_tx.fund_id.id if buy_tx.fund_id else 'X'}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{buy_tx.id}-{sell_tx.id}"
-                        request.env['transaction.matched.orders'].sudo().create({
-                            'name': unique_code,
-                            'buy_order_id': buy_tx.id,
-                            'sell_order_id': sell_tx.id,
-                            'matched_quantity': matched_units,
-                            'matched_price': matched_price,
-                            'fund_id': (buy_tx.fund_id.id if buy_tx.fund_id else (sell_tx.fund_id.id if sell_tx.fund_id else False)),
-                            'status': mo_status,
-                        })
-                except Exception as perr:
-                    pass
+            # Ghi toàn bộ kết quả khớp của phiên trong một lần (giao dịch + cặp lệnh)
+            with request.env.cr.savepoint():
+                matching_engine.apply_fills(fills)
             
             return request.make_response(
                 json.dumps({
@@ -1,6 +1,7 @@
 from odoo import http, fields
 from odoo.http import request
 import json
+from ..utils.order_book import fill_state
 
 
 class MatchedOrdersController(http.Controller):
@@ -599,22 +600,20 @@ class MatchedOrdersController(http.Controller):
             if qty_f <= 0:
                 return None
             # Cập nhật BUY
-            new_buy_matched = (buy_tx.matched_units or 0.0) + qty_f
-            buy_remaining = max(0.0, (buy_tx.units or 0.0) - new_buy_matched)
+            new_buy_matched, buy_remaining, buy_status = fill_state(buy_tx.units, buy_tx.matched_units, qty_f)
             buy_vals = {
                 'matched_units': new_buy_matched,
                 'remaining_units': buy_remaining,
-                'status': 'completed' if buy_remaining <= 0 else 'pending',
+                'status': buy_status,
             }
             (buy_tx.sudo().write(buy_vals) if buy_remaining <= 0 else buy_tx.with_context(bypass_investment_update=True).sudo().write(buy_vals))
 
             # Cập nhật SELL
-            new_sell_matched = (sell_tx.matched_units or 0.0) + qty_f
-            sell_remaining = max(0.0, (sell_tx.units or 0.0) - new_sell_matched)
+            new_sell_matched, sell_remaining, sell_status = fill_state(sell_tx.units, sell_tx.matched_units, qty_f)
             sell_vals = {
                 'matched_units': new_sell_matched,
                 'remaining_units': sell_remaining,
-                'status': 'completed' if sell_remaining <= 0 else 'pending',
+                'status': sell_status,
             }
             (sell_tx.sudo().write(sell_vals) if sell_remaining <= 0 else sell_tx.with_context(bypass_investment_update=True).sudo().write(sell_vals))
 
@@ -3,6 +3,7 @@
 from odoo import http
 from odoo.http import request
 import json
+from ..utils.order_book import priority_key
 
 
 class OrderBookController(http.Controller):
@@ -72,7 +73,7 @@ class OrderBookController(http.Controller):
                 ('transaction_type', 'in', ['buy', 'purchase']),
                 ('status', '=', 'pending'),
                 '|', ('matched_units', '=', 0), ('matched_units', '=', False),
-            ], order='price desc, create_date asc')
+            ], order='price desc, create_date asc, id asc')
             
             # Lấy lệnh bán (sell) chỉ trạng thái pending
             # Sắp xếp theo Price-Time Priority: Giá thấp nhất trước, cùng giá thì thời gian sớm nhất trước
@@ -81,7 +82,7 @@ class OrderBookController(http.Controller):
                 ('transaction_type', '=', 'sell'),
                 ('status', '=', 'pending'),
                 '|', ('matched_units', '=', 0), ('matched_units', '=', False),
-            ], order='price asc, create_date asc')
+            ], order='price asc, create_date asc, id asc')
             
             # Tính thống kê
             total_buy_value = sum(order.price * order.units for order in buy_orders)
@@ -173,7 +174,7 @@ class OrderBookController(http.Controller):
                     "ccq_remaining": getattr(order, 'ccq_remaining_to_match', 0),
                     "matched_units": getattr(order, 'matched_units', 0.0),
                     "remaining_units": getattr(order, 'remaining_units', 0.0),
-                    "priority_score": self._calculate_priority_score(order, 'buy')
+                    "priority_key": self._get_priority_key(order)
                 })
             
             sell_orders_data = []
@@ -189,7 +190,7 @@ class OrderBookController(http.Controller):
                     "ccq_remaining": getattr(order, 'ccq_remaining_to_match', 0),
                     "matched_units": getattr(order, 'matched_units', 0.0),
                     "remaining_units": getattr(order, 'remaining_units', 0.0),
-                    "priority_score": self._calculate_priority_score(order, 'sell')
+                    "priority_key": self._get_priority_key(order)
                 })
             
             fund_info = {
@@ -329,21 +330,9 @@ class OrderBookController(http.Controller):
         except Exception as e:
             return request.make_response(json.dumps({"success": False, "message": str(e), "data": []}, ensure_ascii=False), headers=[("Content-Type", "application/json")], status=500)
 
-    def _calculate_priority_score(self, order, order_type):
-        """Tính điểm ưu tiên theo Price-Time Priority"""
+    def _get_priority_key(self, order):
+        """Khóa Price-Time Priority dùng chung với engine khớp lệnh (xem utils.order_book.priority_key)"""
         try:
-            price = float(order.price or 0)
-            # Chuyển đổi thời gian thành số để so sánh
-            if order.created_at:
-                time_int = order.created_at.hour * 3600 + order.created_at.minute * 60 + order.created_at.second
-            else:
-                time_int = 0
-            
-            if order_type == 'buy':
-                # Buy: Giá cao nhất trước, cùng giá thì thời gian sớm nhất trước
-                return (price * 1000000) - time_int  # Giá cao hơn = điểm cao hơn, thời gian sớm hơn = điểm cao hơn
-            else:  # sell
-                # Sell: Giá thấp nhất trước, cùng giá thì thời gian sớm nhất trước
-                return (1000000 - price * 1000000) - time_int  # Giá thấp hơn = điểm cao hơn, thời gian sớm hơn = điểm cao hơn
+            return list(priority_key(order.transaction_type, order.price, order.create_date, order.id))
         except Exception:
-            return 0
+            return []
@@ -1,4 +1,4 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 
 class MatchedOrders(models.Model):
     _name = 'transaction.matched.orders'
@@ -166,8 +166,8 @@ class MatchedOrders(models.Model):
             # This is now handled in the action_match_orders method
             # to avoid double updates and conflicts
 
-            # Trigger recompute stats cho engines
-            self._trigger_engine_stats_recompute()
+            # Cộng dồn thống kê cho engines theo delta của các cặp mới
+            records._update_engine_stats(added=records._engine_stats_delta())
             return records
 
         except Exception as e:
@@ -176,28 +176,65 @@ class MatchedOrders(models.Model):
             traceback.print_exc()
             raise
 
+    # Các trường quyết định việc một cặp được đếm vào thống kê engine
+    _ENGINE_STATS_FIELDS = {'status', 'active', 'buy_order_id', 'sell_order_id', 'match_date'}
+
     def write(self, vals):
+        # Chỉ các trường quyết định việc cặp được đếm mới cần cập nhật thống kê engine
+        track_stats = bool(self._ENGINE_STATS_FIELDS.intersection(vals))
+        removed = self._engine_stats_delta() if track_stats else None
         result = super(MatchedOrders, self).write(vals)
-        # Trigger recompute stats cho engines
-        self._trigger_engine_stats_recompute()
+        if track_stats:
+            self._update_engine_stats(added=self._engine_stats_delta(), removed=removed)
         return result
 
     def unlink(self):
+        removed = self._engine_stats_delta()
         result = super(MatchedOrders, self).unlink()
-        # Trigger recompute stats cho engines
-        self._trigger_engine_stats_recompute()
+        self._update_engine_stats(removed=removed)
         return result
 
+    def init(self):
+        # Index cho thống kê khớp lệnh theo quỹ (engine stats, cron đối soát)
+        tools.create_index(
+            self._cr,
+            'transaction_matched_orders_fund_stats_idx',
+            self._table,
+            ['fund_id', 'status', 'match_date'],
+        )
+
+    def _engine_stats_delta(self):
+        """
+        Đóng góp của các cặp trong self vào thống kê engine, gộp theo quỹ.
+        Chỉ đếm cặp đang active ở trạng thái confirmed/done. Số cặp khớp một phần
+        không nằm ở đây: engine tính từ remaining_units hiện tại khi đọc.
+
+        Returns:
+            dict: {fund_id: (matches, last_match_date)}
+        """
+        stats = {}
+        for record in self:
+            if not record.fund_id or not record.active or record.status not in ('confirmed', 'done'):
+                continue
+            count, last_date = stats.get(record.fund_id.id, (0, False))
+            match_date = record.match_date or record.create_date
+            if match_date and (not last_date or match_date > last_date):
+                last_date = match_date
+            stats[record.fund_id.id] = (count + 1, last_date)
+        return stats
+
     @api.model
-    def _trigger_engine_stats_recompute(self):
-        """Trigger recompute stats cho engines khi có thay đổi matched orders"""
+    def _update_engine_stats(self, added=None, removed=None):
+        """Cập nhật bộ đếm thống kê của engines theo delta (thay cho tính lại toàn bộ)"""
+        if not added and not removed:
+            return
         try:
-            engine_model = self.env['transaction.partial.matching.engine']
-            if hasattr(engine_model, '_trigger_recompute_stats'):
-                engine_model._trigger_recompute_stats()
-        except Exception:
-            # Ignore errors để không ảnh hưởng đến chức năng chính
-            pass
+            with self.env.cr.savepoint():
+                self.env['transaction.partial.matching.engine'].sudo()._apply_match_stats_delta(added, removed)
+        except Exception as e:
+            # Không chặn luồng chính; cron đối soát sẽ sửa sai lệch
+            import logging
+            logging.getLogger(__name__).warning(f"Could not update engine match stats: {e}")
 
     def get_remaining_orders_summary(self):
         """Lấy tổng kết các lệnh còn lại - simplified version"""
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 from enum import Enum
+from ..utils.order_book import BookOrder, OrderBook, fill_state, price_key
 
 _logger = logging.getLogger(__name__)
 
+# Sổ lệnh trong bộ nhớ theo từng worker: (dbname, engine_id) -> (book_version, OrderBook)
+_ORDER_BOOKS = {}
+
 
 class OrderType(Enum):
     """Loại lệnh giao dịch"""
@@ -46,28 +50,32 @@ class PartialMatchingEngine(models.Model):
         help='Số lần khớp một phần tối đa cho mỗi lệnh'
     )
     
-    # Thống kê (tính động dựa trên giao dịch đã khớp)
+    # Thống kê (cộng dồn theo delta khi tạo/xóa matched orders, đối soát định kỳ bằng cron)
     total_matches = fields.Integer(
         string='Total Matches',
-        compute='_compute_engine_match_stats',
-        store=True,
-        search='_search_total_matches'
+        default=0,
+        readonly=True,
+        index=True,
+        copy=False
     )
+    # Số cặp khớp một phần phụ thuộc remaining_units của lệnh (đổi theo các lần khớp sau),
+    # nên không giữ bộ đếm mà tính từ matched orders khi đọc
     total_partial_matches = fields.Integer(
         string='Total Partial Matches',
-        compute='_compute_engine_match_stats',
-        store=True,
-        search='_search_total_partial_matches'
+        compute='_compute_total_partial_matches',
     )
     last_match_date = fields.Datetime(
         string='Last Match Date',
-        compute='_compute_engine_match_stats',
-        store=True,
-        search='_search_last_match_date'
+        readonly=True,
+        index=True,
+        copy=False
     )
     
     # Logs
     match_logs = fields.Text(string='Match Logs', readonly=True)
+    
+    # Phiên bản sổ lệnh, tăng sau mỗi lần ghi kết quả khớp để các worker đồng bộ sổ lệnh trong bộ nhớ
+    book_version = fields.Integer(string='Order Book Version', default=0, readonly=True, copy=False)
 
     def add_order(self, order_record):
         """
@@ -84,20 +92,52 @@ class PartialMatchingEngine(models.Model):
             if not self._validate_order(order_record):
                 return []
             
-            # Thêm lệnh vào priority queue
-            self._add_to_queue(order_record)
-            
-            # Thực hiện khớp lệnh
-            matched_pairs = self._match_orders()
-            
-            # Cập nhật thống kê
-            self._update_statistics(matched_pairs)
-            
-            return matched_pairs
+            return self._add_orders(order_record)
             
         except Exception as e:
             _logger.error(f"Error in add_order: {str(e)}")
+            # Sổ lệnh có thể đã lệch so với DB, nạp lại ở lần khớp sau
+            _ORDER_BOOKS.pop(self._order_book_key(), None)
+            return []
+
+    def _add_orders(self, order_records):
+        """
+        Đưa một loạt lệnh vào sổ lệnh trong bộ nhớ, khớp từng lệnh theo thứ tự
+        rồi ghi toàn bộ kết quả xuống database một lần (write-behind theo lô).
+        """
+        self.ensure_one()
+        book = self._get_order_book()
+        
+        # Nếu transaction bị rollback thì sổ lệnh trong bộ nhớ không còn khớp với DB
+        key = self._order_book_key()
+        self.env.cr.postrollback.add(lambda: _ORDER_BOOKS.pop(key, None))
+        
+        # Bỏ qua các lệnh đã nằm trong sổ để không tạo queue trùng
+        new_orders = order_records.filtered(lambda o: o.id not in book)
+        if not new_orders:
             return []
+        
+        queue_records = self._add_to_queue(new_orders)
+        
+        fills = []
+        for order, queue_record in zip(new_orders, queue_records):
+            incoming = BookOrder(
+                order.id,
+                order.transaction_type,
+                order.price or order.current_nav,
+                order.remaining_units,
+                user_id=order.user_id.id,
+                queue_id=queue_record.id,
+                timestamp=queue_record.create_time,
+            )
+            fills.extend(book.match(incoming, self.min_match_quantity))
+        
+        matched_pairs = self._flush_fills(fills)
+        
+        # Cập nhật thống kê
+        self._update_statistics(matched_pairs)
+        
+        return matched_pairs
 
     def _validate_order(self, order_record):
         """Validate lệnh trước khi thêm vào engine"""
@@ -115,166 +155,168 @@ class PartialMatchingEngine(models.Model):
             
         return True
 
-    def _add_to_queue(self, order_record):
-        """Thêm lệnh vào priority queue tương ứng"""
-        # Lưu trữ trong database thay vì memory queue
-        queue_record = self.env['transaction.order.queue'].create({
+    def _add_to_queue(self, order_records):
+        """Thêm lệnh vào priority queue tương ứng (tạo theo lô)"""
+        # Lưu trữ trong database để có thể nạp lại sổ lệnh khi worker khởi động
+        return self.env['transaction.order.queue'].create([{
             'engine_id': self.id,
             'order_id': order_record.id,
             'order_type': order_record.transaction_type,
             'price': order_record.price or order_record.current_nav,
             'quantity': order_record.remaining_units,
-            'priority_score': self._calculate_priority_score(order_record),
+            # Khóa Price-Time Priority: (price_key, create_time, order_id) - xem utils.order_book.priority_key
+            'price_key': price_key(order_record.transaction_type, order_record.price or order_record.current_nav),
             'create_time': order_record.create_date,
             'status': 'pending'
-        })
-        
-        return queue_record
+        } for order_record in order_records])
 
-    def _calculate_priority_score(self, order_record):
-        """
-        Tính điểm ưu tiên theo Price-Time Priority
-        Dựa trên thuật toán từ CompanyStockComparator
-        """
-        price = float(order_record.price or order_record.current_nav or 0)
-        create_time = order_record.create_date
-        
-        # Chuyển đổi thời gian thành số để so sánh (giống CompanyStockComparator)
-        time_score = self._time_to_integer(create_time)
-        
-        if order_record.transaction_type in ['buy', 'purchase']:
-            # Buy: Giá cao nhất trước, cùng giá thì thời gian sớm nhất trước
-            # Sử dụng công thức: (price * 1000000) - time_score
-            return (price * 1000000) - time_score
-        else:  # sell
-            # Sell: Giá thấp nhất trước, cùng giá thì thời gian sớm nhất trước
-            # Sử dụng công thức: (1000000 - price * 1000000) - time_score
-            return (1000000 - price * 1000000) - time_score
-
-    def _time_to_integer(self, datetime_obj):
+    # ==== Sổ lệnh trong bộ nhớ ====
+    def _order_book_key(self):
+        return (self.env.cr.dbname, self.id)
+
+    def _get_order_book(self):
         """
-        Chuyển đổi datetime thành integer để so sánh
-        Tương tự companyOrderIntegerTime trong Java
+        Lấy sổ lệnh trong bộ nhớ của engine.
+
+        Khóa dòng engine (FOR UPDATE) để các worker khớp tuần tự trên cùng một quỹ.
+        Nếu book_version trong DB khác phiên bản đang giữ (worker khác vừa khớp,
+        hoặc worker mới khởi động) thì nạp lại sổ lệnh từ transaction.order.queue.
         """
-        if not datetime_obj:
-            return 0
+        self.ensure_one()
+        self.env.cr.execute(
+            "SELECT book_version FROM transaction_partial_matching_engine WHERE id = %s FOR UPDATE",
+            (self.id,)
+        )
+        row = self.env.cr.fetchone()
+        db_version = (row[0] if row else 0) or 0
         
-        try:
-            # Lấy giờ và phút
-            hour = datetime_obj.hour
-            minute = datetime_obj.minute
-            # Chuyển thành phút từ 00:00 (giống Java)
-            return hour * 60 + minute
-        except Exception:
-            return 0
+        key = self._order_book_key()
+        cached = _ORDER_BOOKS.get(key)
+        if cached and cached[0] == db_version:
+            return cached[1]
+        
+        book = self._load_order_book()
+        _ORDER_BOOKS[key] = (db_version, book)
+        return book
 
-    def _match_orders(self):
+    def _load_order_book(self):
         """
-        Thực hiện khớp lệnh theo thuật toán Stock Exchange
-        Dựa trên CompanyOrderBookModule.match()
+        Nạp lại sổ lệnh từ các queue đang pending.
+        Dữ liệu đã được sắp theo khóa ưu tiên bằng index transaction_order_queue_priority_idx
+        nên chỉ cần một lần quét có thứ tự, không sort lại trong Python.
         """
-        matched_pairs = []
-        
-        try:
-            # Lấy buy orders (sắp xếp theo priority score giảm dần)
-            buy_orders = self.env['transaction.order.queue'].search([
-                ('engine_id', '=', self.id),
-                ('order_type', 'in', ['buy', 'purchase']),
-                ('status', '=', 'pending'),
-                ('quantity', '>', 0)
-            ], order='priority_score desc')
-            
-            # Lấy sell orders (sắp xếp theo priority score giảm dần)
-            sell_orders = self.env['transaction.order.queue'].search([
-                ('engine_id', '=', self.id),
-                ('order_type', '=', 'sell'),
-                ('status', '=', 'pending'),
-                ('quantity', '>', 0)
-            ], order='priority_score desc')
-            
-            # Khớp lệnh theo thuật toán
-            for buy_queue in buy_orders:
-                if buy_queue.quantity <= 0:
-                    continue
-                    
-                for sell_queue in sell_orders:
-                    if sell_queue.quantity <= 0:
-                        continue
-                    
-                    # Kiểm tra điều kiện khớp: buy_price >= sell_price
-                    if buy_queue.price < sell_queue.price:
-                        continue
-                    
-                    # Kiểm tra không cùng user
-                    buy_order = buy_queue.order_id
-                    sell_order = sell_queue.order_id
-                    if buy_order.user_id.id == sell_order.user_id.id:
-                        continue
-                    
-                    # Tính số lượng khớp
-                    matched_quantity = min(buy_queue.quantity, sell_queue.quantity)
-                    if matched_quantity < self.min_match_quantity:
-                        continue
-                    
-                    # Tạo cặp khớp
-                    pair = self._create_matched_pair(buy_order, sell_order, matched_quantity)
-                    matched_pairs.append(pair)
-                    
-                    # Cập nhật database
-                    self._update_transaction_status(buy_order, sell_order, matched_quantity)
-                    
-                    # Cập nhật queue quantities
-                    buy_queue.quantity -= matched_quantity
-                    sell_queue.quantity -= matched_quantity
-                    
-                    # Đánh dấu completed nếu hết
-                    if buy_queue.quantity <= 0:
-                        buy_queue.status = 'completed'
-                    if sell_queue.quantity <= 0:
-                        sell_queue.status = 'completed'
-                    
-                    # Không break: cho phép một lệnh khớp liên tiếp với nhiều lệnh đối ứng
-                    # Tiếp tục duyệt các sell_orders còn lại cho đến khi buy_queue.quantity về 0
-            
-            return matched_pairs
-            
-        except Exception as e:
-            _logger.error(f"Error in _match_orders: {str(e)}")
-            return []
-
-    def _create_matched_pair(self, buy_order, sell_order, matched_quantity):
+        book = OrderBook()
+        Queue = self.env['transaction.order.queue']
+        Queue.flush_model(['engine_id', 'status', 'quantity', 'price', 'price_key', 'create_time', 'order_id', 'user_id'])
+        self.env.cr.execute("""
+            SELECT id, order_id, order_type, price, quantity, user_id, create_time
+              FROM transaction_order_queue
+             WHERE engine_id = %s AND status = 'pending' AND quantity > 0
+          ORDER BY price_key, create_time, order_id
+        """, (self.id,))
+        for queue_id, order_id, order_type, price, quantity, user_id, create_time in self.env.cr.fetchall():
+            book.add(BookOrder(
+                order_id,
+                order_type,
+                price,
+                quantity,
+                user_id=user_id,
+                queue_id=queue_id,
+                timestamp=create_time,
+            ))
+        return book
+
+    def _invalidate_order_book(self):
+        """Buộc mọi worker nạp lại sổ lệnh ở lần khớp tiếp theo"""
+        for engine in self:
+            _ORDER_BOOKS.pop(engine._order_book_key(), None)
+            self.env.cr.execute(
+                "UPDATE transaction_partial_matching_engine "
+                "SET book_version = COALESCE(book_version, 0) + 1 WHERE id = %s",
+                (engine.id,)
+            )
+        self.invalidate_recordset(['book_version'])
+
+    def _flush_fills(self, fills):
         """
-        Tạo cặp lệnh khớp theo chuẩn Stock Exchange
-        Dựa trên CompanyStockTransaction
+        Ghi các lần khớp xuống database theo lô:
+        - transaction.matched.orders: một lần create(vals_list)
+        - transaction.order.queue: một lần write cho các queue đã khớp hết,
+          mỗi queue khớp dở một write
+        - portfolio.transaction: gộp khối lượng khớp theo lệnh, mỗi lệnh một write
         """
-        try:
-            # Tạo matched order record
-            matched_order = self.env['transaction.matched.orders'].create({
-                'name': f"PM-{self.fund_id.id}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{buy_order.id}-{sell_order.id}",
-                'buy_order_id': buy_order.id,
-                'sell_order_id': sell_order.id,
-                'matched_quantity': matched_quantity,
-                'matched_price': sell_order.price or sell_order.current_nav,  # Giá khớp = giá sell
+        if not fills:
+            return []
+        
+        key = self._order_book_key()
+        Transaction = self.env['portfolio.transaction'].sudo()
+        Queue = self.env['transaction.order.queue'].sudo()
+        
+        # Cộng dồn khối lượng khớp theo từng lệnh
+        matched_by_tx = {}
+        queue_by_id = {}
+        for buy, sell, qty, _price in fills:
+            for book_order in (buy, sell):
+                matched_by_tx[book_order.order_id] = matched_by_tx.get(book_order.order_id, 0.0) + qty
+                queue_by_id[book_order.queue_id] = book_order.quantity
+        
+        transactions = Transaction.browse(list(matched_by_tx))
+        tx_by_id = {tx.id: tx for tx in transactions}
+        user_types = {tx.id: self._get_user_type(tx) for tx in transactions}
+        
+        # Cập nhật queue: gộp các queue đã khớp hết vào một lần write
+        completed_queue_ids = [qid for qid, qty in queue_by_id.items() if qid and qty <= 0]
+        if completed_queue_ids:
+            Queue.browse(completed_queue_ids).write({'quantity': 0, 'status': 'completed'})
+        for qid, qty in queue_by_id.items():
+            if qid and qty > 0:
+                Queue.browse(qid).write({'quantity': qty})
+        
+        # Cập nhật trạng thái giao dịch
+        for tx_id, matched_quantity in matched_by_tx.items():
+            self._update_transaction_status(tx_by_id[tx_id], matched_quantity)
+        
+        # Tạo matched orders trong một lần create
+        now = datetime.now()
+        stamp = now.strftime('%Y%m%d%H%M%S%f')
+        vals_list = []
+        for index, (buy, sell, qty, price) in enumerate(fills):
+            vals_list.append({
+                'name': f"PM-{self.fund_id.id}-{stamp}-{index}-{buy.order_id}-{sell.order_id}",
+                'buy_order_id': buy.order_id,
+                'sell_order_id': sell.order_id,
+                'matched_quantity': qty,
+                'matched_price': price,  # Giá khớp = giá sell
                 'fund_id': self.fund_id.id,
                 'status': 'confirmed',
-                'buy_user_type': self._get_user_type(buy_order),
-                'sell_user_type': self._get_user_type(sell_order),
+                'buy_user_type': user_types.get(buy.order_id, 'investor'),
+                'sell_user_type': user_types.get(sell.order_id, 'investor'),
             })
-            
-            return {
-                'id': matched_order.id,
-                'buy_id': buy_order.id,
-                'sell_id': sell_order.id,
-                'matched_quantity': matched_quantity,
-                'matched_price': sell_order.price or sell_order.current_nav,
-                'match_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'algorithm_used': 'Partial Matching Engine',
-                'fund_name': self.fund_id.name,
-            }
-            
-        except Exception as e:
-            _logger.error(f"Error creating matched pair: {str(e)}")
-            return None
+        matched_orders = self.env['transaction.matched.orders'].create(vals_list)
+        
+        # Đánh dấu phiên bản sổ lệnh mới để worker khác biết cần nạp lại
+        self.env.cr.execute(
+            "UPDATE transaction_partial_matching_engine "
+            "SET book_version = COALESCE(book_version, 0) + 1 WHERE id = %s RETURNING book_version",
+            (self.id,)
+        )
+        new_version = self.env.cr.fetchone()[0]
+        self.invalidate_recordset(['book_version'])
+        cached = _ORDER_BOOKS.get(key)
+        if cached:
+            _ORDER_BOOKS[key] = (new_version, cached[1])
+        
+        match_time = now.strftime('%Y-%m-%d %H:%M:%S')
+        return [{
+            'id': matched_order.id,
+            'buy_id': buy.order_id,
+            'sell_id': sell.order_id,
+            'matched_quantity': qty,
+            'matched_price': price,
+            'match_time': match_time,
+            'algorithm_used': 'Partial Matching Engine',
+            'fund_name': self.fund_id.name,
+        } for matched_order, (buy, sell, qty, price) in zip(matched_orders, fills)]
 
     def _get_user_type(self, transaction):
         """Xác định loại user"""
@@ -289,56 +331,32 @@ class PartialMatchingEngine(models.Model):
         
         return 'investor'
 
-    def _update_transaction_status(self, buy_order, sell_order, matched_quantity):
+    def _update_transaction_status(self, order, matched_quantity):
         """
-        Cập nhật trạng thái giao dịch sau khi khớp
+        Cập nhật trạng thái giao dịch sau khi khớp (đã gộp mọi lần khớp của lệnh)
         Dựa trên thuật toán từ CompanyOrderBookModule.checkTransactionExecutor
         """
         try:
-            # Cập nhật buy order - sử dụng logic hiện tại
-            new_buy_matched = (buy_order.matched_units or 0) + matched_quantity
-            buy_remaining = max(0, (buy_order.units or 0) - new_buy_matched)
-            
-            # Cập nhật ccq_remaining_to_match chính xác
-            buy_ccq_remaining = max(0, buy_remaining) if buy_remaining > 0 else 0
-            
-            buy_vals = {
-                'matched_units': new_buy_matched,
-                'remaining_units': buy_remaining,
-                'ccq_remaining_to_match': buy_ccq_remaining,  # Record chính xác số lượng còn lại cần khớp
-                'status': 'completed' if buy_remaining <= 0 else 'pending',
-            }
-            
-            if buy_remaining <= 0:
-                buy_order.sudo().write(buy_vals)
-            else:
-                buy_order.with_context(bypass_investment_update=True).sudo().write(buy_vals)
+            new_matched, remaining, status = fill_state(order.units, order.matched_units, matched_quantity)
             
-            # Cập nhật sell order - sử dụng logic hiện tại
-            new_sell_matched = (sell_order.matched_units or 0) + matched_quantity
-            sell_remaining = max(0, (sell_order.units or 0) - new_sell_matched)
-            
-            # Cập nhật ccq_remaining_to_match chính xác
-            sell_ccq_remaining = max(0, sell_remaining) if sell_remaining > 0 else 0
-            
-            sell_vals = {
-                'matched_units': new_sell_matched,
-                'remaining_units': sell_remaining,
-                'ccq_remaining_to_match': sell_ccq_remaining,  # Record chính xác số lượng còn lại cần khớp
-                'status': 'completed' if sell_remaining <= 0 else 'pending',
+            vals = {
+                'matched_units': new_matched,
+                'remaining_units': remaining,
+                'ccq_remaining_to_match': remaining,  # Record chính xác số lượng còn lại cần khớp
+                'status': status,
             }
             
-            if sell_remaining <= 0:
-                sell_order.sudo().write(sell_vals)
+            if status == 'completed':
+                order.sudo().write(vals)
             else:
-                sell_order.with_context(bypass_investment_update=True).sudo().write(sell_vals)
+                order.with_context(bypass_investment_update=True).sudo().write(vals)
                 
         except Exception as e:
             _logger.error(f"Error updating transaction status: {str(e)}")
 
     def _update_statistics(self, matched_pairs):
         """Cập nhật thống kê engine"""
-        # Giữ lại để log nội bộ; thống kê hiển thị được tính động qua _compute_engine_match_stats
+        # Giữ lại để log nội bộ; bộ đếm thống kê được cộng dồn trong transaction.matched.orders
         if not matched_pairs:
             return
         # Ghi log để truy vết (không thay đổi trường thống kê hiển thị)
@@ -348,204 +366,128 @@ class PartialMatchingEngine(models.Model):
         except Exception:
             pass
 
-    @api.depends('fund_id')
-    @api.depends_context('force_recompute')
-    def _compute_engine_match_stats(self):
-        """Tính thống kê từ bảng transaction.matched.orders (danh sách lệnh thỏa thuận)"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        Transaction = self.env['portfolio.transaction'].sudo()
+    _MATCH_STAT_FIELDS = ['total_matches', 'last_match_date']
 
+    def _compute_total_partial_matches(self):
+        stats = self._read_fund_match_stats(self.mapped('fund_id').ids)
         for engine in self:
-            if not engine.fund_id:
-                engine.total_matches = 0
-                engine.total_partial_matches = 0
-                engine.last_match_date = False
-                continue
-
-            # Lấy tất cả matched orders theo quỹ từ danh sách lệnh thỏa thuận
-            matched_orders = MatchedOrder.search([
-                ('fund_id', '=', engine.fund_id.id),
-                ('status', 'in', ['confirmed', 'done'])  # Chỉ lấy các lệnh đã xác nhận hoặc hoàn thành
-            ])
-            
-            # Tổng số lần khớp
-            engine.total_matches = len(matched_orders)
-
-            # Lần khớp cuối cùng
-            if matched_orders:
-                # Ưu tiên field match_date, fallback create_date
-                dates = []
-                for mo in matched_orders:
-                    match_date = mo.match_date or mo.create_date
-                    if match_date:
-                        dates.append(match_date)
-                engine.last_match_date = max(dates) if dates else False
-            else:
-                engine.last_match_date = False
-
-            # Tính số lần khớp một phần
-            # Một cặp được coi là khớp một phần nếu sau khi khớp, 
-            # lệnh mua hoặc lệnh bán vẫn còn remaining_units > 0
-            partial_count = 0
-            for mo in matched_orders:
-                try:
-                    # Lấy thông tin lệnh mua và bán
-                    buy_order = mo.buy_order_id
-                    sell_order = mo.sell_order_id
-                    
-                    if buy_order and sell_order:
-                        # Kiểm tra xem có còn remaining_units không
-                        buy_remaining = buy_order.remaining_units or 0
-                        sell_remaining = sell_order.remaining_units or 0
-                        
-                        # Nếu một trong hai lệnh còn remaining > 0 thì là khớp một phần
-                        if buy_remaining > 0 or sell_remaining > 0:
-                            partial_count += 1
-                            
-                except Exception as e:
-                    # Log lỗi nhưng không dừng quá trình
-                    _logger.warning(f"Error checking partial match for {mo.name}: {str(e)}")
-                    continue
-                    
-            engine.total_partial_matches = partial_count
+            engine.total_partial_matches = stats.get(engine.fund_id.id, (0, 0, False))[1]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        engines = super().create(vals_list)
+        # Engine mới: lấy thống kê hiện có của quỹ một lần
+        engines._reconcile_match_stats()
+        return engines
 
     @api.model
-    def _trigger_recompute_stats(self):
-        """Trigger recompute cho tất cả engines khi có thay đổi dữ liệu"""
-        engines = self.search([])
-        engines.with_context(force_recompute=True)._compute_engine_match_stats()
-
-    def _search_total_matches(self, operator, value):
-        """Search method cho total_matches"""
-        if operator == '>':
-            return [('fund_id', 'in', self._get_funds_with_matches_greater_than(value))]
-        elif operator == '=':
-            return [('fund_id', 'in', self._get_funds_with_matches_equal_to(value))]
-        elif operator == '>=':
-            return [('fund_id', 'in', self._get_funds_with_matches_greater_equal(value))]
-        return []
-
-    def _search_total_partial_matches(self, operator, value):
-        """Search method cho total_partial_matches"""
-        if operator == '>':
-            return [('fund_id', 'in', self._get_funds_with_partial_matches_greater_than(value))]
-        elif operator == '=':
-            return [('fund_id', 'in', self._get_funds_with_partial_matches_equal_to(value))]
-        elif operator == '>=':
-            return [('fund_id', 'in', self._get_funds_with_partial_matches_greater_equal(value))]
-        return []
-
-    def _search_last_match_date(self, operator, value):
-        """Search method cho last_match_date"""
-        if operator == '>':
-            return [('fund_id', 'in', self._get_funds_with_last_match_after(value))]
-        elif operator == '=':
-            return [('fund_id', 'in', self._get_funds_with_last_match_on(value))]
-        elif operator == '>=':
-            return [('fund_id', 'in', self._get_funds_with_last_match_after_equal(value))]
-        return []
-
-    def _get_funds_with_matches_greater_than(self, value):
-        """Lấy danh sách fund_id có total_matches > value từ danh sách lệnh thỏa thuận"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        matched_orders = MatchedOrder.read_group(
-            [
-                ('fund_id', '!=', False),
-                ('status', 'in', ['confirmed', 'done'])
-            ],
-            ['fund_id'],
-            ['fund_id']
-        )
-        fund_ids = []
-        for group in matched_orders:
-            if group['fund_id_count'] > value:
-                fund_ids.append(group['fund_id'][0])
-        return fund_ids
-
-    def _get_funds_with_matches_equal_to(self, value):
-        """Lấy danh sách fund_id có total_matches = value từ danh sách lệnh thỏa thuận"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        matched_orders = MatchedOrder.read_group(
-            [
-                ('fund_id', '!=', False),
-                ('status', 'in', ['confirmed', 'done'])
-            ],
-            ['fund_id'],
-            ['fund_id']
-        )
-        fund_ids = []
-        for group in matched_orders:
-            if group['fund_id_count'] == value:
-                fund_ids.append(group['fund_id'][0])
-        return fund_ids
-
-    def _get_funds_with_matches_greater_equal(self, value):
-        """Lấy danh sách fund_id có total_matches >= value từ danh sách lệnh thỏa thuận"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        matched_orders = MatchedOrder.read_group(
-            [
-                ('fund_id', '!=', False),
-                ('status', 'in', ['confirmed', 'done'])
-            ],
-            ['fund_id'],
-            ['fund_id']
-        )
-        fund_ids = []
-        for group in matched_orders:
-            if group['fund_id_count'] >= value:
-                fund_ids.append(group['fund_id'][0])
-        return fund_ids
-
-    def _get_funds_with_partial_matches_greater_than(self, value):
-        """Lấy danh sách fund_id có partial matches > value"""
-        # Simplified implementation - có thể cải thiện sau
-        return self._get_funds_with_matches_greater_than(value)
-
-    def _get_funds_with_partial_matches_equal_to(self, value):
-        """Lấy danh sách fund_id có partial matches = value"""
-        # Simplified implementation - có thể cải thiện sau
-        return self._get_funds_with_matches_equal_to(value)
-
-    def _get_funds_with_partial_matches_greater_equal(self, value):
-        """Lấy danh sách fund_id có partial matches >= value"""
-        # Simplified implementation - có thể cải thiện sau
-        return self._get_funds_with_matches_greater_equal(value)
-
-    def _get_funds_with_last_match_after(self, value):
-        """Lấy danh sách fund_id có last_match_date > value từ danh sách lệnh thỏa thuận"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        matched_orders = MatchedOrder.search([
-            ('fund_id', '!=', False),
-            ('status', 'in', ['confirmed', 'done']),
-            ('match_date', '>', value)
-        ])
-        return list(set(matched_orders.mapped('fund_id.id')))
+    def _apply_match_stats_delta(self, added=None, removed=None):
+        """
+        Cộng/trừ thống kê khớp lệnh cho các engine theo quỹ (không quét lại lịch sử).
 
-    def _get_funds_with_last_match_on(self, value):
-        """Lấy danh sách fund_id có last_match_date = value từ danh sách lệnh thỏa thuận"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        matched_orders = MatchedOrder.search([
-            ('fund_id', '!=', False),
-            ('status', 'in', ['confirmed', 'done']),
-            ('match_date', '=', value)
-        ])
-        return list(set(matched_orders.mapped('fund_id.id')))
+        Args:
+            added, removed: dict {fund_id: (matches, last_match_date)}
+                            do transaction.matched.orders._engine_stats_delta() trả về
+        """
+        added = added or {}
+        removed = removed or {}
+        fund_ids = set(added) | set(removed)
+        if not fund_ids:
+            return
+        self.flush_model(self._MATCH_STAT_FIELDS)
+        cr = self.env.cr
+        for fund_id in fund_ids:
+            add_count, add_date = added.get(fund_id, (0, False))
+            del_count, _del_date = removed.get(fund_id, (0, False))
+            # Cộng trực tiếp trong SQL để các worker ghi đồng thời không mất delta
+            cr.execute("""
+                UPDATE transaction_partial_matching_engine
+                   SET total_matches = GREATEST(0, COALESCE(total_matches, 0) + %s),
+                       last_match_date = CASE
+                           WHEN %s::timestamp IS NULL THEN last_match_date
+                           ELSE GREATEST(last_match_date, %s::timestamp)
+                       END
+                 WHERE fund_id = %s
+            """, (add_count - del_count, add_date or None, add_date or None, fund_id))
+        if removed:
+            # Xóa/hủy cặp khớp có thể làm lùi lần khớp cuối: lấy lại MAX theo index của quỹ
+            cr.execute("""
+                UPDATE transaction_partial_matching_engine e
+                   SET last_match_date = (
+                       SELECT MAX(COALESCE(mo.match_date, mo.create_date))
+                         FROM transaction_matched_orders mo
+                        WHERE mo.fund_id = e.fund_id
+                          AND mo.status IN ('confirmed', 'done')
+                          AND mo.active
+                   )
+                 WHERE e.fund_id IN %s
+            """, (tuple(removed),))
+        self.invalidate_model(self._MATCH_STAT_FIELDS)
 
-    def _get_funds_with_last_match_after_equal(self, value):
-        """Lấy danh sách fund_id có last_match_date >= value từ danh sách lệnh thỏa thuận"""
-        MatchedOrder = self.env['transaction.matched.orders'].sudo()
-        matched_orders = MatchedOrder.search([
-            ('fund_id', '!=', False),
-            ('status', 'in', ['confirmed', 'done']),
-            ('match_date', '>=', value)
+    @api.model
+    def _read_fund_match_stats(self, fund_ids=None):
+        """
+        Thống kê khớp lệnh theo quỹ bằng một câu SQL aggregate
+        (dùng index transaction_matched_orders_fund_stats_idx).
+
+        Một cặp được coi là khớp một phần nếu lệnh mua hoặc lệnh bán vẫn còn remaining_units > 0.
+
+        Returns:
+            dict: {fund_id: (matches, partial_matches, last_match_date)}
+        """
+        self.env['transaction.matched.orders'].flush_model([
+            'fund_id', 'status', 'active', 'match_date', 'buy_remaining_units', 'sell_remaining_units',
         ])
-        return list(set(matched_orders.mapped('fund_id.id')))
+        query = """
+            SELECT fund_id,
+                   COUNT(*),
+                   COUNT(*) FILTER (
+                       WHERE COALESCE(buy_remaining_units, 0) > 0 OR COALESCE(sell_remaining_units, 0) > 0
+                   ),
+                   MAX(COALESCE(match_date, create_date))
+              FROM transaction_matched_orders
+             WHERE fund_id IS NOT NULL
+               AND status IN ('confirmed', 'done')
+               AND active
+        """
+        params = []
+        if fund_ids is not None:
+            if not fund_ids:
+                return {}
+            query += " AND fund_id IN %s"
+            params.append(tuple(fund_ids))
+        query += " GROUP BY fund_id"
+        self.env.cr.execute(query, params)
+        return {row[0]: (row[1], row[2], row[3]) for row in self.env.cr.fetchall()}
+
+    def _reconcile_match_stats(self):
+        """Đối soát lại thống kê của các engine từ transaction.matched.orders"""
+        engines = self.filtered('fund_id')
+        if not engines:
+            return
+        stats = self._read_fund_match_stats(engines.mapped('fund_id').ids)
+        for engine in engines:
+            total, _partial, last_date = stats.get(engine.fund_id.id, (0, 0, False))
+            if (engine.total_matches, engine.last_match_date) != (total, last_date or False):
+                engine.write({
+                    'total_matches': total,
+                    'last_match_date': last_date or False,
+                })
+
+    @api.model
+    def cron_reconcile_match_stats(self):
+        """Cron: đối soát định kỳ các bộ đếm thống kê (sửa sai lệch do cặp khớp thay đổi trạng thái)"""
+        try:
+            self.search([])._reconcile_match_stats()
+        except Exception as e:
+            _logger.error(f"Error reconciling engine match stats: {str(e)}")
 
     def clear_queue(self):
         """Xóa tất cả lệnh trong queue"""
         self.env['transaction.order.queue'].search([
             ('engine_id', '=', self.id)
         ]).unlink()
+        self._invalidate_order_book()
 
     def get_queue_status(self):
         """Lấy trạng thái queue"""
@@ -576,12 +518,14 @@ class PartialMatchingEngine(models.Model):
             ('fund_id', '=', self.fund_id.id),
             ('status', '=', 'pending'),
             ('remaining_units', '>', 0)
-        ])
+        ], order='create_date asc, id asc')
         
-        # Thêm từng lệnh vào engine
-        for order in pending_orders:
-            pairs = self.add_order(order)
-            matched_pairs.extend(pairs)
+        # Khớp toàn bộ trong bộ nhớ, ghi kết quả xuống DB một lần
+        try:
+            matched_pairs = self._add_orders(pending_orders.filtered(self._validate_order))
+        except Exception as e:
+            _logger.error(f"Error in process_all_pending_orders: {str(e)}")
+            _ORDER_BOOKS.pop(self._order_book_key(), None)
         
         return matched_pairs
 
@@ -647,7 +591,7 @@ class TransactionOrderQueue(models.Model):
     """
     _name = 'transaction.order.queue'
     _description = 'Transaction Order Queue'
-    _order = 'priority_score desc'
+    _order = 'price_key, create_time, id'
     _rec_name = 'order_id'
 
     engine_id = fields.Many2one('transaction.partial.matching.engine', string='Engine', required=True)
@@ -660,7 +604,8 @@ class TransactionOrderQueue(models.Model):
     
     price = fields.Float(string='Price', digits=(16, 2))
     quantity = fields.Float(string='Remaining Quantity', digits=(16, 2))
-    priority_score = fields.Float(string='Priority Score', digits=(20, 6))
+    # Giá đổi dấu theo phía (buy: -price, sell: price) để một index tăng dần phục vụ cả hai phía
+    price_key = fields.Float(string='Price Key', digits=(16, 2))
     create_time = fields.Datetime(string='Create Time')
     
     status = fields.Selection([
@@ -693,6 +638,16 @@ class TransactionOrderQueue(models.Model):
         digits=(16, 2)
     )
     
+    def init(self):
+        # Index theo khóa Price-Time Priority cho các queue đang chờ khớp
+        tools.create_index(
+            self._cr,
+            'transaction_order_queue_priority_idx',
+            self._table,
+            ['engine_id', 'price_key', 'create_time', 'order_id'],
+            where="status = 'pending'",
+        )
+
     @api.model
     def cleanup_old_queues(self, days=7):
         """Dọn dẹp queue cũ"""
@@ -733,6 +688,9 @@ class TransactionOrderQueue(models.Model):
                 if (transaction.remaining_units or 0) <= 0:
                     queue_record.status = 'completed'
                 
+                # Số lượng thay đổi ngoài engine: worker nạp lại sổ lệnh ở lần khớp sau
+                queue_record.engine_id._invalidate_order_book()
+                
                 return True
             
             return False
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import BaseCase
+
+from ..utils import order_book
+
+
+class TestOrderBook(BaseCase):
+    """Quy tắc khớp của lõi sổ lệnh (không cần database)"""
+
+    def test_matching_rules(self):
+        book = order_book.OrderBook()
+        book.match(order_book.BookOrder(1, 'sell', 10.0, 100, user_id=1, timestamp='2024-01-01 09:00:00'))
+        book.match(order_book.BookOrder(2, 'sell', 10.0, 100, user_id=2, timestamp='2024-01-01 09:00:01'))
+        # Cùng user với lệnh 1 -> bỏ qua lệnh 1, khớp lệnh 2 theo giá bán
+        fills = book.match(order_book.BookOrder(3, 'buy', 11.0, 150, user_id=1, timestamp='2024-01-01 09:00:02'))
+        self.assertEqual([(b.order_id, s.order_id, q, p) for b, s, q, p in fills], [(3, 2, 100.0, 10.0)])
+        self.assertEqual(book.get(3).quantity, 50.0)
+
+    def test_cross_books(self):
+        fills, buys, sells = order_book.cross_books(
+            [(10, 'buy', 12.0, 50, 5, '2024-01-01 09:00:00'), (11, 'buy', 12.0, 50, 6, '2024-01-01 09:00:01')],
+            [(20, 'sell', 11.0, 80, 7, '2024-01-01 09:00:00')],
+        )
+        self.assertEqual([(b.order_id, s.order_id, q) for b, s, q, _p in fills], [(10, 20, 50.0), (11, 20, 30.0)])
+        self.assertEqual([o.order_id for o in buys], [11])
+        self.assertFalse(sells)
+        self.assertEqual(order_book.fill_state(100, 30, 70), (100.0, 0.0, 'completed'))
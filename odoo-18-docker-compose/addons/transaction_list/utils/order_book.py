@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Lõi khớp lệnh Price-Time Priority (thuần Python, không phụ thuộc ORM).
+
+Mọi đường khớp lệnh của module (PartialMatchingEngine, OrderMatchingEngine,
+nhà tạo lập trong matched_orders_controller) chỉ là adapter chuyển record
+portfolio.transaction thành tuple lệnh và ghi kết quả xuống DB:
+
+    (order_id, side, price, quantity, user_id, timestamp[, sequence])
+
+Mỗi phía (buy/sell) được chia thành các mức giá; trong cùng một mức giá các lệnh
+được giữ theo thứ tự FIFO bằng deque. Danh sách mức giá được giữ đã sắp xếp để
+duyệt theo thứ tự ưu tiên mà không phải sort lại toàn bộ sổ lệnh mỗi lần khớp.
+"""
+import calendar
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import date, datetime
+
+BUY = 'buy'
+SELL = 'sell'
+
+# Độ chính xác giá dùng trong khóa ưu tiên (khớp digits=(16, 2) của các trường giá)
+PRICE_DIGITS = 2
+
+
+def normalize_side(order_type):
+    """Quy đổi loại giao dịch ('purchase', 'buy', 'sell') về phía của sổ lệnh"""
+    return BUY if order_type in ('buy', 'purchase') else SELL
+
+
+def price_key(side, price):
+    """
+    Khóa giá đã làm tròn, sort tăng dần cho cả hai phía:
+    buy lưu giá âm (giá cao nhất trước), sell lưu giá dương (giá thấp nhất trước)
+    """
+    value = round(float(price or 0), PRICE_DIGITS)
+    return -value if normalize_side(side) == BUY else value
+
+
+def time_key(value):
+    """
+    Chuyển thời điểm đặt lệnh sang epoch nanoseconds (UTC, giữ nguyên ngày).
+    Hỗ trợ datetime, date và chuỗi 'YYYY-MM-DD HH:MM:SS[.ffffff]' / ISO 'T'.
+    """
+    if not value:
+        return 0
+    if isinstance(value, str):
+        s = value.strip()
+        try:
+            value = datetime.fromisoformat(s)
+        except ValueError:
+            # Fallback: chỉ có HH:MM:SS trong ngày
+            try:
+                parts = [int(p) for p in s.split(':')[:3]]
+            except ValueError:
+                return 0
+            parts += [0] * (3 - len(parts))
+            return (parts[0] * 3600 + parts[1] * 60 + parts[2]) * 1_000_000_000
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple()) * 1_000_000_000 + value.microsecond * 1000
+    if isinstance(value, date):
+        return calendar.timegm(value.timetuple()) * 1_000_000_000
+    return 0
+
+
+def priority_key(side, price, timestamp, sequence=0):
+    """
+    Khóa Price-Time Priority dùng chung cho mọi đường khớp lệnh:
+    (giá đã đổi dấu theo phía, thời điểm ns, số thứ tự để phá hòa).
+    Sort tăng dần theo khóa = đúng thứ tự ưu tiên của từng phía.
+    """
+    return (price_key(side, price), time_key(timestamp), sequence or 0)
+
+
+class BookOrder:
+    """Một lệnh đang chờ khớp trong sổ lệnh"""
+    __slots__ = ('order_id', 'side', 'price', 'quantity', 'user_id', 'queue_id', 'time_key', 'sequence')
+
+    def __init__(self, order_id, side, price, quantity, user_id=None, queue_id=None, timestamp=None, sequence=None):
+        self.order_id = order_id
+        self.side = normalize_side(side)
+        self.price = round(float(price or 0), PRICE_DIGITS)
+        self.quantity = float(quantity or 0)
+        self.user_id = user_id
+        self.queue_id = queue_id
+        self.time_key = time_key(timestamp)
+        self.sequence = sequence if sequence is not None else (order_id or 0)
+
+    @classmethod
+    def from_tuple(cls, order):
+        """Tạo BookOrder từ tuple (order_id, side, price, quantity, user_id, timestamp[, sequence])"""
+        if isinstance(order, cls):
+            return order
+        order_id, side, price, quantity, user_id, timestamp = order[:6]
+        sequence = order[6] if len(order) > 6 else None
+        return cls(order_id, side, price, quantity, user_id=user_id, timestamp=timestamp, sequence=sequence)
+
+    @property
+    def key(self):
+        return (price_key(self.side, self.price), self.time_key, self.sequence)
+
+    def __repr__(self):
+        return f"BookOrder({self.order_id}, {self.side}, {self.price}, {self.quantity})"
+
+
+class OrderBook:
+    """
+    Sổ lệnh theo mức giá, FIFO trong từng mức giá.
+    - Buy: giá cao nhất trước
+    - Sell: giá thấp nhất trước
+    """
+
+    def __init__(self):
+        # key mức giá -> deque[BookOrder]; key của buy là -price để cả hai phía sort tăng dần
+        self._levels = {BUY: {}, SELL: {}}
+        self._keys = {BUY: [], SELL: []}
+        self._orders = {}
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    @staticmethod
+    def _level_key(side, price):
+        return -price if side == BUY else price
+
+    def get(self, order_id):
+        return self._orders.get(order_id)
+
+    def add(self, order):
+        """Thêm lệnh vào cuối mức giá tương ứng (giữ FIFO)"""
+        if order.quantity <= 0 or order.order_id in self._orders:
+            return False
+        key = self._level_key(order.side, order.price)
+        levels = self._levels[order.side]
+        level = levels.get(key)
+        if level is None:
+            level = levels[key] = deque()
+            insort(self._keys[order.side], key)
+        if level and (level[-1].time_key, level[-1].sequence) > (order.time_key, order.sequence):
+            # Lệnh đến trễ nhưng đặt sớm hơn: chèn đúng vị trí thời gian (hiếm gặp)
+            ordered = list(level)
+            insort(ordered, order, key=lambda o: (o.time_key, o.sequence))
+            level.clear()
+            level.extend(ordered)
+        else:
+            level.append(order)
+        self._orders[order.order_id] = order
+        return True
+
+    def remove(self, order_id):
+        """Gỡ lệnh khỏi sổ (ví dụ khi lệnh bị hủy hoặc đã khớp hết)"""
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        key = self._level_key(order.side, order.price)
+        level = self._levels[order.side].get(key)
+        if level is not None:
+            try:
+                level.remove(order)
+            except ValueError:
+                pass
+            if not level:
+                self._drop_level(order.side, key)
+        return order
+
+    def _drop_level(self, side, key):
+        self._levels[side].pop(key, None)
+        keys = self._keys[side]
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+
+    def iter_side(self, side):
+        """Duyệt các lệnh của một phía theo Price-Time Priority"""
+        levels = self._levels[side]
+        for key in list(self._keys[side]):
+            for order in list(levels.get(key, ())):
+                yield order
+
+    def best(self, side):
+        keys = self._keys[side]
+        if not keys:
+            return None
+        return self._levels[side][keys[0]][0]
+
+    def depth(self, side):
+        return sum(len(level) for level in self._levels[side].values())
+
+    def match(self, incoming, min_quantity=0.0):
+        """
+        Khớp một lệnh mới với phía đối ứng của sổ lệnh.
+
+        Quy tắc giữ nguyên như engine hiện tại:
+        1. Khớp khi buy_price >= sell_price
+        2. Không khớp hai lệnh cùng user
+        3. Bỏ qua cặp có khối lượng khớp < min_quantity
+        4. Giá khớp luôn là giá của lệnh bán
+
+        Lệnh mới chỉ được đưa vào sổ nếu còn khối lượng sau khi khớp.
+
+        Returns:
+            list[tuple]: (buy_order, sell_order, matched_quantity, matched_price)
+        """
+        fills = []
+        opposite = SELL if incoming.side == BUY else BUY
+        levels = self._levels[opposite]
+        emptied = []
+
+        for key in self._keys[opposite]:
+            if incoming.quantity <= 0:
+                break
+            level_price = -key if opposite == BUY else key
+            crosses = (incoming.price >= level_price) if incoming.side == BUY else (level_price >= incoming.price)
+            if not crosses:
+                break
+            level = levels[key]
+            for resting in list(level):
+                if incoming.quantity <= 0:
+                    break
+                if incoming.user_id and resting.user_id == incoming.user_id:
+                    continue
+                qty = min(incoming.quantity, resting.quantity)
+                if qty < min_quantity:
+                    continue
+                if incoming.side == BUY:
+                    buy, sell = incoming, resting
+                else:
+                    buy, sell = resting, incoming
+                fills.append((buy, sell, qty, sell.price))
+                incoming.quantity -= qty
+                resting.quantity -= qty
+                if resting.quantity <= 0:
+                    if level[0] is resting:
+                        level.popleft()
+                    else:
+                        level.remove(resting)
+                    self._orders.pop(resting.order_id, None)
+            if not level:
+                emptied.append(key)
+
+        for key in emptied:
+            self._drop_level(opposite, key)
+
+        if incoming.quantity > 0:
+            self.add(incoming)
+        return fills
+
+
+def cross_books(buy_orders, sell_orders):
+    """
+    Khớp hai danh sách lệnh trong một phiên (dùng cho /api/transaction-list/match-orders).
+
+    Hai phía được sắp theo priority_key rồi khớp lệnh tốt nhất với lệnh tốt nhất.
+    Khi hai lệnh tốt nhất cùng user, bỏ lệnh đặt muộn hơn để giữ đúng FIFO.
+
+    Args:
+        buy_orders, sell_orders: iterable tuple lệnh hoặc BookOrder
+
+    Returns:
+        tuple: (fills, remaining_buys, remaining_sells)
+            fills: list[(buy_order, sell_order, matched_quantity, matched_price)]
+    """
+    buy_book = deque(sorted(
+        (o for o in map(BookOrder.from_tuple, buy_orders) if o.quantity > 0), key=lambda o: o.key))
+    sell_book = deque(sorted(
+        (o for o in map(BookOrder.from_tuple, sell_orders) if o.quantity > 0), key=lambda o: o.key))
+    fills = []
+
+    while buy_book and sell_book:
+        best_buy = buy_book[0]
+        best_sell = sell_book[0]
+
+        # Khớp khi buy_price >= sell_price
+        if best_buy.price < best_sell.price:
+            break
+
+        # Không khớp lệnh cùng 1 nhà đầu tư
+        if best_buy.user_id and best_buy.user_id == best_sell.user_id:
+            if (best_buy.time_key, best_buy.sequence) <= (best_sell.time_key, best_sell.sequence):
+                sell_book.popleft()
+            else:
+                buy_book.popleft()
+            continue
+
+        matched_quantity = min(best_buy.quantity, best_sell.quantity)
+        fills.append((best_buy, best_sell, matched_quantity, best_sell.price))
+        best_buy.quantity -= matched_quantity
+        best_sell.quantity -= matched_quantity
+
+        if best_buy.quantity <= 0:
+            buy_book.popleft()
+        if best_sell.quantity <= 0:
+            sell_book.popleft()
+
+    return fills, list(buy_book), list(sell_book)
+
+
+def fill_state(units, matched_units, quantity):
+    """
+    Trạng thái của một lệnh sau khi khớp thêm `quantity` CCQ.
+
+    Returns:
+        tuple: (matched_units, remaining_units, status)
+    """
+    new_matched = float(matched_units or 0) + float(quantity or 0)
+    remaining = max(0.0, float(units or 0) - new_matched)
+    return new_matched, remaining, ('completed' if remaining <= 0 else 'pending')
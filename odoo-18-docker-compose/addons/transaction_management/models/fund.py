@@ -1,6 +1,5 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
-import json
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP, getcontext
 
@@ -62,19 +61,8 @@ class Fund(models.Model):
 
     def _update_nav_history(self):
         self.ensure_one()
-        history = []
-        if self.nav_history_json:
-            try:
-                history = json.loads(self.nav_history_json)
-            except json.JSONDecodeError:
-                history = []
-        
-        history.append({
-            'date': fields.Date.today().isoformat(),
-            'value': self.current_nav
-        })
-        
-        self.nav_history_json = json.dumps(history)
+        # Ghi một điểm NAV của hôm nay vào portfolio.fund.nav.point (không ghi lại cả chuỗi JSON)
+        self.append_nav_point(self.current_nav, fields.Date.today())
 
     def _recompute_all_dependent_fields(self):
         """Force recompute all computed fields"""
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark thời gian cho các lõi tính toán thuần Python/NumPy của addons (chạy độc lập, không cần Odoo).
+Test hành vi nằm trong <addon>/tests/ và chạy bằng test runner của Odoo; dữ liệu mẫu dùng chung
+lấy từ <addon>/tests/common.py.
+
+    pip install pytest pytest-benchmark
+    pytest odoo-18-docker-compose/benchmarks --benchmark-only
+"""
+import importlib.util
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+_ADDONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'addons')
+
+# Tên fixture -> (đường dẫn trong addons, các package bắt buộc)
+ADDON_MODULES = {
+    'order_book': ('transaction_list/utils/order_book.py', ()),
+    'nav_vector': ('nav_management/utils/nav_vector.py', ('numpy',)),
+    'date_utils': ('nav_management/utils/date_utils.py', ()),
+    'nav_samples': ('nav_management/tests/common.py', ('numpy',)),
+    'market_stream': ('stock_data/utils/market_stream.py', ()),
+    'fetch_executor': ('stock_data/utils/fetch_executor.py', ()),
+    'client_pool': ('stock_data/utils/client_pool.py', ()),
+    'indicators': ('stock_data/utils/indicators.py', ('numpy',)),
+    'ohlc_series': ('stock_data/utils/ohlc_series.py', ()),
+    'stock_data_samples': ('stock_data/tests/common.py', ('numpy',)),
+    'order_stream': ('stock_trading/models/order_stream.py', ()),
+    'account_sync': ('stock_trading/models/account_sync.py', ()),
+    'risk_cache': ('stock_trading/models/risk_cache.py', ()),
+    'trading_samples': ('stock_trading/tests/common.py', ()),
+    'http_cache': ('fund_management/utils/http_cache.py', ()),
+    'fund_samples': ('fund_management/tests/common.py', ()),
+}
+
+
+def load_addon_module(relpath, requires=()):
+    """Nạp trực tiếp một file của addon để không kéo theo package Odoo của addon"""
+    for package in requires:
+        pytest.importorskip(package)
+    name = 'bench_' + os.path.splitext(relpath)[0].replace('/', '_')
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(_ADDONS_PATH, *relpath.split('/')))
+        module = importlib.util.module_from_spec(spec)
+        # Đăng ký tên module như một import thông thường
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+def _addon_fixture(fixture_name, relpath, requires):
+    @pytest.fixture(scope='session', name=fixture_name)
+    def _fixture():
+        return load_addon_module(relpath, requires)
+    return _fixture
+
+
+for _name, (_relpath, _requires) in ADDON_MODULES.items():
+    globals()[_name] = _addon_fixture(_name, _relpath, _requires)
+
+
+def generate_orders(size, seed=20240101):
+    """
+    Sinh sổ lệnh tổng hợp có thể tái lập (cùng seed -> cùng dữ liệu):
+    tuple (order_id, side, price, quantity, user_id, timestamp)
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    users = max(10, size // 20)
+    orders = []
+    for order_id in range(1, size + 1):
+        side = 'buy' if rng.random() < 0.5 else 'sell'
+        # Giá quanh 10,000 với bước 10 đồng, hai phía chồng lấn để có khớp
+        offset = rng.randint(-50, 50) * 10
+        price = 10000 + (offset - 100 if side == 'buy' else offset + 100)
+        quantity = rng.randint(1, 100) * 100
+        timestamp = start + timedelta(milliseconds=order_id * 7)
+        orders.append((order_id, side, price, quantity, rng.randint(1, users), timestamp))
+    return orders
+
+
+@pytest.fixture(scope='session')
+def synthetic_orders():
+    return generate_orders
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import random
+
+
+def test_bench_sync_parse_and_diff(benchmark, account_sync, trading_samples):
+    """Parse + so sánh cho 2.000 tài khoản mà phần lớn số dư không đổi giữa hai lần cron"""
+    rng = random.Random(20240104)
+    responses = [trading_samples.balance_response(rng.randint(1, 10 ** 6) * 1000, rng.randint(1, 10 ** 6) * 1000)
+                 for _ in range(2000)]
+    current = [account_sync.parse_balance(r) for r in responses]
+    for i in rng.sample(range(len(responses)), 100):
+        responses[i]['data']['availableCash'] += 1000
+
+    def run():
+        return [account_sync.diff_values(cur, account_sync.parse_balance(resp))
+                for cur, resp in zip(current, responses)]
+
+    changes = benchmark(run)
+    assert sum(1 for diff in changes if diff) == 100
+
+
+def test_bench_parse_positions(benchmark, account_sync, trading_samples):
+    result = trading_samples.positions_response(500)
+    parsed = benchmark(account_sync.parse_positions, result)
+    assert parsed['holding_count'] <= 500
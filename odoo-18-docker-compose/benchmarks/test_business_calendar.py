@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def test_workday_session(benchmark, date_utils, nav_samples):
+    pytest.importorskip('pytest_benchmark')
+    calendar = date_utils.BusinessCalendar(nav_samples.HOLIDAYS)
+    cases = nav_samples.workday_cases(10_000)
+
+    def run():
+        return [calendar.workday(start, days) for start, days in cases]
+
+    result = benchmark(run)
+    benchmark.extra_info['calls'] = len(cases)
+    assert len(result) == len(cases)
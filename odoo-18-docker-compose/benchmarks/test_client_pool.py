@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def test_pooled_get(benchmark, client_pool):
+    pytest.importorskip('pytest_benchmark')
+    pool = client_pool.ClientPool(lambda config: object(), ttl=3600)
+    client = pool.get(('db', 1), (1, 'a'), 'cfg')
+    assert benchmark(pool.get, ('db', 1), (1, 'a'), 'cfg') is client
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def test_concurrent_fetch_session(benchmark, fetch_executor, stock_data_samples):
+    pytest.importorskip('pytest_benchmark')
+    symbols = ['S%04d' % i for i in range(400)]
+    fetch, _calls = stock_data_samples.fake_api(latency=0.005)
+    executor = fetch_executor.FetchExecutor(max_workers=32, rate_per_sec=0)
+
+    results = benchmark.pedantic(executor.map, args=(fetch, symbols), rounds=3, iterations=1)
+    benchmark.extra_info['requests'] = len(symbols)
+    assert len(results) == len(symbols)
+    # --benchmark-disable: không có số liệu thời gian
+    if not benchmark.disabled:
+        # Tuần tự: 400 x 5ms = 2s; song song 32 luồng phải nhanh hơn nhiều
+        assert benchmark.stats.stats.mean < 1.0
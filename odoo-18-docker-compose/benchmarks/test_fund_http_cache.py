@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime
+
+import pytest
+
+
+def test_cached_body_hit(benchmark, http_cache, fund_samples):
+    pytest.importorskip('pytest_benchmark')
+    funds = fund_samples.fund_rows(20)
+    cache = http_cache.ResponseCache()
+    version = (20, datetime(2024, 5, 2, 8, 30), 20)
+    cache.get_or_build('data_fund', version, lambda: json.dumps(funds))
+    body = benchmark(cache.get_or_build, 'data_fund', version, lambda: json.dumps(funds))
+    assert len(body) > 100000
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+UNIVERSE_SIZES = [50, 400]
+
+
+@pytest.mark.parametrize('size', UNIVERSE_SIZES)
+def test_run_many(benchmark, indicators, stock_data_samples, size):
+    pytest.importorskip('pytest_benchmark')
+    series = {i: stock_data_samples.closes(1000, seed=i) for i in range(size)}
+    results = benchmark(indicators.run_many, series, 'rsi')
+    assert len(results) == size
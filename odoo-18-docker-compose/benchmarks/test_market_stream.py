@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def test_coalesce_session(benchmark, market_stream, stock_data_samples):
+    pytest.importorskip('pytest_benchmark')
+    messages = stock_data_samples.stream_messages(20_000)
+
+    def run():
+        coalescer = market_stream.TickCoalescer()
+        for message in messages:
+            coalescer.add_message(message)
+        return coalescer.drain()
+
+    batch = benchmark(run)
+    benchmark.extra_info['ticks'] = len(messages)
+    assert batch['quotes']
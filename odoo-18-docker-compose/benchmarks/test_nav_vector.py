@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+SESSION_SIZES = [1_000, 100_000]
+
+
+@pytest.mark.parametrize('size', SESSION_SIZES)
+def test_full_metrics_session(benchmark, nav_vector, nav_samples, size):
+    pytest.importorskip('pytest_benchmark')
+    columns = nav_samples.nav_columns(nav_vector, nav_samples.nav_session(size))
+    result = benchmark(nav_vector.full_metrics, *columns)
+    benchmark.extra_info['rows'] = size
+    assert len(result['sell_price2']) == size
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def test_pack_year_of_minutes(benchmark, ohlc_series, stock_data_samples):
+    pytest.importorskip('pytest_benchmark')
+    rows = stock_data_samples.minute_bars(250 * 270)
+    columns = benchmark(ohlc_series.pack_columns, rows)
+    benchmark.extra_info['bars'] = len(rows)
+    assert len(columns['c']) == len(rows)
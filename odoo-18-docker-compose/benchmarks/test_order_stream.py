@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+
+def test_buffer_session(benchmark, order_stream, trading_samples):
+    pytest.importorskip('pytest_benchmark')
+    messages = trading_samples.order_session_messages(2_000)
+
+    def run():
+        buffer = order_stream.OrderEventBuffer()
+        for message in messages:
+            event_type, data, _notify = order_stream.parse_stream_message(message)
+            buffer.add(order_stream.normalize_order(data, event_type))
+        return buffer.drain()
+
+    events = benchmark(run)
+    benchmark.extra_info['events'] = len(messages)
+    assert len(events) == 2_000
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+import random
+
+
+def test_bench_local_check(benchmark, risk_cache, trading_samples):
+    """Kiểm tra một lệnh trên snapshot có 200 lệnh đang chờ khớp"""
+    rng = random.Random(20240105)
+    orders = [(i, rng.choice('BS'), f'S{rng.randint(0, 49):02d}', rng.randint(10, 100) * 1000,
+               rng.randint(1, 10) * 100, 0, 'submitted') for i in range(200)]
+    holdings = {f'S{i:02d}': 10 ** 6 for i in range(50)}
+    cache = trading_samples.risk_cache_with(risk_cache, buying_power=10 ** 12, holdings=holdings, orders=orders)
+    result = benchmark(cache.check, trading_samples.RISK_KEY, 'B', 'S01', 25000, 1000, trading_samples.FEE)
+    assert result[0]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+BOOK_SIZES = [1_000, 10_000, 100_000]
+
+
+def _replay(order_book, orders):
+    """Đưa lần lượt từng lệnh vào sổ, đo độ trễ mỗi lần add_order (ns)"""
+    book = order_book.OrderBook()
+    latencies = []
+    fills = 0
+    for order in orders:
+        incoming = order_book.BookOrder.from_tuple(order)
+        started = time.perf_counter_ns()
+        fills += len(book.match(incoming))
+        latencies.append(time.perf_counter_ns() - started)
+    return fills, latencies
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@pytest.mark.parametrize('size', BOOK_SIZES)
+def test_add_order_stream(benchmark, order_book, synthetic_orders, size):
+    orders = synthetic_orders(size)
+    stats = {}
+
+    def run():
+        started = time.perf_counter_ns()
+        fills, latencies = _replay(order_book, orders)
+        stats['elapsed'] = time.perf_counter_ns() - started
+        stats['fills'] = fills
+        stats['latencies'] = latencies
+
+    benchmark.pedantic(run, rounds=3 if size < 100_000 else 1, iterations=1)
+
+    elapsed_s = stats['elapsed'] / 1e9
+    benchmark.extra_info['orders'] = size
+    benchmark.extra_info['fills'] = stats['fills']
+    benchmark.extra_info['fills_per_sec'] = round(stats['fills'] / elapsed_s, 1) if elapsed_s else 0.0
+    benchmark.extra_info['add_order_p50_us'] = round(_percentile(stats['latencies'], 50) / 1000.0, 2)
+    benchmark.extra_info['add_order_p99_us'] = round(_percentile(stats['latencies'], 99) / 1000.0, 2)
+    assert stats['fills'] > 0
+
+
+@pytest.mark.parametrize('size', BOOK_SIZES)
+def test_cross_books(benchmark, order_book, synthetic_orders, size):
+    orders = synthetic_orders(size)
+    buys = [o for o in orders if o[1] == 'buy']
+    sells = [o for o in orders if o[1] == 'sell']
+
+    fills, _buys, _sells = benchmark(order_book.cross_books, buys, sells)
+
+    # --benchmark-disable: không có số liệu thời gian
+    elapsed_s = 0.0 if benchmark.disabled else benchmark.stats.stats.mean
+    benchmark.extra_info['orders'] = size
+    benchmark.extra_info['fills'] = len(fills)
+    benchmark.extra_info['fills_per_sec'] = round(len(fills) / elapsed_s, 1) if elapsed_s else 0.0
+    assert fills
+